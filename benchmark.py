@@ -0,0 +1,443 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from bokeh.plotting import figure, save
+from bokeh.io import output_file
+from bokeh.layouts import column
+from bokeh.models import ColumnDataSource
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from netdelay import instrument, synth
+from netdelay.cache import code_version
+from netdelay.decimate import decimate
+from netdelay.delayed_ack import KIND_OTHER, classify_acks, label_outliers
+from netdelay.jobs import plotting_scripts
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import flow_index, load_packets
+from netdelay.protocols import protocol_codes, protocol_shares
+from netdelay.tcp import sequence_state
+from netdelay.timeindex import index_path
+from netdelay.worker import run_script
+
+SIZES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+BENCH_DIR = "benchmarks"                # results, one JSON file per commit
+CAPTURE_DIR = os.path.join(BENCH_DIR, "captures")
+TIMEOUT_RTO = 0.2                       # retransmissions this late after the original count as timeouts
+TOP_SOURCES = 20                        # sources drawn in the per-source charts
+
+# ------------------------------------------------------------------------
+# 1. Measurements
+# ------------------------------------------------------------------------
+#
+# Each stage is timed on its own and its peak resident set size recorded
+# (see netdelay.instrument). Every capture size runs in a fresh process so
+# sizes do not inherit each other's heap.
+
+def stage_result(analysis, stage, packets, record, depth=0):
+    """One measurement: an instrument stage record of analysis over packets."""
+    seconds = record["wall_seconds"]
+    return {
+        "analysis": analysis,
+        "stage": stage,
+        "depth": depth,
+        "seconds": seconds,
+        "cpu_seconds": record["cpu_seconds"],
+        "packets_per_second": packets / seconds if seconds else None,
+        "peak_rss": record["peak_rss"],
+        "output_bytes": record["output_bytes"],
+    }
+
+
+def measure(results, analysis, stage, packets, fn, *args):
+    """Runs fn(*args) as one stage, appends its measurement to results and returns its value."""
+    value, record = instrument.measure(f"{analysis} {stage}", fn, *args, packets=packets)
+    results.append(stage_result(analysis, stage, packets, record))
+    return value
+
+# ------------------------------------------------------------------------
+# 2. Kernels
+# ------------------------------------------------------------------------
+#
+# The netdelay building blocks of the analyses, timed on their own: not
+# the plotting scripts (see run_scripts) but the vectorized computations
+# behind an RTT, protocol, loss and retransmission view, split into
+# group (per-packet classification and grouping), stats (the aggregates a
+# view shows) and render (a Bokeh figure of them saved to HTML). Parsing
+# (packets.load_packets) is shared by all four and timed once. They are
+# recorded as "<name> kernel".
+
+def rtt_group(table):
+    acks = classify_acks(table)
+    rows = np.flatnonzero(acks["kind"] != KIND_OTHER)
+    conversation, _, _ = flow_index(table, directed=False)
+    return {"rows": rows, "rtt": acks["ack_delay"][rows], "kind": acks["kind"][rows],
+            "conversation": conversation[rows]}
+
+
+def rtt_stats(group):
+    outlier, artefact = label_outliers(group["rtt"], group["kind"], group["conversation"])
+    order = np.lexsort((group["rtt"], group["conversation"]))
+    keys, first, count = np.unique(group["conversation"][order], return_index=True, return_counts=True)
+    ranked = group["rtt"][order]
+    percentiles = {f"p{q}": ranked[first + ((count - 1) * q // 100)] for q in (50, 95, 99)}
+    return {"conversation": keys, "samples": count, **percentiles,
+            "outliers": int(outlier.sum()), "artefacts": int(artefact.sum())}
+
+
+def rtt_render(table, group, stats, path):
+    order = np.argsort(group["rows"], kind="stable")
+    x = table["time"][group["rows"][order]] - table["time"][0]
+    y = group["rtt"][order] * 1000
+    keep = decimate(x, y)
+    scatter = figure(title="RTT over time", x_axis_label="Time (s)", y_axis_label="RTT (ms)",
+                     width=800, height=400, output_backend="webgl")
+    scatter.scatter("x", "y", source=ColumnDataSource(data={"x": x[keep], "y": y[keep]}), size=3)
+    names = [str(c) for c in stats["conversation"][:TOP_SOURCES]]
+    bars = figure(x_range=names, title="p95 RTT per conversation", y_axis_label="RTT (ms)", width=800, height=300)
+    bars.vbar(x=names, top=stats["p95"][:TOP_SOURCES] * 1000, width=0.8)
+    output_file(path)
+    save(column(scatter, bars))
+    return path
+
+
+def protocol_group(table):
+    return protocol_codes(table)
+
+
+def protocol_stats(table, codes):
+    return protocol_shares(table, codes)
+
+
+def protocol_render(shares, path):
+    names = [str(p) for p in shares["protocol"]]
+    bars = figure(x_range=names, title="Protocol distribution", y_axis_label="% of packets", width=800, height=400)
+    bars.vbar(x=names, top=shares["packet_share"], width=0.8)
+    output_file(path)
+    save(bars)
+    return path
+
+
+def loss_group(table):
+    return classify_loss(table)
+
+
+def loss_stats(table, flags):
+    width = max(len(table["addresses"]), 1)
+    ip = table["src"] >= 0
+    per_source = {lt: np.bincount(table["src"][ip & flags[lt]], minlength=width) for lt in LOSS_TYPES}
+    totals = {lt: int(flags[lt].sum()) for lt in LOSS_TYPES}
+    n = len(table["time"])
+    return {"totals": totals, "percent": sum(totals.values()) / n * 100 if n else 0.0, "per_source": per_source}
+
+
+def _source_bars(table, per_source, title, y_label, path):
+    total = sum(per_source.values())
+    top = np.argsort(-total, kind="stable")[:TOP_SOURCES]
+    top = top[total[top] > 0]
+    names = [str(table["addresses"][i]) for i in top]
+    data = {"source": names, **{k: v[top] for k, v in per_source.items()}}
+    bars = figure(x_range=names, title=title, y_axis_label=y_label, width=800, height=400)
+    bars.vbar_stack(list(per_source), x="source", width=0.8, source=ColumnDataSource(data=data),
+                    color=["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728"][:len(per_source)])
+    bars.xaxis.major_label_orientation = 1.0
+    output_file(path)
+    save(bars)
+    return path
+
+
+def loss_render(table, stats, path):
+    return _source_bars(table, stats["per_source"], "Loss indicators per source IP", "Packets", path)
+
+
+def retransmission_group(table):
+    """Retransmitted segments with the time since the first transmission of the same data."""
+    data = sequence_state(table)["data"]
+    key = data["dir"] * (np.int64(1) << 33) + data["rel_seq"]
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    retransmitted = ~data["first"] & (data["rel_end"] <= data["high_sent"])
+    delay = data["time"] - data["time"][first][inverse.reshape(-1)]
+    return {"rows": data["row"][retransmitted], "delay": delay[retransmitted],
+            "spurious": (data["rel_end"] <= data["high_acked"])[retransmitted]}
+
+
+def retransmission_stats(table, group):
+    """Total retransmission delay per source IP, split as in source_retransmission_type.py."""
+    width = max(len(table["addresses"]), 1)
+    src = table["src"][group["rows"]]
+    kinds = {"spurious": group["spurious"],
+             "fast": ~group["spurious"] & (group["delay"] < TIMEOUT_RTO),
+             "timeout": ~group["spurious"] & (group["delay"] >= TIMEOUT_RTO)}
+    return {k: np.bincount(src[mask], weights=group["delay"][mask], minlength=width) for k, mask in kinds.items()}
+
+
+def retransmission_render(table, stats, path):
+    return _source_bars(table, stats, "Retransmission delay per source IP", "Seconds", path)
+
+
+def run_kernels(table, folder, results):
+    """Times the group, stats and render stages of every kernel on one packet table."""
+    n = len(table["time"])
+    group = measure(results, "rtt kernel", "group", n, rtt_group, table)
+    stats = measure(results, "rtt kernel", "stats", n, rtt_stats, group)
+    measure(results, "rtt kernel", "render", n, rtt_render, table, group, stats, os.path.join(folder, "rtt.html"))
+
+    codes = measure(results, "protocol kernel", "group", n, protocol_group, table)
+    shares = measure(results, "protocol kernel", "stats", n, protocol_stats, table, codes)
+    measure(results, "protocol kernel", "render", n, protocol_render, shares, os.path.join(folder, "protocol.html"))
+
+    flags = measure(results, "loss kernel", "group", n, loss_group, table)
+    stats = measure(results, "loss kernel", "stats", n, loss_stats, table, flags)
+    measure(results, "loss kernel", "render", n, loss_render, table, stats, os.path.join(folder, "loss.html"))
+
+    group = measure(results, "retransmission kernel", "group", n, retransmission_group, table)
+    stats = measure(results, "retransmission kernel", "stats", n, retransmission_stats, table, group)
+    measure(results, "retransmission kernel", "render", n, retransmission_render, table, stats,
+            os.path.join(folder, "retransmission.html"))
+
+# ------------------------------------------------------------------------
+# 3. Plotting scripts
+# ------------------------------------------------------------------------
+#
+# The analyses the dashboard and the analysis API actually run: each
+# plotting script is run on the capture as a worker runs it
+# (netdelay.worker.run_script), in a folder of its own, and its
+# instrumented stages are read back from its <script>.report.json. The
+# outermost stage, the whole run, is recorded as "total". The pyshark /
+# scapy scripts take a few hundred microseconds per packet (see
+# netdelay.scheduler.SCRIPT_COSTS); pass scripts= to leave them out.
+
+def run_scripts(capture, scripts, folder, results, packets):
+    """Runs every script on capture and appends the stages of its report to results."""
+    for script in scripts:
+        name = os.path.basename(script)
+        cwd = os.path.join(folder, name)
+        os.makedirs(cwd)
+        result = run_script(script, [os.path.abspath(capture)], cwd)
+        try:
+            with open(os.path.join(cwd, name + ".report.json")) as f:
+                stages = json.load(f)["stages"]
+        except (OSError, ValueError, KeyError):
+            stages = []
+        for record in stages:
+            stage = "total" if record["depth"] == 0 else record["stage"]
+            results.append(stage_result(name, stage, record["packets"] or packets, record, record["depth"]))
+        if result["code"] != 0:
+            error = (result["error"].strip().splitlines() or [f"exit code {result['code']}"])[-1]
+            results.append({"analysis": name, "stage": "failed", "depth": 0, "error": error})
+
+# ------------------------------------------------------------------------
+# 4. Benchmark runs
+# ------------------------------------------------------------------------
+#
+# Captures are generated once per size and parameter set (and generator
+# version) into CAPTURE_DIR and reused by later runs, so runs on different
+# commits read identical bytes. Parsing reads the file from the page
+# cache: the capture was just written or read by an earlier run.
+
+def capture_for(packets, params):
+    """Path of the synthetic capture for packets and params, generating it if needed."""
+    fmt = params.get("format", synth.DEFAULTS["format"])
+    ident = json.dumps({"packets": packets, "params": params, "version": code_version(synth.__file__)},
+                       sort_keys=True)
+    path = os.path.join(CAPTURE_DIR, f"synth-{packets}-{hashlib.sha256(ident.encode()).hexdigest()[:12]}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(CAPTURE_DIR, exist_ok=True)
+        generator = {k: tuple(v) if k == "rtt" else v for k, v in params.items() if k != "format"}
+        synth.write_capture(path + ".tmp", packets, fmt=fmt, **generator)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def run_size(packets, params, scripts):
+    """Generates (or reuses) one capture and benchmarks every stage on it; runs in its own process."""
+    start = time.perf_counter()
+    capture = capture_for(packets, params)
+    generate_seconds = time.perf_counter() - start
+    try:
+        os.remove(index_path(capture))  # parse without the sidecar write of a first read
+    except OSError:
+        pass
+
+    results = []
+    table = measure(results, "all", "parse", packets, load_packets, capture)
+    folder = tempfile.mkdtemp(prefix="benchmark-")
+    n = len(table["time"])
+    try:
+        run_kernels(table, folder, results)
+        del table
+        run_scripts(capture, scripts, folder, results, n)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    measured = [r for r in results if r["depth"] == 0 and "seconds" in r]
+    return {
+        "packets": n,
+        "capture": os.path.basename(capture),
+        "capture_bytes": os.path.getsize(capture),
+        "generate_seconds": generate_seconds,
+        "stages": results,
+        "total_seconds": sum(r["seconds"] for r in measured),
+        "peak_rss": max(r["peak_rss"] or 0 for r in measured),
+    }
+
+
+def git_commit():
+    """(commit, dirty) of the working tree, or (None, None) outside git."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def benchmark(sizes, params, scripts):
+    """Benchmark record for the given packet counts: environment, parameters and one run per size."""
+    commit, dirty = git_commit()
+    runs = []
+    context = multiprocessing.get_context("spawn")
+    for packets in sizes:
+        with context.Pool(1) as pool:
+            runs.append(pool.apply(run_size, (packets, params, scripts)))
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "scripts": [os.path.basename(s) for s in scripts],
+        "runs": runs,
+    }
+
+
+def stage_label(stage):
+    """Stage name indented by its nesting level within a script run."""
+    return "  " * stage.get("depth", 0) + stage["stage"]
+
+
+def compare(before, after):
+    """Lines comparing the stage times of two benchmark records run on the same sizes."""
+    lines = [f"{'packets':>10}  {'analysis':<29} {'stage':<34} {'before s':>10} {'after s':>10} {'change':>8}"
+             f" {'after peak MB':>14}"]
+    old_runs = {r["packets"]: r for r in before["runs"]}
+    for run in after["runs"]:
+        old = {(s["analysis"], s["stage"]): s for s in old_runs.get(run["packets"], {}).get("stages", [])}
+        for stage in run["stages"]:
+            label = f"{run['packets']:>10}  {stage['analysis']:<29} {stage_label(stage):<34}"
+            if "seconds" not in stage:
+                lines.append(f"{label} {stage.get('error', '')}")
+                continue
+            prior = old.get((stage["analysis"], stage["stage"]))
+            was = f"{prior['seconds']:10.3f}" if prior and "seconds" in prior else f"{'-':>10}"
+            change = f"{(stage['seconds'] / prior['seconds'] - 1) * 100:+7.1f}%" \
+                if prior and prior.get("seconds") else f"{'-':>8}"
+            lines.append(f"{label} {was} {stage['seconds']:10.3f} {change} {(stage['peak_rss'] or 0) / 1e6:14.1f}")
+    return lines
+
+# ------------------------------------------------------------------------
+# 5. Main Script
+# ------------------------------------------------------------------------
+
+def parse_size(text):
+    text = text.strip()
+    if text in SIZES:
+        return SIZES[text]
+    scale = {"k": 1_000, "M": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def parse_param(key, value):
+    if key == "rtt":
+        kind, *args = value.split(":")
+        spec = [kind] + [float(a) for a in args]
+        synth.rtt_samples(np.random.default_rng(0), spec, 1)   # raises ValueError if unknown
+        return spec
+    if key == "protocols":
+        mix = {name: float(weight) for name, weight in (p.rsplit(":", 1) for p in value.split(","))}
+        unknown = set(mix) - set(synth.PROTOCOL_PORTS)
+        if unknown:
+            raise ValueError(f"Unknown protocols: {', '.join(sorted(unknown))} (use {', '.join(synth.PROTOCOL_PORTS)})")
+        return mix
+    if key in ("conversations", "seed"):
+        return int(value)
+    if key in ("loss", "retransmission"):
+        return float(value)
+    if key == "format":
+        return value
+    raise ValueError(f"Unknown parameter: {key}")
+
+
+def parse_scripts(value):
+    """Plotting scripts named in a comma-separated list ("none" for no script runs)."""
+    if value == "none":
+        return []
+    scripts = {os.path.basename(s): s for s in plotting_scripts()}
+    names = [n.strip() for n in value.split(",") if n.strip()]
+    unknown = [n for n in names if n not in scripts]
+    if unknown:
+        raise ValueError(f"Unknown scripts: {', '.join(unknown)} (use {', '.join(sorted(scripts))})")
+    return [scripts[n] for n in names]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "compare":
+        if len(args) != 3:
+            print("Usage: python benchmark.py compare <before.json> <after.json>")
+            sys.exit(1)
+        with open(args[1]) as f:
+            before = json.load(f)
+        with open(args[2]) as f:
+            after = json.load(f)
+        print("\n".join(compare(before, after)))
+        sys.exit(0)
+
+    positional = [a for a in args if "=" not in a]
+    try:
+        params = {**synth.DEFAULTS, "rtt": list(synth.DEFAULTS["rtt"])}
+        scripts = plotting_scripts()
+        for arg in args:
+            if "=" in arg:
+                key, value = arg.split("=", 1)
+                if key == "scripts":
+                    scripts = parse_scripts(value)
+                else:
+                    params[key] = parse_param(key, value)
+        sizes = [parse_size(s) for s in (positional[0] if positional else "10k,1M,10M").split(",")]
+    except ValueError as e:
+        print(e)
+        print("Usage: python benchmark.py [sizes, e.g. 10k,1M,10M] [output.json] [conversations=N] "
+              "[rtt=lognormal:0.05:0.5] [loss=R] [retransmission=R] [protocols=TLS/SSL:0.6,HTTP:0.2,...] "
+              "[format=pcap|pcapng] [seed=N] [scripts=rtt_ack_analysis.py,...|none]")
+        sys.exit(1)
+
+    record = benchmark(sizes, params, scripts)
+    output = positional[1] if len(positional) > 1 else \
+        os.path.join(BENCH_DIR, f"{(record['commit'] or 'nogit')[:12]}{'-dirty' if record['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(record, f, indent=2)
+    for run in record["runs"]:
+        print(f"{run['packets']} packets ({run['capture_bytes'] / 1e6:.1f} MB), peak {run['peak_rss'] / 1e6:.0f} MB")
+        for stage in run["stages"]:
+            if "seconds" not in stage:
+                print(f"  {stage['analysis']:<29} {stage_label(stage):<34} {stage.get('error', '')}")
+                continue
+            rate = stage["packets_per_second"]
+            print(f"  {stage['analysis']:<29} {stage_label(stage):<34} {stage['seconds']:8.3f} s"
+                  f"  {rate / 1e6 if rate else 0:8.2f} Mpkt/s  {(stage['peak_rss'] or 0) / 1e6:8.1f} MB")
+    print(f"Benchmark saved as '{output}'.")
@@ -0,0 +1,171 @@
+import os
+import sys
+
+import numpy as np
+from bokeh.plotting import figure, save
+from bokeh.io import output_file, curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, DataTable, TableColumn, HoverTool, Div, NumberFormatter, FactorRange
+from bokeh.palettes import Category10
+from bokeh.themes import built_in_themes
+from bokeh.transform import factor_cmap
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from netdelay.packets import load_packets
+from netdelay.diff import BUCKET_WIDTH, capture_metrics, compare
+from netdelay.loss import LOSS_LABELS, LOSS_TYPES
+
+# Apply dark mode theme - add this before creating any figures
+curdoc().theme = built_in_themes["dark_minimal"]
+
+TOP_CONVERSATIONS = 10   # conversations drawn in the per-bucket chart
+
+# ------------------------------------------------------------------------
+# 1. Visualization
+# ------------------------------------------------------------------------
+
+def _ms(values):
+    return np.asarray(values, dtype=np.float64) * 1000
+
+
+def create_layout(diff, name_a, name_b, metrics_a, metrics_b):
+    """
+    Builds one comparison report with:
+      - A header naming capture A and capture B.
+      - A per-conversation table: RTT percentiles, path-delay outlier rate and
+        loss rates in both captures, with the B - A deltas.
+      - p95 RTT delta per time bucket for the busiest conversations.
+      - Loss rates per loss type, A next to B.
+      - Protocol share shift (B - A, percentage points).
+    """
+    cells = diff["cells"]
+    header = Div(text=(
+        f"<h2>Capture comparison</h2>"
+        f"<p><b>A:</b> {name_a} — {metrics_a['packets']} packets, {metrics_a['duration']:.1f} s<br>"
+        f"<b>B:</b> {name_b} — {metrics_b['packets']} packets, {metrics_b['duration']:.1f} s<br>"
+        f"Conversations are matched by source → destination IP; time buckets are "
+        f"{metrics_a['bucket_width']:g} s since each capture's start. Deltas are B − A.</p>"), width=1000)
+
+    # Per-conversation table (whole-capture cells)
+    whole = cells["bucket"] == -1
+    order = np.argsort(-(cells["samples_a"][whole] + cells["samples_b"][whole]), kind="stable")
+    conv = {k: v[whole][order] for k, v in cells.items()}
+    table_data = {"conversation": conv["conversation"], "present": conv["present"],
+                  "samples_a": conv["samples_a"], "samples_b": conv["samples_b"]}
+    for q in (50, 95, 99):
+        for side in ("a", "b", "delta"):
+            table_data[f"p{q}_{side}"] = _ms(conv[f"p{q}_{side}"])
+    for column_name in ["outlier_rate"] + [f"{lt}_rate" for lt in LOSS_TYPES]:
+        for side in ("a", "b", "delta"):
+            table_data[f"{column_name}_{side}"] = conv[f"{column_name}_{side}"]
+    ms = NumberFormatter(format="0.000")
+    pct = NumberFormatter(format="0.00")
+    columns = [
+        TableColumn(field="conversation", title="Conversation"),
+        TableColumn(field="present", title="In"),
+        TableColumn(field="samples_a", title="RTT samples A"),
+        TableColumn(field="samples_b", title="RTT samples B"),
+    ]
+    for q in (50, 95, 99):
+        columns += [
+            TableColumn(field=f"p{q}_a", title=f"p{q} A (ms)", formatter=ms),
+            TableColumn(field=f"p{q}_b", title=f"p{q} B (ms)", formatter=ms),
+            TableColumn(field=f"p{q}_delta", title=f"Δ p{q} (ms)", formatter=ms),
+        ]
+    columns += [
+        TableColumn(field="outlier_rate_a", title="Path outliers A (%)", formatter=pct),
+        TableColumn(field="outlier_rate_b", title="Path outliers B (%)", formatter=pct),
+        TableColumn(field="outlier_rate_delta", title="Δ Path outliers (%)", formatter=pct),
+    ]
+    columns += [TableColumn(field=f"{lt}_rate_delta", title=f"Δ {label} (%)", formatter=pct)
+                for lt, label in zip(LOSS_TYPES, LOSS_LABELS)]
+    conv_table = DataTable(source=ColumnDataSource(data=table_data), columns=columns,
+                           width=1400, height=300)
+
+    # p95 delta per bucket for the busiest conversations present in both captures
+    delta_plot = figure(title="Δ p95 RTT per Time Bucket (B − A)", x_axis_label="Time (s since capture start)",
+                        y_axis_label="Δ p95 RTT (ms)", width=1000, height=400,
+                        tools="pan,wheel_zoom,box_zoom,reset")
+    palette = Category10[10]
+    busiest = [c for c, p in zip(conv["conversation"], conv["present"]) if p == "both"][:TOP_CONVERSATIONS]
+    bucket_width = metrics_a["bucket_width"]
+    for i, name in enumerate(busiest):
+        mine = (cells["conversation"] == name) & (cells["bucket"] >= 0) & np.isfinite(cells["p95_delta"])
+        if not mine.any():
+            continue
+        source = ColumnDataSource(data={
+            "time": cells["bucket"][mine] * bucket_width,
+            "delta": _ms(cells["p95_delta"][mine]),
+            "p95_a": _ms(cells["p95_a"][mine]),
+            "p95_b": _ms(cells["p95_b"][mine]),
+            "conversation": cells["conversation"][mine],
+        })
+        color = palette[i % len(palette)]
+        delta_plot.line("time", "delta", source=source, color=color, line_width=2, legend_label=name)
+        delta_plot.scatter("time", "delta", source=source, color=color, size=6, legend_label=name)
+    delta_plot.add_tools(HoverTool(tooltips=[
+        ("Conversation", "@conversation"),
+        ("Bucket start (s)", "@time"),
+        ("p95 A (ms)", "@p95_a{0.000}"),
+        ("p95 B (ms)", "@p95_b{0.000}"),
+        ("Δ p95 (ms)", "@delta{0.000}")
+    ]))
+    if delta_plot.renderers:
+        delta_plot.legend.location = "top_left"
+        delta_plot.legend.click_policy = "hide"
+    else:
+        delta_plot = Div(text="<h3>No conversation has RTT samples in both captures.</h3>", width=1000)
+
+    # Loss rates per type, both captures, over all conversations
+    total = {side: max(int(cells[f"data_segments_{side}"][whole].sum()), 1) for side in ("a", "b")}
+    factors = [(label, side) for label in LOSS_LABELS for side in ("A", "B")]
+    rates = [cells[f"{lt}_{side.lower()}"][whole].sum() / total[side.lower()] * 100
+             for lt in LOSS_TYPES for side in ("A", "B")]
+    loss_plot = figure(x_range=FactorRange(*factors), title="Loss Indicators (% of data segments)",
+                       y_axis_label="% of data segments", width=700, height=400, tools="hover",
+                       tooltips=[("Indicator", "@x"), ("Rate (%)", "@rate{0.000}")])
+    loss_plot.vbar(x="x", top="rate", width=0.9, source=ColumnDataSource(data={"x": factors, "rate": rates}),
+                   fill_color=factor_cmap("x", palette=["#1f77b4", "#ff7f0e"], factors=["A", "B"], start=1, end=2))
+    loss_plot.xaxis.major_label_orientation = 1.0
+    loss_plot.y_range.start = 0
+
+    # Protocol share shift
+    protocols = diff["protocols"]
+    order = np.argsort(-np.abs(protocols["packet_share_delta"]), kind="stable")
+    protocol_names = list(protocols["protocol"][order])
+    shift = protocols["packet_share_delta"][order]
+    shift_source = ColumnDataSource(data={
+        "protocol": protocol_names,
+        "shift": shift,
+        "share_a": protocols["packet_share_a"][order],
+        "share_b": protocols["packet_share_b"][order],
+        "color": np.where(shift >= 0, "#2ca02c", "#d62728"),
+    })
+    shift_plot = figure(y_range=protocol_names[::-1], title="Protocol Share Shift (B − A, % of packets)",
+                        x_axis_label="Percentage points", width=700, height=400,
+                        tools="hover", tooltips=[("Protocol", "@protocol"), ("A (%)", "@share_a{0.00}"),
+                                                 ("B (%)", "@share_b{0.00}"), ("Shift", "@shift{0.00}")])
+    shift_plot.hbar(y="protocol", right="shift", height=0.7, color="color", source=shift_source)
+
+    return column(header, conv_table, delta_plot, row(loss_plot, shift_plot))
+
+# ------------------------------------------------------------------------
+# 2. Main Script
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python compare_captures.py <capture_a> <capture_b> [bucket_seconds]")
+        sys.exit(1)
+
+    capture_a, capture_b = sys.argv[1], sys.argv[2]
+    bucket_width = float(sys.argv[3]) if len(sys.argv) > 3 else BUCKET_WIDTH
+    metrics_a = capture_metrics(load_packets(capture_a), bucket_width)
+    metrics_b = capture_metrics(load_packets(capture_b), bucket_width)
+    diff = compare(metrics_a, metrics_b)
+
+    final_layout = create_layout(diff, os.path.basename(capture_a), os.path.basename(capture_b),
+                                 metrics_a, metrics_b)
+    output_file("capture_diff.html")
+    save(final_layout)
+    print("Capture comparison saved as 'capture_diff.html'.")
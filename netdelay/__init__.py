@@ -0,0 +1,7 @@
+"""
+Shared capture-processing helpers for the NetDelayAnalyser scripts.
+
+The plotting scripts used to walk every packet through pyshark. The modules in
+this package read pcap/pcapng files directly and decode the headers we need
+into NumPy column arrays, so analyses can work on whole captures at once.
+"""
@@ -0,0 +1,200 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from netdelay.store import file_hash
+
+CACHE_DIR = "analysis_cache"
+MAX_CACHE_BYTES = int(os.environ.get("ANALYSIS_CACHE_BYTES", 2 << 30))
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------------------------------------------------------------
+# 1. Cache keys
+# ------------------------------------------------------------------------
+#
+# A plotting script's outputs are reused when all of these are unchanged:
+#   - the capture's bytes (SHA-256)
+#   - the script name
+#   - the code version: the script's source plus every netdelay module it
+#     imports, directly or through other netdelay modules, so changing a
+#     threshold in netdelay/delayed_ack.py re-runs the RTT views only
+#   - the parameters (the script's arguments after the capture)
+
+def _netdelay_imports(source):
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            if node.module == "netdelay":
+                names.update(f"netdelay.{a.name}" for a in node.names)
+            elif node.module.startswith("netdelay."):
+                names.add(node.module)
+        elif isinstance(node, ast.Import):
+            names.update(a.name for a in node.names if a.name.startswith("netdelay."))
+    return names
+
+
+def code_version(script):
+    """SHA-256 over the script and the netdelay modules it depends on."""
+    digest = hashlib.sha256()
+    pending, seen = [os.path.abspath(script)], set()
+    while pending:
+        path = pending.pop()
+        if path in seen or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        with open(path, "rb") as f:
+            source = f.read()
+        digest.update(os.path.basename(path).encode() + b"\0" + hashlib.sha256(source).digest())
+        for name in _netdelay_imports(source):
+            pending.append(os.path.join(PACKAGE_DIR, *name.split(".")[1:]) + ".py")
+    return digest.hexdigest()
+
+
+def cache_key(capture_sha256, script, version, params=()):
+    fields = {"capture": capture_sha256, "analysis": os.path.basename(script), "version": version,
+              "params": [str(p) for p in params]}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest(), fields
+
+# ------------------------------------------------------------------------
+# 2. Result cache
+# ------------------------------------------------------------------------
+#
+# One directory per key under CACHE_DIR: the files the script wrote (pages,
+# data files, tables), at their paths relative to the directory it ran in,
+# plus meta.json {"key", "fields", "files", "output" (what the run printed),
+# "bytes", "created", "used"}.
+# When the files add up to more than max_bytes, the least recently used
+# entries are evicted.
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._captures = {}     # (path, size, mtime) -> SHA-256
+        self._entries = {}      # key -> meta
+        for key in os.listdir(directory):
+            try:
+                with open(os.path.join(directory, key, "meta.json")) as f:
+                    self._entries[key] = json.load(f)
+            except (OSError, ValueError):
+                shutil.rmtree(os.path.join(directory, key), ignore_errors=True)
+
+    def capture_hash(self, path):
+        """SHA-256 of a capture, hashed once per (path, size, mtime)."""
+        stat = os.stat(path)
+        ident = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if ident in self._captures:
+                return self._captures[ident]
+        sha256 = file_hash(path)
+        with self._lock:
+            self._captures[ident] = sha256
+        return sha256
+
+    def key(self, script, args, capture_sha256=None):
+        """(key, fields) of a script run on args[0] with parameters args[1:]."""
+        capture_sha256 = capture_sha256 or self.capture_hash(args[0])
+        return cache_key(capture_sha256, script, code_version(script), args[1:])
+
+    def get(self, key, cwd):
+        """
+        Restores a cached run's files under cwd. Returns the run's meta
+        ("files" relative paths, "output"), or None on a miss.
+        """
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is None:
+                return None
+            meta["used"] = time.time()
+        source = os.path.join(self.directory, key)
+        try:
+            for name in meta["files"]:
+                target = os.path.join(cwd, name)
+                os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+                shutil.copyfile(os.path.join(source, name), target)
+            self._write_meta(key, meta)
+        except OSError:
+            self._evict(key)
+            return None
+        return json.loads(json.dumps(meta))
+
+    def put(self, key, fields, files, cwd, output=""):
+        """Stores the files a successful run wrote (paths relative to cwd)."""
+        files = [f for f in files if not f.startswith("../") and os.path.isfile(os.path.join(cwd, f))]
+        if not files:
+            return
+        target = os.path.join(self.directory, key)
+        temp = target + f".tmp{os.getpid()}-{threading.get_ident()}"
+        size = 0
+        for name in files:
+            path = os.path.join(temp, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(os.path.join(cwd, name), path)
+            size += os.path.getsize(path)
+        if size > self.max_bytes:
+            shutil.rmtree(temp, ignore_errors=True)
+            return
+        now = time.time()
+        meta = {"key": key, "fields": fields, "files": files, "output": output, "bytes": size,
+                "created": now, "used": now}
+        with self._lock:
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(temp, target)
+            self._entries[key] = meta
+        self._write_meta(key, meta)
+        self._shrink()
+
+    def _write_meta(self, key, meta):
+        path = os.path.join(self.directory, key, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+
+    def _shrink(self):
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda m: m["used"])
+            total = sum(m["bytes"] for m in entries)
+            victims = []
+            while entries and total > self.max_bytes:
+                meta = entries.pop(0)
+                total -= meta["bytes"]
+                victims.append(meta["key"])
+        for key in victims:
+            self._evict(key)
+
+    def run(self, runner, script, args=(), cwd=None, capture_sha256=None):
+        """
+        run_script through the cache: restores the files of an earlier run
+        with the same key, or calls runner(script, args, cwd) and stores what
+        a successful run wrote. The result dict gains "cached".
+        """
+        cwd = os.path.abspath(cwd or os.getcwd())
+        args = list(args)
+        try:
+            key, fields = self.key(script, args, capture_sha256)
+        except OSError:
+            key = None
+        hit = self.get(key, cwd) if key else None
+        if hit is not None:
+            return cached_result(script, hit)
+        result = runner(script, args, cwd)
+        if key and result["code"] == 0:
+            self.put(key, fields, result["files"], cwd, result["output"])
+        return {**result, "cached": False}
+
+
+def cached_result(script, meta):
+    """A run_script result dict for a cache hit."""
+    return {"script": os.path.basename(script), "code": 0, "output": meta["output"], "error": "",
+            "files": meta["files"], "cached": True}
@@ -0,0 +1,97 @@
+import numpy as np
+
+POINT_BUDGET = 2000     # points per plotted series
+OUTLIER_STDEVS = 2
+
+# ------------------------------------------------------------------------
+# Point selection for plotting large series
+# ------------------------------------------------------------------------
+
+def minmax_indices(x, y, n_columns):
+    """
+    Splits the x extent into n_columns equal-width columns (think pixel
+    columns) and keeps the lowest and highest y of each, so spikes survive.
+    x must be sorted. Returns sorted indices.
+    """
+    n = len(x)
+    if n == 0 or n_columns <= 0:
+        return np.zeros(0, dtype=np.int64)
+    span = float(x[-1] - x[0])
+    if span <= 0:
+        column = np.zeros(n, dtype=np.int64)
+    else:
+        column = np.minimum(((x - x[0]) / span * n_columns).astype(np.int64), n_columns - 1)
+    # Within each column, order by y: the first and last row are min and max.
+    order = np.lexsort((y, column))
+    grouped = column[order]
+    boundary = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    last = np.r_[boundary[1:] - 1, n - 1]
+    return np.unique(np.concatenate([order[boundary], order[last]]))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: picks n_out points that preserve the
+    visual shape of the series (first and last point always kept). x must be
+    sorted. Returns sorted indices.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n, dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets between the fixed first and last point.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sum_x = np.r_[0.0, np.cumsum(x)]
+    sum_y = np.r_[0.0, np.cumsum(y)]
+    count = ends - starts
+    mean_x = np.r_[(sum_x[ends] - sum_x[starts]) / count, x[-1]]
+    mean_y = np.r_[(sum_y[ends] - sum_y[starts]) / count, y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        s, e = starts[i], ends[i]
+        cx, cy = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (cy - y[a]))
+        a = s + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def outlier_threshold(y, stdevs=OUTLIER_STDEVS):
+    """mean + stdevs * sigma, the outlier rule used across the RTT views."""
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) == 0:
+        return np.inf
+    return float(np.mean(y) + stdevs * np.std(y))
+
+
+def decimate(x, y, budget=POINT_BUDGET, method="lttb", stdevs=OUTLIER_STDEVS):
+    """
+    Picks at most about budget points of a series sorted by x for plotting.
+    The shape is kept by LTTB ("lttb") or per-column min/max ("minmax"), and
+    every outlier (y above mean + stdevs * sigma) is kept on top of that. If
+    there are more outliers than the budget, they are thinned with min/max
+    too. Returns sorted indices; all of them when the series fits the budget.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= budget:
+        return np.arange(n, dtype=np.int64)
+
+    if method == "minmax":
+        shape = minmax_indices(x, y, max(budget // 2, 1))
+    elif method == "lttb":
+        shape = lttb_indices(x, y, budget)
+    else:
+        raise ValueError(f"Unknown decimation method: {method}")
+
+    outliers = np.flatnonzero(y > outlier_threshold(y, stdevs))
+    if len(outliers) > budget:
+        outliers = outliers[minmax_indices(x[outliers], y[outliers], max(budget // 2, 1))]
+    return np.union1d(shape, outliers)
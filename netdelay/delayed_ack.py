@@ -0,0 +1,169 @@
+import numpy as np
+
+from netdelay.packets import (
+    IPPROTO_TCP, SEQ_MODULO, TCP_ACK, TCP_FIN, TCP_RST, TCP_SYN, flow_index,
+    segmented_cummax, unwrap_sequence,
+)
+
+# RFC 1122 caps the delayed-ACK timer at 500 ms; an ACK that waited longer
+# than that is not explained by the timer alone.
+DELAYED_ACK_MAX = 0.5
+OUTLIER_STDEVS = 2
+
+SEQ_SHIFT = np.int64(1) << 40   # room for 1 TiB of unwrapped sequence space per direction
+
+# Kinds of ACK, as stored in the "kind" column
+KIND_OTHER = 0        # ACK that acknowledges no matched data segment
+KIND_IMMEDIATE = 1    # pure ACK covering two or more segments (sent at once)
+KIND_DELAYED = 2      # pure ACK covering a single segment (delayed-ACK eligible)
+KIND_PIGGYBACK = 3    # ACK carried on a data segment
+
+KIND_LABELS = ["Other", "Immediate ACK", "Delayed ACK", "Piggybacked ACK"]
+
+# ------------------------------------------------------------------------
+# 1. ACK classification
+# ------------------------------------------------------------------------
+
+def classify_acks(table):
+    """
+    Matches every TCP ACK to the data segment it acknowledges and classifies it
+    from the TCP header rather than from the frame length:
+      - pure ACK: ACK flag set, no payload, no SYN/FIN/RST
+      - the acknowledged segment is the one whose sequence end equals the ACK
+        number, in the opposite direction of the same connection
+      - a pure ACK that newly acknowledges at most one segment is one the
+        receiver was allowed to hold back (delayed ACK); one covering more is
+        an immediate ACK; an ACK carried on data is piggybacked
+
+    Only the first ACK for a given sequence end is matched, and segments that
+    were sent more than once are skipped (Karn's rule), mirroring how
+    Wireshark fills tcp.analysis.ack_rtt.
+
+    Returns a dict of columns, one entry per packet of the table:
+      kind       KIND_* code (KIND_OTHER for non-ACK packets)
+      ack_delay  seconds between the acknowledged segment and the ACK (NaN if unmatched)
+      data_row   row of the acknowledged segment (-1 if unmatched)
+      segments   number of data segments newly acknowledged
+    """
+    n = len(table["time"])
+    kind = np.zeros(n, dtype=np.uint8)
+    ack_delay = np.full(n, np.nan)
+    data_row = np.full(n, -1, dtype=np.int64)
+    segments = np.zeros(n, dtype=np.int64)
+    result = {"kind": kind, "ack_delay": ack_delay, "data_row": data_row, "segments": segments}
+
+    conn, forward, _ = flow_index(table, directed=False)
+    tcp = (table["proto"] == IPPROTO_TCP) & (conn >= 0)
+    flags = table["tcp_flags"]
+    payload = table["payload_len"].astype(np.int64)
+    data = tcp & (payload > 0)
+    acks = tcp & ((flags & TCP_ACK) != 0) & ((flags & (TCP_SYN | TCP_RST)) == 0)
+    if not data.any() or not acks.any():
+        return result
+
+    # Direction of the data stream each packet sends / acknowledges.
+    data_dir = conn * 2 + (~forward).astype(np.int64)
+    ack_dir = conn * 2 + forward.astype(np.int64)
+    data_rows = np.flatnonzero(data)
+    ack_rows = np.flatnonzero(acks)
+
+    seq = table["seq"].astype(np.int64)
+    base = np.full(int(conn.max() + 1) * 2, -1, dtype=np.int64)
+    first = data_rows[np.unique(data_dir[data_rows], return_index=True)[1]]
+    base[data_dir[first]] = seq[first]
+
+    ack_rows = ack_rows[base[ack_dir[ack_rows]] >= 0]
+
+    # Segment ends and ACK numbers share the direction's sequence space; unwrap
+    # them together in time order so streams past 4 GiB keep distinct keys.
+    n_data = len(data_rows)
+    event_rows = np.concatenate([data_rows, ack_rows])
+    event_dir = np.concatenate([data_dir[data_rows], ack_dir[ack_rows]])
+    number = np.concatenate([seq[data_rows] + payload[data_rows], table["ack"][ack_rows].astype(np.int64)])
+    by_time = np.lexsort((event_rows, table["time"][event_rows], event_dir))
+    relative = np.empty(len(number), dtype=np.int64)
+    relative[by_time] = unwrap_sequence((number - base[event_dir])[by_time] % SEQ_MODULO,
+                                        event_dir[by_time])
+    rel_end, rel_ack = relative[:n_data], relative[n_data:]
+    valid = rel_ack >= 0
+    ack_rows, rel_ack = ack_rows[valid], rel_ack[valid]
+
+    # Data segments keyed by (direction, sequence end); repeated keys are
+    # retransmissions and give ambiguous RTTs.
+    data_key = data_dir[data_rows] * SEQ_SHIFT + rel_end
+    order = np.lexsort((table["time"][data_rows], data_key))
+    data_key = data_key[order]
+    data_sorted = data_rows[order]
+    repeated = np.r_[data_key[1:] == data_key[:-1], False] | np.r_[False, data_key[1:] == data_key[:-1]]
+
+    ack_key = ack_dir[ack_rows] * SEQ_SHIFT + rel_ack
+    ack_order = np.lexsort((ack_rows, table["time"][ack_rows], ack_key))
+    ack_rows, ack_key, rel_ack = ack_rows[ack_order], ack_key[ack_order], rel_ack[ack_order]
+
+    # Newly acknowledged bytes: this ACK minus the highest earlier ACK in the
+    # same direction (walk the ACKs in time order for that).
+    by_time = np.lexsort((ack_rows, table["time"][ack_rows], ack_dir[ack_rows]))
+    dirs_t = ack_dir[ack_rows][by_time]
+    high = segmented_cummax(rel_ack[by_time], dirs_t)
+    previous = np.r_[0, high[:-1]]
+    previous[np.r_[True, dirs_t[1:] != dirs_t[:-1]]] = 0
+    newly = np.empty(len(ack_rows), dtype=np.int64)
+    newly[by_time] = rel_ack[by_time] - previous
+
+    first_ack = np.r_[True, ack_key[1:] != ack_key[:-1]]
+    pos = np.searchsorted(data_key, ack_key)
+    pos_ok = pos < len(data_key)
+    hit = pos_ok.copy()
+    hit[pos_ok] = data_key[pos[pos_ok]] == ack_key[pos_ok]
+    hit &= first_ack & (newly > 0)
+    hit[hit] = ~repeated[pos[hit]]
+
+    matched_ack = ack_rows[hit]
+    matched_data = data_sorted[pos[hit]]
+    delay = table["time"][matched_ack] - table["time"][matched_data]
+    later = delay >= 0
+    matched_ack, matched_data, delay = matched_ack[later], matched_data[later], delay[later]
+    matched_newly = newly[hit][later]
+
+    seg_payload = payload[matched_data]
+    n_segments = np.maximum(np.ceil(matched_newly / np.maximum(seg_payload, 1)), 1).astype(np.int64)
+    pure = payload[matched_ack] == 0
+    fin = (flags[matched_ack] & TCP_FIN) != 0
+
+    kind[matched_ack] = np.where(~pure, KIND_PIGGYBACK,
+                                 np.where((n_segments <= 1) & ~fin, KIND_DELAYED, KIND_IMMEDIATE))
+    ack_delay[matched_ack] = delay
+    data_row[matched_ack] = matched_data
+    segments[matched_ack] = n_segments
+    return result
+
+
+# ------------------------------------------------------------------------
+# 2. Outlier labelling
+# ------------------------------------------------------------------------
+
+def label_outliers(rtt, kind, group_ids, stdevs=OUTLIER_STDEVS, delayed_max=DELAYED_ACK_MAX):
+    """
+    Applies the mean + stdevs * sigma outlier rule per group (e.g. per source
+    IP) and splits the outliers into:
+      - delayed-ACK artefacts: pure ACKs covering a single segment whose RTT
+        is within the delayed-ACK timer bound (the receiver held the ACK back)
+      - real path delay: everything else
+    Returns (outlier, artefact) boolean arrays aligned with rtt.
+    """
+    rtt = np.asarray(rtt, dtype=np.float64)
+    group_ids = np.asarray(group_ids)
+    outlier = np.zeros(len(rtt), dtype=bool)
+    if len(rtt) == 0:
+        return outlier, outlier.copy()
+
+    _, inverse = np.unique(group_ids, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    count = np.bincount(inverse)
+    mean = np.bincount(inverse, weights=rtt) / count
+    var = np.bincount(inverse, weights=(rtt - mean[inverse]) ** 2) / count
+    threshold = mean + stdevs * np.sqrt(var)
+    outlier = rtt > threshold[inverse]
+
+    artefact = outlier & (np.asarray(kind) == KIND_DELAYED) & (rtt <= delayed_max)
+    return outlier, artefact
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+
+from netdelay.encoding import integer_type
+
+DENSITY_WIDTH = 200     # image columns at the overview level
+DENSITY_HEIGHT = 100    # image rows (all levels)
+DENSITY_LEVELS = 5      # overview plus zoom levels, each doubling the columns
+INDEX_SIZE = 256        # entries of the sparse x index of the points file
+
+# ------------------------------------------------------------------------
+# Rasterized point clouds
+# ------------------------------------------------------------------------
+#
+# A point cloud too large to plot point by point is shipped as 2D histograms
+# at several zoom levels: level k splits the x extent into
+# DENSITY_WIDTH * 2**k columns (y always into DENSITY_HEIGHT rows). The
+# overview image is embedded in the page; the browser reads the other levels
+# and, once the visible window holds few enough points, the points themselves
+# (sorted by x, so a window is one byte range of the points file).
+
+def density_extent(values):
+    """Padded [low, high] of the finite values ([0, 1] if there are none)."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return [0.0, 1.0]
+    low, high = float(values.min()), float(values.max())
+    pad = (high - low) * 0.02 or max(abs(high) * 0.02, 1e-3)
+    return [low - pad, high + pad]
+
+
+def _bins(values, extent, n):
+    low, high = extent
+    return np.clip(((values - low) / (high - low) * n).astype(np.int64), 0, n - 1)
+
+
+def density_levels(x, y, x_extent, y_extent, width=DENSITY_WIDTH, height=DENSITY_HEIGHT,
+                   levels=DENSITY_LEVELS):
+    """
+    Point counts per cell (height rows by width * 2**k columns, row 0
+    at the lowest y) for every level k. One bincount at the finest level;
+    coarser levels sum adjacent column pairs.
+    """
+    finest = width << (levels - 1)
+    cells = _bins(y, y_extent, height) * finest + _bins(x, x_extent, finest)
+    counts = np.bincount(cells, minlength=height * finest).reshape(height, finest)
+    out = [counts]
+    for _ in range(levels - 1):
+        counts = counts.reshape(height, -1, 2).sum(axis=2)
+        out.append(counts)
+    return out[::-1]
+
+
+def shade(counts):
+    """
+    uint8 image of a count grid for an image glyph: 0 where a cell is empty,
+    otherwise 1-255 on a log scale of the count relative to the busiest cell.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    peak = counts.max() if counts.size else 0
+    if peak <= 0:
+        return np.zeros(counts.shape, dtype=np.uint8)
+    image = 1 + np.rint(np.log1p(counts) * (254 / np.log1p(peak)))
+    return np.where(counts > 0, image, 0).astype(np.uint8)
+
+
+def write_density(path, x, y, url=None, width=DENSITY_WIDTH, height=DENSITY_HEIGHT,
+                  levels=DENSITY_LEVELS):
+    """
+    Rasterizes one point cloud (rows with a missing x or y are dropped):
+      - path + ".levels.bin": counts of every level, level after level, in
+        the narrowest unsigned type that holds the busiest cell
+      - path + ".points.bin": x then y as little-endian float64, sorted by x
+    Returns (meta, overview image); meta is what the browser side needs.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    order = np.argsort(x[keep], kind="stable")
+    x, y = x[keep][order], y[keep][order]
+    x_extent, y_extent = density_extent(x), density_extent(y)
+
+    grids = density_levels(x, y, x_extent, y_extent, width, height, levels)
+    dtype = np.dtype(integer_type(0, int(grids[0].max()) if len(x) else 0)).newbyteorder("<")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".levels.bin", "wb") as f:
+        for grid in grids:
+            f.write(grid.astype(dtype).tobytes())
+    np.concatenate([x, y]).astype("<f8").tofile(path + ".points.bin")
+
+    url = (url or path).replace(os.sep, "/")
+    stride = max(-(-len(x) // INDEX_SIZE), 1)
+    meta = {"levels_url": url + ".levels.bin", "points_url": url + ".points.bin",
+            "width": width, "height": height, "levels": levels, "count_bytes": dtype.itemsize,
+            "x_extent": x_extent, "y_extent": y_extent, "total": int(len(x)),
+            "stride": stride, "index": [float(v) for v in x[::stride]]}
+    return meta, shade(grids[0])
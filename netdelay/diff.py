@@ -0,0 +1,211 @@
+import numpy as np
+
+from netdelay.delayed_ack import KIND_OTHER, classify_acks, label_outliers
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import group_percentile
+from netdelay.protocols import PROTOCOLS, protocol_codes
+
+BUCKET_WIDTH = 10.0          # seconds per time bucket
+PERCENTILES = (50, 95, 99)
+
+# Columns compare() joins, and whether a missing row counts as 0 (counts) or
+# as unknown (NaN, for percentiles and rates).
+COUNT_COLUMNS = ["packets", "data_segments", "samples", "path_outliers"] + LOSS_TYPES
+RATE_COLUMNS = [f"p{q}" for q in PERCENTILES] + ["outlier_rate"] + [f"{lt}_rate" for lt in LOSS_TYPES]
+
+# ------------------------------------------------------------------------
+# 1. Per-capture metrics
+# ------------------------------------------------------------------------
+
+def _conversation_labels(table, rows, reverse=False):
+    """'src → dst' labels for the given rows (IP level, so ports may differ between runs)."""
+    addresses = table["addresses"]
+    src, dst = table["src"][rows], table["dst"][rows]
+    if reverse:
+        src, dst = dst, src
+    return np.array([f"{s} → {d}" for s, d in zip(addresses[src], addresses[dst])], dtype=object)
+
+
+def _aggregate(n_cells, events):
+    """
+    Counts / percentiles per (conversation, bucket) cell. events maps a column
+    name to (cell_ids, values) where values is None for "count the events" and
+    the column name is "p<q>" for percentiles.
+    """
+    out = {}
+    for name, (cells, values) in events.items():
+        if values is None:
+            out[name] = np.bincount(cells, minlength=n_cells).astype(np.int64)
+        else:
+            out[name] = group_percentile(values, cells, n_cells, int(name[1:]))
+    return out
+
+
+def capture_metrics(table, bucket_width=BUCKET_WIDTH):
+    """
+    Aggregates one capture per conversation (data sender → receiver, at IP
+    level) and per time bucket (seconds since the capture start, so two runs
+    line up even if they were recorded on different days).
+
+    RTT samples are the matched ACK delays of classify_acks. Path outliers
+    follow the RTT view's rule (mean + 2 sigma per source IP) with delayed-ACK
+    artefacts removed. Loss events are attributed to the data direction: the
+    sender for retransmissions, lost and spurious segments, the reverse of the
+    ACK for duplicate ACKs.
+
+    Returns a dict with:
+      "cells":     columns conversation, bucket (-1 = whole capture), packets,
+                   data_segments, samples, p50, p95, p99, path_outliers,
+                   outlier_rate, one count and one <type>_rate per LOSS_TYPES
+      "protocols": packet and byte counts per PROTOCOLS entry
+      "duration", "packets", "bucket_width"
+    """
+    times = table["time"]
+    n = len(times)
+    start = float(np.nanmin(times)) if n else 0.0
+    duration = float(np.nanmax(times)) - start if n else 0.0
+    bucket = np.floor((times - start) / bucket_width).astype(np.int64) if n else np.zeros(0, np.int64)
+    is_ip = table["src"] >= 0
+
+    # Conversation label for every IP packet, and the label of the reverse
+    # direction (needed for ACK-side events).
+    ip_rows = np.flatnonzero(is_ip)
+    forward_labels = _conversation_labels(table, ip_rows)
+    reverse_labels = _conversation_labels(table, ip_rows, reverse=True)
+    conversations, codes = np.unique(np.concatenate([forward_labels, reverse_labels]),
+                                     return_inverse=True)
+    codes = codes.reshape(-1)
+    fwd = np.full(n, -1, dtype=np.int64)
+    rev = np.full(n, -1, dtype=np.int64)
+    fwd[ip_rows] = codes[:len(ip_rows)]
+    rev[ip_rows] = codes[len(ip_rows):]
+
+    n_conv = len(conversations)
+    n_buckets = int(bucket.max()) + 1 if n else 0
+    # Bucket index n_buckets of every conversation holds its whole-capture totals.
+    stride = n_buckets + 1
+
+    def cells(conv, rows):
+        c = conv[rows]
+        return np.concatenate([c * stride + bucket[rows], c * stride + n_buckets])
+
+    def twice(values):
+        return np.concatenate([values, values])
+
+    # RTT samples, keyed by the data direction (the reverse of the ACK).
+    acks = classify_acks(table)
+    rtt_rows = np.flatnonzero((acks["kind"] != KIND_OTHER) & is_ip)
+    rtt = acks["ack_delay"][rtt_rows]
+    outlier, artefact = label_outliers(rtt, acks["kind"][rtt_rows], table["src"][rtt_rows])
+    path_rows = rtt_rows[outlier & ~artefact]
+
+    loss = classify_loss(table)
+    data_rows = np.flatnonzero((table["payload_len"] > 0) & is_ip)
+    events = {
+        "packets": (cells(fwd, ip_rows), None),
+        "data_segments": (cells(fwd, data_rows), None),
+        "samples": (cells(rev, rtt_rows), None),
+        "path_outliers": (cells(rev, path_rows), None),
+    }
+    for q in PERCENTILES:
+        events[f"p{q}"] = (cells(rev, rtt_rows), twice(rtt))
+    for lt in LOSS_TYPES:
+        rows = np.flatnonzero(loss[lt] & is_ip)
+        events[lt] = (cells(rev if lt == "duplicate_acks" else fwd, rows), None)
+    agg = _aggregate(n_conv * stride, events)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agg["outlier_rate"] = np.where(agg["samples"] > 0, agg["path_outliers"] / agg["samples"] * 100, np.nan)
+        for lt in LOSS_TYPES:
+            agg[f"{lt}_rate"] = np.where(agg["data_segments"] > 0,
+                                         agg[lt] / agg["data_segments"] * 100, np.nan)
+
+    # Keep cells that saw at least one packet or sample.
+    keep = np.flatnonzero((agg["packets"] > 0) | (agg["samples"] > 0))
+    cell_bucket = keep % stride
+    result = {
+        "conversation": conversations[keep // stride] if n_conv else np.zeros(0, dtype=object),
+        "bucket": np.where(cell_bucket == n_buckets, -1, cell_bucket),
+    }
+    result.update({k: v[keep] for k, v in agg.items()})
+
+    proto = protocol_codes(table)
+    return {
+        "cells": result,
+        "protocols": {
+            "packets": np.bincount(proto, minlength=len(PROTOCOLS)),
+            "bytes": np.bincount(proto, weights=table["wire_len"], minlength=len(PROTOCOLS)),
+        },
+        "duration": duration,
+        "packets": n,
+        "bucket_width": bucket_width,
+    }
+
+# ------------------------------------------------------------------------
+# 2. Joining two captures
+# ------------------------------------------------------------------------
+
+def _align(keys_a, keys_b):
+    """
+    Outer join of two key arrays. Returns (keys, index_a, index_b) where the
+    indexes point into the inputs and are -1 where a side has no such key.
+    """
+    keys = np.union1d(keys_a, keys_b)
+
+    def index(side):
+        order = np.argsort(side, kind="stable")
+        pos = np.searchsorted(side[order], keys)
+        pos_ok = pos < len(side)
+        found = np.zeros(len(keys), dtype=bool)
+        found[pos_ok] = side[order][pos[pos_ok]] == keys[pos_ok]
+        idx = np.full(len(keys), -1, dtype=np.int64)
+        idx[found] = order[pos[found]]
+        return idx
+
+    return keys, index(keys_a), index(keys_b)
+
+
+def compare(a, b):
+    """
+    Joins two capture_metrics results on (conversation, bucket) and reports,
+    for every column in COUNT_COLUMNS and RATE_COLUMNS, the value in each
+    capture and the delta b - a. Cells present in only one capture keep NaN
+    rates on the other side; their counts are 0.
+
+    Returns a dict with:
+      "cells":     conversation, bucket, present ("A", "B" or "both"),
+                   <column>_a, <column>_b, <column>_delta
+      "protocols": protocol, packet_share_a/_b/_delta, byte_share_a/_b/_delta (percent)
+    """
+    ca, cb = a["cells"], b["cells"]
+    # Buckets are small non-negative integers (or -1), so one string key is enough.
+    key_a = np.array([f"{c}\x00{k}" for c, k in zip(ca["conversation"], ca["bucket"])], dtype=object)
+    key_b = np.array([f"{c}\x00{k}" for c, k in zip(cb["conversation"], cb["bucket"])], dtype=object)
+    keys, ia, ib = _align(key_a, key_b)
+
+    in_a, in_b = ia >= 0, ib >= 0
+    split = [k.split("\x00") for k in keys]
+    cells = {
+        "conversation": np.array([s[0] for s in split], dtype=object),
+        "bucket": np.array([int(s[1]) for s in split], dtype=np.int64),
+        "present": np.where(in_a & in_b, "both", np.where(in_a, "A", "B")).astype(object),
+    }
+    for column in COUNT_COLUMNS + RATE_COLUMNS:
+        fill = 0 if column in COUNT_COLUMNS else np.nan
+        va = np.where(in_a, ca[column][np.maximum(ia, 0)], fill) if len(keys) else np.zeros(0)
+        vb = np.where(in_b, cb[column][np.maximum(ib, 0)], fill) if len(keys) else np.zeros(0)
+        cells[f"{column}_a"] = va
+        cells[f"{column}_b"] = vb
+        cells[f"{column}_delta"] = vb - va
+
+    protocols = {"protocol": np.array(PROTOCOLS, dtype=object)}
+    for metric in ("packets", "bytes"):
+        share_a = a["protocols"][metric] / max(float(a["protocols"][metric].sum()), 1.0) * 100
+        share_b = b["protocols"][metric] / max(float(b["protocols"][metric].sum()), 1.0) * 100
+        name = "packet_share" if metric == "packets" else "byte_share"
+        protocols[f"{name}_a"] = share_a
+        protocols[f"{name}_b"] = share_b
+        protocols[f"{name}_delta"] = share_b - share_a
+    used = (a["protocols"]["packets"] > 0) | (b["protocols"]["packets"] > 0)
+    protocols = {k: v[used] for k, v in protocols.items()}
+    return {"cells": cells, "protocols": protocols}
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netdelay import instrument
+from netdelay.partial import partial_results
+from netdelay.preview import preview
+from netdelay.query import PACKET_TABLE_DIR, packet_table
+
+# ------------------------------------------------------------------------
+# 1. Early results of an analysis job
+# ------------------------------------------------------------------------
+#
+# Run like a plotting script, on the worker pool behind the scheduler, in
+# the job's folder: python early.py <capture> <sha256> [packet_table_dir].
+# It writes preview.json, estimates from a sample of the capture (see
+# netdelay.preview), then partial.json, the aggregates of ever longer
+# prefixes of it (see netdelay.partial), and last builds the capture's
+# packet table for ad hoc queries (netdelay.query). Its stages go to
+# early.py.report.json like any script's.
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def early_results(capture, sha256, folder=".", tables=PACKET_TABLE_DIR):
+    """Writes preview.json and partial.json into folder, then builds the packet table under tables."""
+    try:
+        with instrument.stage("preview") as stage:
+            result = preview(capture)
+            _write_json(os.path.join(folder, "preview.json"), result)
+            stage["packets"], stage["outputs"] = result["sampled_packets"], os.path.join(folder, "preview.json")
+    except Exception as e:
+        _write_json(os.path.join(folder, "preview.json"), {"error": str(e)})
+    target = os.path.join(folder, "partial.json")
+    try:
+        with instrument.stage("partial_results") as stage:
+            for partial in partial_results(capture):
+                _write_json(target, partial)
+                stage["packets"], stage["outputs"] = partial["packets"], target
+    except Exception as e:
+        # Reported as the final result, so event streams do not wait on it
+        _write_json(target, {"error": str(e), "final": True})
+        return
+    try:
+        with instrument.stage("packet_table") as stage:
+            table = packet_table(capture, sha256, tables)
+            stage["packets"], stage["outputs"] = table["meta"]["rows"], table["columns"]
+    except (OSError, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python early.py <capture> <sha256> [packet_table_dir]")
+        sys.exit(1)
+    early_results(sys.argv[1], sys.argv[2], tables=sys.argv[3] if len(sys.argv) > 3 else PACKET_TABLE_DIR)
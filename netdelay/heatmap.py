@@ -0,0 +1,85 @@
+import numpy as np
+
+from netdelay.delayed_ack import KIND_OTHER, classify_acks, label_outliers
+from netdelay.diff import BUCKET_WIDTH
+from netdelay.packets import group_percentile
+
+HEATMAP_PERCENTILE = 95
+GROUPINGS = ["source", "conversation"]
+
+# ------------------------------------------------------------------------
+# RTT per row group and time bucket
+# ------------------------------------------------------------------------
+
+def rtt_grid(table, bucket_width=BUCKET_WIDTH, by="conversation", q=HEATMAP_PERCENTILE):
+    """
+    ACK RTT on a (row group, time bucket) grid, for a heatmap. Rows are the
+    data direction of each RTT sample (the reverse of the ACK): one row per
+    "sender → receiver" IP pair (by="conversation") or per sender IP
+    (by="source"). Buckets are bucket_width seconds since the capture start.
+
+    All cells come from one grouped aggregation: a bincount per count and a
+    single sort for the percentiles (group_percentile). Path outliers follow
+    the RTT views' rule (mean + 2 sigma per ACK source IP) without
+    delayed-ACK artefacts.
+
+    Returns a dict with:
+      "rows":         row labels, ordered by whole-capture percentile
+                      (lowest first, so the worst row is drawn on top)
+      "samples":      RTT samples per cell (rows x buckets)
+      "percentile":   q-th percentile RTT in seconds per cell, NaN if empty
+      "outlier_rate": path-delay outliers as % of samples, NaN if empty
+      "row_samples", "row_percentile": the same over the whole capture
+      "q", "bucket_width", "by"
+    """
+    if by not in GROUPINGS:
+        raise ValueError(f"Unknown grouping: {by}")
+    times = table["time"]
+    start = float(np.nanmin(times)) if len(times) else 0.0
+    addresses = table["addresses"]
+
+    acks = classify_acks(table)
+    rows = np.flatnonzero((acks["kind"] != KIND_OTHER) & (table["src"] >= 0))
+    rtt = acks["ack_delay"][rows]
+    outlier, artefact = label_outliers(rtt, acks["kind"][rows], table["src"][rows])
+    path = outlier & ~artefact
+
+    sender, receiver = table["dst"][rows].astype(np.int64), table["src"][rows].astype(np.int64)
+    keys = sender * len(addresses) + receiver if by == "conversation" else sender
+    groups, group = np.unique(keys, return_inverse=True)
+    group = group.reshape(-1)
+    bucket = np.floor((times[rows] - start) / bucket_width).astype(np.int64)
+    n_groups = len(groups)
+    n_buckets = int(bucket.max()) + 1 if len(rows) else 0
+
+    n_cells = n_groups * n_buckets
+    cell = group * n_buckets + bucket
+    samples = np.bincount(cell, minlength=n_cells)
+    outliers = np.bincount(cell, weights=path, minlength=n_cells)
+    percentile = group_percentile(rtt, cell, n_cells, q)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        outlier_rate = np.where(samples > 0, outliers / samples * 100, np.nan)
+
+    row_samples = np.bincount(group, minlength=n_groups)
+    row_percentile = group_percentile(rtt, group, n_groups, q)
+    order = np.argsort(row_percentile, kind="stable")
+
+    if by == "conversation":
+        labels = [f"{addresses[k // len(addresses)]} → {addresses[k % len(addresses)]}" for k in groups]
+    else:
+        labels = [str(addresses[k]) for k in groups]
+
+    def grid(values):
+        return values.reshape(n_groups, n_buckets)[order]
+
+    return {
+        "rows": [labels[i] for i in order],
+        "samples": grid(samples),
+        "percentile": grid(percentile),
+        "outlier_rate": grid(outlier_rate),
+        "row_samples": row_samples[order],
+        "row_percentile": row_percentile[order],
+        "q": q,
+        "bucket_width": bucket_width,
+        "by": by,
+    }
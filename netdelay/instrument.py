@@ -0,0 +1,190 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# Also trace Python allocations (tracemalloc) for a per-stage peak of the
+# Python heap; slows allocation-heavy code down, so off unless asked for.
+TRACE_MEMORY = os.environ.get("NETDELAY_TRACEMALLOC") == "1"
+
+# ------------------------------------------------------------------------
+# 1. Peak memory
+# ------------------------------------------------------------------------
+#
+# On Linux the peak resident set size (VmHWM) can be reset by writing "5"
+# to /proc/self/clear_refs, so every stage reports its own peak; elsewhere
+# the process-wide ru_maxrss is all there is. Either way it is a property
+# of the process: stages running at the same time in other threads see
+# each other's memory.
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (since the last reset where supported)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _peak_traced():
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+
+
+def _reset_peaks():
+    reset_peak_rss()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def output_size(value):
+    """Bytes of a stage's output: file size for a path, buffer size for arrays / bytes / str, summed over containers."""
+    if isinstance(value, (str, os.PathLike)) and os.path.isfile(value):
+        return os.path.getsize(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(output_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(output_size(v) for v in value)
+    return 0
+
+# ------------------------------------------------------------------------
+# 2. Stages
+# ------------------------------------------------------------------------
+#
+# A stage is a named stretch of a pipeline: parsing, a pyshark pass,
+# grouping, statistics, building or saving a Bokeh layout. Each records
+#   stage, depth        its name and nesting level (0 = outermost)
+#   wall_seconds        elapsed time
+#   cpu_seconds         CPU time of the thread that ran it
+#   packets             packets it processed, if the caller says
+#   peak_rss            peak resident set size while it ran, in bytes
+#   peak_traced         peak traced Python heap (None unless TRACE_MEMORY)
+#   output_bytes        size of what it produced, if the caller says
+# Stages nest: an outer stage's peaks include its inner stages'. Library
+# code wraps its stages in `with stage(...)`; the module-level plotting
+# scripts mark theirs with begin() / end() so no code moves. Finished
+# stages are collected while a report is open (start_report), per thread.
+
+_state = threading.local()
+
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack, _state.report = [], None
+    return _state.stack
+
+
+def begin(name, packets=None):
+    """Opens a stage; returns its record (filled in by end)."""
+    stack = _stack()
+    if stack:
+        parent = stack[-1]
+        parent["_rss"] = max(parent["_rss"], peak_rss())
+        traced = _peak_traced()
+        if traced is not None:
+            parent["_traced"] = max(parent["_traced"], traced)
+    record = {"stage": name, "depth": len(stack), "wall_seconds": None, "cpu_seconds": None, "packets": packets,
+              "peak_rss": None, "peak_traced": None, "output_bytes": None,
+              "_rss": 0, "_traced": 0, "_wall": time.perf_counter(), "_cpu": time.thread_time()}
+    if _state.report is not None:
+        _state.report.append(record)
+    stack.append(record)
+    _reset_peaks()
+    return record
+
+
+def end(packets=None, outputs=None):
+    """
+    Closes the innermost stage and returns its record. packets and outputs
+    (anything output_size measures) fill in its "packets" / "output_bytes".
+    """
+    stack = _stack()
+    record = stack.pop()
+    record["wall_seconds"] = time.perf_counter() - record.pop("_wall")
+    record["cpu_seconds"] = time.thread_time() - record.pop("_cpu")
+    record["peak_rss"] = max(record.pop("_rss"), peak_rss())
+    traced = _peak_traced()
+    record["peak_traced"] = None if traced is None else max(record.pop("_traced"), traced)
+    record.pop("_traced", None)
+    if packets is not None:
+        record["packets"] = int(packets)
+    if outputs is not None:
+        record["output_bytes"] = output_size(outputs)
+    if stack:
+        parent = stack[-1]
+        parent["_rss"] = max(parent["_rss"], record["peak_rss"])
+        if record["peak_traced"] is not None:
+            parent["_traced"] = max(parent["_traced"], record["peak_traced"])
+    return record
+
+
+@contextlib.contextmanager
+def stage(name, packets=None):
+    """
+    with stage("parse") as record: ... -- set record["packets"] or
+    record["outputs"] inside the block to have them recorded.
+    """
+    record = begin(name, packets)
+    try:
+        yield record
+    finally:
+        end(outputs=record.pop("outputs", None))
+
+
+def measure(name, fn, *args, packets=None):
+    """Runs fn(*args) as one stage whose output is its return value; returns (value, record)."""
+    begin(name, packets)
+    try:
+        value = fn(*args)
+    except BaseException:
+        end()
+        raise
+    return value, end(outputs=value)
+
+# ------------------------------------------------------------------------
+# 3. Reports
+# ------------------------------------------------------------------------
+
+def start_report():
+    """Starts collecting the stages this thread runs (tracing memory if TRACE_MEMORY)."""
+    _stack().clear()
+    _state.report = []
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def finish_report():
+    """Closes any stage left open and returns the stages collected since start_report, in start order."""
+    stack = _stack()
+    while stack:
+        end()
+    stages, _state.report = _state.report or [], None
+    return stages
+
+
+def write_report(path, report):
+    with open(path + ".tmp", "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + ".tmp", path)
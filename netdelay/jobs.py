@@ -0,0 +1,298 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from netdelay.cache import ResultCache, cached_result
+from netdelay.query import PACKET_TABLE_DIR
+from netdelay.scheduler import Scheduler
+from netdelay.summary import capture_summary
+from netdelay.worker import AnalysisPool
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_DIR = os.path.join(PROJECT_DIR, "analysis_jobs")
+SCRIPTS_DIR = os.path.join(PROJECT_DIR, "plotting_scripts")
+EARLY_SCRIPT = os.path.join(PROJECT_DIR, "netdelay", "early.py")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+# ------------------------------------------------------------------------
+# 1. Job files
+# ------------------------------------------------------------------------
+#
+# A job is one capture run through every plotting script on the worker
+# pool. Its directory under JOB_DIR holds job.json (the record returned by
+# the API), one <script>.progress.json per running script, which the
+# worker's capture scan keeps up to date (netdelay.worker.write_progress),
+# preview.json and partial.json, written by the job's early results run
+# (netdelay/early.py), report.json, the job's instrumentation report (see
+# JobManager.report), and everything the scripts write, including their
+# <script>.report.json: they run with the job directory as their working
+# directory, so concurrent jobs never share an output file.
+
+def job_path(job_id, directory=JOB_DIR):
+    if not _JOB_ID.fullmatch(job_id or ""):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return os.path.join(directory, job_id)
+
+
+def served_path(path):
+    """
+    A job directory as the web app names it: relative to the project
+    directory server.js serves (e.g. "analysis_jobs/<id>"), absolute if
+    outside it.
+    """
+    relative = os.path.relpath(os.path.abspath(path), PROJECT_DIR)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        relative = os.path.abspath(path)
+    return relative.replace(os.sep, "/")
+
+
+def plotting_scripts(directory=SCRIPTS_DIR):
+    """Every plotting script, as run for an analysis job."""
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".py"))
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+# ------------------------------------------------------------------------
+# 2. Job manager
+# ------------------------------------------------------------------------
+
+class JobManager:
+    """
+    Submits analysis jobs to an AnalysisPool behind a Scheduler (created on
+    first use) and reports their status. Scripts of a job run in parallel
+    on the pool as the scheduler admits them;
+    each finished script updates job.json from the pool's result thread.
+    Scripts whose result is in the cache (same capture, code version and
+    parameters) are restored from it instead of run. The job's early
+    results run on the pool as well, ahead of the scripts (it is the
+    cheapest run): a sampled preview of the capture in preview.json and
+    partial aggregates of ever longer prefixes of it in partial.json, so a
+    dashboard has numbers within seconds, then the capture's packet table
+    for ad hoc queries, under packet_tables.
+    """
+
+    def __init__(self, pool=None, directory=JOB_DIR, processes=None, cache=None, packet_tables=PACKET_TABLE_DIR):
+        self.directory = directory
+        self.packet_tables = packet_tables
+        self.cache = cache if cache is not None else ResultCache()
+        self._pool = pool
+        self._processes = processes
+        self._jobs = {}
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = Scheduler(AnalysisPool(self._processes), cpus=self._processes)
+            return self._pool
+
+    def submit(self, capture, scripts=None, sha256=None):
+        """
+        Queues every plotting script (or the given script paths) on capture
+        (whose SHA-256 is hashed if not given). Returns the new job's record,
+        with the capture's header summary (netdelay.summary).
+        """
+        capture = os.path.abspath(capture)
+        if not os.path.isfile(capture):
+            raise FileNotFoundError(f"No such capture: {capture}")
+        scripts = scripts or plotting_scripts()
+        try:
+            summary = capture_summary(capture)
+        except ValueError:
+            summary = None      # not a capture; the scripts report why
+        job_id = uuid.uuid4().hex
+        path = job_path(job_id, self.directory)
+        os.makedirs(path)
+        job = {
+            "id": job_id,
+            "capture": capture,
+            "output": served_path(path),
+            "total_bytes": os.path.getsize(capture),
+            "summary": summary,
+            "created": time.time(),
+            "finished": None,
+            "report": served_path(path) + "/report.json",
+            "scripts": {os.path.basename(s): {"status": "queued"} for s in scripts},
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._reports[job_id] = {"job": job_id, "capture": capture, "total_bytes": job["total_bytes"],
+                                     "packets": summary["packets"] if summary else None,
+                                     "created": job["created"], "finished": None, "elapsed_seconds": None,
+                                     "totals": {}, "early": [], "scripts": {}}
+            _write_json(os.path.join(path, "job.json"), job)
+            self._write_report(job_id)
+        sha256 = sha256 or self.cache.capture_hash(capture)
+        output = os.path.abspath(path)
+        self.pool.submit(EARLY_SCRIPT, [capture, sha256, os.path.abspath(self.packet_tables)], output,
+                         callback=lambda result, job_id=job_id: self._early_done(job_id, result))
+        for script in scripts:
+            name = os.path.basename(script)
+            key, fields = self.cache.key(script, [capture], sha256)
+            hit = self.cache.get(key, output)
+            if hit is not None:
+                self._finish(job_id, name, cached_result(script, hit))
+                continue
+            self.pool.submit(script, [capture], output, progress=os.path.join(output, name + ".progress.json"),
+                             callback=lambda result, job_id=job_id, name=name, key=key, fields=fields:
+                             self._finish(job_id, name, result, key, fields))
+        return self.status(job_id)
+
+    def _early_done(self, job_id, result):
+        path = job_path(job_id, self.directory)
+        partial = _read_json(os.path.join(path, "partial.json"))
+        if result["code"] != 0 and not (partial and partial.get("final")):
+            # Reported as the final result, so event streams do not wait on it
+            _write_json(os.path.join(path, "partial.json"),
+                        {**(partial or {}), "error": result["error"] or "early results failed", "final": True})
+        report = _read_json(os.path.join(path, os.path.basename(EARLY_SCRIPT) + ".report.json")) or {}
+        with self._lock:
+            self._reports[job_id]["early"] = report.get("stages", [])
+            self._write_report(job_id)
+
+    def _finish(self, job_id, name, result, key=None, fields=None):
+        if key and result["code"] == 0:
+            self.cache.put(key, fields, result["files"], os.path.abspath(job_path(job_id, self.directory)),
+                           result["output"])
+        with self._lock:
+            job = self._jobs[job_id]
+            job["scripts"][name] = {"status": "done" if result["code"] == 0 else "failed",
+                                    "code": result["code"], "error": result["error"],
+                                    "files": result["files"], "cached": result.get("cached", False)}
+            if all(s["status"] in ("done", "failed") for s in job["scripts"].values()):
+                job["finished"] = time.time()
+            path = job_path(job_id, self.directory)
+            _write_json(os.path.join(path, "job.json"), job)
+            script = _read_json(os.path.join(path, name + ".report.json")) or {"script": name, "code": result["code"]}
+            report = self._reports[job_id]
+            report["scripts"][name] = {**script, "cached": result.get("cached", False)}
+            if job["finished"]:
+                report["finished"] = job["finished"]
+                report["elapsed_seconds"] = job["finished"] - job["created"]
+            self._write_report(job_id)
+
+    def _write_report(self, job_id):
+        """Writes report.json of a job from its collected report (call with the lock held)."""
+        report = self._reports[job_id]
+        scripts = [s for s in report["scripts"].values() if not s["cached"]]
+        report["totals"] = {
+            "wall_seconds": sum(s.get("wall_seconds") or 0 for s in scripts),
+            "cpu_seconds": sum(s.get("cpu_seconds") or 0 for s in scripts),
+            "peak_rss": max((s.get("peak_rss") or 0 for s in scripts), default=None),
+            "output_bytes": sum(s.get("output_bytes") or 0 for s in report["scripts"].values()),
+        }
+        _write_json(os.path.join(job_path(job_id, self.directory), "report.json"), report)
+
+    def status(self, job_id):
+        """
+        The job record plus live state:
+          "status":   "queued", "running" or "complete"
+          "progress": {"scripts_done", "scripts_total", "packets", "bytes",
+                       "total_bytes"}; packets and bytes are the furthest
+                      any script's capture scan has got
+          "results":  {script: pages (.html) it wrote, relative to the server
+                      root, i.e. under "output"}; scripts[name]["files"]
+                      lists every file, relative to "output"
+          "successes", "failures": script names, once finished
+          "preview":  the sampled preview (netdelay.preview) until the job is
+                      complete and its results replace it, or None
+        Raises FileNotFoundError for an unknown job.
+        """
+        path = job_path(job_id, self.directory)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            job = json.loads(json.dumps(job)) if job else _read_json(os.path.join(path, "job.json"))
+        if job is None:
+            raise FileNotFoundError(f"No such job: {job_id}")
+
+        scripts = job["scripts"]
+        packets = scanned = 0
+        for name, state in scripts.items():
+            progress = _read_json(os.path.join(path, name + ".progress.json"))
+            if progress is None:
+                continue
+            if state["status"] == "queued":
+                state["status"] = "running"
+            packets, scanned = max(packets, progress["packets"]), max(scanned, progress["bytes"])
+        done = [n for n, s in scripts.items() if s["status"] in ("done", "failed")]
+
+        if job["finished"]:
+            job["status"] = "complete"
+        elif any(s["status"] != "queued" for s in scripts.values()):
+            job["status"] = "running"
+        else:
+            job["status"] = "queued"
+        job["progress"] = {"scripts_done": len(done), "scripts_total": len(scripts),
+                           "packets": packets, "bytes": scanned, "total_bytes": job["total_bytes"]}
+        job["results"] = {n: [f"{job['output']}/{f}" for f in scripts[n]["files"] if f.endswith(".html")]
+                          for n in done}
+        job["successes"] = [n for n in done if scripts[n]["status"] == "done"]
+        job["failures"] = [n for n in done if scripts[n]["status"] == "failed"]
+        job["preview"] = None if job["finished"] else _read_json(os.path.join(path, "preview.json"))
+        return job
+
+    def report(self, job_id):
+        """
+        The job's instrumentation report (netdelay.instrument), also kept as
+        report.json next to its plots:
+          "job", "capture", "total_bytes", "packets", "created", "finished",
+          "elapsed_seconds" (created to finished)
+          "totals":  {"wall_seconds", "cpu_seconds" (summed over scripts run,
+                     not restored from the cache), "peak_rss" (the largest
+                     script's), "output_bytes" (every file written)}
+          "early":   stages of the preview, partial results and packet table
+          "scripts": {script: its <script>.report.json plus "cached"}, as
+                     each finishes
+        Raises FileNotFoundError for an unknown job.
+        """
+        path = job_path(job_id, self.directory)
+        with self._lock:
+            report = self._reports.get(job_id)
+            report = json.loads(json.dumps(report)) if report else _read_json(os.path.join(path, "report.json"))
+        if report is None:
+            raise FileNotFoundError(f"No such job: {job_id}")
+        return report
+
+    def partial(self, job_id):
+        """
+        The job's latest partial aggregates (netdelay.partial.summarize plus
+        "bytes_scanned", "total_bytes", "final"), or None before the first.
+        """
+        return _read_json(os.path.join(job_path(job_id, self.directory), "partial.json"))
+
+    def running(self, job_id):
+        """Whether the job was submitted to this manager and is not finished (False for one read from job.json)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job is not None and not job["finished"]
+
+    def list(self):
+        with self._lock:
+            ids = list(self._jobs)
+        return [self.status(job_id) for job_id in ids]
+
+    def load(self):
+        """The scheduler's running and queued runs (None before the first job)."""
+        return self._pool.stats() if self._pool is not None and hasattr(self._pool, "stats") else None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
@@ -0,0 +1,55 @@
+import numpy as np
+
+from netdelay.packets import TCP_FIN, TCP_RST, TCP_SYN
+from netdelay.tcp import sequence_state
+
+LOSS_TYPES = ["retransmissions", "lost_segments", "spurious_retransmissions", "duplicate_acks"]
+LOSS_LABELS = ["Retransmissions", "Lost Segments", "Spurious Retransmissions", "Duplicate ACKs"]
+
+# ------------------------------------------------------------------------
+# Vectorized TCP loss indicators
+# ------------------------------------------------------------------------
+
+def classify_loss(table):
+    """
+    Flags the same loss indicators packet_loss.py reads from Wireshark's
+    tcp.analysis.* fields, computed from the sequence state of every TCP
+    direction (see tcp.sequence_state):
+      - retransmissions: a data segment that does not extend the highest
+        sequence number already sent in its direction
+      - lost_segments: a data segment starting beyond the highest sequence
+        number sent so far (the segment before it was never captured)
+      - spurious_retransmissions: a retransmission of data the peer had
+        already acknowledged
+      - duplicate_acks: a pure ACK repeating the previous ACK number and
+        window while data is outstanding
+
+    Returns a dict mapping each name in LOSS_TYPES to a boolean array with one
+    entry per packet of the table.
+    """
+    n = len(table["time"])
+    flags = {lt: np.zeros(n, dtype=bool) for lt in LOSS_TYPES}
+    state = sequence_state(table)
+
+    data = state["data"]
+    later = ~data["first"]
+    retrans = later & (data["rel_end"] <= data["high_sent"])
+    flags["retransmissions"][data["row"][retrans]] = True
+    lost = later & (data["rel_seq"] > data["high_sent"])
+    flags["lost_segments"][data["row"][lost]] = True
+    spurious = retrans & (data["rel_end"] <= data["high_acked"])
+    flags["spurious_retransmissions"][data["row"][spurious]] = True
+
+    acks = state["acks"]
+    rows = acks["row"]
+    if len(rows) > 1:
+        same_dir = np.r_[False, acks["dir"][1:] == acks["dir"][:-1]]
+        same_ack = np.r_[False, acks["rel_ack"][1:] == acks["rel_ack"][:-1]]
+        window = table["window"][rows]
+        same_window = np.r_[False, window[1:] == window[:-1]]
+        pure = (table["payload_len"][rows] == 0) & \
+            ((table["tcp_flags"][rows] & (TCP_SYN | TCP_FIN | TCP_RST)) == 0)
+        outstanding = acks["rel_ack"] < acks["high_sent"]
+        dup = same_dir & same_ack & same_window & pure & outstanding
+        flags["duplicate_acks"][rows[dup]] = True
+    return flags
@@ -0,0 +1,282 @@
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from netdelay import pcapio
+from netdelay.packets import IPPROTO_TCP, TCP_FIN, TCP_RST, TCP_SYN, group_percentile
+
+MQTT_PORTS = (1883,)          # plain MQTT; 8883 is TLS and cannot be decoded
+MAX_PENDING = 100_000         # requests waiting for a response, across all flows
+PENDING_TIMEOUT = 60.0        # seconds before an unanswered request is dropped
+SEQ_MODULO = 1 << 32
+
+# MQTT control packet types
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP = 8, 9, 10, 11, 12, 13
+
+# request type (and QoS for PUBLISH) -> (response type, label)
+EXCHANGES = {
+    (CONNECT, 0): (CONNACK, "CONNECT → CONNACK"),
+    (PUBLISH, 1): (PUBACK, "PUBLISH QoS1 → PUBACK"),
+    (PUBLISH, 2): (PUBREC, "PUBLISH QoS2 → PUBREC"),
+    (PUBREL, 0): (PUBCOMP, "PUBREL → PUBCOMP"),
+    (SUBSCRIBE, 0): (SUBACK, "SUBSCRIBE → SUBACK"),
+    (UNSUBSCRIBE, 0): (UNSUBACK, "UNSUBSCRIBE → UNSUBACK"),
+    (PINGREQ, 0): (PINGRESP, "PINGREQ → PINGRESP"),
+}
+EXCHANGE_LABELS = [label for _, label in EXCHANGES.values()]
+_EXCHANGE_CODE = {key: code for code, key in enumerate(EXCHANGES)}
+_RESPONSE_CODE = {resp: code for code, (_, (resp, _)) in enumerate(EXCHANGES.items())}
+
+_WITH_PACKET_ID = (PUBACK, PUBREC, PUBREL, PUBCOMP, SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK)
+
+# ------------------------------------------------------------------------
+# 1. MQTT framing
+# ------------------------------------------------------------------------
+
+def parse_messages(buffer):
+    """
+    Pops every complete MQTT control packet off the front of a bytearray.
+    Returns (messages, ok) where messages is a list of (type, qos, packet_id)
+    tuples (packet_id None when the type has none) and ok is False when the
+    stream does not look like MQTT (bad remaining-length encoding).
+    """
+    messages = []
+    pos = 0
+    size = len(buffer)
+    ok = True
+    while size - pos >= 2:
+        first = buffer[pos]
+        msg_type = first >> 4
+        if msg_type == 0 or msg_type == 15:
+            ok = False
+            break
+
+        # Remaining length: 1-4 bytes, 7 bits each, high bit = "more".
+        remaining = 0
+        shift = 0
+        complete = False
+        i = pos + 1
+        while i < size and i - pos <= 4:
+            byte = buffer[i]
+            i += 1
+            remaining |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                complete = True
+                break
+        if not complete:
+            ok = i - pos <= 4
+            break
+        end = i + remaining
+        if end > size:
+            break
+
+        qos = 0
+        packet_id = None
+        if msg_type == PUBLISH:
+            qos = (first >> 1) & 0x03
+            if qos and remaining >= 4:
+                topic_len = (buffer[i] << 8) | buffer[i + 1]
+                if i + 2 + topic_len + 2 <= end:
+                    packet_id = (buffer[i + 2 + topic_len] << 8) | buffer[i + 3 + topic_len]
+        elif msg_type in _WITH_PACKET_ID and remaining >= 2:
+            packet_id = (buffer[i] << 8) | buffer[i + 1]
+        messages.append((msg_type, qos, packet_id))
+        pos = end
+    del buffer[:pos]
+    return messages, ok
+
+
+# ------------------------------------------------------------------------
+# 2. Stream reassembly and request/response matching
+# ------------------------------------------------------------------------
+
+def match_latencies(path, table, ports=MQTT_PORTS, max_pending=MAX_PENDING,
+                    pending_timeout=PENDING_TIMEOUT):
+    """
+    Reassembles the TCP byte stream of every MQTT connection in capture order
+    and matches requests to responses as a streaming hash join:
+      - CONNECT → CONNACK per connection
+      - PUBLISH (QoS 1/2) → PUBACK/PUBREC, PUBREL → PUBCOMP,
+        SUBSCRIBE → SUBACK, UNSUBSCRIBE → UNSUBACK by packet identifier
+      - PINGREQ → PINGRESP per connection
+    Pending requests are kept in insertion (time) order; entries older than
+    pending_timeout are expired and at most max_pending are kept, so memory
+    stays bounded on long high-rate captures.
+
+    Returns a dict with
+      - "samples": columns client, broker (address codes), exchange (index
+        into EXCHANGE_LABELS), packet_id, time (request time), latency
+      - "stats": counters for messages, matched, unmatched responses,
+        evicted / expired requests and stream gaps
+    """
+    port_set = set(int(p) for p in ports)
+    rows = np.flatnonzero((table["proto"] == IPPROTO_TCP) & (table["src"] >= 0)
+                          & (np.isin(table["sport"], list(port_set))
+                             | np.isin(table["dport"], list(port_set))))
+
+    client = array("i")
+    broker = array("i")
+    exchange = array("B")
+    packet_ids = array("i")
+    req_time = array("d")
+    latency = array("d")
+    stats = {"messages": 0, "matched": 0, "unmatched_responses": 0, "evicted": 0,
+             "expired": 0, "gaps": 0, "desync": 0}
+
+    streams = {}               # (src, sport, dst, dport) -> {"next_seq", "buffer"}
+    pending = OrderedDict()    # (conn, to_broker, exchange code, packet id) -> request time
+
+    if len(rows) == 0:
+        mapped = None
+    else:
+        mapped = pcapio.open_buffer(path)
+    try:
+        src_col, dst_col = table["src"], table["dst"]
+        sport_col, dport_col = table["sport"], table["dport"]
+        seq_col, flags_col = table["seq"], table["tcp_flags"]
+        time_col = table["time"]
+        plen_col, poff_col = table["payload_len"], table["payload_offset"]
+        rec_end = table["offset"] + table["cap_len"]
+        for r in rows:
+            src, dst = int(src_col[r]), int(dst_col[r])
+            sport, dport = int(sport_col[r]), int(dport_col[r])
+            direction = (src, sport, dst, dport)
+            flags = int(flags_col[r])
+            seq = int(seq_col[r])
+            length = int(plen_col[r])
+
+            if flags & (TCP_SYN | TCP_RST):
+                streams.pop(direction, None)
+                if flags & TCP_SYN:
+                    streams[direction] = {"next_seq": (seq + 1) % SEQ_MODULO, "buffer": bytearray()}
+                continue
+            if length <= 0:
+                continue
+
+            stream = streams.get(direction)
+            if stream is None:
+                # Joined mid-connection: assume the segment starts a message.
+                stream = streams[direction] = {"next_seq": seq, "buffer": bytearray()}
+            offset = (seq - stream["next_seq"]) % SEQ_MODULO
+            if offset >= SEQ_MODULO // 2:
+                skip = SEQ_MODULO - offset       # retransmitted / overlapping bytes
+                if skip >= length:
+                    continue
+            else:
+                skip = 0
+                if offset:
+                    stats["gaps"] += 1
+                    stream["buffer"].clear()
+            start = int(poff_col[r]) + skip
+            stop = int(poff_col[r]) + length
+            if stop > rec_end[r]:
+                # Cut off by the snap length: the rest of the stream is unusable
+                # until the next segment.
+                stats["gaps"] += 1
+                stream["buffer"].clear()
+                stream["next_seq"] = (seq + length) % SEQ_MODULO
+                continue
+            stream["buffer"] += mapped[start:stop]
+            stream["next_seq"] = (seq + length) % SEQ_MODULO
+            if flags & TCP_FIN:
+                stream["next_seq"] = (stream["next_seq"] + 1) % SEQ_MODULO
+
+            messages, ok = parse_messages(stream["buffer"])
+            if not ok:
+                stats["desync"] += 1
+                stream["buffer"].clear()
+
+            now = float(time_col[r])
+            to_broker = dport in port_set
+            conn = (src, sport, dst, dport) if to_broker else (dst, dport, src, sport)
+            for msg_type, qos, packet_id in messages:
+                stats["messages"] += 1
+                request = EXCHANGES.get((msg_type, qos if msg_type == PUBLISH else 0))
+                if request is not None:
+                    key = (conn, to_broker, _EXCHANGE_CODE[(msg_type, qos if msg_type == PUBLISH else 0)],
+                           packet_id)
+                    if key not in pending:
+                        pending[key] = now
+                        if len(pending) > max_pending:
+                            pending.popitem(last=False)
+                            stats["evicted"] += 1
+                    continue
+                code = _RESPONSE_CODE.get(msg_type)
+                if code is None:
+                    continue
+                key = (conn, not to_broker, code, packet_id)
+                sent = pending.pop(key, None)
+                if sent is None:
+                    stats["unmatched_responses"] += 1
+                    continue
+                stats["matched"] += 1
+                client.append(conn[0])
+                broker.append(conn[2])
+                exchange.append(code)
+                packet_ids.append(-1 if packet_id is None else packet_id)
+                req_time.append(sent)
+                latency.append(now - sent)
+
+            # Expire requests that will not be answered any more.
+            while pending:
+                oldest_key = next(iter(pending))
+                if pending[oldest_key] >= now - pending_timeout:
+                    break
+                del pending[oldest_key]
+                stats["expired"] += 1
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+    stats["pending_at_end"] = len(pending)
+    samples = {
+        "client": np.frombuffer(client, dtype=np.int32).copy(),
+        "broker": np.frombuffer(broker, dtype=np.int32).copy(),
+        "exchange": np.frombuffer(exchange, dtype=np.uint8).copy(),
+        "packet_id": np.frombuffer(packet_ids, dtype=np.int32).copy(),
+        "time": np.frombuffer(req_time, dtype=np.float64).copy(),
+        "latency": np.frombuffer(latency, dtype=np.float64).copy(),
+    }
+    return {"samples": samples, "stats": stats}
+
+
+# ------------------------------------------------------------------------
+# 3. Latency distributions
+# ------------------------------------------------------------------------
+
+def latency_summary(samples, addresses):
+    """
+    Latency distribution per (client, broker, exchange). Returns columns
+    client, broker, exchange (labels), count, mean, p50, p95, p99, max
+    (seconds), ordered by descending p95.
+    """
+    if len(samples["latency"]) == 0:
+        empty = np.zeros(0)
+        return {"client": np.zeros(0, dtype=object), "broker": np.zeros(0, dtype=object),
+                "exchange": np.zeros(0, dtype=object), "count": empty.astype(np.int64),
+                "mean": empty, "p50": empty, "p95": empty, "p99": empty, "max": empty}
+
+    keys = np.stack([samples["client"], samples["broker"], samples["exchange"]], axis=1)
+    uniq, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    n = len(uniq)
+    latency = samples["latency"]
+    count = np.bincount(group, minlength=n)
+    worst = np.zeros(n)
+    np.maximum.at(worst, group, latency)
+    summary = {
+        "client": addresses[uniq[:, 0]],
+        "broker": addresses[uniq[:, 1]],
+        "exchange": np.array([EXCHANGE_LABELS[c] for c in uniq[:, 2]], dtype=object),
+        "count": count,
+        "mean": np.bincount(group, weights=latency, minlength=n) / count,
+        "p50": group_percentile(latency, group, n, 50),
+        "p95": group_percentile(latency, group, n, 95),
+        "p99": group_percentile(latency, group, n, 99),
+        "max": worst,
+    }
+    order = np.argsort(-summary["p95"], kind="stable")
+    return {k: v[order] for k, v in summary.items()}
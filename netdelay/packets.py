@@ -0,0 +1,402 @@
+import ipaddress
+
+import numpy as np
+
+from netdelay import instrument, pcapio, timeindex
+
+# ------------------------------------------------------------------------
+# Link / network constants
+# ------------------------------------------------------------------------
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8, 0x9100)
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT = 44
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+TCP_URG = 0x20
+
+SEQ_MODULO = np.int64(1) << 32
+SEQ_HALF = np.int64(1) << 31
+
+# ------------------------------------------------------------------------
+# 1. Vectorized byte access
+# ------------------------------------------------------------------------
+
+def _u8(buf, start, pos, limit):
+    """Reads one byte at start+pos for every packet, 0 where not captured."""
+    idx = start + pos
+    ok = (pos >= 0) & (idx < limit)
+    return np.where(ok, buf[np.where(ok, idx, 0)], 0).astype(np.uint32)
+
+
+def _u16(buf, start, pos, limit):
+    return (_u8(buf, start, pos, limit) << 8) | _u8(buf, start, pos + 1, limit)
+
+
+def _u32(buf, start, pos, limit):
+    return (_u16(buf, start, pos, limit) << 16) | _u16(buf, start, pos + 2, limit)
+
+
+def _address_keys(buf, start, l3, version, limit):
+    """
+    Builds (hi, lo) uint64 keys for the source and destination addresses.
+    IPv4 addresses are stored IPv4-mapped (::ffff:a.b.c.d) so both families
+    share one key space.
+    """
+    n = len(start)
+    src = np.zeros((n, 2), dtype=np.uint64)
+    dst = np.zeros((n, 2), dtype=np.uint64)
+
+    v4 = version == 4
+    mapped = np.uint64(0xFFFF << 32)
+    src[v4, 1] = mapped | _u32(buf, start[v4], l3[v4] + 12, limit[v4]).astype(np.uint64)
+    dst[v4, 1] = mapped | _u32(buf, start[v4], l3[v4] + 16, limit[v4]).astype(np.uint64)
+
+    v6 = version == 6
+    if v6.any():
+        base = start[v6] + l3[v6]
+        lim = limit[v6]
+        for col, (field, pos) in enumerate(((src, 8), (src, 16), (dst, 24), (dst, 32))):
+            word = np.zeros(len(base), dtype=np.uint64)
+            for i in range(8):
+                word = (word << np.uint64(8)) | _u8(buf, base, pos + i, lim).astype(np.uint64)
+            field[v6, col % 2] = word
+    return src, dst
+
+
+def _factorize_addresses(src, dst, version):
+    """
+    Maps address keys to small integer codes shared by src and dst.
+    Returns (src_codes, dst_codes, addresses) where addresses[code] is the
+    printable address string; non-IP packets get code -1.
+    """
+    n = len(version)
+    is_ip = version > 0
+    keys = np.concatenate([src[is_ip], dst[is_ip]])
+    if len(keys) == 0:
+        return np.full(n, -1, np.int32), np.full(n, -1, np.int32), np.array([], dtype=object)
+
+    if not keys[:, 0].any():
+        uniq, inverse = np.unique(keys[:, 1], return_inverse=True)
+        uniq = np.stack([np.zeros_like(uniq), uniq], axis=1)
+    else:
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    addresses = []
+    for hi, lo in uniq:
+        value = (int(hi) << 64) | int(lo)
+        addr = ipaddress.IPv6Address(value)
+        addresses.append(str(addr.ipv4_mapped) if addr.ipv4_mapped else str(addr))
+
+    m = int(is_ip.sum())
+    src_codes = np.full(n, -1, np.int32)
+    dst_codes = np.full(n, -1, np.int32)
+    src_codes[is_ip] = inverse[:m]
+    dst_codes[is_ip] = inverse[m:]
+    return src_codes, dst_codes, np.array(addresses, dtype=object)
+
+
+# ------------------------------------------------------------------------
+# 2. Columnar packet table
+# ------------------------------------------------------------------------
+
+def decode_records(buf, scan):
+    """
+    Decodes link, IP and TCP/UDP headers for every record of a scan (see
+    pcapio.scan_records) straight from the mapped file buffer.
+
+    Returns a dict of equally long NumPy arrays (one row per packet):
+      time, wire_len, cap_len       from the record header
+      ip_version                    4, 6 or 0 for non-IP packets
+      src, dst                      address codes into "addresses" (-1 if not IP)
+      proto                         IP protocol number
+      sport, dport                  TCP/UDP ports
+      seq, ack, tcp_flags, window   TCP header fields
+      tcp_hlen                      TCP header length in bytes
+      payload_len                   transport payload bytes (from IP lengths)
+      payload_offset                file offset of the transport payload
+      offset                        file offset of the first captured byte
+    plus "addresses", the lookup table of printable IP addresses.
+    """
+    records = scan["records"]
+    n = len(records["time"])
+    start = records["offset"]
+    limit = start + records["cap_len"].astype(np.int64)
+    linktypes = np.array([iface["linktype"] for iface in scan["interfaces"]] or [0],
+                         dtype=np.int64)
+    linktype = linktypes[records["interface"]] if n else np.zeros(0, np.int64)
+
+    # Link layer: find where the network header starts and what it claims to be.
+    l3 = np.full(n, -1, dtype=np.int64)
+    ethertype = np.zeros(n, dtype=np.uint32)
+
+    eth = linktype == LINKTYPE_ETHERNET
+    eth_l3 = np.full(n, 14, dtype=np.int64)
+    eth_type = _u16(buf, start, 12, limit)
+    for _ in range(2):
+        tagged = eth & np.isin(eth_type, VLAN_ETHERTYPES)
+        eth_type = np.where(tagged, _u16(buf, start, eth_l3 + 2, limit), eth_type)
+        eth_l3 = np.where(tagged, eth_l3 + 4, eth_l3)
+    l3 = np.where(eth, eth_l3, l3)
+    ethertype = np.where(eth, eth_type, ethertype)
+
+    sll = linktype == LINKTYPE_LINUX_SLL
+    l3 = np.where(sll, 16, l3)
+    ethertype = np.where(sll, _u16(buf, start, 14, limit), ethertype)
+
+    sll2 = linktype == LINKTYPE_LINUX_SLL2
+    l3 = np.where(sll2, 20, l3)
+    ethertype = np.where(sll2, _u16(buf, start, 0, limit), ethertype)
+
+    raw = np.isin(linktype, (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6))
+    l3 = np.where(raw, 0, l3)
+    loop = np.isin(linktype, (LINKTYPE_NULL, LINKTYPE_LOOP))
+    l3 = np.where(loop, 4, l3)
+
+    # Network layer.
+    nibble = _u8(buf, start, l3, limit) >> 4
+    by_type = np.where(ethertype == ETHERTYPE_IPV4, 4,
+                       np.where(ethertype == ETHERTYPE_IPV6, 6, 0))
+    version = np.where(raw | loop, nibble, np.where(by_type == nibble, by_type, 0))
+    version = np.where((version == 4) | (version == 6), version, 0).astype(np.uint8)
+    v4 = version == 4
+    v6 = version == 6
+
+    ihl = (_u8(buf, start, l3, limit) & 0x0F).astype(np.int64) * 4
+    v4_total = _u16(buf, start, l3 + 2, limit).astype(np.int64)
+    v4_frag = (_u16(buf, start, l3 + 6, limit) & 0x1FFF) != 0
+    v6_plen = _u16(buf, start, l3 + 4, limit).astype(np.int64)
+
+    proto = np.where(v4, _u8(buf, start, l3 + 9, limit), 0)
+    proto = np.where(v6, _u8(buf, start, l3 + 6, limit), proto)
+    l4 = np.where(v4, l3 + ihl, -1)
+    l4 = np.where(v6, l3 + 40, l4)
+    fragment = v4 & v4_frag
+
+    # Skip the common IPv6 extension headers to reach the transport header.
+    for _ in range(3):
+        ext = v6 & np.isin(proto, IPV6_EXTENSION_HEADERS)
+        frag6 = v6 & (proto == IPV6_FRAGMENT)
+        if not (ext.any() or frag6.any()):
+            break
+        ext_len = (_u8(buf, start, l4 + 1, limit).astype(np.int64) + 1) * 8
+        next_header = _u8(buf, start, l4, limit)
+        fragment |= frag6 & ((_u16(buf, start, l4 + 2, limit) & 0xFFF8) != 0)
+        proto = np.where(ext | frag6, next_header, proto)
+        l4 = np.where(ext, l4 + ext_len, np.where(frag6, l4 + 8, l4))
+
+    ip_end = np.where(v4, l3 + v4_total, np.where(v6, l3 + 40 + v6_plen, -1))
+
+    src_key, dst_key = _address_keys(buf, start, l3, version, limit)
+    src, dst, addresses = _factorize_addresses(src_key, dst_key, version)
+
+    # Transport layer.
+    tcp = (version > 0) & ~fragment & (proto == IPPROTO_TCP) & (start + l4 + 20 <= limit)
+    udp = (version > 0) & ~fragment & (proto == IPPROTO_UDP) & (start + l4 + 8 <= limit)
+    transport = tcp | udp
+
+    sport = np.where(transport, _u16(buf, start, l4, limit), 0).astype(np.uint16)
+    dport = np.where(transport, _u16(buf, start, l4 + 2, limit), 0).astype(np.uint16)
+    seq = np.where(tcp, _u32(buf, start, l4 + 4, limit), 0).astype(np.uint32)
+    ack = np.where(tcp, _u32(buf, start, l4 + 8, limit), 0).astype(np.uint32)
+    tcp_hlen = np.where(tcp, (_u8(buf, start, l4 + 12, limit) >> 4) * 4, 0).astype(np.int64)
+    tcp_flags = np.where(tcp, _u16(buf, start, l4 + 12, limit) & 0x01FF, 0).astype(np.uint16)
+    window = np.where(tcp, _u16(buf, start, l4 + 14, limit), 0).astype(np.uint16)
+
+    payload_start = np.where(tcp, l4 + tcp_hlen, np.where(udp, l4 + 8, -1))
+    payload_len = np.where(transport, np.maximum(ip_end - payload_start, 0), 0)
+
+    return {
+        "time": records["time"],
+        "wire_len": records["wire_len"],
+        "cap_len": records["cap_len"],
+        "ip_version": version,
+        "src": src,
+        "dst": dst,
+        "proto": proto.astype(np.uint8),
+        "sport": sport,
+        "dport": dport,
+        "seq": seq,
+        "ack": ack,
+        "tcp_flags": tcp_flags,
+        "window": window,
+        "tcp_hlen": tcp_hlen.astype(np.uint16),
+        "payload_len": payload_len.astype(np.int32),
+        "payload_offset": np.where(transport, start + payload_start, -1),
+        "offset": start,
+        "addresses": addresses,
+    }
+
+
+def load_packets(path: str, limit=None, start=None, end=None):
+    """
+    Reads a pcap/pcapng file into a columnar packet table (see decode_records).
+    No per-packet Python objects are created beyond the record header scan.
+    With limit, only the packets in the first limit bytes are read. With
+    start / end (epoch seconds), only packets with start <= time < end are
+    read, seeking through the capture's time index (see netdelay.timeindex).
+    The first full read of a capture records that index. Runs as the
+    "load_packets" stage of netdelay.instrument.
+    """
+    with instrument.stage("load_packets") as record:
+        table = _read_packets(path, limit, start, end)
+        record["packets"] = len(table["time"])
+        record["outputs"] = table
+    return table
+
+
+def _read_packets(path, limit, start, end):
+    if start is not None or end is not None:
+        scan = timeindex.scan_window(path, start, end)
+    else:
+        scan = pcapio.scan_records(path, limit=limit)
+        if limit is None:
+            timeindex.record_index(path, scan)
+    mapped = pcapio.open_buffer(path) if len(scan["records"]["time"]) else None
+    if mapped is None:
+        buf = np.zeros(1, dtype=np.uint8)
+        return decode_records(buf, scan)
+    try:
+        buf = np.frombuffer(mapped, dtype=np.uint8)
+        table = decode_records(buf, scan)
+        del buf
+    finally:
+        mapped.close()
+    return table
+
+
+# ------------------------------------------------------------------------
+# 3. Flow keys and grouping helpers
+# ------------------------------------------------------------------------
+
+def flow_index(table, directed=True):
+    """
+    Assigns a flow id to every IP packet (-1 for non-IP packets).
+
+    Directed flows are keyed by (proto, src, sport, dst, dport). Undirected
+    flows (connections) put the smaller endpoint first, so both directions of
+    a TCP connection share an id; "forward" is True for packets travelling
+    from the first endpoint to the second.
+
+    Returns (ids, forward, flows) where flows holds one row per flow id with
+    the columns proto, src, sport, dst, dport.
+    """
+    src = table["src"].astype(np.int64)
+    dst = table["dst"].astype(np.int64)
+    sport = table["sport"].astype(np.int64)
+    dport = table["dport"].astype(np.int64)
+    is_ip = src >= 0
+
+    ep_a = (src << 16) | sport
+    ep_b = (dst << 16) | dport
+    forward = np.ones(len(src), dtype=bool)
+    if not directed:
+        forward = ep_a <= ep_b
+        ep_a, ep_b = np.where(forward, ep_a, ep_b), np.where(forward, ep_b, ep_a)
+
+    ids = np.full(len(src), -1, dtype=np.int64)
+    empty = {k: np.zeros(0, dtype=np.int64) for k in ("proto", "src", "sport", "dst", "dport")}
+    if not is_ip.any():
+        return ids, forward, empty
+
+    endpoints, ep_codes = np.unique(np.concatenate([ep_a[is_ip], ep_b[is_ip]]),
+                                    return_inverse=True)
+    m = int(is_ip.sum())
+    a_code = ep_codes[:m].astype(np.int64)
+    b_code = ep_codes[m:].astype(np.int64)
+    key = (a_code * len(endpoints) + b_code) * 256 + table["proto"][is_ip].astype(np.int64)
+    uniq, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    ids[is_ip] = inverse.reshape(-1)
+
+    a_ep = endpoints[(uniq // 256) // len(endpoints)]
+    b_ep = endpoints[(uniq // 256) % len(endpoints)]
+    flows = {
+        "proto": uniq % 256,
+        "src": a_ep >> 16,
+        "sport": a_ep & 0xFFFF,
+        "dst": b_ep >> 16,
+        "dport": b_ep & 0xFFFF,
+    }
+    return ids, forward, flows
+
+
+def segment_starts(sorted_ids):
+    """Start positions of each run of equal ids in an already sorted array."""
+    if len(sorted_ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+
+
+def segmented_cummax(values, sorted_ids):
+    """
+    Running maximum of non-negative values, restarted at every new id.
+    sorted_ids must be grouped (all rows of one id contiguous).
+    """
+    if len(values) == 0:
+        return values.astype(np.int64)
+    rank = np.cumsum(np.r_[0, sorted_ids[1:] != sorted_ids[:-1]])
+    shift = np.int64(1) << 40
+    shifted = rank.astype(np.int64) * shift + values.astype(np.int64)
+    return np.maximum.accumulate(shifted) - rank * shift
+
+
+def segmented_cumsum(values, sorted_ids):
+    """Running sum of values, restarted at every new id (ids grouped)."""
+    total = np.cumsum(values.astype(np.int64))
+    starts = segment_starts(sorted_ids)
+    if len(starts) == 0:
+        return total
+    before = total[starts] - values[starts]
+    return total - np.repeat(before, np.diff(np.r_[starts, len(values)]))
+
+
+def unwrap_sequence(relative, sorted_ids):
+    """
+    Turns 32-bit sequence numbers taken relative to a reference (mod 2**32)
+    into unbounded ones. Within each id, in the given (time) order, every
+    value lies the signed 32-bit distance (-2**31 .. 2**31) away from the
+    previous one, so a stream keeps counting past 2 GiB instead of wrapping;
+    the first value of an id is its signed distance from the reference.
+    """
+    relative = relative.astype(np.int64)
+    step = (np.diff(relative, prepend=0) + SEQ_HALF) % SEQ_MODULO - SEQ_HALF
+    starts = segment_starts(sorted_ids)
+    step[starts] = (relative[starts] + SEQ_HALF) % SEQ_MODULO - SEQ_HALF
+    return segmented_cumsum(step, sorted_ids)
+
+
+def group_percentile(values, group_ids, n_groups, q):
+    """
+    q-th percentile (0-100, nearest-rank) of values per group id, NaN for
+    empty groups. Runs as a single sort instead of a Python loop per group.
+    """
+    out = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return out
+    order = np.lexsort((values, group_ids))
+    g = group_ids[order]
+    v = values[order]
+    starts = segment_starts(g)
+    counts = np.diff(np.r_[starts, len(g)])
+    pick = starts + np.clip(np.ceil(q / 100.0 * counts).astype(np.int64) - 1, 0, counts - 1)
+    out[g[starts]] = v[pick]
+    return out
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import load_packets
+from netdelay.protocols import protocol_shares
+
+FIRST_BYTES = 1 << 20       # capture prefix of the first partial result
+GROWTH = 2                  # each partial result covers GROWTH x the previous prefix
+TOP_CONVERSATIONS = 10
+
+# ------------------------------------------------------------------------
+# 1. Aggregates of a capture prefix
+# ------------------------------------------------------------------------
+
+def summarize(table, top=TOP_CONVERSATIONS):
+    """
+    The headline numbers of the dashboard for a packet table (see
+    packets.load_packets). Returns a dict with:
+      "packets", "bytes", "duration"
+      "loss":          {"percent", one count per LOSS_TYPES}, the percentage
+                       computed like packet_loss.py (indicators / packets)
+      "protocols":     [{"protocol", "packets", "bytes", "packet_share",
+                       "byte_share"}], largest first
+      "conversations": [{"src", "dst", "packets", "bytes"}], the top IP-level
+                       conversations (one direction each) by bytes
+    """
+    n = len(table["time"])
+    times = table["time"][np.isfinite(table["time"])]
+    flags = classify_loss(table)
+    counts = {lt: int(flags[lt].sum()) for lt in LOSS_TYPES}
+    shares = protocol_shares(table)
+
+    addresses = table["addresses"]
+    width = max(len(addresses), 1)
+    ip = np.flatnonzero(table["src"] >= 0)
+    pairs = table["src"][ip].astype(np.int64) * width + table["dst"][ip]
+    keys, inverse = np.unique(pairs, return_inverse=True)
+    volume = np.bincount(inverse.reshape(-1), weights=table["wire_len"][ip], minlength=len(keys))
+    packets = np.bincount(inverse.reshape(-1), minlength=len(keys))
+    order = np.argsort(-volume, kind="stable")[:top]
+
+    return {
+        "packets": n,
+        "bytes": int(table["wire_len"].sum()),
+        "duration": float(times.max() - times.min()) if len(times) else 0.0,
+        "loss": {"percent": sum(counts.values()) / n * 100 if n else 0.0, **counts},
+        "protocols": [{"protocol": str(p), "packets": int(c), "bytes": int(b),
+                       "packet_share": float(ps), "byte_share": float(bs)}
+                      for p, c, b, ps, bs in zip(*(shares[k] for k in ("protocol", "packets", "bytes",
+                                                                       "packet_share", "byte_share")))],
+        "conversations": [{"src": str(addresses[keys[i] // width]), "dst": str(addresses[keys[i] % width]),
+                           "packets": int(packets[i]), "bytes": int(volume[i])} for i in order],
+    }
+
+# ------------------------------------------------------------------------
+# 2. Progressive results
+# ------------------------------------------------------------------------
+#
+# Loss detection needs each TCP direction's whole history so far, so the
+# aggregates are not merged chunk by chunk: each partial result is computed
+# afresh on a prefix GROWTH times longer than the last one. The first
+# arrives after FIRST_BYTES of the capture, whatever its size, and all of
+# them together cost about GROWTH / (GROWTH - 1) full passes.
+
+def partial_results(path, first=FIRST_BYTES, growth=GROWTH, top=TOP_CONVERSATIONS):
+    """
+    Yields summarize() of ever longer prefixes of a capture, each with
+    "bytes_scanned", "total_bytes" and "final" (True for the last, which
+    covers the whole capture).
+    """
+    total = os.path.getsize(path)
+    limit = first
+    while True:
+        final = limit >= total
+        table = load_packets(path, limit=None if final else limit)
+        yield {**summarize(table, top), "bytes_scanned": min(limit, total), "total_bytes": total,
+               "final": final}
+        if final:
+            return
+        limit *= growth
@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+
+from netdelay import pcapio
+from netdelay.delayed_ack import KIND_OTHER, classify_acks
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import decode_records, load_packets
+from netdelay.protocols import PROTOCOLS, protocol_codes
+
+SAMPLE_BLOCKS = 32          # evenly spaced byte ranges read from a capture
+BLOCK_BYTES = 1 << 20       # bytes per sampled range
+RTT_PER_BLOCK = 2000        # RTT samples kept per block (systematic)
+BOOTSTRAP = 200             # bootstrap resamples of the blocks
+CONFIDENCE = 0.95
+RTT_PERCENTILES = (50, 95, 99)
+
+# ------------------------------------------------------------------------
+# 1. Block sample
+# ------------------------------------------------------------------------
+#
+# A cluster sample: SAMPLE_BLOCKS contiguous ranges of BLOCK_BYTES spread
+# evenly over the capture, each starting at the first record boundary
+# found after its offset (pcapio.sync_record). Packets inside a block keep
+# their neighbours, so TCP loss indicators and ACK RTTs are detected as in
+# a full pass, except for the first segment of each direction in a block.
+# The read is at most SAMPLE_BLOCKS x BLOCK_BYTES whatever the capture size.
+
+def _block_stats(table, span):
+    n = len(table["time"])
+    loss = classify_loss(table)
+    acks = classify_acks(table)
+    rtt = acks["ack_delay"][acks["kind"] != KIND_OTHER]
+    if len(rtt) > RTT_PER_BLOCK:
+        rtt = rtt[::int(np.ceil(len(rtt) / RTT_PER_BLOCK))]
+    return {
+        "packets": n,
+        "span": span,
+        "protocols": np.bincount(protocol_codes(table), minlength=len(PROTOCOLS)),
+        "loss": np.array([loss[lt].sum() for lt in LOSS_TYPES], dtype=np.int64),
+        "rtt": rtt,
+    }
+
+
+def sample_blocks(capture, blocks=SAMPLE_BLOCKS, block_bytes=BLOCK_BYTES):
+    """
+    Per-block statistics (packets, file bytes spanned, protocol counts,
+    loss counts, RTT samples) of a block sample of a capture, and whether
+    the blocks cover the whole capture (then the statistics are exact).
+    """
+    size = os.path.getsize(capture)
+    if size <= blocks * block_bytes:
+        return [_block_stats(load_packets(capture), size)], True
+    head = pcapio.scan_records(capture, limit=block_bytes)
+    layout = head if head["format"] == "pcapng" else None
+    scans = [(0, head)]
+    for i in range(1, blocks):
+        pos = pcapio.sync_record(capture, i * size // blocks, head)
+        if pos is None:
+            continue
+        try:
+            scans.append((pos, pcapio.scan_records(capture, start=pos, limit=pos + block_bytes, layout=layout)))
+        except (IndexError, KeyError):
+            continue    # a pcapng section not described in the head
+    mapped = pcapio.open_buffer(capture)
+    try:
+        buf = np.frombuffer(mapped, dtype=np.uint8)
+        stats = []
+        for pos, scan in scans:
+            records = scan["records"]
+            end = int(records["offset"][-1] + records["cap_len"][-1]) if len(records["offset"]) else pos
+            stats.append(_block_stats(decode_records(buf, scan), end - pos))
+        del buf
+    finally:
+        mapped.close()
+    return stats, False
+
+# ------------------------------------------------------------------------
+# 2. Estimates with confidence intervals
+# ------------------------------------------------------------------------
+#
+# Shares and percentages are ratios over the pooled blocks. Their
+# intervals come from a bootstrap over blocks (not packets), since packets
+# of one block are correlated. Exact previews report low = high = value.
+
+def _interval(value, replicates):
+    if replicates is None:
+        return {"value": value, "low": value, "high": value}
+    alpha = (1 - CONFIDENCE) / 2 * 100
+    low, high = np.nanpercentile(replicates, [alpha, 100 - alpha])
+    return {"value": value, "low": float(low), "high": float(high)}
+
+
+def preview(capture, blocks=SAMPLE_BLOCKS, block_bytes=BLOCK_BYTES, seed=0):
+    """
+    Approximate analysis of a capture from a block sample, in seconds.
+    Returns a dict with:
+      "exact":       True if the sample is the whole capture
+      "blocks", "sampled_packets", "sampled_bytes", "total_bytes",
+      "estimated_packets", "confidence"
+      "protocols":   [{"protocol", "value", "low", "high"}], packet shares in
+                     percent, largest first
+      "loss":        {"percent" and one entry per LOSS_TYPES: {"value",
+                     "low", "high"}}, indicators per 100 packets as in
+                     packet_loss.py
+      "rtt":         {"samples", "p50", "p95", "p99": {"value", "low",
+                     "high"}}, ACK RTT in seconds
+    """
+    stats, exact = sample_blocks(capture, blocks, block_bytes)
+    packets = np.array([s["packets"] for s in stats], dtype=np.float64)
+    span = sum(s["span"] for s in stats)
+    protocols = np.array([s["protocols"] for s in stats], dtype=np.float64)
+    loss = np.array([s["loss"] for s in stats], dtype=np.float64)
+    rtts = [s["rtt"] for s in stats]
+    total_bytes = os.path.getsize(capture)
+
+    resamples = None
+    if not exact and len(stats) > 1:
+        rng = np.random.default_rng(seed)
+        resamples = rng.integers(0, len(stats), size=(BOOTSTRAP, len(stats)))
+
+    def ratio(counts):
+        """Percent of packets per column of counts (blocks x columns): value and replicates."""
+        value = counts.sum(axis=0) / max(packets.sum(), 1) * 100
+        if resamples is None:
+            return value, None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return value, counts[resamples].sum(axis=1) / packets[resamples].sum(axis=1)[:, None] * 100
+
+    share, share_reps = ratio(protocols)
+    order = [i for i in np.argsort(-share, kind="stable") if protocols[:, i].sum() > 0]
+    result_protocols = [{"protocol": PROTOCOLS[i],
+                         **_interval(float(share[i]), None if share_reps is None else share_reps[:, i])}
+                        for i in order]
+
+    loss_rate, loss_reps = ratio(np.column_stack([loss.sum(axis=1, keepdims=True), loss]))
+    names = ["percent"] + LOSS_TYPES
+    result_loss = {name: _interval(float(loss_rate[i]), None if loss_reps is None else loss_reps[:, i])
+                   for i, name in enumerate(names)}
+
+    pooled = np.concatenate(rtts) if rtts else np.zeros(0)
+    result_rtt = {"samples": int(len(pooled))}
+    rtt_reps = None
+    if resamples is not None and len(pooled):
+        rtt_reps = np.array([np.percentile(np.concatenate([rtts[i] for i in r]), RTT_PERCENTILES)
+                             if sum(len(rtts[i]) for i in r) else [np.nan] * len(RTT_PERCENTILES)
+                             for r in resamples])
+    for k, q in enumerate(RTT_PERCENTILES):
+        value = float(np.percentile(pooled, q)) if len(pooled) else None
+        result_rtt[f"p{q}"] = _interval(value, None if rtt_reps is None else rtt_reps[:, k])
+
+    return {
+        "exact": exact,
+        "blocks": len(stats),
+        "sampled_packets": int(packets.sum()),
+        "sampled_bytes": span,
+        "total_bytes": total_bytes,
+        "estimated_packets": int(packets.sum()) if exact else int(packets.sum() * total_bytes / max(span, 1)),
+        "confidence": CONFIDENCE,
+        "protocols": result_protocols,
+        "loss": result_loss,
+        "rtt": result_rtt,
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+
+from netdelay.packets import IPPROTO_TCP, IPPROTO_UDP
+
+# Protocol labels, indexed by the codes protocol_codes returns. Port-based
+# like identify_protocol in protocol_analysis.py, with a few more ports.
+PROTOCOLS = ["Other", "IPv4", "IPv6", "TCP", "UDP", "ICMP", "ICMPv6",
+             "TLS/SSL", "HTTP", "MQTT", "MQTT/TLS", "DNS", "mDNS"]
+_CODE = {name: code for code, name in enumerate(PROTOCOLS)}
+
+TCP_PORTS = {443: "TLS/SSL", 80: "HTTP", 8080: "HTTP", 1883: "MQTT", 8883: "MQTT/TLS"}
+UDP_PORTS = {53: "DNS", 5353: "mDNS", 443: "TLS/SSL"}
+
+
+def protocol_codes(table):
+    """
+    Labels every packet with an index into PROTOCOLS: well-known ports first,
+    then the transport or network protocol.
+    """
+    n = len(table["time"])
+    version = table["ip_version"]
+    proto = table["proto"]
+    codes = np.zeros(n, dtype=np.uint8)
+    codes[version == 4] = _CODE["IPv4"]
+    codes[version == 6] = _CODE["IPv6"]
+    codes[(version > 0) & (proto == 1)] = _CODE["ICMP"]
+    codes[(version > 0) & (proto == 58)] = _CODE["ICMPv6"]
+
+    for ip_proto, name, ports in ((IPPROTO_TCP, "TCP", TCP_PORTS), (IPPROTO_UDP, "UDP", UDP_PORTS)):
+        mine = (version > 0) & (proto == ip_proto)
+        codes[mine] = _CODE[name]
+        # Apply in reverse so the first listed port wins when both ends match.
+        for port, label in reversed(list(ports.items())):
+            hit = mine & ((table["sport"] == port) | (table["dport"] == port))
+            codes[hit] = _CODE[label]
+    return codes
+
+
+def protocol_shares(table, codes=None):
+    """
+    Packet and byte shares per protocol. Returns columns protocol, packets,
+    bytes, packet_share, byte_share (shares in percent), largest first.
+    """
+    if codes is None:
+        codes = protocol_codes(table)
+    packets = np.bincount(codes, minlength=len(PROTOCOLS))
+    volume = np.bincount(codes, weights=table["wire_len"], minlength=len(PROTOCOLS))
+    present = np.flatnonzero(packets)
+    order = present[np.argsort(-packets[present], kind="stable")]
+    total_packets = max(int(packets.sum()), 1)
+    total_bytes = max(float(volume.sum()), 1.0)
+    return {
+        "protocol": np.array(PROTOCOLS, dtype=object)[order],
+        "packets": packets[order],
+        "bytes": volume[order],
+        "packet_share": packets[order] / total_packets * 100,
+        "byte_share": volume[order] / total_bytes * 100,
+    }
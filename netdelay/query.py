@@ -0,0 +1,281 @@
+import json
+import os
+import shutil
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from netdelay.cache import code_version
+from netdelay.delayed_ack import KIND_OTHER, classify_acks
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import IPPROTO_TCP, IPPROTO_UDP, group_percentile, load_packets
+from netdelay.protocols import PROTOCOLS, protocol_codes
+
+PACKET_TABLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "packet_tables")
+GROUPS = ["src", "dst", "conversation", "protocol", "loss", "time"]
+RTT_PERCENTILES = (50, 95, 99)
+DEFAULT_BUCKET = 1.0        # seconds per group when grouping by time
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+
+# ------------------------------------------------------------------------
+# 1. Cached packet tables
+# ------------------------------------------------------------------------
+#
+# One directory per capture SHA-256 under PACKET_TABLE_DIR, built on the
+# first query (or at the end of the capture's analysis job) and memory-
+# mapped afterwards, so queries never re-parse the capture:
+#   <column>.npy        one row per packet: time, wire_len, src, dst
+#                       (codes into addresses.npy, -1 if not IP), proto,
+#                       sport, dport, protocol (code into PROTOCOLS),
+#                       conversation (code into conversations.npy, -1 if
+#                       not IP), loss (bit i set for LOSS_TYPES[i]) and rtt
+#                       (the matched ACK delay on ACK rows, NaN elsewhere)
+#   addresses.npy       printable addresses
+#   conversations.npy   the two address codes of each IP pair
+#   time_order.npy,     the rows in time order and their times; only when
+#   time_sorted.npy     the capture is not already in time order
+#   meta.json           {"rows", "start", "end", "time_sorted", "version"}
+# "version" is the code version of this module and the netdelay modules it
+# uses (see cache.code_version); a table built by other code is rebuilt.
+
+COLUMNS = ["time", "wire_len", "src", "dst", "proto", "sport", "dport", "protocol", "conversation",
+           "loss", "rtt"]
+
+_build_lock = threading.Lock()
+_building = {}      # sha256 -> lock held while that table is built
+
+
+@lru_cache(maxsize=1)
+def table_version():
+    return code_version(__file__)
+
+
+def _conversations(src, dst, n_addresses):
+    """Undirected IP pair code of every packet, and the address codes of each pair."""
+    width = max(n_addresses, 1)
+    ip = src >= 0
+    lo = np.minimum(src, dst).astype(np.int64)
+    hi = np.maximum(src, dst).astype(np.int64)
+    keys, inverse = np.unique((lo * width + hi)[ip], return_inverse=True)
+    codes = np.full(len(src), -1, dtype=np.int32)
+    codes[ip] = inverse.reshape(-1)
+    return codes, np.stack([keys // width, keys % width], axis=1).astype(np.int32)
+
+
+def build_packet_table(capture, path):
+    """Parses a capture once and stores its query table in directory path."""
+    table = load_packets(capture)
+    n = len(table["time"])
+    loss = np.zeros(n, dtype=np.uint8)
+    for bit, flags in enumerate(classify_loss(table)[lt] for lt in LOSS_TYPES):
+        loss |= flags.astype(np.uint8) << bit
+    acks = classify_acks(table)
+    conversation, pairs = _conversations(table["src"], table["dst"], len(table["addresses"]))
+    columns = {c: table[c] for c in ("time", "wire_len", "src", "dst", "proto", "sport", "dport")}
+    columns.update({
+        "protocol": protocol_codes(table),
+        "conversation": conversation,
+        "loss": loss,
+        "rtt": np.where(acks["kind"] != KIND_OTHER, acks["ack_delay"], np.nan),
+    })
+
+    time = table["time"]
+    time_sorted = bool(np.all(time[1:] >= time[:-1]))
+    finite = time[np.isfinite(time)]
+    meta = {"rows": n, "start": float(finite.min()) if len(finite) else 0.0,
+            "end": float(finite.max()) if len(finite) else 0.0, "time_sorted": time_sorted,
+            "version": table_version()}
+
+    temp = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(temp)
+    for c in COLUMNS:
+        np.save(os.path.join(temp, f"{c}.npy"), columns[c])
+    np.save(os.path.join(temp, "addresses.npy"), table["addresses"].astype(str))
+    np.save(os.path.join(temp, "conversations.npy"), pairs)
+    if not time_sorted:
+        order = np.argsort(time, kind="stable")
+        np.save(os.path.join(temp, "time_order.npy"), order)
+        np.save(os.path.join(temp, "time_sorted.npy"), time[order])
+    with open(os.path.join(temp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temp, path)
+
+
+@lru_cache(maxsize=16)
+def _load(path, mtime):
+    """Memory-maps a packet table; cached per directory and modification time."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    packets = {"meta": meta,
+               "columns": {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in COLUMNS},
+               "addresses": np.load(os.path.join(path, "addresses.npy")),
+               "conversations": np.load(os.path.join(path, "conversations.npy"))}
+    if not meta["time_sorted"]:
+        packets["time_order"] = np.load(os.path.join(path, "time_order.npy"), mmap_mode="r")
+        packets["time_sorted"] = np.load(os.path.join(path, "time_sorted.npy"), mmap_mode="r")
+    return packets
+
+
+def packet_table(capture, sha256, directory=PACKET_TABLE_DIR):
+    """
+    The query table of a capture (parsed on first use). Returns a dict with
+    "meta", "columns", "addresses", "conversations" and, for captures not
+    in time order, "time_order" and "time_sorted".
+    """
+    path = os.path.join(directory, sha256)
+    meta_file = os.path.join(path, "meta.json")
+    with _build_lock:
+        lock = _building.setdefault(sha256, threading.Lock())
+    with lock:
+        try:
+            with open(meta_file) as f:
+                current = json.load(f).get("version") == table_version()
+        except (OSError, ValueError):
+            current = False
+        if not current:
+            os.makedirs(directory, exist_ok=True)
+            build_packet_table(capture, path)
+    return _load(path, os.path.getmtime(meta_file))
+
+# ------------------------------------------------------------------------
+# 2. Queries: filter, group, aggregate
+# ------------------------------------------------------------------------
+
+def _address_code(packets, address):
+    hits = np.flatnonzero(packets["addresses"] == address)
+    return int(hits[0]) if len(hits) else -2    # -2 matches no packet
+
+
+def _time_rows(packets, start, end):
+    """Rows in [start, end) seconds since the capture start: a slice, or sorted row numbers."""
+    meta = packets["meta"]
+    times = packets["columns"]["time"] if meta["time_sorted"] else packets["time_sorted"]
+    lo = 0 if start is None else int(np.searchsorted(times, meta["start"] + start, side="left"))
+    hi = len(times) if end is None else int(np.searchsorted(times, meta["start"] + end, side="left"))
+    hi = max(lo, hi)
+    if meta["time_sorted"]:
+        return slice(lo, hi)
+    return np.sort(packets["time_order"][lo:hi])
+
+
+def _json_values(values):
+    if values.dtype.kind == "f":
+        return [None if np.isnan(v) else float(v) for v in values]
+    return values.tolist()
+
+
+def query_packets(packets, start=None, end=None, ip=(), src=None, dst=None, protocol=None, loss=None,
+                  group_by=None, bucket=DEFAULT_BUCKET, limit=DEFAULT_LIMIT):
+    """
+    Filters a packet table and aggregates the matching packets.
+
+    Filters (all optional, combined with AND):
+      start, end  seconds since the first packet, end exclusive
+      ip          addresses that must each be one end of the packet, so two
+                  addresses select a conversation in both directions
+      src, dst    sender / receiver address
+      protocol    a PROTOCOLS label (case-insensitive); TCP and UDP match
+                  every packet of that transport, including TLS, DNS, ...
+      loss        a LOSS_TYPES name, or "any"
+    group_by is None (one row for everything) or one of GROUPS; "time"
+    groups into buckets of bucket seconds and "loss" into one row per loss
+    type. Groups are ordered by time for "time", otherwise by packets,
+    largest first, and cut at limit.
+
+    Returns {"matched": packets matched, "groups": groups before the limit,
+    "capture_start", "rows": columns group, packets, bytes, one count per
+    LOSS_TYPES, rtt_samples, rtt_mean, rtt_p50, rtt_p95, rtt_p99 (RTT in
+    seconds, from the matched ACKs among the packets)}.
+    """
+    meta = packets["meta"]
+    if group_by is not None and group_by not in GROUPS:
+        raise ValueError(f"Unknown group: {group_by!r} (one of {', '.join(GROUPS)})")
+    if loss is not None and loss != "any" and loss not in LOSS_TYPES:
+        raise ValueError(f"Unknown loss type: {loss!r} (one of any, {', '.join(LOSS_TYPES)})")
+    if group_by == "time" and not bucket > 0:
+        raise ValueError("bucket must be positive")
+    limit = min(max(int(limit), 1), MAX_LIMIT)
+
+    rows = _time_rows(packets, start, end)
+    columns = packets["columns"]
+    cache = {}
+
+    def column(name):
+        if name not in cache:
+            cache[name] = np.asarray(columns[name][rows])
+        return cache[name]
+
+    mask = np.ones(len(column("time")), dtype=bool)
+    for address in ip:
+        code = _address_code(packets, address)
+        mask &= (column("src") == code) | (column("dst") == code)
+    if src is not None:
+        mask &= column("src") == _address_code(packets, src)
+    if dst is not None:
+        mask &= column("dst") == _address_code(packets, dst)
+    if protocol is not None:
+        name = protocol.upper()
+        if name in ("TCP", "UDP"):
+            mask &= column("proto") == (IPPROTO_TCP if name == "TCP" else IPPROTO_UDP)
+        else:
+            labels = [p.upper() for p in PROTOCOLS]
+            if name not in labels:
+                raise ValueError(f"Unknown protocol: {protocol!r} (one of {', '.join(PROTOCOLS)})")
+            mask &= column("protocol") == labels.index(name)
+    if loss is not None:
+        bits = (1 << len(LOSS_TYPES)) - 1 if loss == "any" else 1 << LOSS_TYPES.index(loss)
+        mask &= (column("loss") & bits) != 0
+
+    hit = np.flatnonzero(mask)
+    loss_bits = column("loss")[hit]
+    if group_by is None:
+        keys, labels = np.zeros(len(hit), dtype=np.int64), np.array(["all"], dtype=object)
+    elif group_by in ("src", "dst"):
+        keys = column(group_by)[hit].astype(np.int64) + 1
+        labels = np.concatenate([["non-IP"], packets["addresses"]]).astype(object)
+    elif group_by == "conversation":
+        keys = column("conversation")[hit].astype(np.int64) + 1
+        addresses, pairs = packets["addresses"], packets["conversations"]
+        labels = np.array(["non-IP"] + [f"{addresses[a]} ↔ {addresses[b]}" for a, b in pairs], dtype=object)
+    elif group_by == "protocol":
+        keys = column("protocol")[hit].astype(np.int64)
+        labels = np.array(PROTOCOLS, dtype=object)
+    elif group_by == "time":
+        keys = np.floor((column("time")[hit] - meta["start"]) / bucket).astype(np.int64)
+        keys = np.maximum(keys, 0)
+        labels = np.arange(int(keys.max()) + 1 if len(keys) else 0) * float(bucket)
+    else:
+        # A packet can carry several loss indicators: one row per (packet, type).
+        picks = [np.flatnonzero(loss_bits & (1 << bit)) for bit in range(len(LOSS_TYPES))]
+        keys = np.concatenate([np.full(len(p), bit, dtype=np.int64) for bit, p in enumerate(picks)])
+        hit = hit[np.concatenate(picks)] if picks else hit[:0]
+        loss_bits = column("loss")[hit]
+        labels = np.array(LOSS_TYPES, dtype=object)
+
+    n_groups = len(labels)
+    agg = {
+        "packets": np.bincount(keys, minlength=n_groups),
+        "bytes": np.bincount(keys, weights=column("wire_len")[hit], minlength=n_groups).astype(np.int64),
+    }
+    for bit, lt in enumerate(LOSS_TYPES):
+        agg[lt] = np.bincount(keys, weights=(loss_bits >> bit) & 1, minlength=n_groups).astype(np.int64)
+    rtt = column("rtt")[hit].astype(np.float64)
+    sampled = np.isfinite(rtt)
+    rtt, rtt_keys = rtt[sampled], keys[sampled]
+    agg["rtt_samples"] = np.bincount(rtt_keys, minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agg["rtt_mean"] = np.bincount(rtt_keys, weights=rtt, minlength=n_groups) / agg["rtt_samples"]
+    for q in RTT_PERCENTILES:
+        agg[f"rtt_p{q}"] = group_percentile(rtt, rtt_keys, n_groups, q)
+
+    present = np.flatnonzero(agg["packets"] > 0)
+    if group_by != "time":
+        present = present[np.argsort(-agg["packets"][present], kind="stable")]
+    shown = present[:limit]
+    result = {"group": labels[shown].tolist()}
+    result.update({name: _json_values(values[shown]) for name, values in agg.items()})
+    return {"matched": int(mask.sum()), "groups": int(len(present)), "capture_start": meta["start"],
+            "rows": result}
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from netdelay import pcapio
+from netdelay.summary import cached_summary
+
+MEMORY_FRACTION = 0.7       # share of physical memory analyses may reserve
+AGING = 1.0                 # priority credit (estimated seconds) per second queued
+SAMPLE_BYTES = 1 << 20      # capture bytes scanned to estimate the packet count
+
+# Per plotting script: (seconds per packet, bytes of memory per packet).
+# pyshark / scapy passes build Python objects per packet; the netdelay
+# scripts work on column arrays.
+SCRIPT_COSTS = {
+    "packet_loss.py": (3e-4, 2000),
+    "protocol_analysis.py": (4e-4, 3000),
+    "rtt_ack_analysis.py": (1.5e-5, 800),
+    "source_retransmission_type.py": (5e-4, 2000),
+    "mqtt_latency.py": (2e-6, 200),
+    "rtt_heatmap.py": (2e-6, 200),
+    "throughput_analysis.py": (2e-6, 200),
+    "early.py": (4e-6, 200),
+}
+DEFAULT_COST = (3e-4, 2000)
+BASE_SECONDS = 0.5          # start-up and page rendering per script run
+BASE_MEMORY = 150 << 20     # interpreter, imports and Bokeh per script run
+
+# ------------------------------------------------------------------------
+# 1. Cost estimates
+# ------------------------------------------------------------------------
+
+_packet_counts = {}     # (path, size, mtime) -> estimated packets
+
+
+def estimate_packets(capture):
+    """
+    Packet count of a capture: exact once its header summary has been
+    taken (netdelay.summary, done on upload), otherwise extrapolated from
+    the records in its first SAMPLE_BYTES (exact for small captures).
+    """
+    summary = cached_summary(capture)
+    if summary is not None:
+        return summary["packets"]
+    stat = os.stat(capture)
+    ident = (os.path.abspath(capture), stat.st_size, stat.st_mtime_ns)
+    if ident not in _packet_counts:
+        try:
+            scan = pcapio.scan_records(capture, limit=SAMPLE_BYTES)
+            records = scan["records"]
+            packets = len(records["time"])
+            if stat.st_size > SAMPLE_BYTES and packets:
+                scanned = int(records["offset"][-1] + records["cap_len"][-1])
+                packets = int(packets * stat.st_size / max(scanned, 1))
+        except (OSError, ValueError):
+            packets = stat.st_size // 500
+        _packet_counts[ident] = packets
+    return _packet_counts[ident]
+
+
+def estimate_cost(script, capture):
+    """{"packets", "seconds", "memory"} estimated for one script run."""
+    packets = estimate_packets(capture)
+    per_second, per_memory = SCRIPT_COSTS.get(os.path.basename(script), DEFAULT_COST)
+    return {"packets": packets, "seconds": BASE_SECONDS + packets * per_second,
+            "memory": BASE_MEMORY + packets * per_memory}
+
+
+def memory_limit(fraction=MEMORY_FRACTION):
+    """Bytes of memory analyses may reserve (None if unknown)."""
+    try:
+        return int(os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") * fraction)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+# ------------------------------------------------------------------------
+# 2. Admission control
+# ------------------------------------------------------------------------
+
+class Scheduler:
+    """
+    Admission control in front of an AnalysisPool, with the same submit /
+    run interface. Each script run reserves one CPU slot and its estimated
+    memory; runs are admitted while both caps hold. The queue is ordered by
+    estimated seconds minus AGING x seconds waited (shortest job first, with
+    aging), and admission stops at the first run that does not fit, so a
+    large capture that has waited long enough is never overtaken forever.
+    A run larger than the memory cap is admitted alone.
+    """
+
+    def __init__(self, pool, cpus=None, memory=None):
+        self.pool = pool
+        self.cpus = cpus or os.cpu_count() or 1
+        self.memory = memory if memory is not None else memory_limit()
+        self._lock = threading.Lock()
+        self._queue = []
+        self._running = []
+
+    def submit(self, script, args=(), cwd=None, callback=None, progress=None):
+        """Queues a script run; returns a Future of run_script's dict."""
+        args = list(args)
+        cost = estimate_cost(script, args[0]) if args and os.path.isfile(args[0]) else \
+            {"packets": 0, "seconds": BASE_SECONDS, "memory": BASE_MEMORY}
+        task = {"script": script, "args": args, "cwd": cwd, "progress": progress, "callback": callback,
+                "cost": cost, "queued": time.time(), "future": Future()}
+        with self._lock:
+            self._queue.append(task)
+        self._dispatch()
+        return task["future"]
+
+    def run(self, script, args=(), cwd=None):
+        return self.submit(script, args, cwd).result()
+
+    def _priority(self, task, now):
+        return task["cost"]["seconds"] - AGING * (now - task["queued"])
+
+    def _fits(self, task):
+        if not self._running:
+            return True
+        if len(self._running) >= self.cpus:
+            return False
+        if self.memory is None:
+            return True
+        used = sum(t["cost"]["memory"] for t in self._running)
+        return used + min(task["cost"]["memory"], self.memory) <= self.memory
+
+    def _dispatch(self):
+        with self._lock:
+            now = time.time()
+            self._queue.sort(key=lambda t: self._priority(t, now))
+            started = []
+            while self._queue and self._fits(self._queue[0]):
+                task = self._queue.pop(0)
+                task["started"] = now
+                self._running.append(task)
+                started.append(task)
+        for task in started:
+            self.pool.submit(task["script"], task["args"], task["cwd"], progress=task["progress"],
+                             callback=lambda result, task=task: self._done(task, result),
+                             error_callback=lambda error, task=task: self._done(task, error=error))
+
+    def _done(self, task, result=None, error=None):
+        with self._lock:
+            self._running.remove(task)
+        self._dispatch()
+        if error is not None:
+            # run_script itself failed in the worker; the caller still hears
+            # of the run, as a failed one, so its job can finish
+            if task["callback"] is not None:
+                task["callback"]({"script": os.path.basename(task["script"]), "code": -1, "error": str(error),
+                                  "files": [], "output": task["cwd"]})
+            task["future"].set_exception(error)
+            return
+        if task["callback"] is not None:
+            task["callback"](result)
+        task["future"].set_result(result)
+
+    def stats(self):
+        """Running and queued runs with their estimates, and the caps."""
+        with self._lock:
+            def describe(t):
+                return {"script": os.path.basename(t["script"]), "capture": os.path.basename(t["args"][0])
+                        if t["args"] else None, **t["cost"]}
+            return {"cpus": self.cpus, "memory": self.memory,
+                    "memory_reserved": sum(t["cost"]["memory"] for t in self._running),
+                    "running": [describe(t) for t in self._running],
+                    "queued": [describe(t) for t in self._queue]}
+
+    def close(self):
+        self.pool.close()
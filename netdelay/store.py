@@ -0,0 +1,455 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+STORE_DIR = "uploads"
+INDEX_NAME = ".index.jsonl"
+SESSION_DIR = ".sessions"           # resumable upload sessions, inside STORE_DIR
+CHUNK_SIZE = 1 << 20                # bytes read, hashed and written per step
+MAX_UPLOAD_CHUNK = 256 << 20        # largest chunk accepted in one request
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+# ------------------------------------------------------------------------
+# 1. Content-addressed upload store
+# ------------------------------------------------------------------------
+#
+# Captures are identified by the SHA-256 of their bytes. Each stored file
+# keeps its upload name in STORE_DIR (another upload of the same name with
+# different bytes gets "-<hash prefix>" added), so scripts and /jobs can
+# still open uploads/<name>. The index is a JSON-lines file in STORE_DIR,
+# one entry per line, later lines replacing earlier ones with the same
+# hash (or dropping it, with "removed"):
+#   {"sha256", "name", "size", "names" (every upload name seen),
+#    "stored" (epoch), "jobs" (analysis job ids, oldest first)}
+# It is read once, so looking up a hash or a name never lists the
+# directory.
+
+def _write_chunk(f, digest, chunk):
+    digest.update(chunk)
+    f.write(chunk)
+
+
+def file_hash(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, INDEX_NAME)
+        self._entries = {}      # sha256 -> entry
+        self._names = {}        # stored or uploaded name (lower case) -> sha256
+        self._lock = threading.Lock()
+        self._indexer = None    # thread hashing the files found at first start
+        self._load()
+
+    def _load(self):
+        lines = 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry.get("removed"):
+                            self._forget(entry)
+                        else:
+                            self._remember(entry)
+                        lines += 1
+            if lines > 2 * len(self._entries):
+                self._rewrite()
+        else:
+            # First start with an existing uploads/ directory: index it once,
+            # hashing in the background so startup does not wait on it
+            self._rewrite()
+            names = [name for name in sorted(os.listdir(self.directory))
+                     if not name.startswith(".") and os.path.isfile(os.path.join(self.directory, name))]
+            if names:
+                self._indexer = threading.Thread(target=self._index_existing, args=(names,), daemon=True)
+                self._indexer.start()
+
+    def _index_existing(self, names):
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                sha256 = file_hash(path)
+                entry = {"sha256": sha256, "name": name, "size": os.path.getsize(path),
+                         "names": [name], "stored": os.path.getmtime(path), "jobs": []}
+            except OSError:
+                continue
+            with self._lock:
+                if sha256 not in self._entries:
+                    self._remember(entry)
+                    self._append(entry)
+
+    def indexed(self, timeout=None):
+        """
+        Waits up to timeout seconds for the files found in the directory at
+        first start to be hashed into the index (until then find and
+        find_name do not know them). Returns True once they are.
+        """
+        if self._indexer is not None:
+            self._indexer.join(timeout)
+            return not self._indexer.is_alive()
+        return True
+
+    def _remember(self, entry):
+        self._entries[entry["sha256"]] = entry
+        self._names[entry["name"].lower()] = entry["sha256"]
+        for name in entry["names"]:
+            self._names.setdefault(Path(name).name.lower(), entry["sha256"])
+
+    def _forget(self, entry):
+        sha256 = entry["sha256"]
+        self._entries.pop(sha256, None)
+        for name in [entry["name"]] + entry["names"]:
+            if self._names.get(Path(name).name.lower()) == sha256:
+                del self._names[Path(name).name.lower()]
+
+    def _append(self, entry):
+        with open(self._index_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _rewrite(self):
+        temp = self._index_path + ".tmp"
+        with open(temp, "w") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(temp, self._index_path)
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry["name"])
+
+    def _present(self, sha256):
+        entry = self._entries.get(sha256)
+        if entry is not None and not os.path.isfile(self.path(entry)):
+            # Removed from disk behind the store's back
+            self._forget(entry)
+            self._append({**entry, "removed": True})
+            entry = None
+        return entry
+
+    def find(self, sha256):
+        """The entry for a content hash, or None."""
+        with self._lock:
+            entry = self._present(sha256)
+            return json.loads(json.dumps(entry)) if entry else None
+
+    def find_name(self, name):
+        """
+        The entry stored or uploaded under a file name (case insensitive),
+        or None.
+        """
+        with self._lock:
+            sha256 = self._names.get(Path(name).name.lower())
+            entry = self._present(sha256) if sha256 else None
+            return json.loads(json.dumps(entry)) if entry else None
+
+    def _free_name(self, filename, sha256):
+        name = Path(filename or "capture").name or "capture"
+        if name.lower() in self._names or os.path.exists(os.path.join(self.directory, name)):
+            stem, suffix = os.path.splitext(name)
+            name = f"{stem}-{sha256[:12]}{suffix}"
+        return name
+
+    def add(self, temp_path, sha256, size, filename):
+        """
+        Moves a fully written temporary file (in the store directory) into
+        the store, unless the same bytes are already there. Returns
+        (entry, created).
+        """
+        with self._lock:
+            entry = self._present(sha256)
+            if entry is not None:
+                if filename and filename not in entry["names"]:
+                    entry["names"].append(filename)
+                    self._names.setdefault(Path(filename).name.lower(), sha256)
+                    self._append(entry)
+                return json.loads(json.dumps(entry)), False
+            name = self._free_name(filename, sha256)
+            os.replace(temp_path, os.path.join(self.directory, name))
+            entry = {"sha256": sha256, "name": name, "size": size, "names": [filename or name],
+                     "stored": time.time(), "jobs": []}
+            self._remember(entry)
+            self._append(entry)
+            return json.loads(json.dumps(entry)), True
+
+    async def save(self, upload, chunk_size=CHUNK_SIZE):
+        """
+        Streams an UploadFile into the store, hashing as it writes. Reads
+        are awaited and each chunk is hashed and written in a worker
+        thread, so the event loop is never blocked on disk. Returns
+        (entry, created); created is False for a byte-identical re-upload,
+        whose copy is discarded.
+        """
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix=".upload-")
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await upload.read(chunk_size)
+                    if not chunk:
+                        break
+                    await asyncio.to_thread(_write_chunk, f, digest, chunk)
+                    size += len(chunk)
+            return await asyncio.to_thread(self.add, temp, digest.hexdigest(), size, upload.filename)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def add_job(self, sha256, job_id):
+        """Records an analysis job run on a stored capture."""
+        with self._lock:
+            entry = self._entries.get(sha256)
+            if entry is not None and job_id not in entry["jobs"]:
+                entry["jobs"].append(job_id)
+                self._append(entry)
+
+# ------------------------------------------------------------------------
+# 2. Resumable upload sessions
+# ------------------------------------------------------------------------
+#
+# A multi-GB capture is sent as chunks, each PUT at its byte offset with the
+# SHA-256 of its bytes. Chunks are written straight into their place in
+# <STORE_DIR>/.sessions/<id>.part, so a dropped connection only loses the
+# chunk in flight, chunks may arrive in any order or in parallel, and
+# completing the upload renames the part file into the store instead of
+# copying it. <id>.json keeps the session:
+#   {"id", "filename", "size", "chunk_size", "received" ([start, end)
+#    byte ranges, merged), "created"}
+# The bytes received from offset 0 without a gap can be scanned (see
+# pcapio.scan_records(limit=...)) before the upload finishes.
+
+def _merge(ranges, start, end):
+    merged = []
+    for low, high in sorted(ranges + [[start, end]]):
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+def _missing(ranges, size):
+    gaps, pos = [], 0
+    for low, high in ranges:
+        if low > pos:
+            gaps.append([pos, low])
+        pos = max(pos, high)
+    if pos < size:
+        gaps.append([pos, size])
+    return gaps
+
+
+def _write_at(fd, offset, data):
+    while data:
+        written = os.pwrite(fd, data, offset)
+        offset, data = offset + written, data[written:]
+
+
+class UploadSessions:
+    """Resumable chunked uploads into an UploadStore."""
+
+    def __init__(self, store):
+        self.store = store
+        self.directory = os.path.join(store.directory, SESSION_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hashing = {}      # id -> (running SHA-256, bytes hashed) of the gap-free prefix
+        self._writing = {}      # id -> {offset: end written so far} of the chunks in flight
+        self._completing = {}   # id -> lock held while that upload is completed
+        self._completed = {}    # id -> SHA-256 of the stored upload
+
+    def _path(self, session_id, suffix):
+        if not _SESSION_ID.fullmatch(session_id or ""):
+            raise ValueError(f"Invalid upload session id: {session_id!r}")
+        return os.path.join(self.directory, session_id + suffix)
+
+    def _load(self, session_id):
+        try:
+            with open(self._path(session_id, ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No such upload session: {session_id}") from None
+
+    def _save(self, session):
+        path = self._path(session["id"], ".json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(session, f)
+        os.replace(path + ".tmp", path)
+
+    def _state(self, session):
+        received = session["received"]
+        prefix = received[0][1] if received and received[0][0] == 0 else 0
+        return {**session, "offset": prefix, "missing": _missing(received, session["size"]),
+                "complete": prefix == session["size"]}
+
+    def open(self, filename, size, chunk_size=64 << 20):
+        """Starts an upload of size bytes. Returns the session state."""
+        if size <= 0:
+            raise ValueError("size must be positive")
+        session = {"id": uuid.uuid4().hex, "filename": Path(filename or "capture").name, "size": int(size),
+                   "chunk_size": int(min(chunk_size, MAX_UPLOAD_CHUNK)), "received": [], "created": time.time()}
+        open(self._path(session["id"], ".part"), "wb").close()
+        self._save(session)
+        return self._state(session)
+
+    def state(self, session_id):
+        """
+        The session plus "offset" (bytes received from 0 without a gap, where
+        a sequential client resumes), "missing" byte ranges and "complete".
+        """
+        with self._lock:
+            return self._state(self._load(session_id))
+
+    async def write(self, session_id, offset, stream, sha256=None):
+        """
+        Writes one chunk, read from an async byte stream, at offset. With
+        sha256 the chunk is checked and, on a mismatch, not counted as
+        received (raises ValueError; the client resends it). Returns the
+        session state.
+        """
+        await asyncio.to_thread(self._start_chunk, session_id, offset)
+        digest, length, pending = hashlib.sha256(), 0, bytearray()
+
+        def flush(at, data):
+            self._extend_chunk(session_id, offset, at + len(data))
+            digest.update(data)
+            _write_at(fd, at, data)
+
+        try:
+            fd = os.open(self._path(session_id, ".part"), os.O_WRONLY)
+        except OSError:
+            self._end_chunk(session_id, offset)
+            raise
+        try:
+            # Request bodies arrive in small pieces; write them CHUNK_SIZE at a time
+            async for data in stream:
+                if length + len(pending) + len(data) > MAX_UPLOAD_CHUNK:
+                    raise ValueError(f"The chunk at {offset} is larger than {MAX_UPLOAD_CHUNK} bytes")
+                pending += data
+                if len(pending) >= CHUNK_SIZE:
+                    await asyncio.to_thread(flush, offset + length, bytes(pending))
+                    length, pending = length + len(pending), bytearray()
+            if pending:
+                await asyncio.to_thread(flush, offset + length, bytes(pending))
+                length += len(pending)
+            if not length:
+                raise ValueError("Empty chunk")
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise ValueError(f"Checksum mismatch for the chunk at {offset}; send it again")
+            return await asyncio.to_thread(self._received, session_id, offset, offset + length)
+        finally:
+            os.close(fd)
+            self._end_chunk(session_id, offset)
+
+    def _start_chunk(self, session_id, offset):
+        """
+        Claims offset for one chunk: it must lie in a gap, and not in a chunk
+        still being written (checked under the lock, so two requests for
+        one offset cannot both pass).
+        """
+        with self._lock:
+            session = self._state(self._load(session_id))
+            if offset < 0 or offset >= session["size"]:
+                raise ValueError(f"Offset {offset} is outside the upload (0-{session['size'] - 1})")
+            # A chunk may only fill a gap: received bytes are never rewritten
+            if not any(low <= offset < high for low, high in session["missing"]):
+                raise ValueError(f"The chunk at {offset} was already received")
+            writing = self._writing.setdefault(session_id, {})
+            if any(start <= offset < max(end, start + 1) for start, end in writing.items()):
+                raise ValueError(f"The chunk at {offset} is already being received")
+            writing[offset] = offset
+
+    def _extend_chunk(self, session_id, offset, end):
+        """Records that the chunk at offset reaches end, unless that runs into received bytes or another chunk."""
+        with self._lock:
+            session = self._load(session_id)
+            writing = self._writing[session_id]
+            bounds = [low for low, _ in session["received"] if low > offset]
+            bounds += [start for start in writing if start > offset]
+            if end > min(bounds, default=session["size"]):
+                raise ValueError(f"The chunk at {offset} runs past the gap it fills")
+            writing[offset] = end
+
+    def _end_chunk(self, session_id, offset):
+        with self._lock:
+            writing = self._writing.get(session_id, {})
+            writing.pop(offset, None)
+            if not writing:
+                self._writing.pop(session_id, None)
+
+    def _received(self, session_id, start, end):
+        with self._lock:
+            session = self._load(session_id)
+            session["received"] = _merge(session["received"], start, end)
+            self._save(session)
+            state = self._state(session)
+        self._hash_prefix(session_id, state["offset"])
+        return state
+
+    def _hash_prefix(self, session_id, prefix):
+        # Keeps the whole-file hash up to date over the gap-free prefix, so
+        # completing the upload does not re-read it
+        with self._lock:
+            digest, hashed = self._hashing.pop(session_id, (hashlib.sha256(), 0))
+        if prefix > hashed:
+            with open(self._path(session_id, ".part"), "rb") as f:
+                f.seek(hashed)
+                while hashed < prefix:
+                    chunk = f.read(min(CHUNK_SIZE, prefix - hashed))
+                    digest.update(chunk)
+                    hashed += len(chunk)
+        with self._lock:
+            current = self._hashing.get(session_id)
+            if current is None or current[1] < hashed:
+                self._hashing[session_id] = (digest, hashed)
+
+    def received_path(self, session_id):
+        """(part file path, gap-free bytes) for scanning an upload in progress."""
+        state = self.state(session_id)
+        return self._path(session_id, ".part"), state["offset"]
+
+    def complete(self, session_id):
+        """
+        Moves a fully received upload into the store (a rename, no copy).
+        Returns (entry, created) as UploadStore.add; a repeated request for
+        a completed upload gets its stored entry again. Raises ValueError
+        while bytes are missing.
+        """
+        self._path(session_id, ".json")     # rejects bad ids before they get a lock
+        with self._lock:
+            lock = self._completing.setdefault(session_id, threading.Lock())
+        with lock:
+            with self._lock:
+                sha256 = self._completed.get(session_id)
+            entry = self.store.find(sha256) if sha256 else None
+            if entry is not None:
+                return entry, False
+            state = self.state(session_id)
+            if not state["complete"]:
+                raise ValueError(f"Upload incomplete; missing byte ranges {state['missing']}")
+            self._hash_prefix(session_id, state["size"])
+            with self._lock:
+                digest, _ = self._hashing.pop(session_id)
+            part = self._path(session_id, ".part")
+            result = self.store.add(part, digest.hexdigest(), state["size"], state["filename"])
+            with self._lock:
+                self._completed[session_id] = result[0]["sha256"]
+            if os.path.exists(part):
+                os.remove(part)
+            os.remove(self._path(session_id, ".json"))
+            return result
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+
+from netdelay import pcapio
+
+# Link-layer header types (https://www.tcpdump.org/linktypes.html) by number
+LINK_TYPES = {0: "NULL", 1: "ETHERNET", 101: "RAW", 105: "IEEE802_11", 108: "LOOP", 113: "LINUX_SLL",
+              127: "IEEE802_11_RADIOTAP", 228: "IPV4", 229: "IPV6", 276: "LINUX_SLL2"}
+
+# ------------------------------------------------------------------------
+# Capture summaries
+# ------------------------------------------------------------------------
+#
+# The shape of a capture from its record headers alone (pcapio.header_totals),
+# without decoding a packet: computed once per file and kept in memory and
+# next to the capture as .<capture name>.summary.json (hidden, like the
+# time index), so it survives restarts.
+
+_summaries = {}     # (path, size, mtime) -> summary
+_lock = threading.Lock()
+
+
+def summary_path(capture):
+    folder, name = os.path.split(os.path.abspath(capture))
+    return os.path.join(folder, f".{name}.summary.json")
+
+
+def _identity(capture):
+    stat = os.stat(capture)
+    return os.path.abspath(capture), stat.st_size, stat.st_mtime_ns
+
+
+def cached_summary(capture):
+    """The capture's summary if it has been computed, else None (never scans)."""
+    ident = _identity(capture)
+    with _lock:
+        if ident in _summaries:
+            return _summaries[ident]
+    try:
+        with open(summary_path(capture)) as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if [summary.get("total_bytes"), summary.get("mtime_ns")] != list(ident[1:]):
+        return None
+    with _lock:
+        _summaries[ident] = summary
+    return summary
+
+
+def capture_summary(capture):
+    """
+    Packet count and shape of a capture, from one walk over its record
+    headers. Returns a dict with:
+      "format", "packets", "total_bytes" (file size), "wire_bytes" and
+      "captured_bytes" (packet bytes on the wire / in the file),
+      "first", "last" (epoch seconds), "duration" (seconds),
+      "link_type" / "linktype" and "snaplen" of the first interface,
+      "interfaces": [{"linktype", "link_type", "snaplen"}],
+      "average_bps" (wire bits per second), "average_pps", "mtime_ns"
+    Raises ValueError for files that are not captures.
+    """
+    summary = cached_summary(capture)
+    if summary is not None:
+        return summary
+    ident = _identity(capture)
+    totals = pcapio.header_totals(capture)
+    interfaces = [{**i, "link_type": LINK_TYPES.get(i["linktype"], f"LINKTYPE_{i['linktype']}")}
+                  for i in totals["interfaces"]]
+    duration = totals["last"] - totals["first"] if totals["packets"] and totals["first"] is not None else 0.0
+    summary = {
+        "format": totals["format"],
+        "packets": totals["packets"],
+        "total_bytes": ident[1],
+        "wire_bytes": totals["wire_bytes"],
+        "captured_bytes": totals["captured_bytes"],
+        "first": totals["first"],
+        "last": totals["last"],
+        "duration": duration,
+        "linktype": interfaces[0]["linktype"] if interfaces else None,
+        "link_type": interfaces[0]["link_type"] if interfaces else None,
+        "snaplen": interfaces[0]["snaplen"] if interfaces else None,
+        "interfaces": interfaces,
+        "average_bps": totals["wire_bytes"] * 8 / duration if duration > 0 else None,
+        "average_pps": totals["packets"] / duration if duration > 0 else None,
+        "mtime_ns": ident[2],
+    }
+    with _lock:
+        _summaries[ident] = summary
+    try:
+        path = summary_path(capture)
+        with open(path + ".tmp", "w") as f:
+            json.dump(summary, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+    return summary
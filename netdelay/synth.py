@@ -0,0 +1,248 @@
+import struct
+
+import numpy as np
+
+from netdelay.packets import IPPROTO_TCP, IPPROTO_UDP, TCP_ACK
+
+START_TIME = 1_700_000_000      # epoch seconds of the first conversation
+SEGMENT_GAP = 0.01              # mean seconds between data segments of a conversation
+MIN_RTO = 0.2                   # retransmission timeout floor (Linux TCP_RTO_MIN)
+SNAPLEN = 96                    # snaplen in the file header; only the 54 header bytes are written
+CHUNK_PACKETS = 1 << 20         # records written per block of the output file
+TCP_PSH = 0x08
+
+# Server port of each protocol the generator can mix in (see protocols.py)
+PROTOCOL_PORTS = {"TLS/SSL": (IPPROTO_TCP, 443), "HTTP": (IPPROTO_TCP, 80), "MQTT": (IPPROTO_TCP, 1883),
+                  "MQTT/TLS": (IPPROTO_TCP, 8883), "DNS": (IPPROTO_UDP, 53)}
+
+DEFAULTS = {
+    "conversations": 200,
+    "rtt": ("lognormal", 0.05, 0.5),
+    "loss": 0.01,
+    "retransmission": 0.01,
+    "protocols": {"TLS/SSL": 0.6, "HTTP": 0.2, "MQTT": 0.1, "DNS": 0.1},
+    "format": "pcap",
+    "seed": 0,
+}
+
+# ------------------------------------------------------------------------
+# 1. Synthetic traffic
+# ------------------------------------------------------------------------
+#
+# Deterministic captures of known shape for tests and benchmarks: the same
+# parameters and seed always give the same bytes. Each conversation is one
+# client and one server on a protocol drawn from the mix. TCP servers send
+# data segments SEGMENT_GAP apart on average, each acknowledged by the
+# client one RTT later; with probability "retransmission" a segment is
+# resent after the RTO instead, and with probability "loss" it is also
+# missing from the capture (dropped before the capture point), so the
+# analyses see a gap and a later retransmission. UDP conversations are
+# DNS query / response pairs one RTT apart.
+
+def rtt_samples(rng, spec, size):
+    """
+    Draws RTTs in seconds from spec, one of ("constant", value),
+    ("uniform", low, high), ("exponential", mean) or
+    ("lognormal", median, sigma).
+    """
+    kind, *args = spec
+    if kind == "constant":
+        return np.full(size, float(args[0]))
+    if kind == "uniform":
+        return rng.uniform(args[0], args[1], size)
+    if kind == "exponential":
+        return rng.exponential(args[0], size)
+    if kind == "lognormal":
+        return rng.lognormal(np.log(args[0]), args[1], size)
+    raise ValueError(f"Unknown RTT distribution: {kind!r}")
+
+
+def _cumulative_acks(sent, seq, end, resent, rto):
+    """
+    Acknowledgement number of the ACK of every segment (unwrapped): its end,
+    or the start of the earliest resent segment whose retransmission was
+    still to come when it was sent (duplicate ACKs of the hole).
+    """
+    conversations, per = sent.shape
+    span = float(sent.max() - sent.min() + rto.max()) + 1
+    key = (sent - sent.min()) + np.arange(conversations)[:, None] * span
+    rows, cols = np.nonzero(resent)
+    holes = np.searchsorted(key.ravel(), key[rows, cols] + rto[rows, cols])
+    length = np.maximum(np.minimum(holes - rows * per, per) - cols - 1, 0)
+    owner = np.repeat(np.arange(len(rows)), length)
+    within = np.arange(len(owner)) - np.repeat(np.cumsum(length) - length, length)
+    ack = end.copy()
+    np.minimum.at(ack.reshape(-1), rows[owner] * per + cols[owner] + 1 + within, seq[rows, cols][owner])
+    return ack
+
+
+def synthetic_packets(packets, conversations=DEFAULTS["conversations"], rtt=DEFAULTS["rtt"],
+                      loss=DEFAULTS["loss"], retransmission=DEFAULTS["retransmission"],
+                      protocols=None, seed=DEFAULTS["seed"]):
+    """
+    Columns of about `packets` synthetic packets in time order:
+      time, src, dst (IPv4 as uint32), proto, sport, dport, seq, ack,
+      tcp_flags, payload_len
+    plus "expected": the counts the generator put in (segments, lost,
+    retransmitted, exchanges), before the list is cut to `packets`.
+    """
+    rng = np.random.default_rng(seed)
+    mix = protocols or DEFAULTS["protocols"]
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=np.float64)
+    conv_protocol = rng.choice(len(names), size=conversations, p=weights / weights.sum())
+    conv_proto = np.array([PROTOCOL_PORTS[name][0] for name in names], dtype=np.uint8)[conv_protocol]
+    conv_port = np.array([PROTOCOL_PORTS[name][1] for name in names], dtype=np.uint16)[conv_protocol]
+    client = (np.uint32(10 << 24) + rng.integers(1, 1 << 16, conversations)).astype(np.uint32)
+    server = (np.uint32(192 << 24 | 168 << 16) + rng.integers(1, 1 << 16, conversations)).astype(np.uint32)
+    client_port = rng.integers(49152, 65536, conversations).astype(np.uint16)
+
+    # Units per conversation: a TCP segment (two or three packets) or a DNS exchange (two).
+    per = max(int(np.ceil(packets / 2 / conversations * (1 + loss + retransmission))), 1)
+    shape = (conversations, per)
+    start = START_TIME + rng.uniform(0, SEGMENT_GAP * per / 10, conversations)
+    sent = start[:, None] + np.cumsum(rng.exponential(SEGMENT_GAP, shape), axis=1)
+    delay = rtt_samples(rng, rtt, shape)
+    payload = rng.integers(64, 1461, shape)
+    isn = rng.integers(0, 1 << 32, conversations)
+    seq = isn[:, None] + np.cumsum(payload, axis=1) - payload
+    draw = rng.random(shape)
+    tcp = (conv_proto == IPPROTO_TCP)[:, None]
+    lost = tcp & (draw < loss)
+    resent = tcp & (draw < loss + retransmission)
+    rto = np.maximum(MIN_RTO, 3 * delay)
+    ack = _cumulative_acks(sent, seq, seq + payload, resent, rto)
+
+    conv = np.broadcast_to(np.arange(conversations, dtype=np.int32)[:, None], shape)
+    udp = ~np.broadcast_to(tcp, shape)
+    parts = []
+
+    def emit(mask, time, forward, seq_no, ack_no, flags, length):
+        """Packets for the units in mask; forward = server to client."""
+        c = conv[mask]
+        ends = (server[c], client[c]) if forward else (client[c], server[c])
+        ports = (conv_port[c], client_port[c]) if forward else (client_port[c], conv_port[c])
+        parts.append({
+            "time": time[mask], "conv": c, "src": ends[0], "dst": ends[1], "sport": ports[0], "dport": ports[1],
+            "seq": seq_no[mask].astype(np.uint32), "ack": ack_no[mask].astype(np.uint32),
+            "tcp_flags": np.full(len(c), flags, np.uint16), "payload_len": length[mask].astype(np.int32),
+        })
+
+    zero = np.zeros(shape, dtype=np.int64)
+    client_isn = np.broadcast_to(rng.integers(0, 1 << 32, conversations)[:, None], shape)
+    emit(tcp & ~lost, sent, True, seq % (1 << 32), client_isn, TCP_ACK | TCP_PSH, payload)
+    emit(resent, sent + rto, True, seq % (1 << 32), client_isn, TCP_ACK | TCP_PSH, payload)
+    emit(np.broadcast_to(tcp, shape), sent + np.where(resent, rto, 0) + delay, False, client_isn,
+         ack % (1 << 32), TCP_ACK, zero)
+    query_id = rng.integers(0, 1 << 16, shape)
+    emit(udp, sent, False, query_id, zero, 0, np.minimum(payload, 64))
+    emit(udp, sent + delay, True, query_id, zero, 0, np.minimum(payload, 512))
+
+    columns = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    order = np.argsort(columns["time"], kind="stable")[:packets]
+    table = {k: v[order] for k, v in columns.items()}
+    table["proto"] = conv_proto[table.pop("conv")]
+    table["expected"] = {"segments": int(np.count_nonzero(np.broadcast_to(tcp, shape))),
+                         "lost": int(lost.sum()), "retransmitted": int(resent.sum()),
+                         "exchanges": int(udp.sum())}
+    return table
+
+# ------------------------------------------------------------------------
+# 2. Capture files
+# ------------------------------------------------------------------------
+#
+# Frames are Ethernet + IPv4 + TCP/UDP with zeroed checksums. IP lengths
+# give the full payload but only the headers are captured, so a file
+# is about 70 (pcap) or 90 (pcapng) bytes per packet. Records are laid out
+# CHUNK_PACKETS at a time as rows of one byte matrix.
+
+def _put(rows, col, values, dtype):
+    """Writes one field of every row at byte column col."""
+    values = np.ascontiguousarray(values, dtype=dtype)
+    rows[:, col:col + values.itemsize] = values.view(np.uint8).reshape(-1, values.itemsize)
+
+
+def _frames(chunk, snaplen):
+    """(header bytes, captured lengths, wire lengths) of the frames of chunk, one row per packet."""
+    n = len(chunk["time"])
+    tcp = chunk["proto"] == IPPROTO_TCP
+    payload = chunk["payload_len"].astype(np.int64)
+    wire = 34 + np.where(tcp, 20, 8) + payload
+    rows = np.zeros((n, 54), dtype=np.uint8)
+    rows[:, 0:6] = (0x02, 0, 0, 0, 0, 0x02)
+    rows[:, 6:12] = (0x02, 0, 0, 0, 0, 0x01)
+    rows[:, 12:14] = (0x08, 0x00)
+    rows[:, 14] = 0x45
+    _put(rows, 16, wire - 14, ">u2")
+    rows[:, 20] = 0x40
+    rows[:, 22] = 64
+    rows[:, 23] = chunk["proto"]
+    _put(rows, 26, chunk["src"], ">u4")
+    _put(rows, 30, chunk["dst"], ">u4")
+    _put(rows, 34, chunk["sport"], ">u2")
+    _put(rows, 36, chunk["dport"], ">u2")
+    # TCP: seq, ack, data offset + flags, window. UDP: length, checksum, then
+    # the DNS header: id (kept in the seq column), flags, one question.
+    seq = chunk["seq"].astype(np.int64)
+    query = chunk["dport"] == 53
+    _put(rows, 38, np.where(tcp, seq, (8 + payload) << 16), ">u4")
+    _put(rows, 42, np.where(tcp, chunk["ack"], seq << 16 | np.where(query, 0x0100, 0x8180)), ">u4")
+    _put(rows, 46, np.where(tcp, 5 << 12 | chunk["tcp_flags"].astype(np.int64), 1), ">u2")
+    _put(rows, 48, np.where(tcp, 0xFFFF, np.where(query, 0, 1)), ">u2")
+    return rows, np.minimum(np.minimum(wire, 54), snaplen), wire
+
+
+def _records(chunk, fmt, snaplen):
+    """The file bytes of the records of chunk."""
+    rows, caplen, wire = _frames(chunk, snaplen)
+    micros = np.round(chunk["time"] * 1e6).astype(np.int64)
+    if fmt == "pcap":
+        head = np.zeros((len(rows), 16), dtype=np.uint8)
+        _put(head, 0, micros // 1_000_000, "<u4")
+        _put(head, 4, micros % 1_000_000, "<u4")
+        _put(head, 8, caplen, "<u4")
+        _put(head, 12, wire, "<u4")
+        full = np.hstack([head, rows])
+        size = 16 + caplen
+    else:
+        padded = (caplen + 3) // 4 * 4
+        size = 32 + padded
+        head = np.zeros((len(rows), 28), dtype=np.uint8)
+        _put(head, 0, np.full(len(rows), 6), "<u4")
+        _put(head, 4, size, "<u4")
+        _put(head, 12, micros >> 32, "<u4")
+        _put(head, 16, micros & 0xFFFFFFFF, "<u4")
+        _put(head, 20, caplen, "<u4")
+        _put(head, 24, wire, "<u4")
+        full = np.hstack([head, rows, np.zeros((len(rows), 8), dtype=np.uint8)])
+        # The trailing block length goes right after the padded packet data.
+        trailer = np.ascontiguousarray(size, dtype="<u4").view(np.uint8).reshape(-1, 4)
+        full[np.arange(len(rows))[:, None], 28 + padded[:, None] + np.arange(4)] = trailer
+    keep = np.arange(full.shape[1]) < size[:, None]
+    return full[keep].tobytes()
+
+
+def file_header(fmt, snaplen=SNAPLEN):
+    """The bytes before the first record: pcap global header, or pcapng SHB + IDB."""
+    if fmt == "pcap":
+        return struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, snaplen, 1)
+    if fmt == "pcapng":
+        section = struct.pack("<IIIHHqI", 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28)
+        interface = struct.pack("<IIHHII", 1, 20, 1, 0, snaplen, 20)
+        return section + interface
+    raise ValueError(f"Unknown capture format: {fmt!r}")
+
+
+def write_capture(path, packets, fmt=DEFAULTS["format"], snaplen=SNAPLEN, **params):
+    """
+    Writes a synthetic capture of `packets` packets (see synthetic_packets
+    for params) as pcap or pcapng. Returns the generator's "expected" counts.
+    """
+    table = synthetic_packets(packets, **params)
+    expected = table.pop("expected")
+    with open(path, "wb") as f:
+        f.write(file_header(fmt, snaplen))
+        for first in range(0, len(table["time"]), CHUNK_PACKETS):
+            chunk = {k: v[first:first + CHUNK_PACKETS] for k, v in table.items()}
+            f.write(_records(chunk, fmt, snaplen))
+    return expected
@@ -0,0 +1,180 @@
+import json
+import os
+import re
+from functools import lru_cache
+from urllib.parse import unquote
+
+import numpy as np
+
+TABLE_DIR = "analysis_tables"     # inside each output folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+_TABLE_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")   # not "." or ".."
+_FOLDER = re.compile(r"[A-Za-z0-9_@+-][A-Za-z0-9_.@+-]*")  # an output folder name (user e-mail, upload)
+
+# ------------------------------------------------------------------------
+# 1. Columnar table files
+# ------------------------------------------------------------------------
+#
+# A table is a directory holding one .npy file per column plus meta.json.
+# Numeric columns are stored as float64 (missing values as NaN); text
+# columns as int32 codes into a sorted array of categories, so filtering
+# and sorting never touch Python strings row by row.
+
+def table_path(table_id, directory=TABLE_DIR):
+    if not _TABLE_ID.fullmatch(table_id or ""):
+        raise ValueError(f"Invalid table id: {table_id!r}")
+    return os.path.join(directory, table_id)
+
+
+def output_table_dir(output, directory=TABLE_DIR, root=PROJECT_DIR):
+    """
+    The table directory of the output folder a page was written to. output
+    is the URL path the page was served from (its base URL, e.g.
+    "/plots/<user>/<upload>/") under root, the project directory server.js
+    serves; scripts write their tables into that folder, so every upload's
+    and job's pages read their own tables. "" or "/" is root itself.
+    """
+    parts = [p for p in unquote(output or "").split("/") if p]
+    if not all(_FOLDER.fullmatch(p) for p in parts):
+        raise ValueError(f"Invalid output folder: {output!r}")
+    return os.path.join(root, *parts, directory)
+
+
+def _is_numeric(values):
+    return all(v is None or isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool)
+               for v in values)
+
+
+def write_table(table_id, data, directory=TABLE_DIR):
+    """
+    Stores a dict of equal-length columns (lists or arrays) as a queryable
+    table. Returns the number of rows.
+    """
+    path = table_path(table_id, directory)
+    os.makedirs(path, exist_ok=True)
+    columns = list(data)
+    kinds = {}
+    n = 0
+    for c in columns:
+        values = data[c]
+        if isinstance(values, np.ndarray) and values.dtype.kind in "biuf":
+            numeric = True
+        else:
+            values = list(values)
+            numeric = _is_numeric(values)
+        n = len(values)
+        if numeric:
+            column = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64) \
+                if isinstance(values, list) else values.astype(np.float64)
+            np.save(os.path.join(path, f"{c}.npy"), column)
+            kinds[c] = "num"
+        else:
+            categories, codes = np.unique(np.asarray(["" if v is None else str(v) for v in values]),
+                                          return_inverse=True)
+            np.save(os.path.join(path, f"{c}.npy"), codes.reshape(-1).astype(np.int32))
+            np.save(os.path.join(path, f"{c}.categories.npy"), categories.astype(str))
+            kinds[c] = "cat"
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "kinds": kinds, "rows": n}, f)
+    return n
+
+
+@lru_cache(maxsize=64)
+def _load(path, mtime):
+    """Memory-maps a table; cached per directory and modification time."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    categories = {}
+    for c in meta["columns"]:
+        columns[c] = np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r")
+        if meta["kinds"][c] == "cat":
+            categories[c] = np.load(os.path.join(path, f"{c}.categories.npy"))
+    return meta, columns, categories
+
+
+def read_table(table_id, directory=TABLE_DIR):
+    """Returns (meta, columns, categories) for a stored table."""
+    path = table_path(table_id, directory)
+    meta_file = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_file):
+        raise FileNotFoundError(f"No such table: {table_id}")
+    return _load(path, os.path.getmtime(meta_file))
+
+# ------------------------------------------------------------------------
+# 2. Queries: filter, sort, page
+# ------------------------------------------------------------------------
+
+@lru_cache(maxsize=64)
+def _sort_order(path, mtime, column):
+    """Ascending row order for a column, NaN last. Text columns sort by code,
+    which is alphabetical because categories are stored sorted."""
+    _, columns, _ = _load(path, mtime)
+    return np.argsort(np.asarray(columns[column]), kind="stable")
+
+
+def _json_values(values):
+    if values.dtype.kind == "f":
+        return [None if np.isnan(v) else float(v) for v in values]
+    return values.tolist()
+
+
+def query_table(table_id, offset=0, limit=PAGE_SIZE, sort=None, desc=False, q=None,
+                filter_column=None, filter_value=None, directory=TABLE_DIR):
+    """
+    One page of a stored table:
+      - q keeps rows where any text column contains q (case-insensitive)
+      - filter_column / filter_value keep rows whose column equals the value
+      - sort orders by a column (descending if desc), NaN last
+    Returns {"total": matching rows, "offset", "limit", "columns", "rows": {column: values}}.
+    """
+    meta, columns, categories = read_table(table_id, directory)
+    path = table_path(table_id, directory)
+    mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    n = meta["rows"]
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    for c in (sort, filter_column):
+        if c is not None and c not in columns:
+            raise ValueError(f"Unknown column: {c}")
+
+    mask = None
+    if q:
+        needle = q.lower()
+        mask = np.zeros(n, dtype=bool)
+        for c, cats in categories.items():
+            hits = np.flatnonzero(np.char.find(np.char.lower(cats), needle) >= 0)
+            if len(hits):
+                mask |= np.isin(columns[c], hits)
+    if filter_column is not None and filter_value is not None:
+        if filter_column in categories:
+            cats = categories[filter_column]
+            pos = np.searchsorted(cats, filter_value)
+            code = pos if pos < len(cats) and cats[pos] == filter_value else -1
+            keep = np.asarray(columns[filter_column]) == code
+        else:
+            keep = np.asarray(columns[filter_column]) == float(filter_value)
+        mask = keep if mask is None else mask & keep
+
+    if sort is not None:
+        order = _sort_order(path, mtime, sort)
+        if desc:
+            # reverse, but keep NaN rows at the end
+            values = np.asarray(columns[sort])[order]
+            missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(order), dtype=bool)
+            order = np.concatenate([order[~missing][::-1], order[missing]])
+        if mask is not None:
+            order = order[mask[order]]
+    else:
+        order = np.flatnonzero(mask) if mask is not None else None
+
+    total = len(order) if order is not None else n
+    rows_idx = order[offset:offset + limit] if order is not None else np.arange(offset, min(offset + limit, n))
+    rows = {}
+    for c in meta["columns"]:
+        values = np.asarray(columns[c])[rows_idx]
+        rows[c] = categories[c][values].tolist() if c in categories else _json_values(values)
+    return {"total": int(total), "offset": offset, "limit": limit, "columns": meta["columns"], "rows": rows}
@@ -0,0 +1,113 @@
+import numpy as np
+
+from netdelay.packets import (
+    IPPROTO_TCP, SEQ_MODULO, TCP_ACK, flow_index, segmented_cummax, unwrap_sequence,
+)
+
+# ------------------------------------------------------------------------
+# Per-direction sequence / acknowledgement state
+# ------------------------------------------------------------------------
+
+def _before(inclusive, sorted_dirs):
+    """Turns a running maximum into the value just before each event."""
+    before = np.r_[0, inclusive[:-1]]
+    if len(before):
+        before[np.r_[True, sorted_dirs[1:] != sorted_dirs[:-1]]] = 0
+    return before
+
+
+def sequence_state(table):
+    """
+    Replays every TCP connection direction in time order and reports, for each
+    data segment and each ACK, the sender's and receiver's high-water marks
+    just before that packet. Sequence numbers are relative to the first data
+    segment of the direction, so they start at 0, and are unwrapped along
+    the direction so they keep counting past 4 GiB; values that would fall
+    behind that reference are clamped to 0.
+
+    A "direction" is a (connection, sender side) pair; ACKs are attributed to
+    the direction whose data they acknowledge.
+
+    Returns {"data": {...}, "acks": {...}} where each part holds aligned columns:
+      row          packet row in the table
+      dir          direction id
+      time         capture time
+      data:  rel_seq, rel_end         relative start / end of the segment
+      acks:  rel_ack                  relative acknowledgement number
+      high_sent    highest sequence end sent in the direction before the packet
+      high_acked   highest acknowledgement received for it before the packet
+      first        True for the first packet of its kind in the direction
+    """
+    conn, forward, _ = flow_index(table, directed=False)
+    tcp = (table["proto"] == IPPROTO_TCP) & (conn >= 0)
+    flags = table["tcp_flags"]
+    payload = table["payload_len"].astype(np.int64)
+
+    data = tcp & (payload > 0)
+    acks = tcp & ((flags & TCP_ACK) != 0)
+    data_rows = np.flatnonzero(data)
+    ack_rows = np.flatnonzero(acks)
+
+    empty_i = np.zeros(0, dtype=np.int64)
+    empty_part = {"row": empty_i, "dir": empty_i, "time": np.zeros(0), "high_sent": empty_i,
+                  "high_acked": empty_i, "first": np.zeros(0, dtype=bool)}
+    if len(data_rows) == 0:
+        return {"data": dict(empty_part, rel_seq=empty_i, rel_end=empty_i),
+                "acks": dict(empty_part, rel_ack=empty_i)}
+
+    data_dir = conn * 2 + (~forward).astype(np.int64)
+    ack_dir = conn * 2 + forward.astype(np.int64)
+    seq = table["seq"].astype(np.int64)
+
+    base = np.full(int(conn.max() + 1) * 2, -1, dtype=np.int64)
+    first = data_rows[np.unique(data_dir[data_rows], return_index=True)[1]]
+    base[data_dir[first]] = seq[first]
+
+    ack_rows = ack_rows[base[ack_dir[ack_rows]] >= 0]
+
+    # Merge both event kinds per direction in time order.
+    n_data = len(data_rows)
+    event_dir = np.concatenate([data_dir[data_rows], ack_dir[ack_rows]])
+    event_time = np.concatenate([table["time"][data_rows], table["time"][ack_rows]])
+    event_row = np.concatenate([data_rows, ack_rows])
+    is_data = np.r_[np.ones(n_data, bool), np.zeros(len(ack_rows), bool)]
+    order = np.lexsort((~is_data, event_row, event_time, event_dir))
+    dirs = event_dir[order]
+
+    # Sequence and acknowledgement numbers of a direction share one space,
+    # so both are unwrapped together along the merged events.
+    number = np.concatenate([seq[data_rows], table["ack"][ack_rows].astype(np.int64)])
+    relative = np.empty(len(number), dtype=np.int64)
+    relative[order] = unwrap_sequence((number - base[event_dir])[order] % SEQ_MODULO, dirs)
+    relative = np.maximum(relative, 0)
+    rel_seq = relative[:n_data]
+    rel_ack = relative[n_data:]
+    sent = np.concatenate([rel_seq + payload[data_rows], np.zeros(len(ack_rows), dtype=np.int64)])
+    acked = np.concatenate([np.zeros(n_data, dtype=np.int64), rel_ack])
+
+    high_sent = _before(segmented_cummax(sent[order], dirs), dirs)
+    high_acked = _before(segmented_cummax(acked[order], dirs), dirs)
+
+    # "first" means the first packet of that kind in the direction.
+    def part(mask, extra):
+        idx = order[mask]
+        d = dirs[mask]
+        result = {
+            "row": event_row[idx],
+            "dir": d,
+            "time": event_time[idx],
+            "high_sent": high_sent[mask],
+            "high_acked": high_acked[mask],
+            "first": np.r_[True, d[1:] != d[:-1]] if len(d) else np.zeros(0, bool),
+        }
+        result.update({k: v[idx] for k, v in extra.items()})
+        return result
+
+    data_mask = is_data[order]
+    data_part = part(data_mask, {
+        "rel_seq": np.concatenate([rel_seq, np.zeros(len(ack_rows), dtype=np.int64)]),
+        "rel_end": sent,
+    })
+    ack_part = part(~data_mask, {"rel_ack": acked})
+    return {"data": data_part, "acks": ack_part}
+
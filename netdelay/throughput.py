@@ -0,0 +1,196 @@
+import numpy as np
+
+from netdelay.packets import flow_index, group_percentile
+from netdelay.tcp import sequence_state
+
+# Default analysis parameters
+BIN_WIDTH = 1.0               # seconds per throughput bin
+SATURATION_THRESHOLD = 0.8    # p95 throughput / estimated capacity
+MIN_PAIR_SAMPLES = 5          # packet pairs needed for a capacity estimate
+
+# ------------------------------------------------------------------------
+# 1. Per-flow throughput time series
+# ------------------------------------------------------------------------
+
+def flow_throughput(table, flow_ids, bin_width=BIN_WIDTH):
+    """
+    Sums wire bytes per (flow, time bin). Returns sparse columns
+    {"flow", "bin", "bin_start", "bytes", "bps"} with one row per non-empty bin.
+    """
+    rows = flow_ids >= 0
+    time = table["time"][rows]
+    if len(time) == 0:
+        empty = np.zeros(0)
+        return {"flow": empty.astype(np.int64), "bin": empty.astype(np.int64),
+                "bin_start": empty, "bytes": empty, "bps": empty}
+
+    t0 = np.nanmin(time)
+    bins = np.floor((time - t0) / bin_width).astype(np.int64)
+    n_bins = int(bins.max()) + 1
+    key = flow_ids[rows] * n_bins + bins
+    uniq, inverse = np.unique(key, return_inverse=True)
+    total = np.bincount(inverse.reshape(-1), weights=table["wire_len"][rows])
+    return {
+        "flow": uniq // n_bins,
+        "bin": uniq % n_bins,
+        "bin_start": t0 + (uniq % n_bins) * bin_width,
+        "bytes": total,
+        "bps": total * 8.0 / bin_width,
+    }
+
+
+# ------------------------------------------------------------------------
+# 2. Packet-pair dispersion capacity estimates
+# ------------------------------------------------------------------------
+
+def packet_pair_capacity(table, flow_ids, n_flows, flight):
+    """
+    Estimates the bottleneck capacity of every directed flow from the spacing
+    of consecutive large packets: a bottleneck link of capacity C spreads two
+    back-to-back packets of L bytes at least L*8/C seconds apart.
+
+    Only pairs sent back-to-back are informative. A pair counts when the
+    first segment was still unacknowledged as the second one left (taken from
+    the bytes-in-flight samples, see bytes_in_flight); otherwise the gap is
+    the application's pacing, not the path's. Flows without ACK feedback
+    (UDP) therefore get no estimate.
+
+    Returns {"capacity_bps", "pairs"} indexed by flow id (NaN when a flow has
+    fewer than MIN_PAIR_SAMPLES usable pairs).
+    """
+    capacity = np.full(n_flows, np.nan)
+    pairs = np.zeros(n_flows, dtype=np.int64)
+    rows = flight["row"]
+    if len(rows) < 2:
+        return {"capacity_bps": capacity, "pairs": pairs}
+
+    order = np.lexsort((table["time"][rows], flow_ids[rows]))
+    rows = rows[order]
+    in_flight = flight["in_flight"][order]
+    flow = flow_ids[rows]
+    time = table["time"][rows]
+    length = table["wire_len"][rows].astype(np.int64)
+    payload = table["payload_len"][rows].astype(np.int64)
+
+    # Small control segments say little about capacity; keep the large ones.
+    largest = np.zeros(n_flows, dtype=np.int64)
+    np.maximum.at(largest, flow, length)
+    large = 2 * length >= largest[flow]
+
+    same = flow[1:] == flow[:-1]
+    dt = time[1:] - time[:-1]
+    queued = in_flight[1:] >= payload[1:] + payload[:-1]
+    usable = same & large[1:] & large[:-1] & queued & (dt > 0)
+    pair_flow = flow[1:][usable]
+    estimate = length[1:][usable] * 8.0 / dt[usable]
+
+    pairs = np.bincount(pair_flow, minlength=n_flows)
+    # Cross traffic can only stretch a pair, so the upper quartile is a
+    # better capacity estimate than the median.
+    capacity = group_percentile(estimate, pair_flow, n_flows, 75)
+    capacity[pairs < MIN_PAIR_SAMPLES] = np.nan
+    return {"capacity_bps": capacity, "pairs": pairs}
+
+
+# ------------------------------------------------------------------------
+# 3. Bytes in flight per TCP connection direction
+# ------------------------------------------------------------------------
+
+def bytes_in_flight(table):
+    """
+    For every TCP data segment, the number of bytes sent but not yet
+    acknowledged by the peer at that moment (highest sequence end sent minus
+    highest ACK received, see tcp.sequence_state). Returns {"row", "time",
+    "in_flight"} for the data segments plus "flow", their directed flow id.
+    """
+    directed, _, _ = flow_index(table, directed=True)
+    data = sequence_state(table)["data"]
+    high_sent = np.maximum(data["high_sent"], data["rel_end"])
+    return {
+        "row": data["row"],
+        "time": data["time"],
+        "in_flight": np.maximum(high_sent - data["high_acked"], 0),
+        "flow": directed[data["row"]],
+    }
+
+
+# ------------------------------------------------------------------------
+# 4. Saturation ranking per IP pair
+# ------------------------------------------------------------------------
+
+def rank_ip_pairs(table, bin_width=BIN_WIDTH, saturation_threshold=SATURATION_THRESHOLD):
+    """
+    Runs the throughput, capacity and in-flight analyses and aggregates them
+    per directed IP pair. Returns a dict with:
+      - "pairs": columns src, dst (address strings), bytes, mean_bps,
+        peak_bps, p95_bps, capacity_bps, utilisation, max_in_flight,
+        mean_in_flight, saturated; sorted most saturated first
+      - "series": the per-flow throughput time series (see flow_throughput)
+      - "flows": flow key columns plus each flow's "pair" index
+      - "in_flight": the per-segment bytes-in-flight samples
+    """
+    ids, _, flows = flow_index(table, directed=True)
+    n_flows = len(flows["src"])
+    series = flow_throughput(table, ids, bin_width)
+    flight = bytes_in_flight(table)
+    capacity = packet_pair_capacity(table, ids, n_flows, flight)
+
+    pair_keys, pair_of_flow = np.unique(
+        np.stack([flows["src"], flows["dst"]], axis=1), axis=0, return_inverse=True)
+    pair_of_flow = pair_of_flow.reshape(-1)
+    n_pairs = len(pair_keys)
+    flows["pair"] = pair_of_flow
+
+    # Pair throughput per bin: sum the flows that share a pair and bin.
+    pair_bin_key = pair_of_flow[series["flow"]] * (int(series["bin"].max(initial=0)) + 1) \
+        + series["bin"]
+    pb_uniq, pb_inverse = np.unique(pair_bin_key, return_inverse=True)
+    pb_bps = np.bincount(pb_inverse.reshape(-1), weights=series["bps"])
+    pb_pair = pb_uniq // (int(series["bin"].max(initial=0)) + 1)
+
+    total_bytes = np.bincount(pair_of_flow[series["flow"]], weights=series["bytes"],
+                              minlength=n_pairs)
+    peak = np.zeros(n_pairs)
+    np.maximum.at(peak, pb_pair, pb_bps)
+    p95 = group_percentile(pb_bps, pb_pair, n_pairs, 95)
+    active_bins = np.bincount(pb_pair, minlength=n_pairs)
+    mean_bps = total_bytes * 8.0 / np.maximum(active_bins * bin_width, bin_width)
+
+    # A pair is limited by the fastest path any of its flows could see.
+    pair_capacity = np.full(n_pairs, np.nan)
+    has_capacity = ~np.isnan(capacity["capacity_bps"])
+    np.fmax.at(pair_capacity, pair_of_flow[has_capacity],
+               capacity["capacity_bps"][has_capacity])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        utilisation = p95 / pair_capacity
+
+    max_flight = np.zeros(n_pairs, dtype=np.int64)
+    flight_pair = pair_of_flow[flight["flow"]]
+    np.maximum.at(max_flight, flight_pair, flight["in_flight"])
+    flight_count = np.bincount(flight_pair, minlength=n_pairs)
+    mean_flight = np.bincount(flight_pair, weights=flight["in_flight"], minlength=n_pairs) \
+        / np.maximum(flight_count, 1)
+
+    saturated = np.nan_to_num(utilisation, nan=0.0) >= saturation_threshold
+    order = np.lexsort((-peak, -np.nan_to_num(utilisation, nan=-1.0)))
+
+    addresses = table["addresses"]
+    pairs = {
+        "src": addresses[pair_keys[:, 0]] if n_pairs else np.zeros(0, dtype=object),
+        "dst": addresses[pair_keys[:, 1]] if n_pairs else np.zeros(0, dtype=object),
+        "bytes": total_bytes,
+        "mean_bps": mean_bps,
+        "peak_bps": peak,
+        "p95_bps": p95,
+        "capacity_bps": pair_capacity,
+        "utilisation": utilisation,
+        "max_in_flight": max_flight,
+        "mean_in_flight": mean_flight,
+        "saturated": saturated,
+    }
+    pairs = {k: v[order] for k, v in pairs.items()}
+    # Re-point flows at the ranked pair positions.
+    rank_of_pair = np.empty(n_pairs, dtype=np.int64)
+    rank_of_pair[order] = np.arange(n_pairs)
+    flows["pair"] = rank_of_pair[pair_of_flow]
+    return {"pairs": pairs, "series": series, "flows": flows, "in_flight": flight}
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from netdelay import pcapio
+
+INDEX_EVERY = 1024      # packets between index entries
+
+# Bytes from the start of a record block to its packet data: the pcap
+# record header, or the pcapng (enhanced) packet block header. Simple
+# packet blocks carry no timestamp and are never index entries.
+RECORD_HEADER = {"pcap": 16, "pcapng": 28}
+
+# ------------------------------------------------------------------------
+# 1. Sidecar index
+# ------------------------------------------------------------------------
+#
+# A sparse table recorded from the first full scan of a capture and kept
+# next to it as .<capture name>.tidx.npz (hidden, so the upload store does
+# not take it for a capture). Every INDEX_EVERY-th timestamped packet
+# gets an entry:
+#   packet       packet number
+#   offset       file offset of its record block, where a scan can resume
+#   time         its timestamp
+#   before_max   latest timestamp of any packet before it
+#   after_min    earliest timestamp of it or any packet after it
+# before_max / after_min keep seeking correct when timestamps are not in
+# order. "meta" holds the file size and mtime it was built for, and the
+# format, interfaces and sections a pcapng scan needs to resume mid-file.
+
+def index_path(capture):
+    folder, name = os.path.split(os.path.abspath(capture))
+    return os.path.join(folder, f".{name}.tidx.npz")
+
+
+def _identity(capture):
+    stat = os.stat(capture)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_index(capture, scan, every=INDEX_EVERY):
+    """Writes the sidecar index of a capture from a scan of the whole file."""
+    records = scan["records"]
+    times = records["time"]
+    timed = np.isfinite(times)
+    picks = np.flatnonzero(timed)[::every]
+    before = np.maximum.accumulate(np.where(timed, times, -np.inf))
+    before_max = np.where(picks > 0, before[np.maximum(picks - 1, 0)], -np.inf)
+    after_min = np.minimum.accumulate(np.where(timed, times, np.inf)[::-1])[::-1][picks]
+    size, mtime_ns = _identity(capture)
+    meta = {"size": size, "mtime_ns": mtime_ns, "format": scan["format"], "every": every,
+            "packets": len(times), "interfaces": scan["interfaces"], "sections": scan.get("sections", [])}
+    path = index_path(capture)
+    temp = f"{path}.tmp{os.getpid()}-{threading.get_ident()}.npz"
+    np.savez(temp, packet=picks, offset=records["offset"][picks] - RECORD_HEADER[scan["format"]],
+             time=times[picks], before_max=before_max, after_min=after_min, meta=np.array(json.dumps(meta)))
+    os.replace(temp, path)
+
+
+def read_index(capture):
+    """The capture's sidecar index as a dict of arrays plus "meta", or None if missing or stale."""
+    try:
+        with np.load(index_path(capture)) as data:
+            index = {k: data[k] for k in data.files}
+    except (OSError, ValueError):
+        return None
+    index["meta"] = json.loads(str(index["meta"]))
+    if (index["meta"]["size"], index["meta"]["mtime_ns"]) != _identity(capture):
+        return None
+    return index
+
+
+def record_index(capture, scan):
+    """
+    Called with the first full scan of a capture: writes its sidecar index
+    unless a current one exists. A capture in a read-only folder simply
+    goes without.
+    """
+    try:
+        if read_index(capture) is None:
+            build_index(capture, scan)
+    except OSError:
+        pass
+
+# ------------------------------------------------------------------------
+# 2. Windowed scans
+# ------------------------------------------------------------------------
+
+def window_range(index, start=None, end=None):
+    """
+    (first, stop) byte offsets holding every packet with start <= time < end
+    (epoch seconds, None for open): the last entry with no earlier packet
+    at or after start, and the first entry with no later packet before end.
+    """
+    first, stop = None, index["meta"]["size"]
+    if start is not None:
+        ok = np.flatnonzero(index["before_max"] < start)
+        if len(ok):
+            first = int(index["offset"][ok[-1]])
+    if end is not None:
+        ok = np.flatnonzero(index["after_min"] >= end)
+        if len(ok):
+            stop = int(index["offset"][ok[0]])
+    return first, stop
+
+
+def scan_window(capture, start=None, end=None):
+    """
+    scan_records restricted to packets with start <= time < end (epoch
+    seconds). With a sidecar index only the byte range of the window (plus
+    at most INDEX_EVERY packets on each side) is read; without one the
+    whole capture is scanned once and the index recorded.
+    """
+    index = read_index(capture)
+    if index is None:
+        scan = pcapio.scan_records(capture)
+        record_index(capture, scan)
+    else:
+        first, stop = window_range(index, start, end)
+        meta = index["meta"]
+        scan = pcapio.scan_records(capture, start=first, limit=stop,
+                                   layout=meta if meta["format"] == "pcapng" else None)
+    times = scan["records"]["time"]
+    keep = np.ones(len(times), dtype=bool)
+    if start is not None:
+        keep &= times >= start
+    if end is not None:
+        keep &= times < end
+    scan["records"] = {k: v[keep] for k, v in scan["records"].items()}
+    return scan
@@ -0,0 +1,620 @@
+import json
+import os
+from urllib.parse import quote
+
+import numpy as np
+from bokeh.layouts import column, row
+from bokeh.models import (Button, ColumnDataSource, CustomJS, CustomJSFilter, CustomJSTransform, DataTable,
+                          Div, LinearColorMapper, Range1d, Select, TextInput)
+from bokeh.palettes import Viridis256
+from bokeh.transform import transform
+
+from netdelay.decimate import POINT_BUDGET, decimate, outlier_threshold
+from netdelay.encoding import compact_data
+from netdelay.tables import PAGE_SIZE, query_table
+
+# ------------------------------------------------------------------------
+# 1. Series payloads: decimated overview + full-resolution file
+# ------------------------------------------------------------------------
+#
+# Every data file (series, lazy views, density levels, tables) is written
+# next to the page that uses it, and the page fetches it by a URL relative
+# to itself, so a page and its files can be moved or restored from the
+# result cache into any output folder together. The web app serves the
+# pages it stores in the database (/userPlotN) with a <base href> naming
+# their output folder (see updatePlot.js).
+
+def served_url(path):
+    """URL of a file written at path (relative to the page's folder)."""
+    return quote(path.replace(os.sep, "/"))
+
+
+def _column(values):
+    """A JSON-safe list (NaN / None become null)."""
+    out = []
+    for v in values:
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            out.append(None)
+        elif isinstance(v, (np.integer, np.floating)):
+            out.append(None if np.isnan(v) else v.item())
+        else:
+            out.append(v)
+    return out
+
+
+def write_series(path, data, columns):
+    """
+    Writes the numeric columns of a series as one little-endian float64 file,
+    column after column (missing values become NaN), for the browser to fetch.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    block = np.vstack([np.asarray([np.nan if v is None else v for v in data[c]], dtype="<f8")
+                       for c in columns])
+    block.tofile(path)
+
+
+def series_payload(data, x, y, path, url=None, budget=POINT_BUDGET, method="lttb",
+                   group=None, expand=None):
+    """
+    Prepares one plotted series for a lazily loaded view:
+      - writes the full-resolution numeric columns to path (see write_series)
+      - decimates the series to the point budget (per group when group names
+        a string column, e.g. the destination IP), keeping outliers
+
+    Groups are sent as an integer "code" column; meta["expand"] is the one
+    lookup table from code to group value and to the extra columns in
+    expand, a function of the group value (e.g. colour and legend label).
+
+    Returns a dict with "data" (the overview columns), "meta" (what the zoom
+    callback needs), "extent" (x range) and "total" (number of points).
+    data must be sorted by x.
+    """
+    n = len(data[x])
+    xs = np.asarray(data[x], dtype=np.float64)
+    ys = np.asarray(data[y], dtype=np.float64)
+    numeric = [c for c in data if c != group]
+    categories = [None]
+    codes = np.zeros(n, dtype=np.int64)
+    if group is not None:
+        categories, codes = np.unique(np.asarray(data[group], dtype=object), return_inverse=True)
+        categories = list(categories)
+        codes = codes.reshape(-1)
+
+    keep = []
+    thresholds = []
+    for code in range(len(categories)):
+        rows = np.flatnonzero(codes == code)
+        keep.append(rows[decimate(xs[rows], ys[rows], budget, method)])
+        thresholds.append(outlier_threshold(ys[rows]) if len(rows) else np.inf)
+    keep = np.sort(np.concatenate(keep)) if keep else np.zeros(0, dtype=np.int64)
+
+    full = {c: data[c] for c in numeric}
+    columns = list(numeric)
+    meta = {"url": url or served_url(path), "x": x, "y": y, "budget": budget,
+            "thresholds": [float(t) if np.isfinite(t) else None for t in thresholds],
+            "code": None, "group": group, "expand": {}}
+    if group is not None:
+        full["code"] = codes
+        columns.append("code")
+        meta["code"] = "code"
+        meta["expand"] = {group: categories}
+        meta["expand"].update({c: [f(v) for v in categories] for c, f in (expand or {}).items()})
+    meta["columns"] = columns
+    if n:
+        write_series(path, full, columns)
+
+    overview = {c: _column(np.asarray(full[c], dtype=object)[keep]) for c in columns}
+
+    pad = max((xs[-1] - xs[0]) * 0.02, 1e-3) if n else 1.0
+    extent = [float(xs[0] - pad), float(xs[-1] + pad)] if n else [0.0, 1.0]
+    return {"data": overview, "meta": meta, "extent": extent, "total": n}
+
+
+def write_payload(path, payload):
+    """Writes a view payload (plain dicts and lists) as compact JSON."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, separators=(",", ":"), allow_nan=False)
+
+# ------------------------------------------------------------------------
+# 2. Browser side: zoom reload and lazy view switching
+# ------------------------------------------------------------------------
+
+ZOOM_RELOAD_JS = """
+    // Refill the source with full-resolution points of the visible window,
+    // thinned to the budget with per-column min/max (outliers always kept).
+    const meta = source.tags[0];
+    if (!meta || !meta.url) { return; }
+    const state = window.__netdelay_series || (window.__netdelay_series = {});
+    const key = source.id + "@" + meta.url;
+    clearTimeout(state["timer:" + source.id]);
+    state["timer:" + source.id] = setTimeout(function () {
+        const extent = meta.extent;
+        if (!state["overview:" + key]) { state["overview:" + key] = source.data; }
+        if (extent && x_range.start <= extent[0] && x_range.end >= extent[1]) {
+            source.data = state["overview:" + key];
+            return;
+        }
+        if (!state[meta.url]) {
+            state[meta.url] = fetch(meta.url).then(function (r) {
+                if (!r.ok) { throw new Error(r.status); }
+                return r.arrayBuffer();
+            }).then(function (buf) {
+                const all = new Float64Array(buf);
+                const n = all.length / meta.columns.length;
+                const full = {n: n};
+                meta.columns.forEach(function (c, i) { full[c] = all.subarray(i * n, (i + 1) * n); });
+                return full;
+            });
+        }
+        state[meta.url].then(function (full) {
+            if (source.tags[0] !== meta) { return; }   // another view was loaded meanwhile
+            const t = full[meta.x], v = full[meta.y];
+            const code = meta.code ? full[meta.code] : null;
+            const groups = meta.thresholds.length;
+            function bisect(value) {
+                let lo = 0, hi = full.n;
+                while (lo < hi) { const mid = (lo + hi) >> 1; if (t[mid] < value) { lo = mid + 1; } else { hi = mid; } }
+                return lo;
+            }
+            const lo = bisect(x_range.start), hi = bisect(x_range.end);
+            const idx = [];
+            if (hi - lo <= meta.budget) {
+                for (let i = lo; i < hi; i++) { idx.push(i); }
+            } else {
+                const cols = Math.max(meta.budget >> 1, 1);
+                const span = (t[hi - 1] - t[lo]) || 1;
+                const minAt = new Int32Array(cols * groups).fill(-1), maxAt = new Int32Array(cols * groups).fill(-1);
+                const keep = new Uint8Array(hi - lo);
+                for (let i = lo; i < hi; i++) {
+                    const g = code ? code[i] : 0;
+                    const c = g * cols + Math.min(Math.floor((t[i] - t[lo]) / span * cols), cols - 1);
+                    if (minAt[c] < 0 || v[i] < v[minAt[c]]) { minAt[c] = i; }
+                    if (maxAt[c] < 0 || v[i] > v[maxAt[c]]) { maxAt[c] = i; }
+                    const limit = meta.thresholds[g];
+                    if (limit !== null && v[i] > limit) { keep[i - lo] = 1; }
+                }
+                for (let c = 0; c < minAt.length; c++) {
+                    if (minAt[c] >= 0) { keep[minAt[c] - lo] = 1; keep[maxAt[c] - lo] = 1; }
+                }
+                for (let i = 0; i < keep.length; i++) { if (keep[i]) { idx.push(lo + i); } }
+            }
+            const data = {};
+            meta.columns.forEach(function (c) { data[c] = idx.map(function (i) { return full[c][i]; }); });
+            source.data = data;
+        }).catch(function () {
+            // Series file not reachable (e.g. page opened from disk): keep the overview.
+        });
+    }, 200);
+"""
+
+
+def reload_on_zoom(p, source):
+    """
+    Makes a decimated scatter zoomable to full resolution: whenever the x
+    range changes, the visible window is read from the series file named in
+    source.tags[0] (the "meta" of a series payload) and swapped into source,
+    at most about the point budget of it, outliers kept. Zooming back out to
+    the full extent restores the overview. The x range is pinned (Range1d)
+    so Reset brings the overview back.
+    """
+    if not isinstance(p.x_range, Range1d):
+        p.x_range = Range1d(0, 1)
+    callback = CustomJS(args=dict(source=source, x_range=p.x_range), code=ZOOM_RELOAD_JS)
+    p.x_range.js_on_change("start", callback)
+    p.x_range.js_on_change("end", callback)
+    return p
+
+
+def apply_part(target, part):
+    """
+    Python twin of the loader in LAZY_SELECT_JS: fills a view target (dict of
+    source / x_range / figure / header / layout / filter / legend / table)
+    from one part of a payload, so the first view can be embedded in the
+    page directly. The embedded columns are typed arrays (see
+    netdelay.encoding). filter is a Select over the groups of a grouped
+    series; its first option means "all" and it is reset on every load.
+    legend is the source of a group_legend. table is the source of a
+    paged_table, pointed at the table id the part names (table_info is its
+    caption Div).
+    """
+    if target.get("layout") is not None:
+        target["layout"].visible = part is not None
+    if part is None:
+        target["source"].data = {k: [] for k in target["source"].data}
+        return
+    meta = part.get("meta")
+    target["source"].tags = [dict(meta, extent=part["extent"])] if meta else []
+    target["source"].data = compact_data(part["data"])
+    if target.get("x_range") is not None and "extent" in part:
+        start, end = part["extent"]
+        target["x_range"].update(start=start, end=end, reset_start=start, reset_end=end)
+    if target.get("figure") is not None and "title" in part:
+        target["figure"].title.text = part["title"]
+    if target.get("header") is not None and "header" in part:
+        target["header"].text = part["header"]
+    if target.get("filter") is not None and meta and meta.get("group"):
+        select = target["filter"]
+        select.options = select.options[:1] + list(meta["expand"][meta["group"]])
+        select.value = select.options[0]
+    if target.get("legend") is not None and meta and meta.get("group"):
+        target["legend"].data = legend_data(meta)
+    if target.get("table") is not None and part.get("table"):
+        page = query_table(part["table"], limit=PAGE_SIZE)
+        target["table"].data = page["rows"]
+        target["table"].tags = [table_state(part["table"], page, PAGE_SIZE)]
+        if target.get("table_info") is not None:
+            target["table_info"].text = page_info(page)
+
+
+LAZY_SELECT_JS = """
+    // Fetch the selected view's payload and swap it into the page.
+    const url = files[cb_obj.value];
+    status.text = "Loading " + cb_obj.value + "…";
+    fetch(url).then(function (r) {
+        if (!r.ok) { throw new Error(r.status); }
+        return r.json();
+    }).then(function (payload) {
+        Object.keys(targets).forEach(function (key) {
+            const t = targets[key];
+            const part = payload[key];
+            if (t.layout) { t.layout.visible = !!part; }
+            if (!part) {
+                const empty = {};
+                Object.keys(t.source.data).forEach(function (c) { empty[c] = []; });
+                t.source.data = empty;
+                return;
+            }
+            // tags and data first, so the range change below sees the new series
+            t.source.tags = part.meta ? [Object.assign({}, part.meta, {extent: part.extent})] : [];
+            t.source.data = part.data;
+            if (t.x_range && part.extent) {
+                t.x_range.setv({start: part.extent[0], end: part.extent[1],
+                                reset_start: part.extent[0], reset_end: part.extent[1]});
+            }
+            if (t.figure && part.title) { t.figure.title.text = part.title; }
+            if (t.header && part.header) { t.header.text = part.header; }
+            if (t.filter && part.meta && part.meta.group) {
+                t.filter.options = [t.filter.options[0]].concat(part.meta.expand[part.meta.group]);
+                t.filter.value = t.filter.options[0];
+            }
+            if (t.legend && part.meta && part.meta.group) {
+                const data = {x: [], y: []};
+                Object.keys(part.meta.expand).forEach(function (c) { data[c] = part.meta.expand[c]; });
+                data[part.meta.group].forEach(function () { data.x.push(NaN); data.y.push(NaN); });
+                t.legend.data = data;
+            }
+            if (t.table && part.table) {
+                // first page of the new table, keeping the page size
+                const previous = t.table.tags[0] || {limit: page_size};
+                t.table.tags = [Object.assign({}, previous, {table: part.table, offset: 0, q: "",
+                                                             filter_column: null, filter_value: null})];
+            }
+        });
+        status.text = "";
+    }).catch(function (err) {
+        status.text = "Could not load " + cb_obj.value + " (" + err + "). The view data is served "
+            + "next to this page; open it through the web app rather than from disk.";
+    });
+"""
+
+
+def lazy_select(select, status, files, targets):
+    """
+    Wires a Select to LAZY_SELECT_JS: files maps every option to the path
+    of its payload (see write_payload), fetched at its served_url, and
+    targets maps payload parts to the models they fill. status is a Div for
+    loading / error messages.
+    """
+    files = {name: served_url(path) for name, path in files.items()}
+    select.js_on_change("value", CustomJS(args=dict(files=files, targets=targets, status=status,
+                                                    page_size=PAGE_SIZE), code=LAZY_SELECT_JS))
+    return select
+
+# ------------------------------------------------------------------------
+# 3. Server-side paged tables (see netdelay.tables)
+# ------------------------------------------------------------------------
+
+TABLE_API = "/api/tables"   # server.js forwards this to the analysis API
+
+TABLE_PAGE_JS = """
+    // Fetch the page described by source.tags[0] from the analysis API.
+    const state = source.tags[0];
+    if (!state || !state.table) { return; }
+    // output: the folder the page was served from, whose tables the API reads
+    const output = new URL(".", document.baseURI).pathname;
+    const params = new URLSearchParams({offset: state.offset, limit: state.limit, output: output});
+    if (state.sort) { params.set("sort", state.sort); params.set("desc", state.desc ? "true" : "false"); }
+    if (state.q) { params.set("q", state.q); }
+    if (state.filter_column && state.filter_value) {
+        params.set("filter_column", state.filter_column);
+        params.set("filter_value", state.filter_value);
+    }
+    info.text = "Loading rows…";
+    fetch(api + "/" + encodeURIComponent(state.table) + "?" + params).then(function (r) {
+        if (!r.ok) { throw new Error(r.status); }
+        return r.json();
+    }).then(function (page) {
+        if (source.tags[0] !== state) { return; }   // a newer request replaced this one
+        state.total = page.total;
+        source.data = page.rows;
+        const last = Math.min(state.offset + state.limit, page.total);
+        info.text = page.total ? ("Rows " + (state.offset + 1).toLocaleString() + "–" + last.toLocaleString()
+                                  + " of " + page.total.toLocaleString()) : "No matching rows";
+    }).catch(function (err) {
+        info.text = "Rows unavailable (" + err + "); the table is served by the analysis API.";
+    });
+"""
+
+TABLE_CONTROL_JS = """
+    // Update the page request; the change of source.tags triggers the fetch.
+    const state = Object.assign({}, source.tags[0]);
+    if (action === "prev") { state.offset = Math.max(state.offset - state.limit, 0); }
+    if (action === "next" && state.offset + state.limit < state.total) { state.offset += state.limit; }
+    if (action === "sort") { state.sort = cb_obj.value || null; state.offset = 0; }
+    if (action === "order") { state.desc = cb_obj.value === "Descending"; state.offset = 0; }
+    if (action === "search") { state.q = cb_obj.value; state.offset = 0; }
+    source.tags = [state];
+"""
+
+
+def table_state(table_id, page, limit, **extra):
+    """The request state a paged table keeps in its source.tags."""
+    state = {"table": table_id, "offset": 0, "limit": limit, "sort": None,
+             "desc": False, "q": "", "filter_column": None, "filter_value": None, "total": page["total"]}
+    state.update(extra)
+    return state
+
+
+def page_info(page):
+    """Row-range caption for a page returned by netdelay.tables.query_table."""
+    if not page["total"]:
+        return "No matching rows"
+    last = min(page["offset"] + page["limit"], page["total"])
+    return f"Rows {page['offset'] + 1:,}–{last:,} of {page['total']:,}"
+
+
+def paged_table(columns, table_id=None, page_size=None, api=TABLE_API, **table_kwargs):
+    """
+    DataTable that shows one page of a stored table at a time, sorted,
+    searched and paged on the server. Only the first page is embedded
+    (when table_id is given). Returns (layout, source, info); setting
+    source.tags = [table_state(...)] from Python or JS loads a page.
+    """
+    page_size = page_size or PAGE_SIZE
+    source = ColumnDataSource({c.field: [] for c in columns})
+    info = Div(text="")
+    if table_id is not None:
+        page = query_table(table_id, limit=page_size)
+        source.data = page["rows"]
+        source.tags = [table_state(table_id, page, page_size)]
+        info.text = page_info(page)
+    source.js_on_change("tags", CustomJS(args=dict(source=source, info=info, api=api), code=TABLE_PAGE_JS))
+
+    def control(action):
+        return CustomJS(args=dict(source=source, action=action), code=TABLE_CONTROL_JS)
+
+    prev_button = Button(label="◀ Prev", width=80)
+    prev_button.js_on_event("button_click", control("prev"))
+    next_button = Button(label="Next ▶", width=80)
+    next_button.js_on_event("button_click", control("next"))
+    sort_select = Select(title="Sort by", value="", width=160,
+                         options=[("", "(capture order)")] + [(c.field, c.title) for c in columns])
+    sort_select.js_on_change("value", control("sort"))
+    order_select = Select(title="Order", value="Ascending", options=["Ascending", "Descending"], width=120)
+    order_select.js_on_change("value", control("order"))
+    search = TextInput(title="Search text columns", width=200)
+    search.js_on_change("value", control("search"))
+
+    table = DataTable(source=source, columns=columns, sortable=False, **table_kwargs)
+    return column(row(sort_select, order_select, search), table, row(prev_button, next_button, info)), source, info
+
+# ------------------------------------------------------------------------
+# 4. Categorical columns stored as codes
+# ------------------------------------------------------------------------
+#
+# Group values (destination IP, outlier cause) travel as small integer
+# codes; these helpers colour, filter and label glyphs from the codes so
+# no per-row strings are embedded.
+
+GROUP_COLOR_JS = """
+    const meta = source.tags[0];
+    const colors = meta && meta.expand ? meta.expand.color : [];
+    return Array.from(xs, function (code) { return colors[code]; });
+"""
+
+GROUP_FILTER_JS = """
+    // Rows of the group picked in select; its first option means "all".
+    const group = select.options.indexOf(select.value) - 1;
+    const codes = source.data[column] || [];
+    return Array.from(codes, function (code) { return group < 0 || code === group; });
+"""
+
+CODE_FILTER_JS = """
+    const codes = source.data[column] || [];
+    return Array.from(codes, function (code) { return code === value; });
+"""
+
+
+def group_color(source, column="code"):
+    """Colour spec mapping a code column through the "color" lookup of the
+    series meta in source.tags[0] (the expand of series_payload)."""
+    return transform(column, CustomJSTransform(args=dict(source=source), v_func=GROUP_COLOR_JS))
+
+
+def group_filter(select, column="code"):
+    """
+    Filter keeping the rows whose code is the group picked in a Select
+    whose options are "all" followed by the lookup table in code order.
+    Call filter.change.emit() from the Select callback to reapply it.
+    """
+    return CustomJSFilter(args=dict(select=select, column=column), code=GROUP_FILTER_JS)
+
+
+def code_filter(column, value):
+    """CustomJSFilter keeping the rows whose integer code in column equals value (GroupFilter only matches strings)."""
+    return CustomJSFilter(args=dict(column=column, value=value), code=CODE_FILTER_JS)
+
+
+def legend_data(meta):
+    """
+    One unplotted (NaN) row per group with its lookup values, for a
+    group_legend: the legend then lists groups without per-row labels.
+    """
+    n = len(meta["expand"][meta["group"]])
+    data = {"x": np.full(n, np.nan), "y": np.full(n, np.nan)}
+    data.update({c: list(values) for c, values in meta["expand"].items()})
+    return data
+
+
+def group_legend(p, field="legend", color="color", **glyph_kwargs):
+    """
+    Adds a legend of the groups of a coded series to p, drawn from its own
+    small source (filled by apply_part / the lazy loader as target["legend"]).
+    Returns that source.
+    """
+    source = ColumnDataSource({"x": [], "y": [], field: [], color: []})
+    p.scatter("x", "y", source=source, color=color, legend_field=field, **glyph_kwargs)
+    return source
+
+# ------------------------------------------------------------------------
+# 5. Density views (see netdelay.density)
+# ------------------------------------------------------------------------
+
+DENSITY_JS = """
+    // Redraw the density image for the visible window from the finest level
+    // that still spans the window with about the overview's number of
+    // columns, or show the points themselves once few enough are visible.
+    const meta = image_source.tags[0];
+    if (!meta || !meta.total) { return; }
+    const state = window.__netdelay_density || (window.__netdelay_density = {});
+    const id = image_source.id;
+    clearTimeout(state["timer:" + id]);
+    state["timer:" + id] = setTimeout(function () {
+        const x0 = meta.x_extent[0], x1 = meta.x_extent[1], y0 = meta.y_extent[0], y1 = meta.y_extent[1];
+        if (!state["overview:" + id]) { state["overview:" + id] = image_source.data; }
+        function show_image(data) {
+            image_source.data = data;
+            image_renderer.visible = true;
+            points_renderer.visible = false;
+        }
+        if (x_range.start <= x0 && x_range.end >= x1 && y_range.start <= y0 && y_range.end >= y1) {
+            show_image(state["overview:" + id]);
+            return;
+        }
+        const fraction = Math.max((Math.min(x_range.end, x1) - Math.max(x_range.start, x0)) / (x1 - x0), 1e-12);
+        if (meta.total <= budget && show_points()) { return; }
+        let level = 0;
+        while (level < meta.levels - 1 && fraction * (1 << level) < 1) { level++; }
+        if (!state[meta.levels_url]) {
+            state[meta.levels_url] = fetch(meta.levels_url).then(function (r) {
+                if (!r.ok) { throw new Error(r.status); }
+                return r.arrayBuffer();
+            }).then(function (buf) {
+                const type = {1: Uint8Array, 2: Uint16Array, 4: Uint32Array}[meta.count_bytes];
+                return new type(buf);
+            });
+        }
+        state[meta.levels_url].then(function (counts) {
+            const cols = meta.width << level, rows = meta.height;
+            const offset = meta.width * rows * ((1 << level) - 1);   // earlier levels
+            function bin(v, low, high, n) { return Math.min(Math.max(Math.floor((v - low) / (high - low) * n), 0), n - 1); }
+            const c0 = bin(x_range.start, x0, x1, cols), c1 = bin(x_range.end, x0, x1, cols);
+            const r0 = bin(y_range.start, y0, y1, rows), r1 = bin(y_range.end, y0, y1, rows);
+            let visible = 0, peak = 0;
+            for (let r = r0; r <= r1; r++) {
+                for (let c = c0; c <= c1; c++) {
+                    const n = counts[offset + r * cols + c];
+                    visible += n;
+                    if (n > peak) { peak = n; }
+                }
+            }
+            if (visible <= budget && show_points()) { return; }
+            const scale = peak > 0 ? 254 / Math.log1p(peak) : 0;
+            const image = [];
+            for (let r = r0; r <= r1; r++) {
+                const line = [];
+                for (let c = c0; c <= c1; c++) {
+                    const n = counts[offset + r * cols + c];
+                    line.push(n ? 1 + Math.round(Math.log1p(n) * scale) : 0);
+                }
+                image.push(line);
+            }
+            const dx = (x1 - x0) / cols, dy = (y1 - y0) / rows;
+            show_image({image: [image], x: [x0 + c0 * dx], y: [y0 + r0 * dy],
+                        dw: [(c1 - c0 + 1) * dx], dh: [(r1 - r0 + 1) * dy]});
+        }).catch(function () {
+            // Density files not reachable (e.g. page opened from disk): keep the overview.
+        });
+
+        function show_points() {
+            // Rows of the x window from the sparse index: the points file is
+            // sorted by x, so the window is one byte range per column.
+            function bisect(value, right) {
+                let lo = 0, hi = meta.index.length;
+                while (lo < hi) {
+                    const mid = (lo + hi) >> 1;
+                    if (right ? meta.index[mid] <= value : meta.index[mid] < value) { lo = mid + 1; } else { hi = mid; }
+                }
+                return lo;
+            }
+            const first = Math.max(bisect(x_range.start, false) - 1, 0) * meta.stride;
+            const last = Math.min(bisect(x_range.end, true) * meta.stride, meta.total);
+            // max_rows visible in x, plus the index granularity on both sides
+            if (last - first > max_rows + 2 * meta.stride) { return false; }
+            function column(i) {
+                const start = (i * meta.total + first) * 8, end = (i * meta.total + last) * 8;
+                return fetch(meta.points_url, {headers: {Range: "bytes=" + start + "-" + (end - 1)}}).then(function (r) {
+                    if (!r.ok) { throw new Error(r.status); }
+                    return r.arrayBuffer().then(function (buf) {
+                        // 200 means the server ignored the range and sent the whole file
+                        return r.status === 206 ? new Float64Array(buf) : new Float64Array(buf, start, last - first);
+                    });
+                });
+            }
+            const window_x = [x_range.start, x_range.end], window_y = [y_range.start, y_range.end];
+            Promise.all([column(0), column(1)]).then(function (xy) {
+                if (x_range.start !== window_x[0] || x_range.end !== window_x[1]
+                    || y_range.start !== window_y[0] || y_range.end !== window_y[1]) { return; }
+                const xs = [], ys = [];
+                for (let i = 0; i < xy[0].length; i++) {
+                    const x = xy[0][i], y = xy[1][i];
+                    if (x >= window_x[0] && x <= window_x[1] && y >= window_y[0] && y <= window_y[1]) { xs.push(x); ys.push(y); }
+                }
+                points_source.data = {x: xs, y: ys};
+                image_renderer.visible = false;
+                points_renderer.visible = true;
+            }).catch(function () {});
+            return true;
+        }
+    }, 200);
+"""
+
+
+def density_plot(p, meta, image, budget=POINT_BUDGET, palette=None, color="#4a86e8"):
+    """
+    Draws a rasterized point cloud (netdelay.density.write_density) on p as
+    an image glyph. Zooming re-rasterizes the window from the finer levels
+    and switches to a scatter of the real points once at most budget of
+    them are visible. The ranges are pinned so Reset shows the overview.
+    Returns (image source, points source).
+    """
+    (x0, x1), (y0, y1) = meta["x_extent"], meta["y_extent"]
+    p.x_range = Range1d(x0, x1)
+    p.y_range = Range1d(y0, y1)
+    image_source = ColumnDataSource({"image": [image], "x": [x0], "y": [y0], "dw": [x1 - x0], "dh": [y1 - y0]},
+                                    tags=[meta])
+    points_source = ColumnDataSource({"x": [], "y": []})
+    mapper = LinearColorMapper(palette=palette or Viridis256, low=1, high=255, low_color=(0, 0, 0, 0))
+    image_renderer = p.image(image="image", x="x", y="y", dw="dw", dh="dh", source=image_source,
+                             color_mapper=mapper)
+    points_renderer = p.scatter("x", "y", source=points_source, size=5, color=color, alpha=0.7, visible=False)
+
+    callback = CustomJS(args=dict(image_source=image_source, points_source=points_source,
+                                  image_renderer=image_renderer, points_renderer=points_renderer,
+                                  x_range=p.x_range, y_range=p.y_range, budget=budget,
+                                  max_rows=20 * budget), code=DENSITY_JS)
+    for r in (p.x_range, p.y_range):
+        r.js_on_change("start", callback)
+        r.js_on_change("end", callback)
+    return image_source, points_source
@@ -0,0 +1,235 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import runpy
+import socketserver
+import sys
+import time
+import traceback
+
+from netdelay import instrument, pcapio
+from netdelay.cache import ResultCache
+from netdelay.scheduler import Scheduler
+
+WORKER_HOST = "127.0.0.1"
+WORKER_PORT = int(os.environ.get("ANALYSIS_WORKER_PORT", 8100))
+
+# Imported once by the warm parent; every job starts with them loaded.
+# Missing ones are skipped.
+PRELOAD = [
+    "numpy", "pandas", "pyshark", "scapy.all",
+    "bokeh.plotting", "bokeh.models", "bokeh.layouts", "bokeh.io", "bokeh.palettes", "bokeh.themes",
+    "netdelay.packets", "netdelay.delayed_ack", "netdelay.tcp", "netdelay.views", "netdelay.tables",
+]
+
+# ------------------------------------------------------------------------
+# 1. Running one plotting script
+# ------------------------------------------------------------------------
+
+_written = None     # set of paths opened for writing by the running script
+
+
+def _record_writes(event, args):
+    # audit hook; installed only in pool workers (_start_worker), as audit
+    # hooks cannot be removed again
+    if event == "open" and _written is not None and isinstance(args[0], (str, bytes, os.PathLike)):
+        mode, flags = args[1], args[2]
+        writing = any(c in mode for c in "wax+") if mode else flags & (os.O_WRONLY | os.O_RDWR)
+        if writing:
+            _written.add(os.path.abspath(os.fsdecode(args[0])))
+
+
+def write_progress(path):
+    """
+    A pcapio progress hook that keeps {"packets", "bytes", "total_bytes",
+    "updated"} in the JSON file at path (replaced atomically).
+    """
+    def report(packets, scanned, total):
+        with open(path + ".tmp", "w") as f:
+            json.dump({"packets": packets, "bytes": scanned, "total_bytes": total, "updated": time.time()}, f)
+        os.replace(path + ".tmp", path)
+    return report
+
+
+def run_script(script, args=(), cwd=None, progress=None):
+    """
+    Runs a plotting script as __main__ in this process, as if started with
+    `python script *args` from cwd. Returns a dict with "script", "code"
+    (exit status), "output" (what it printed), "error" (traceback) and
+    "files" (files it wrote, relative to cwd; recorded in pool workers
+    only). If progress is a path, the capture scan reports its progress
+    there (see write_progress).
+
+    The run is instrumented (netdelay.instrument): its stages, the script's
+    own totals and the size of every file it wrote go to
+    <script>.report.json in cwd, next to its plots, which is one of "files".
+    """
+    global _written
+    output = io.StringIO()
+    result = {"script": os.path.basename(script), "code": 0, "output": "", "error": "", "files": []}
+    old_argv, old_cwd, old_path = sys.argv, os.getcwd(), list(sys.path)
+    sys.argv = [script] + [str(a) for a in args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    progress = progress and os.path.abspath(progress)
+    written = _written = set()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        if progress:
+            pcapio.progress_hook = write_progress(progress)
+            pcapio.progress_hook(0, 0, os.path.getsize(args[0]) if args and os.path.isfile(args[0]) else 0)
+        instrument.start_report()
+        instrument.begin(result["script"])
+        with contextlib.redirect_stdout(output):
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            result["code"] = e.code or 0
+        else:
+            result["code"], result["error"] = 1, str(e.code)
+    except BaseException:
+        result["code"], result["error"] = 1, traceback.format_exc()
+    finally:
+        _written, pcapio.progress_hook = None, None
+        stages = instrument.finish_report()
+        sys.argv, sys.path[:] = old_argv, old_path
+        os.chdir(old_cwd)
+    base = os.path.abspath(cwd or old_cwd)
+    skip = {progress, progress + ".tmp"} if progress else set()
+    # only files under cwd are the script's output (netdelay.instrument
+    # writes /proc/self/clear_refs, for one)
+    result["files"] = sorted(os.path.relpath(f, base).replace(os.sep, "/")
+                             for f in written - skip if f.startswith(base + os.sep) and os.path.isfile(f))
+    result["output"] = output.getvalue()
+    report = os.path.join(base, result["script"] + ".report.json")
+    try:
+        instrument.write_report(report, script_report(result, stages, base))
+        result["files"] = sorted(set(result["files"]) | {os.path.basename(report)})
+    except OSError:
+        pass
+    return result
+
+
+def script_report(result, stages, base):
+    """
+    The report of one script run: "script", "code", the totals of its
+    outermost stage ("wall_seconds", "cpu_seconds", "peak_rss",
+    "peak_traced"), "packets" (the most any stage processed), "files"
+    ({file: bytes} written, relative to base), "output_bytes" (their sum)
+    and "stages" (see netdelay.instrument).
+    """
+    files = {f: os.path.getsize(os.path.join(base, f)) for f in result["files"]}
+    outer = stages[0] if stages else {}
+    if outer:
+        outer["output_bytes"] = sum(files.values())
+    counts = [s["packets"] for s in stages if s["packets"] is not None]
+    return {
+        "script": result["script"],
+        "code": result["code"],
+        **{k: outer.get(k) for k in ("wall_seconds", "cpu_seconds", "peak_rss", "peak_traced")},
+        "packets": max(counts) if counts else None,
+        "files": files,
+        "output_bytes": sum(files.values()),
+        "stages": stages,
+    }
+
+# ------------------------------------------------------------------------
+# 2. Warm worker pool
+# ------------------------------------------------------------------------
+
+def _preload(modules):
+    for name in modules:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+
+def _start_worker(modules=()):
+    """Pool initializer: imports modules and records the files scripts write (see run_script)."""
+    _preload(modules)
+    sys.addaudithook(_record_writes)
+
+
+class AnalysisPool:
+    """
+    Pool of warm analysis processes. Where fork is available the heavy
+    modules are imported once into a fork server and every job runs in a
+    fresh child forked from it, so jobs cost a fork instead of an
+    interpreter start plus imports and cannot leak state into each other.
+    Elsewhere (Windows) long-lived workers import the modules at start and
+    run job after job.
+    """
+
+    def __init__(self, processes=None, preload=PRELOAD):
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # "__main__" too, or every child re-imports the caller's main module
+            context.set_forkserver_preload(["__main__"] + list(preload))
+            self._pool = context.Pool(processes, initializer=_start_worker, maxtasksperchild=1)
+        else:
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(processes, initializer=_start_worker, initargs=(list(preload),))
+
+    def submit(self, script, args=(), cwd=None, callback=None, progress=None, error_callback=None):
+        """Queues a script run; returns an AsyncResult of run_script's dict."""
+        return self._pool.apply_async(run_script, (script, list(args), cwd, progress), callback=callback,
+                                      error_callback=error_callback)
+
+    def run(self, script, args=(), cwd=None):
+        return self.submit(script, args, cwd).get()
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+# ------------------------------------------------------------------------
+# 3. Local socket front end (used by server.js)
+# ------------------------------------------------------------------------
+#
+# One request per connection, one JSON object per line each way:
+#   -> {"script": path, "args": [...], "cwd": path}
+#   <- the run_script dict
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            job = json.loads(self.rfile.readline())
+            run = self.server.pool.run
+            if self.server.cache is not None:
+                result = self.server.cache.run(run, job["script"], job.get("args", []), job.get("cwd"))
+            else:
+                result = run(job["script"], job.get("args", []), job.get("cwd"))
+        except Exception:
+            result = {"script": "", "code": 1, "output": "", "error": traceback.format_exc()}
+        self.wfile.write((json.dumps(result) + "\n").encode())
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, pool, host=WORKER_HOST, port=WORKER_PORT, cache=None):
+        super().__init__((host, port), _JobHandler)
+        self.pool = pool
+        self.cache = cache
+
+
+def serve(processes=None, host=WORKER_HOST, port=WORKER_PORT):
+    pool = Scheduler(AnalysisPool(processes), cpus=processes)
+    with WorkerServer(pool, host, port, ResultCache()) as server:
+        print(f"Analysis workers listening on {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    # Through the package, so jobs pickle as netdelay.worker.*, not __main__.*
+    from netdelay.worker import serve as serve_workers
+    serve_workers(int(sys.argv[1]) if len(sys.argv) > 1 else None)
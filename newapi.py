@@ -1,9 +1,21 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, Header, Query, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-import os
-import shutil
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
 from pathlib import Path
+import asyncio
+import json
+import threading
+import numpy as np
+
+from netdelay import pcapio
+from netdelay.jobs import JobManager
+from netdelay.preview import preview
+from netdelay.query import DEFAULT_BUCKET, DEFAULT_LIMIT, packet_table, query_packets
+from netdelay.store import UploadSessions, UploadStore
+from netdelay.summary import capture_summary
+from netdelay.tables import PAGE_SIZE, output_table_dir, query_table
 
 app = FastAPI()
 
@@ -20,65 +32,354 @@ app.add_middleware(
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Uploads are stored by content hash (see netdelay/store.py)
+store = UploadStore(UPLOAD_DIR)
+sessions = UploadSessions(store)
+
+# Analysis jobs run on a pool of warm worker processes, started on first use
+jobs = JobManager()
+# start_analysis runs in worker threads; one capture gets one running job
+start_lock = threading.Lock()
+
+# Seconds between checks for new job events on an event stream
+EVENT_INTERVAL = 0.5
+# Seconds an event stream may go without a new event before it ends
+EVENT_IDLE = 600
+
+def analyses(entry):
+    """Status of every analysis job run on a stored capture, oldest first."""
+    found = []
+    for job_id in entry["jobs"]:
+        try:
+            found.append(jobs.status(job_id))
+        except FileNotFoundError:
+            pass
+    return found
+
+async def summarize(entry):
+    """The stored capture's header summary (netdelay/summary.py), or None if it is not a capture."""
+    try:
+        return await asyncio.to_thread(capture_summary, store.path(entry))
+    except ValueError:
+        return None
+
+def start_analysis(entry):
+    """
+    The stored capture's analysis job if one is still running, otherwise a
+    new one; scripts whose results are cached finish at once. Submitting
+    reads the capture's headers and hashes the scripts, so the endpoints
+    call this in a thread (asyncio.to_thread) to keep the event loop free.
+    """
+    with start_lock:
+        existing = analyses(entry)
+        if existing and existing[-1]["status"] != "complete":
+            return existing[-1]
+        job = jobs.submit(store.path(entry), sha256=entry["sha256"])
+        store.add_job(entry["sha256"], job["id"])
+        return job
+
+@app.on_event("shutdown")
+def close_jobs():
+    jobs.close()
+
 @app.post("/upload-multiple/")
 async def upload_multiple_files(files: List[UploadFile] = File(...)):
     """
     Endpoint for uploading multiple files simultaneously.
-    Returns the list of successfully uploaded filenames.
-    Rejects any files that already exist on the server.
+    Returns the list of stored filenames. Files are identified by content:
+    re-uploading bytes already on the server stores nothing new and
+    returns the existing file with its analyses.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files were uploaded")
     
-    # Get existing filenames (case insensitive)
-    existing_files = set()
-    for file_path in UPLOAD_DIR.glob("*"):
-        if file_path.is_file():
-            existing_files.add(file_path.name.lower())
-    
-    # Check for duplicates
-    duplicates = []
-    for file in files:
-        if file.filename.lower() in existing_files:
-            duplicates.append(file.filename)
-    
-    # If duplicates found, reject the entire upload
-    if duplicates:
-        duplicate_list = ", ".join(duplicates)
-        raise HTTPException(
-            status_code=409, 
-            detail=f"Duplicate files detected: {duplicate_list}. Upload rejected."
-        )
-    
-    saved_filenames = []
-    
+    saved = []
     try:
         for file in files:
-            # Create a safe filename
-            filename = Path(file.filename)
-            file_path = UPLOAD_DIR / filename
-            
-            # Save the file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            saved_filenames.append(str(file_path.name))
-            
+            entry, created = await store.save(file)
+            saved.append({
+                "filename": file.filename,
+                "stored_as": entry["name"],
+                "sha256": entry["sha256"],
+                "size": entry["size"],
+                "duplicate": not created,
+                "summary": await summarize(entry),
+                "analyses": analyses(entry),
+            })
     except Exception as e:
-        # If anything goes wrong, cleanup any partially uploaded files
-        for filename in saved_filenames:
-            try:
-                (UPLOAD_DIR / filename).unlink(missing_ok=True)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"An error occurred during upload: {str(e)}")
     
-    return {"filenames": saved_filenames, "message": f"Successfully uploaded {len(saved_filenames)} files"}
+    duplicates = sum(f["duplicate"] for f in saved)
+    message = f"Successfully uploaded {len(saved) - duplicates} files"
+    if duplicates:
+        message += f" ({duplicates} already on the server)"
+    return {"filenames": [f["stored_as"] for f in saved], "files": saved, "message": message}
+
+class NewUpload(BaseModel):
+    filename: str
+    size: int
+    chunk_size: int = 64 << 20
+
+@app.post("/uploads", status_code=201)
+async def open_upload(upload: NewUpload):
+    """
+    Starts a resumable upload. Send the bytes as chunks with
+    PUT /uploads/{id}?offset=<byte offset> (header X-Chunk-SHA256: hex digest
+    of the chunk), in any order, then POST /uploads/{id}/complete.
+    """
+    try:
+        return sessions.open(upload.filename, upload.size, upload.chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/uploads/{session_id}")
+async def upload_state(session_id: str):
+    """Where to resume: "offset", the "missing" byte ranges and "complete"."""
+    try:
+        return sessions.state(session_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/uploads/{session_id}")
+async def upload_chunk(session_id: str, offset: int, request: Request,
+                       x_chunk_sha256: Optional[str] = Header(None)):
+    """Writes one chunk at its offset; a chunk failing its checksum is not kept."""
+    try:
+        return await sessions.write(session_id, offset, request.stream(), x_chunk_sha256)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/uploads/{session_id}/received")
+async def upload_received(session_id: str):
+    """
+    Scans the record headers of the bytes received so far (from offset 0,
+    without a gap), so a capture can be looked at before it is complete.
+    """
+    try:
+        path, offset = sessions.received_path(session_id)
+        scan = pcapio.scan_records(path, limit=offset) if offset >= 32 else None
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if scan is None:
+        return {"bytes": offset, "packets": 0}
+    times = scan["records"]["time"]
+    times = times[np.isfinite(times)]
+    return {"bytes": offset, "packets": len(scan["records"]["time"]), "format": scan["format"],
+            "first": float(times.min()) if len(times) else None,
+            "last": float(times.max()) if len(times) else None}
+
+@app.post("/uploads/{session_id}/complete")
+async def complete_upload(session_id: str, analyse: bool = False):
+    """
+    Moves a fully received upload into the upload store (deduplicated by
+    content like /upload-multiple/). With analyse=true it also starts (or
+    returns) the capture's analysis job.
+    """
+    try:
+        entry, created = await asyncio.to_thread(sessions.complete, session_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    result = {"filename": entry["names"][-1], "stored_as": entry["name"], "sha256": entry["sha256"],
+              "size": entry["size"], "duplicate": not created, "summary": await summarize(entry),
+              "analyses": analyses(entry)}
+    if analyse:
+        result["job"] = await asyncio.to_thread(start_analysis, entry)
+    return result
 
 @app.get("/")
 async def root():
     return {"message": "File upload API is running. Use /upload-multiple/ endpoint to upload files."}
 
+@app.get("/tables/{table_id}")
+async def table_page(table_id: str, offset: int = 0, limit: int = PAGE_SIZE, sort: Optional[str] = None,
+                     desc: bool = False, q: str = "", filter_column: Optional[str] = None,
+                     filter_value: Optional[str] = None, output: Optional[str] = None):
+    """
+    One page of an analysis table written by the plotting scripts, filtered,
+    searched and sorted server-side, so the pages only embed the first rows.
+    output is the URL path of the output folder the page was written to (the
+    pages send it with every request); the table is read from that folder.
+    """
+    try:
+        return query_table(table_id, offset=offset, limit=limit, sort=sort, desc=desc, q=q,
+                           filter_column=filter_column, filter_value=filter_value,
+                           directory=output_table_dir(output))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: Optional[UploadFile] = File(None), filename: Optional[str] = Form(None)):
+    """
+    Starts analysing a capture in the background: either an uploaded file or
+    the name of one already in uploads/. Returns the job record at once;
+    poll GET /jobs/{job_id} for status, progress and result locations.
+    A capture with the same bytes as one being analysed returns that job
+    instead of starting another.
+    """
+    if file is not None:
+        entry, _ = await store.save(file)
+    elif filename:
+        entry = store.find_name(filename)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"No such capture: {filename}")
+    else:
+        raise HTTPException(status_code=400, detail="Upload a file or name one in uploads/")
+    return await asyncio.to_thread(start_analysis, entry)
+
+@app.get("/jobs")
+async def list_jobs():
+    """Every job of the running API, and the scheduler's running and queued script runs."""
+    return {"jobs": jobs.list(), "scheduler": jobs.load()}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, progress (packets and bytes scanned) and result files of one job."""
+    try:
+        return jobs.status(job_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs/{job_id}/report")
+async def job_report(job_id: str):
+    """
+    Per-stage wall time, CPU time, packets, peak memory and output sizes of
+    one job's scripts, preview and partial results (report.json in its folder).
+    """
+    try:
+        return jobs.report(job_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/query")
+async def query(capture: str, start: Optional[float] = None, end: Optional[float] = None,
+                ip: List[str] = Query([]), src: Optional[str] = None, dst: Optional[str] = None,
+                protocol: Optional[str] = None, loss: Optional[str] = None, group_by: Optional[str] = None,
+                bucket: float = DEFAULT_BUCKET, limit: int = DEFAULT_LIMIT):
+    """
+    Ad hoc filter / group / aggregate query over one capture in uploads/
+    (by file name or SHA-256), answered from its cached packet table (see
+    netdelay/query.py; built on the first query if its job has not). E.g.
+      /query?capture=a.pcapng&ip=10.0.0.5&start=60&end=120&group_by=dst
+      /query?capture=a.pcapng&protocol=TLS/SSL&group_by=time&bucket=10
+    start / end are seconds since the first packet; repeat ip for a
+    conversation. Rows hold packets, bytes, loss counts and RTT statistics.
+    """
+    entry = store.find(capture) or store.find_name(capture)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No such capture: {capture}")
+    try:
+        packets = await asyncio.to_thread(packet_table, store.path(entry), entry["sha256"])
+        return await asyncio.to_thread(query_packets, packets, start=start, end=end, ip=ip, src=src,
+                                       dst=dst, protocol=protocol, loss=loss, group_by=group_by,
+                                       bucket=bucket, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/summary")
+async def summary(capture: str):
+    """
+    Packet count, duration, link type, snaplen, byte totals and average
+    rates of a capture in uploads/ (by file name or SHA-256), from its
+    record headers alone; returned with every upload too.
+    """
+    entry = store.find(capture) or store.find_name(capture)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No such capture: {capture}")
+    result = await summarize(entry)
+    if result is None:
+        raise HTTPException(status_code=400, detail=f"{capture} is not a pcap or pcapng file")
+    return result
+
+@app.get("/preview")
+async def capture_preview(capture: str):
+    """
+    Approximate protocol shares, loss percentages and RTT percentiles, with
+    confidence intervals, of a capture in uploads/ (by file name or
+    SHA-256), from a sample of at most 32 MB of it (see netdelay/preview.py).
+    Captures up to that size are analysed whole ("exact").
+    """
+    entry = store.find(capture) or store.find_name(capture)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No such capture: {capture}")
+    try:
+        return await asyncio.to_thread(preview, store.path(entry))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def sse(event, data):
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for one job, so a dashboard can fill in before the
+    slowest script finishes:
+      "preview":     estimates with confidence intervals from a sample of the
+                     capture, usually within a second
+      "partial":     aggregates of the capture so far (packets, loss
+                     percentage, protocol shares, top conversations),
+                     growing until "final"
+      "progress":    the job status, whenever a script starts or finishes
+      "complete":    the final job status; the stream then ends
+      "interrupted": the job status, when the job will not finish: it is not
+                     running in this process (e.g. the API restarted), or
+                     nothing changed for EVENT_IDLE seconds; the stream then
+                     ends
+    The stream also ends when the client disconnects.
+    """
+    try:
+        jobs.status(job_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        sent_preview, sent_partial, sent_progress = False, None, None
+        loop = asyncio.get_running_loop()
+        last_event = loop.time()
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(jobs.status, job_id)
+            sent = False
+            if job["preview"] is not None and not sent_preview:
+                sent_preview = sent = True
+                yield sse("preview", job["preview"])
+            partial = await asyncio.to_thread(jobs.partial, job_id)
+            if partial is not None and partial != sent_partial:
+                sent_partial, sent = partial, True
+                yield sse("partial", partial)
+            progress = {name: state["status"] for name, state in job["scripts"].items()}
+            if progress != sent_progress and job["status"] != "complete":
+                sent_progress, sent = progress, True
+                yield sse("progress", job)
+            if job["status"] == "complete" and (partial is None or partial.get("final")):
+                yield sse("complete", job)
+                return
+            if sent:
+                last_event = loop.time()
+            elif not (job["finished"] or jobs.running(job_id)) or loop.time() - last_event > EVENT_IDLE:
+                yield sse("interrupted", job)
+                return
+            await asyncio.sleep(EVENT_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
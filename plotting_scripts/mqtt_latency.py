@@ -0,0 +1,110 @@
+import os
+import sys
+
+import numpy as np
+from bokeh.plotting import figure, save
+from bokeh.io import output_file, curdoc
+from bokeh.layouts import column
+from bokeh.models import ColumnDataSource, DataTable, TableColumn, HoverTool, Div, NumberFormatter
+from bokeh.palettes import Category10
+from bokeh.themes import built_in_themes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.packets import load_packets
+from netdelay.mqtt import EXCHANGE_LABELS, MQTT_PORTS, latency_summary, match_latencies
+
+# Apply dark mode theme - add this before creating any figures
+curdoc().theme = built_in_themes["dark_minimal"]
+
+# ------------------------------------------------------------------------
+# 1. Visualization
+# ------------------------------------------------------------------------
+
+def create_layout(result, addresses, capture_start):
+    """
+    Builds a Bokeh layout with:
+      - A line with the matching statistics (messages, matched, unmatched, gaps).
+      - A table of latency percentiles per client, broker and exchange type.
+      - A scatter plot of request → response latency over time, one colour per exchange type.
+    """
+    samples = result["samples"]
+    stats = result["stats"]
+    if len(samples["latency"]) == 0:
+        ports = ", ".join(str(p) for p in MQTT_PORTS)
+        return column(Div(text=f"<h2>No MQTT request/response pairs found on port(s) {ports}.</h2>"
+                               f"<p>MQTT over TLS (port 8883) cannot be decoded.</p>", width=800))
+
+    stats_div = Div(text=(
+        f"<h3>{stats['messages']} MQTT messages decoded, {stats['matched']} request/response pairs matched, "
+        f"{stats['unmatched_responses']} unmatched responses, "
+        f"{stats['expired'] + stats['evicted'] + stats['pending_at_end']} unanswered requests, "
+        f"{stats['gaps']} stream gaps</h3>"), width=800)
+
+    summary = latency_summary(samples, addresses)
+    table_source = ColumnDataSource(data={k: summary[k] * 1000 if k in ("mean", "p50", "p95", "p99", "max")
+                                          else summary[k] for k in summary})
+    ms = NumberFormatter(format="0.000")
+    columns = [
+        TableColumn(field="client", title="Client"),
+        TableColumn(field="broker", title="Broker"),
+        TableColumn(field="exchange", title="Exchange"),
+        TableColumn(field="count", title="Count"),
+        TableColumn(field="mean", title="Mean (ms)", formatter=ms),
+        TableColumn(field="p50", title="p50 (ms)", formatter=ms),
+        TableColumn(field="p95", title="p95 (ms)", formatter=ms),
+        TableColumn(field="p99", title="p99 (ms)", formatter=ms),
+        TableColumn(field="max", title="Max (ms)", formatter=ms),
+    ]
+    data_table = DataTable(source=table_source, columns=columns, width=1000, height=300)
+
+    scatter = figure(title="MQTT Request → Response Latency", x_axis_label="Time (s since capture start)",
+                     y_axis_label="Latency (ms)", width=1000, height=400,
+                     tools="pan,wheel_zoom,box_zoom,reset")
+    palette = Category10[10]
+    for code in np.unique(samples["exchange"]):
+        mine = samples["exchange"] == code
+        source = ColumnDataSource(data={
+            "time": samples["time"][mine] - capture_start,
+            "latency": samples["latency"][mine] * 1000,
+            "client": addresses[samples["client"][mine]],
+            "broker": addresses[samples["broker"][mine]],
+            "packet_id": samples["packet_id"][mine],
+        })
+        scatter.scatter("time", "latency", source=source, size=6, alpha=0.7,
+                        color=palette[int(code) % len(palette)], legend_label=EXCHANGE_LABELS[code])
+    scatter.add_tools(HoverTool(tooltips=[
+        ("Client", "@client"),
+        ("Broker", "@broker"),
+        ("Packet ID", "@packet_id"),
+        ("Latency (ms)", "@latency{0.000}")
+    ]))
+    scatter.legend.location = "top_right"
+    scatter.legend.click_policy = "hide"
+
+    return column(stats_div, data_table, scatter)
+
+# ------------------------------------------------------------------------
+# 2. Main Script
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python mqtt_latency.py <pcapng_file>")
+        sys.exit(1)
+
+    pcapng_file = sys.argv[1]
+    table = load_packets(pcapng_file)
+    with instrument.stage("match_latencies", packets=len(table["time"])):
+        result = match_latencies(pcapng_file, table)
+    print(f"Matched {result['stats']['matched']} MQTT request/response pairs.")
+
+    capture_start = float(np.nanmin(table["time"])) if len(table["time"]) else 0.0
+    with instrument.stage("layout"):
+        final_layout = create_layout(result, table["addresses"], capture_start)
+
+    with instrument.stage("save") as stage:
+        output_file("plot11.html")
+        save(final_layout)
+        stage["outputs"] = "plot11.html"
+    print("MQTT latency analysis saved as 'plot11.html'.")
@@ -3,7 +3,7 @@ from collections import defaultdict
 import math
 import sys
 
-from bokeh.plotting import figure, show
+from bokeh.plotting import figure, save
 from bokeh.io import output_file
 from bokeh.layouts import column, row
 from bokeh.models import (
@@ -14,6 +14,10 @@ from bokeh.palettes import Category10
 from bokeh.themes import built_in_themes
 from bokeh.io import curdoc
 import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
 
 # Apply dark mode theme - add this before creating any figures
 curdoc().theme = built_in_themes["dark_minimal"]
@@ -207,8 +211,13 @@ if __name__ == "__main__":
         sys.exit(1)
 
     pcapng_file = sys.argv[1]
-    total_loss, ip_loss, total_packets = analyze_pcapng(pcapng_file)
-    final_layout = create_layout(total_loss, ip_loss, total_packets)
-
-    output_file("plot8.html")
-    show(final_layout)
+    with instrument.stage("pyshark") as stage:
+        total_loss, ip_loss, total_packets = analyze_pcapng(pcapng_file)
+        stage["packets"] = total_packets
+    with instrument.stage("layout"):
+        final_layout = create_layout(total_loss, ip_loss, total_packets)
+
+    with instrument.stage("save") as stage:
+        output_file("plot8.html")
+        save(final_layout)
+        stage["outputs"] = "plot8.html"
@@ -1,7 +1,7 @@
 from scapy.all import rdpcap, TCP, IP
 from collections import defaultdict
 from math import pi
-from bokeh.plotting import figure, show, output_file, save
+from bokeh.plotting import figure, output_file, save
 from bokeh.models import ColumnDataSource, DataTable, TableColumn, HoverTool, Select, CustomJS
 from bokeh.layouts import column, row, gridplot
 from bokeh.transform import cumsum
@@ -12,6 +12,13 @@ import numpy as np
 import copy
 from bokeh.themes import built_in_themes
 from bokeh.io import curdoc
+import os
+import re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.tables import write_table
+from netdelay.views import paged_table
 
 # Apply dark mode theme - add this before creating any figures
 curdoc().theme = built_in_themes["dark_minimal"]
@@ -23,7 +30,9 @@ if len(sys.argv) < 2:
 pcap_file=sys.argv[1]
 # Read all packets using Scapy
 print(f"Reading packets from {pcap_file}...")
+instrument.begin("rdpcap")
 packets = rdpcap(pcap_file)
+instrument.end(packets=len(packets))
 print(f"Read {len(packets)} packets.")
 
 
@@ -48,6 +57,7 @@ def identify_protocol(pkt):
 
 
 print("Analyzing delta times per protocol...")
+instrument.begin("protocol_delta_times")
 # Compute delta time manually and group by protocol
 protocol_delta_sum = defaultdict(float)
 prev_time = None
@@ -62,12 +72,14 @@ for pkt in packets:
 
 # Calculate the total delta time across all protocols
 total_delta = sum(protocol_delta_sum.values())
+instrument.end(packets=len(packets))
 
 print("Tracking conversations per protocol...")
 ##############################################
 # Track conversations per protocol
 ##############################################
 # Track conversations (src_ip, dst_ip) per protocol
+instrument.begin("protocol_conversations")
 protocol_conversations = defaultdict(lambda: defaultdict(int))
 
 for pkt in packets:
@@ -81,6 +93,7 @@ for pkt in packets:
         
         # Increment conversation count for this protocol
         protocol_conversations[proto][conv_key] += 1
+instrument.end(packets=len(packets))
 
 print("Creating bar chart...")
 ##############################################
@@ -113,8 +126,10 @@ bar_chart.y_range.start = 0
 bar_chart.xaxis.major_label_orientation = 1
 
 # Save bar chart
+instrument.begin("plot6 save")
 output_file("plot6.html")
 save(bar_chart)
+instrument.end(outputs="plot6.html")
 print("Bar chart saved as 'plot6.html'.")
 
 print("Creating data table...")
@@ -146,8 +161,10 @@ data_table = DataTable(source=table_source, columns=columns, width=500, height=2
 
 # Save data table in its own HTML file (wrapped in a layout)
 table_layout = column(data_table)
+instrument.begin("plot5 save")
 output_file("plot5.html")
 save(table_layout)
+instrument.end(outputs="plot5.html")
 print("Data table saved as 'plot5.html'.")
 
 print("Creating pie chart with increased size...")
@@ -209,8 +226,10 @@ pie_chart.axis.visible = False
 pie_chart.grid.grid_line_color = None
 
 # Save pie chart
+instrument.begin("plot4 save")
 output_file("plot4.html")
 save(pie_chart)
+instrument.end(outputs="plot4.html")
 print("Larger pie chart saved as 'plot4.html'.")
 
 print("Creating top conversations charts...")
@@ -277,30 +296,29 @@ def create_conversation_chart(protocol, conv_data):
 
 # Create conversation data tables
 def create_conversation_table(protocol, conv_data):
-    # Get top 5 conversations by packet count
-    top_5_convs = sorted(conv_data.items(), key=lambda x: x[1], reverse=True)[:5]
+    # All conversations by packet count, paged through the analysis API
+    convs = sorted(conv_data.items(), key=lambda x: x[1], reverse=True)
     
-    if not top_5_convs:
+    if not convs:
         return None  # Skip if no conversations for this protocol
     
-    # Create a DataFrame for the table
-    df = pd.DataFrame({
-        "Conversation": [conv[0] for conv in top_5_convs],
-        "Packet Count": [int(conv[1]) for conv in top_5_convs],  # Convert to int
+    # Store the table; the protocol name becomes part of its id
+    table_id = "protocol-conversations-" + re.sub(r"[^A-Za-z0-9_-]+", "-", protocol)
+    write_table(table_id, {
+        "Conversation": [conv[0] for conv in convs],
+        "Packet Count": [int(conv[1]) for conv in convs],  # Convert to int
     })
     
-    source = ColumnDataSource(df)
-    
     # Define columns
     columns = [
         TableColumn(field="Conversation", title="Source → Destination"),
         TableColumn(field="Packet Count", title="Packet Count"),
     ]
     
-    # Create the table
-    data_table = DataTable(
-        source=source, 
-        columns=columns, 
+    # Create the table, showing its first page
+    data_table, _, _ = paged_table(
+        columns,
+        table_id=table_id,
         width=600, 
         height=150,
         index_position=None
@@ -581,8 +599,10 @@ else:
     )
     
     # Save as a standalone HTML file
+    instrument.begin("plot7 save")
     output_file("plot7.html")
     save(layout)
+    instrument.end(outputs="plot7.html")
     print("Improved protocol selector dashboard saved as 'plot7.html'.")
 
 print("Analysis complete. All visualizations have been saved.")
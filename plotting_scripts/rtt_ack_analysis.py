@@ -1,12 +1,23 @@
-import pyshark
+import os
 import numpy as np
 import sys
-from bokeh.plotting import figure, output_file, show
+from bokeh.plotting import figure, output_file, save
 from bokeh.models import (ColumnDataSource, DataTable, TableColumn, CustomJS,
                           Select, Div, HoverTool, LinearColorMapper)
 from bokeh.layouts import column, row, Spacer
 from bokeh.palettes import Viridis256, Category10
-from bokeh.models import FactorRange
+from bokeh.models import FactorRange, CDSView, AllIndices
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.packets import load_packets
+from netdelay.delayed_ack import DELAYED_ACK_MAX, KIND_DELAYED, KIND_LABELS, classify_acks, label_outliers
+from netdelay.decimate import POINT_BUDGET, decimate, outlier_threshold
+from netdelay.density import write_density
+from netdelay.encoding import capture_start, compact_data
+from netdelay.tables import write_table
+from netdelay.views import (apply_part, code_filter, density_plot, group_color, group_filter, group_legend,
+                            lazy_select, paged_table, reload_on_zoom, series_payload, served_url, write_payload)
 from bokeh.themes import built_in_themes
 from bokeh.io import curdoc
 
@@ -28,6 +39,7 @@ BACKGROUND_COLOR = "#f5f5f5"
 BORDER_RADIUS = "10px"
 TEXT_COLOR = "#333333"
 HIGHLIGHT_COLOR = "#4a86e8"
+TIME_LABEL = "Time (s since capture start)"
 
 # ---------------------------
 # Function to create elegant CSS styling
@@ -88,12 +100,13 @@ def get_elegant_css():
 # Helper: Create a ColumnDataSource from data
 # ---------------------------
 def create_source(data, keys):
+    # Typed NumPy columns are embedded as binary instead of JSON text
     if isinstance(data, dict):
-        return ColumnDataSource(data)
+        return ColumnDataSource(compact_data(data))
     if not data:
         return ColumnDataSource({key: [] for key in keys})
     converted = {key: [d.get(key, None) for d in data if isinstance(d, dict)] for key in keys}
-    return ColumnDataSource(converted)
+    return ColumnDataSource(compact_data(converted))
 
 # ---------------------------
 # Style a figure with elegant design elements
@@ -130,37 +143,65 @@ def style_figure(p, title):
     p.add_tools(HoverTool(tooltips=tooltips))
     
     return p
+
+# ---------------------------
+# Note shown in section headers when a series was decimated
+# ---------------------------
+def points_note(shown, total):
+    if shown >= total:
+        return ""
+    return f" ({shown:,} of {total:,} points shown, zoom in for full resolution)"
+
 # ---------------------------
 # Data Extraction: Extract ACK_RTT values and IP packet times.
 # ---------------------------
 if len(sys.argv) < 2:
-    print("Usage: python generate.py <pcapng_file>")
+    print("Usage: python generate.py <pcapng_file> [point_budget]")
     sys.exit(1)
 
 pcap_file=sys.argv[1]
+# Points per plotted series; outliers are kept on top of the budget
+point_budget = int(sys.argv[2]) if len(sys.argv) > 2 else POINT_BUDGET
+
+# ---------------------------
+# Read the capture once into a packet table (see netdelay.packets) and
+# classify each ACK from its TCP header (pure / piggybacked, segments
+# covered); an ACK's RTT is the delay to the segment it acknowledges, as
+# Wireshark reports it in tcp.analysis.ack_rtt
+# ---------------------------
+instrument.begin("classify_acks")
+packet_table = load_packets(pcap_file)
+acks = classify_acks(packet_table)
+addresses = np.asarray(packet_table["addresses"], dtype=object)
+ipv4 = packet_table["ip_version"] == 4
+ip_rows = np.flatnonzero(ipv4)
+ack_rows = np.flatnonzero(ipv4 & ~np.isnan(acks["ack_delay"]))
+ack_kind = acks["kind"][ack_rows]
+ack_rtt = acks["ack_delay"][ack_rows]
+# A single-segment pure ACK within the timer bound was held back by the
+# receiver (delayed ACK); its RTT says nothing about the path.
+delayed = (ack_kind == KIND_DELAYED) & (ack_rtt <= DELAYED_ACK_MAX)
+
+ip_times = [{"time": t, "src": src, "dst": dst}
+            for t, src, dst in zip(packet_table["time"][ip_rows].tolist(),
+                                   addresses[packet_table["src"][ip_rows]].tolist(),
+                                   addresses[packet_table["dst"][ip_rows]].tolist())]
+ack_rtt_list = [{"time": t, "ack_rtt": rtt, "src": src, "dst": dst, "length": length,
+                 "ack_kind": KIND_LABELS[kind], "delayed_ack": is_delayed}
+                for t, rtt, src, dst, length, kind, is_delayed in zip(
+                    packet_table["time"][ack_rows].tolist(), ack_rtt.tolist(),
+                    addresses[packet_table["src"][ack_rows]].tolist(),
+                    addresses[packet_table["dst"][ack_rows]].tolist(),
+                    packet_table["wire_len"][ack_rows].tolist(), ack_kind.tolist(), delayed.tolist())]
+instrument.end(packets=len(packet_table["time"]))
 
-ack_rtt_list = []
-ip_times = []
-
-capture = pyshark.FileCapture(pcap_file, display_filter="ip")
-for packet in capture:
-    try:
-        if (hasattr(packet, 'ip') and hasattr(packet, 'tcp') and 
-            hasattr(packet.tcp, 'analysis_ack_rtt')):
-            ts = float(packet.sniff_timestamp)
-            ack_rtt = float(packet.tcp.analysis_ack_rtt)
-            src = packet.ip.src
-            dst = packet.ip.dst
-            length = int(packet.frame_info.len) if hasattr(packet, 'frame_info') and hasattr(packet.frame_info, 'len') else None
-            ack_rtt_list.append({"time": ts, "ack_rtt": ack_rtt, "src": src, "dst": dst, "length": length})
-        if hasattr(packet, 'ip'):
-            ts = float(packet.sniff_timestamp)
-            src = packet.ip.src
-            dst = packet.ip.dst
-            ip_times.append({"time": ts, "src": src, "dst": dst})
-    except Exception:
-        continue
-capture.close()
+# ---------------------------
+# Times are seconds since the capture start from here on (compact as float32)
+# ---------------------------
+start_time = capture_start([d["time"] for d in ip_times])
+for d in ack_rtt_list + ip_times:
+    d["time"] -= start_time
+time_note = f"<p>Times are seconds since the capture start ({start_time:.6f} epoch).</p>"
 
 # ---------------------------
 # Group data by conversations and sources
@@ -201,6 +242,7 @@ def compute_delays_by_conversation(ip_data):
         conv_delays[key] = {"times": delay_times, "delays": delays}
     return conv_delays
 
+instrument.begin("compute_delays_by_conversation")
 conv_delays = compute_delays_by_conversation(ip_times)
 
 def group_delays_by_source(conv_delays):
@@ -210,286 +252,286 @@ def group_delays_by_source(conv_delays):
     return groups
 
 delays_by_source = group_delays_by_source(conv_delays)
+instrument.end(packets=len(ip_times))
 
 # ---------------------------
-# Create correlation plot for outliers
+# Outlier rows for the correlation plot
 # ---------------------------
-def add_correlation_plot(layout, ack_items, group_name):
+CORR_KEYS = ["time", "ack_rtt", "length", "src", "dst", "ack_kind"]
+CORR_PLOT_KEYS = ["time", "ack_rtt", "length", "cause"]
+# Outlier causes, plotted as codes into this table
+CAUSES = ["Path delay", "Delayed ACK"]
+CAUSE_COLORS = ["#9b59b6", "#e74c3c"]
+
+def outlier_columns(outlier_items, table_id):
+    # The full rows go to a paged table; the plot only needs numbers
+    causes = [int(bool(d.get("delayed_ack"))) for d in outlier_items]
+    table = {key: [d.get(key) for d in outlier_items] for key in CORR_KEYS}
+    table["cause"] = [CAUSES[c] for c in causes]
+    write_table(table_id, table)
+    return {"time": table["time"], "ack_rtt": table["ack_rtt"], "length": table["length"], "cause": causes}
+
+def correlation_part(ack_items, group_name, table_id):
     ack_vals = [d["ack_rtt"] for d in ack_items if d.get("ack_rtt") is not None]
     if not ack_vals:
-        return layout
+        return None
     
-    arr = np.array(ack_vals)
-    mean_val = np.mean(arr)
-    std_val = np.std(arr)
-    threshold = mean_val + 2 * std_val
+    threshold = outlier_threshold(ack_vals)
     outlier_items = [d for d in ack_items if d["ack_rtt"] > threshold and d.get("length") is not None]
     
     if not outlier_items:
-        return layout
+        return None
+    # Keep the strongest outliers of each time slice when there are too many to draw
+    outlier_items.sort(key=lambda d: d["time"])
+    keep = decimate([d["time"] for d in outlier_items], [d["ack_rtt"] for d in outlier_items],
+                    point_budget, method="minmax")
+    outlier_items = [outlier_items[i] for i in keep]
+    
+    # Delayed ACKs first, then path delay
+    outlier_items.sort(key=lambda d: not d.get("delayed_ack"))
+    return {"data": outlier_columns(outlier_items, table_id), "table": table_id,
+            "title": f"Length vs ACK_RTT Outliers - {group_name}"}
+
+# ---------------------------
+# Decimated series for one view (see netdelay.views)
+# ---------------------------
+def series_part(payload, title, header, table_id, table_data):
+    # The table rows are paged by the analysis API, not embedded
+    write_table(table_id, table_data)
+    payload["table"] = table_id
+    payload["title"] = title
+    shown = len(payload["data"]["time"])
+    payload["header"] = f'<div class="section-header">{header}{points_note(shown, payload["total"])}</div>'
+    return payload
+
+# ---------------------------
+# View templates: filled with the first view, then swapped on selection
+# ---------------------------
+ALL_DESTINATIONS = "All destinations"
+
+def build_series_section(y_field, y_label, keys, table_columns, color=None):
+    source = create_source([], keys)
+    p = figure(x_axis_label=TIME_LABEL, y_axis_label=y_label,
+               width=PLOT_WIDTH, height=PLOT_HEIGHT)
+    p = style_figure(p, "")
+    target = {"source": source}
+    table_layout, table_source, table_info = paged_table(table_columns, width=TABLE_WIDTH, height=TABLE_HEIGHT,
+                                                         css_classes=["elegant-data-table"])
+    target.update({"table": table_source, "table_info": table_info})
+    if color is None:
+        # One shared source for all destinations, which are codes into the
+        # lookup table of the series: a view filters the scatter, the table
+        # asks the analysis API for the same destination.
+        dst_select = Select(title="Destination", value=ALL_DESTINATIONS, options=[ALL_DESTINATIONS], width=300)
+        all_rows = AllIndices()
+        one_destination = group_filter(dst_select)
+        view = CDSView(filter=all_rows)
+        p.scatter("time", y_field, name=y_field, source=source, view=view, size=8,
+                  color=group_color(source), alpha=0.7)
+        target["legend"] = group_legend(p, size=8, alpha=0.7)
+        p.legend.location = "top_left"
+        p.legend.background_fill_alpha = 0.7
+        p.legend.border_line_color = None
         
+        dst_select.js_on_change("value", CustomJS(args=dict(view=view, all_rows=all_rows,
+                                                            one_destination=one_destination,
+                                                            table_source=table_source), code="""
+            const all = cb_obj.value === cb_obj.options[0];
+            if (all) {
+                view.filter = all_rows;
+            } else if (view.filter === one_destination) {
+                one_destination.change.emit();
+            } else {
+                view.filter = one_destination;
+            }
+            table_source.tags = [Object.assign({}, table_source.tags[0], {
+                offset: 0, filter_column: all ? null : "dst", filter_value: all ? null : cb_obj.value})];
+        """))
+        target["filter"] = dst_select
+    else:
+        p.scatter("time", y_field, name=y_field, source=source, size=8,
+                  color=color, alpha=0.7)
+    reload_on_zoom(p, source)
+    
+    header = Div(text="")
+    controls = [target["filter"]] if "filter" in target else []
+    section = column(header, *controls, row(p, Spacer(width=SPACER_WIDTH), table_layout))
+    target.update({"x_range": p.x_range, "figure": p, "header": header, "layout": section})
+    return section, target
+
+def build_correlation_section():
+    corr_source = create_source([], CORR_PLOT_KEYS)
     p_corr = figure(x_axis_label="Packet Length", y_axis_label="ACK_RTT (sec)",
                     width=PLOT_WIDTH, height=PLOT_HEIGHT)
-    p_corr = style_figure(p_corr, f"Length vs ACK_RTT Outliers - {group_name}")
-    
-    outlier_minimal = [d for d in outlier_items if d.get("length") == 54]
-    outlier_regular = [d for d in outlier_items if d.get("length") != 54]
-    
-    if outlier_minimal:
-        src_min = create_source(outlier_minimal, ["time", "ack_rtt", "length", "src", "dst"])
-        p_corr.scatter("length", "ack_rtt", source=src_min, size=10, color="#e74c3c", alpha=0.8, legend_label="Minimal ACK")
-    
-    if outlier_regular:
-        src_reg = create_source(outlier_regular, ["time", "ack_rtt", "length", "src", "dst"])
-        p_corr.scatter("length", "ack_rtt", source=src_reg, size=10, color="#9b59b6", alpha=0.8, legend_label="Other")
+    p_corr = style_figure(p_corr, "Length vs ACK_RTT Outliers")
+    for code, (cause, color) in enumerate(zip(CAUSES, CAUSE_COLORS)):
+        p_corr.scatter("length", "ack_rtt", source=corr_source, view=CDSView(filter=code_filter("cause", code)),
+                       size=10, color=color, alpha=0.8, legend_label=cause)
     
     p_corr.legend.location = "top_left"
     p_corr.legend.border_line_color = None
     p_corr.legend.background_fill_alpha = 0.7
     
-    all_outliers = outlier_minimal + outlier_regular
-    src_corr = create_source(all_outliers, ["time", "ack_rtt", "length", "src", "dst"])
     columns_corr = [
-        TableColumn(field="time", title="Time (Epoch)"),
+        TableColumn(field="time", title="Time (s)"),
         TableColumn(field="ack_rtt", title="ACK_RTT (sec)"),
         TableColumn(field="length", title="Length"),
         TableColumn(field="src", title="Source"),
-        TableColumn(field="dst", title="Destination")
+        TableColumn(field="dst", title="Destination"),
+        TableColumn(field="ack_kind", title="ACK Type"),
+        TableColumn(field="cause", title="Cause")
     ]
-    table_corr = DataTable(source=src_corr, columns=columns_corr, width=TABLE_WIDTH, 
-                           height=TABLE_HEIGHT, css_classes=["elegant-data-table"])
+    table_corr, table_source, table_info = paged_table(columns_corr, width=TABLE_WIDTH, height=TABLE_HEIGHT,
+                                                       css_classes=["elegant-data-table"])
     
     header = Div(text=f'<div class="section-header">Outlier Correlation Analysis</div>')
-    return column(layout, header, row(p_corr, Spacer(width=SPACER_WIDTH), table_corr))
+    section = column(header, row(p_corr, Spacer(width=SPACER_WIDTH), table_corr))
+    return section, {"source": corr_source, "figure": p_corr, "layout": section,
+                     "table": table_source, "table_info": table_info}
+
+def build_lazy_layout(heading, select_title, files, first_payload, sections):
+    targets = {}
+    for key, (section, target) in sections.items():
+        apply_part(target, first_payload[key])
+        targets[key] = target
+    
+    options = sorted(files)
+    select = Select(title=select_title, value=options[0], options=options, width=300)
+    status = Div(text="")
+    lazy_select(select, status, files, targets)
+    
+    title = Div(text=f"<h2 style='color:#4a86e8;margin-bottom:5px'>{heading}</h2>{time_note}")
+    return column(get_elegant_css(), title, select, status, *[s for s, _ in sections.values()])
 
 # ---------------------------
 # Build conversation view layout
 # ---------------------------
-def build_conversation_layout(ack_groups, delay_groups):
-    layouts = []
-    conv_names = []
+def build_conversation_layout(ack_groups, delay_groups, data_dir="plot1_data"):
+    # Each conversation is written to its own data file and fetched when selected;
+    # only the first one is embedded in the page.
+    prefix = os.path.basename(data_dir).replace("_data", "")
+    files = {}
+    first_name, first_payload = None, None
     
-    for key, ack_items in ack_groups.items():
+    for conv_idx, (key, ack_items) in enumerate(ack_groups.items()):
         name = f"{key[0]} → {key[1]}"
-        conv_names.append(name)
         ack_items.sort(key=lambda d: d["time"])
         
-        # ACK RTT plot
-        times_ack = [d["time"] for d in ack_items]
-        ack_vals = [d["ack_rtt"] for d in ack_items]
-        lengths_ack = [d.get("length") for d in ack_items]
-        
-        ack_dict = {"time": times_ack, "ack_rtt": ack_vals, "length": lengths_ack}
-        ack_source = create_source(ack_dict, ["time", "ack_rtt", "length"])
+        # ACK RTT series
+        ack_dict = {"time": [d["time"] for d in ack_items],
+                    "ack_rtt": [d["ack_rtt"] for d in ack_items],
+                    "length": [d.get("length") for d in ack_items]}
+        ack_part = series_payload({k: ack_dict[k] for k in ("time", "ack_rtt")}, "time", "ack_rtt",
+                                  os.path.join(data_dir, f"conv{conv_idx}_ack.bin"), budget=point_budget)
+        payload = {"ack": series_part(ack_part, f"ACK Round-Trip Time - {name}", "ACK RTT Analysis",
+                                      f"{prefix}-conv{conv_idx}-ack", ack_dict),
+                   "delay": None}
         
-        p_ack = figure(x_axis_label="Time (Epoch)", y_axis_label="ACK_RTT (sec)",
-                       width=PLOT_WIDTH, height=PLOT_HEIGHT)
-        p_ack = style_figure(p_ack, f"ACK Round-Trip Time - {name}")
-        p_ack.scatter("time", "ack_rtt", name="ack_rtt", source=ack_source, size=8, 
-                      color=HIGHLIGHT_COLOR, alpha=0.7)
-        
-        columns_ack = [
-            TableColumn(field="time", title="Time (Epoch)"),
-            TableColumn(field="ack_rtt", title="ACK_RTT (sec)")
-        ]
-        table_ack = DataTable(source=ack_source, columns=columns_ack, width=TABLE_WIDTH,
-                              height=TABLE_HEIGHT, css_classes=["elegant-data-table"])
-        
-        ack_header = Div(text=f'<div class="section-header">ACK RTT Analysis</div>')
-        ack_layout = column(ack_header, row(p_ack, Spacer(width=SPACER_WIDTH), table_ack))
-        
-        # Delay plot if available
+        # Delay series if available
         if key in delay_groups:
-            delay_data = delay_groups[key]
-            times_delay = delay_data["times"]
-            delay_vals = delay_data["delays"]
-            
-            delay_dict = {"time": times_delay, "delay": delay_vals}
-            delay_source = create_source(delay_dict, ["time", "delay"])
-            
-            p_delay = figure(x_axis_label="Time (Epoch)", y_axis_label="Delay (sec)",
-                           width=PLOT_WIDTH, height=PLOT_HEIGHT)
-            p_delay = style_figure(p_delay, f"Packet Delay - {name}")
-            p_delay.scatter("time", "delay", name="delay", source=delay_source, size=8, 
-                          color="#2ecc71", alpha=0.7)
-            
-            columns_delay = [
-                TableColumn(field="time", title="Time (Epoch)"),
-                TableColumn(field="delay", title="Delay (sec)")
-            ]
-            table_delay = DataTable(source=delay_source, columns=columns_delay, width=TABLE_WIDTH,
-                                  height=TABLE_HEIGHT, css_classes=["elegant-data-table"])
-            
-            delay_header = Div(text=f'<div class="section-header">Packet Delay Analysis</div>')
-            delay_layout = column(delay_header, row(p_delay, Spacer(width=SPACER_WIDTH), table_delay))
-            full_layout = column(ack_layout, delay_layout)
-        else:
-            full_layout = ack_layout
+            delay_dict = {"time": delay_groups[key]["times"], "delay": delay_groups[key]["delays"]}
+            delay_part = series_payload(delay_dict, "time", "delay",
+                                        os.path.join(data_dir, f"conv{conv_idx}_delay.bin"), budget=point_budget)
+            payload["delay"] = series_part(delay_part, f"Packet Delay - {name}", "Packet Delay Analysis",
+                                           f"{prefix}-conv{conv_idx}-delay", delay_dict)
         
-        # Add correlation plot
-        full_layout = add_correlation_plot(full_layout, ack_items, name)
-        full_layout.tags = [name]
-        full_layout.visible = False
-        layouts.append(full_layout)
+        payload["corr"] = correlation_part(ack_items, name, f"{prefix}-conv{conv_idx}-outliers")
+        path = os.path.join(data_dir, f"conv{conv_idx}.json")
+        write_payload(path, payload)
+        files[name] = path.replace(os.sep, "/")
+        if first_name is None or name < first_name:
+            first_name, first_payload = name, payload
     
-    if not layouts:
+    if not files:
         return column(Div(text="No conversation data available."))
     
-    layouts[0].visible = True
-    container = column(*layouts)
-    options = sorted(list(set(conv_names)))
-    
-    select = Select(title="Select Conversation", value=options[0], options=options, width=300)
-    callback = CustomJS(args=dict(container=container), code="""
-        var selected = cb_obj.value;
-        for (var i = 0; i < container.children.length; i++){
-            var name = container.children[i].tags[0];
-            container.children[i].visible = (name === selected);
-        }
-    """)
-    select.js_on_change('value', callback)
-    
-    title = Div(text="<h2 style='color:#4a86e8;margin-bottom:5px'>Conversation Analysis</h2>")
-    return column(get_elegant_css(), title, select, container)
+    sections = {
+        "ack": build_series_section("ack_rtt", "ACK_RTT (sec)", ["time", "ack_rtt"], [
+            TableColumn(field="time", title="Time (s)"),
+            TableColumn(field="ack_rtt", title="ACK_RTT (sec)")
+        ], color=HIGHLIGHT_COLOR),
+        "delay": build_series_section("delay", "Delay (sec)", ["time", "delay"], [
+            TableColumn(field="time", title="Time (s)"),
+            TableColumn(field="delay", title="Delay (sec)")
+        ], color="#2ecc71"),
+        "corr": build_correlation_section(),
+    }
+    return build_lazy_layout("Conversation Analysis", "Select Conversation", files, first_payload, sections)
 
 # ---------------------------
 # Build source IP view layout
 # ---------------------------
-def build_source_layout(ack_data, delay_data):
-    layouts = []
-    source_names = []
+def build_source_layout(ack_data, delay_data, data_dir="plot2_data"):
+    prefix = os.path.basename(data_dir).replace("_data", "")
+    files = {}
+    first_name, first_payload = None, None
     ack_src_groups = group_by_source(ack_data)
     delay_src_groups = group_by_source(delay_data)
+    palette = Category10[10]
     
-    for src, ack_items in ack_src_groups.items():
-        source_names.append(src)
-        dest_groups = {}
-        for d in ack_items:
-            dest_groups.setdefault(d["dst"], []).append(d)
-        
-        p_ack = figure(x_axis_label="Time (Epoch)", y_axis_label="ACK_RTT (sec)",
-                     width=PLOT_WIDTH, height=PLOT_HEIGHT)
-        p_ack = style_figure(p_ack, f"Source IP Analysis - {src}")
-        
-        table_rows = []
-        palette = Category10[10]
-        for idx, (dst, items) in enumerate(dest_groups.items()):
-            items.sort(key=lambda d: d["time"])
-            times = [d["time"] for d in items]
-            ack_vals = [d["ack_rtt"] for d in items]
-            lengths = [d.get("length") for d in items]
-            color = palette[idx % len(palette)]
-            
-            source_dst = create_source({"time": times, "ack_rtt": ack_vals, "length": lengths}, 
-                                      ["time", "ack_rtt", "length"])
-            p_ack.scatter("time", "ack_rtt", name="ack_rtt", source=source_dst, size=8, 
-                        color=color, alpha=0.7, legend_label=f"to {dst}")
-            
-            table_rows.extend([{"time": t, "ack_rtt": a, "dst": dst, "length": l} 
-                             for t, a, l in zip(times, ack_vals, lengths)])
-        
-        p_ack.legend.location = "top_left"
-        p_ack.legend.background_fill_alpha = 0.7
-        p_ack.legend.border_line_color = None
-        
-        ack_header = Div(text=f'<div class="section-header">ACK RTT by Destination</div>')
-        table_ack = DataTable(
-            source=create_source(table_rows, ["time", "ack_rtt", "dst", "length"]),
-            columns=[
-                TableColumn(field="time", title="Time (Epoch)"),
-                TableColumn(field="ack_rtt", title="ACK_RTT (sec)"),
-                TableColumn(field="dst", title="Destination"),
-                TableColumn(field="length", title="Length")
-            ],
-            width=TABLE_WIDTH, height=TABLE_HEIGHT, css_classes=["elegant-data-table"]
-        )
-        
-        ack_layout = column(ack_header, row(p_ack, Spacer(width=SPACER_WIDTH), table_ack))
+    def destination_series(items, y_field, keys, path):
+        items.sort(key=lambda d: d["time"])
+        # Colours follow the order in which destinations first appear
+        colors = {}
+        for d in items:
+            colors.setdefault(d["dst"], palette[len(colors) % len(palette)])
+        data = {key: [d.get(key) for d in items] for key in keys}
+        # The plot gets time, value and destination code; the table gets every column
+        series = {key: data[key] for key in ("time", y_field, "dst")}
+        return series_payload(series, "time", y_field, path, budget=point_budget, group="dst",
+                              expand={"color": colors.get, "legend": lambda dst: f"to {dst}"}), data
+    
+    for src_idx, (src, ack_items) in enumerate(ack_src_groups.items()):
+        ack_part, ack_table = destination_series(ack_items, "ack_rtt", ["time", "ack_rtt", "length", "dst"],
+                                                 os.path.join(data_dir, f"src{src_idx}_ack.bin"))
+        payload = {"ack": series_part(ack_part, f"Source IP Analysis - {src}", "ACK RTT by Destination",
+                                      f"{prefix}-src{src_idx}-ack", ack_table),
+                   "delay": None}
         
-        # Create delay analysis if available
+        # Delay analysis if available
         if src in delay_src_groups:
-            delay_items = delay_src_groups[src]
-            dest_delay_groups = {}
-            for d in delay_items:
-                dest_delay_groups.setdefault(d["dst"], []).append(d)
-            
-            p_delay = figure(x_axis_label="Time (Epoch)", y_axis_label="Delay (sec)",
-                           width=PLOT_WIDTH, height=PLOT_HEIGHT)
-            p_delay = style_figure(p_delay, f"Packet Delay Analysis - {src}")
-            
-            table_delay_rows = []
-            for idx, (dst, items) in enumerate(dest_delay_groups.items()):
-                items.sort(key=lambda d: d["time"])
-                times = [d["time"] for d in items]
-                delay_vals = [d["delay"] for d in items]
-                color = palette[idx % len(palette)]
-                
-                src_delay = create_source({"time": times, "delay": delay_vals, "dst": [dst]*len(times)}, 
-                                        ["time", "delay", "dst"])
-                p_delay.scatter("time", "delay", name="delay", source=src_delay, size=8, 
-                              color=color, alpha=0.7, legend_label=f"to {dst}")
-                
-                table_delay_rows.extend([{"time": t, "delay": d_val, "dst": dst} 
-                                       for t, d_val in zip(times, delay_vals)])
-            
-            p_delay.legend.location = "top_left"
-            p_delay.legend.background_fill_alpha = 0.7
-            p_delay.legend.border_line_color = None
-            
-            delay_header = Div(text=f'<div class="section-header">Packet Delays by Destination</div>')
-            table_delay = DataTable(
-                source=create_source(table_delay_rows, ["time", "delay", "dst"]),
-                columns=[
-                    TableColumn(field="time", title="Time (Epoch)"),
-                    TableColumn(field="delay", title="Delay (sec)"),
-                    TableColumn(field="dst", title="Destination")
-                ],
-                width=TABLE_WIDTH, height=TABLE_HEIGHT, css_classes=["elegant-data-table"]
-            )
-            
-            delay_layout = column(delay_header, row(p_delay, Spacer(width=SPACER_WIDTH), table_delay))
-            full_layout = column(ack_layout, delay_layout)
-        else:
-            full_layout = ack_layout
+            delay_part, delay_table = destination_series(delay_src_groups[src], "delay", ["time", "delay", "dst"],
+                                                         os.path.join(data_dir, f"src{src_idx}_delay.bin"))
+            payload["delay"] = series_part(delay_part, f"Packet Delay Analysis - {src}",
+                                           "Packet Delays by Destination", f"{prefix}-src{src_idx}-delay",
+                                           delay_table)
         
-        # Add correlation plot
-        full_layout = add_correlation_plot(full_layout, ack_items, src)
-        full_layout.tags = [src]
-        full_layout.visible = False
-        layouts.append(full_layout)
+        payload["corr"] = correlation_part(ack_items, src, f"{prefix}-src{src_idx}-outliers")
+        path = os.path.join(data_dir, f"src{src_idx}.json")
+        write_payload(path, payload)
+        files[src] = path.replace(os.sep, "/")
+        if first_name is None or src < first_name:
+            first_name, first_payload = src, payload
     
-    if not layouts:
+    if not files:
         return column(Div(text="No source data available."))
     
-    layouts[0].visible = True
-    container = column(*layouts)
-    options = sorted(list(set(source_names)))
-    
-    select = Select(title="Select Source IP", value=options[0], options=options, width=300)
-    callback = CustomJS(args=dict(container=container), code="""
-        var selected = cb_obj.value;
-        for (var i = 0; i < container.children.length; i++){
-            var name = container.children[i].tags[0];
-            container.children[i].visible = (name === selected);
-        }
-    """)
-    select.js_on_change('value', callback)
-    
-    title = Div(text="<h2 style='color:#4a86e8;margin-bottom:5px'>Source IP Analysis</h2>")
-    return column(get_elegant_css(), title, select, container)
+    sections = {
+        "ack": build_series_section("ack_rtt", "ACK_RTT (sec)", ["time", "ack_rtt", "code"], [
+            TableColumn(field="time", title="Time (s)"),
+            TableColumn(field="ack_rtt", title="ACK_RTT (sec)"),
+            TableColumn(field="dst", title="Destination"),
+            TableColumn(field="length", title="Length")
+        ]),
+        "delay": build_series_section("delay", "Delay (sec)", ["time", "delay", "code"], [
+            TableColumn(field="time", title="Time (s)"),
+            TableColumn(field="delay", title="Delay (sec)"),
+            TableColumn(field="dst", title="Destination")
+        ]),
+        "corr": build_correlation_section(),
+    }
+    return build_lazy_layout("Source IP Analysis", "Select Source IP", files, first_payload, sections)
 
 # ---------------------------
 # Build overview analysis with bar plots and correlation
 # ---------------------------
-def compute_percentage_outliers(data, value_field):
-    groups = group_by_source(data)
-    return {src: (np.sum(np.array([item[value_field] for item in items]) > 
-              (np.mean([item[value_field] for item in items]) + 
-               2 * np.std([item[value_field] for item in items]))) / 
-              len(items) * 100) if items else 0 
-            for src, items in groups.items()}
-
-ack_out_percent = compute_percentage_outliers(ack_rtt_list, "ack_rtt")
+# ACK RTT outliers caused by delayed ACKs are not path delay; leave them out
+instrument.begin("outliers")
+ack_sources = addresses[packet_table["src"][ack_rows]]
+ack_outliers, ack_artefacts = label_outliers(ack_rtt, ack_kind, ack_sources)
+sources, source_ids = np.unique(ack_sources, return_inverse=True)
+path_delay = np.bincount(source_ids, weights=ack_outliers & ~ack_artefacts, minlength=len(sources))
+ack_out_percent = dict(zip(sources.tolist(), (path_delay / np.bincount(source_ids) * 100).tolist()))
 delay_out_percent = {}
 delay_groups_all = {}
 
@@ -499,13 +541,11 @@ for (src, dst), d in conv_delays.items():
 for src, delays in delay_groups_all.items():
     if delays:
         arr = np.array(delays)
-        mean_val = np.mean(arr)
-        std_val = np.std(arr)
-        threshold = mean_val + 2 * std_val
-        count_out = np.sum(arr > threshold)
+        count_out = np.sum(arr > outlier_threshold(arr))
         delay_out_percent[src] = (count_out / len(arr)) * 100
     else:
         delay_out_percent[src] = 0
+instrument.end(packets=len(ip_times))
 
 def build_bar_chart(percentages, title, y_label, color):
     sources = list(percentages.keys())
@@ -561,48 +601,83 @@ delay_table_bar = DataTable(
 )
 
 # Build overall correlation analysis
-outlier_items = []
-for src, group in group_by_source(ack_rtt_list).items():
-    if group:
-        arr = np.array([d["ack_rtt"] for d in group if d.get("ack_rtt") is not None])
-        if arr.size:
-            mean_val = np.mean(arr)
-            std_val = np.std(arr)
-            threshold = mean_val + 2 * std_val
-            outlier_items.extend([d for d in group if d["ack_rtt"] > threshold and d.get("length") is not None])
+instrument.begin("correlation_outliers")
+# Every ACK RTT outlier of its source (the rule of the bar chart above)
+outlier_items = [ack_rtt_list[i] for i in np.flatnonzero(ack_outliers)]
+instrument.end(packets=len(ack_rtt_list))
 
 corr_header = Div(text=f'<div class="section-header">Overall Correlation Analysis</div>')
 p_all_corr = figure(x_axis_label="Packet Length", y_axis_label="ACK_RTT (sec)",
                    width=PLOT_WIDTH, height=PLOT_HEIGHT)
 p_all_corr = style_figure(p_all_corr, "Overall Correlation: Packet Length vs ACK_RTT")
 
-all_corr_source = create_source(outlier_items, ["time", "ack_rtt", "length", "src", "dst"])
-p_all_corr.scatter("length", "ack_rtt", name="ack_rtt", source=all_corr_source, 
-                  size=10, color="#9b59b6", alpha=0.8)
-
-table_all_corr = DataTable(
-    source=all_corr_source,
+# The outlier table is paged by the analysis API; the plot gets numbers and
+# cause codes only, one source for both glyphs, each seeing its rows through a view
+all_corr_source = create_source(outlier_columns(outlier_items, "plot3-outliers"), CORR_PLOT_KEYS)
+for code, (cause, color) in enumerate(zip(CAUSES, CAUSE_COLORS)):
+    if any(bool(d.get("delayed_ack")) == bool(code) for d in outlier_items):
+        p_all_corr.scatter("length", "ack_rtt", name="ack_rtt", source=all_corr_source,
+                           view=CDSView(filter=code_filter("cause", code)),
+                           size=10, color=color, alpha=0.8, legend_label=cause)
+if outlier_items:
+    p_all_corr.legend.location = "top_left"
+    p_all_corr.legend.border_line_color = None
+    p_all_corr.legend.background_fill_alpha = 0.7
+
+table_all_corr, _, _ = paged_table(
+    table_id="plot3-outliers",
     columns=[
-        TableColumn(field="time", title="Time (Epoch)"),
+        TableColumn(field="time", title="Time (s)"),
         TableColumn(field="ack_rtt", title="ACK_RTT (sec)"),
         TableColumn(field="length", title="Length"),
         TableColumn(field="src", title="Source IP"),
-        TableColumn(field="dst", title="Destination IP")
+        TableColumn(field="dst", title="Destination IP"),
+        TableColumn(field="ack_kind", title="ACK Type"),
+        TableColumn(field="cause", title="Cause")
     ],
     width=TABLE_WIDTH, height=TABLE_HEIGHT, css_classes=["elegant-data-table"]
 )
 
+# ---------------------------
+# Density of every ACK, rasterized so the page does not grow with the capture
+# ---------------------------
+def build_density_plot(x_field, x_label, title, path):
+    rows = [d for d in ack_rtt_list if d.get(x_field) is not None]
+    meta, image = write_density(path, [d[x_field] for d in rows], [d["ack_rtt"] for d in rows],
+                                url=served_url(path))
+    p = figure(x_axis_label=x_label, y_axis_label="ACK_RTT (sec)", width=PLOT_WIDTH, height=PLOT_HEIGHT)
+    p = style_figure(p, f"{title} ({meta['total']:,} ACKs)")
+    density_plot(p, meta, image, budget=point_budget, color=HIGHLIGHT_COLOR)
+    p.hover.tooltips = [(x_label, "$x{0.000}"), ("ACK_RTT (sec)", "$y{0.000}")]
+    return p
+
+instrument.begin("density")
+density_header = Div(text=f'<div class="section-header">ACK RTT Density (zoom in for individual ACKs)</div>')
+p_time_density = build_density_plot("time", TIME_LABEL, "ACK RTT over Time",
+                                    os.path.join("plot3_data", "ack_time_density"))
+p_length_density = build_density_plot("length", "Packet Length", "Packet Length vs ACK RTT",
+                                      os.path.join("plot3_data", "ack_length_density"))
+instrument.end(packets=len(ack_rtt_list))
+
 # Generate outputs
+instrument.begin("plot1 layout")
 ack_conv_groups = group_by_conversation(ack_rtt_list)
 conversation_layout = build_conversation_layout(ack_conv_groups, conv_delays)
+instrument.end()
+instrument.begin("plot1 save")
 output_file("plot1.html")
-show(conversation_layout)
+save(conversation_layout)
+instrument.end(outputs="plot1.html")
 
+instrument.begin("plot2 layout")
 source_layout = build_source_layout(ack_rtt_list, delays_by_source)
+instrument.end()
+instrument.begin("plot2 save")
 output_file("plot2.html")
-show(source_layout)
+save(source_layout)
+instrument.end(outputs="plot2.html")
 
-title = Div(text="<h2 style='color:#4a86e8;margin-bottom:5px'>Network Traffic Overview</h2>")
+title = Div(text=f"<h2 style='color:#4a86e8;margin-bottom:5px'>Network Traffic Overview</h2>{time_note}")
 summary_layout = column(
     get_elegant_css(),
     title,
@@ -610,8 +685,12 @@ summary_layout = column(
     row(ack_table_bar, Spacer(width=SPACER_WIDTH), delay_table_bar),
     corr_header,
     # Changed from row followed by row to a single row with all elements
-    row(p_all_corr, Spacer(width=SPACER_WIDTH), table_all_corr)
+    row(p_all_corr, Spacer(width=SPACER_WIDTH), table_all_corr),
+    density_header,
+    row(p_time_density, Spacer(width=SPACER_WIDTH), p_length_density)
 )
+instrument.begin("plot3 save")
 output_file("plot3.html")
-show(summary_layout)
+save(summary_layout)
+instrument.end(outputs="plot3.html")
 
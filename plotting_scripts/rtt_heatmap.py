@@ -0,0 +1,133 @@
+import os
+import sys
+
+import numpy as np
+from bokeh.plotting import figure, save
+from bokeh.io import output_file, curdoc
+from bokeh.layouts import column
+from bokeh.models import (ColorBar, CustomJS, CustomJSHover, Div, FixedTicker, HoverTool, LinearColorMapper,
+                          LogColorMapper, Range1d, Select)
+from bokeh.palettes import Inferno256, Viridis256
+from bokeh.themes import built_in_themes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.packets import load_packets
+from netdelay.diff import BUCKET_WIDTH
+from netdelay.heatmap import GROUPINGS, rtt_grid
+
+# Apply dark mode theme - add this before creating any figures
+curdoc().theme = built_in_themes["dark_minimal"]
+
+MAX_ROW_LABELS = 60      # rows labelled on the axis; beyond that, hover only
+ROW_HEIGHT = 14          # pixels per row, within the limits below
+MIN_HEIGHT, MAX_HEIGHT = 300, 1600
+TITLES = {"source": "Source IP", "conversation": "Conversation"}
+
+# ------------------------------------------------------------------------
+# 1. Visualization
+# ------------------------------------------------------------------------
+
+def create_heatmap(grid):
+    """
+    One heatmap: a row per conversation / source, a column per time bucket.
+    A Select switches the colour between p<q> ACK RTT (log scale) and the
+    path-delay outlier rate. Both are images, so the page size depends on
+    rows x buckets, not on the number of packets.
+    """
+    rows = grid["rows"]
+    name = TITLES[grid["by"]]
+    if not rows:
+        return column(Div(text=f"<h3>No RTT samples to group by {name.lower()}.</h3>", width=1000))
+
+    n_rows, n_buckets = grid["samples"].shape
+    width = n_buckets * grid["bucket_width"]
+    p = figure(title=f"ACK RTT by {name} and Time", x_axis_label="Time (s since capture start)",
+               y_axis_label=name, width=1000,
+               height=int(np.clip(n_rows * ROW_HEIGHT, MIN_HEIGHT, MAX_HEIGHT)),
+               x_range=Range1d(0, width), y_range=Range1d(0, n_rows),
+               tools="pan,wheel_zoom,box_zoom,reset")
+
+    percentile_ms = (grid["percentile"] * 1000).astype(np.float32)
+    positive = percentile_ms[percentile_ms > 0]
+    low = float(positive.min()) if len(positive) else 0.001
+    high = max(float(np.nanmax(percentile_ms)) if len(positive) else 1.0, low * 10)
+    transparent = (0, 0, 0, 0)
+    rtt_mapper = LogColorMapper(palette=Inferno256, low=low, high=high, nan_color=transparent)
+    rate_mapper = LinearColorMapper(palette=Viridis256, low=0, high=100, nan_color=transparent)
+
+    image = dict(x=0, y=0, dw=width, dh=n_rows)
+    rtt_image = p.image(image=[percentile_ms], color_mapper=rtt_mapper, **image)
+    rate_image = p.image(image=[grid["outlier_rate"].astype(np.float32)], color_mapper=rate_mapper,
+                         visible=False, **image)
+    rtt_bar = ColorBar(color_mapper=rtt_mapper, title=f"p{grid['q']} ACK RTT (ms)")
+    rate_bar = ColorBar(color_mapper=rate_mapper, title="Path-delay outliers (%)", visible=False)
+    p.add_layout(rtt_bar, "right")
+    p.add_layout(rate_bar, "right")
+
+    # Row labels on the axis when they fit, and in the tooltip always
+    if n_rows <= MAX_ROW_LABELS:
+        p.yaxis.ticker = FixedTicker(ticks=[i + 0.5 for i in range(n_rows)])
+        p.yaxis.major_label_overrides = {i + 0.5: label for i, label in enumerate(rows)}
+    else:
+        p.yaxis.major_label_text_font_size = "0pt"
+    row_label = CustomJSHover(args=dict(labels=rows), code="return labels[Math.floor(value)] || '';")
+    bucket_start = CustomJSHover(args=dict(width=grid["bucket_width"]),
+                                 code="return (Math.floor(value / width) * width).toFixed(0) + ' s';")
+    p.add_tools(HoverTool(renderers=[rtt_image], formatters={"$y": row_label, "$x": bucket_start},
+                          tooltips=[(name, "$y{custom}"), ("Bucket start", "$x{custom}"),
+                                    (f"p{grid['q']} RTT (ms)", "@image{0.000}")]))
+    p.add_tools(HoverTool(renderers=[rate_image], formatters={"$y": row_label, "$x": bucket_start},
+                          tooltips=[(name, "$y{custom}"), ("Bucket start", "$x{custom}"),
+                                    ("Outliers (%)", "@image{0.0}")]))
+
+    metric = Select(title="Colour", value="rtt", width=300,
+                    options=[("rtt", f"p{grid['q']} ACK RTT"), ("rate", "Path-delay outlier rate")])
+    metric.js_on_change("value", CustomJS(args=dict(rtt=[rtt_image, rtt_bar], rate=[rate_image, rate_bar]),
+                                          code="""
+        const show_rtt = cb_obj.value === "rtt";
+        rtt.forEach(function (m) { m.visible = show_rtt; });
+        rate.forEach(function (m) { m.visible = !show_rtt; });
+    """))
+    return column(metric, p)
+
+
+def create_layout(grids, capture_start):
+    """
+    Builds the heatmap page: one heatmap per grouping (source IPs first,
+    then conversations), rows sorted so the worst whole-capture RTT is on top.
+    """
+    bucket_width = grids[0]["bucket_width"]
+    header = Div(text=(
+        f"<h2>RTT Heatmap</h2>"
+        f"<p>Each row is a data sender (or sender → receiver pair), each column a {bucket_width:g} s "
+        f"bucket since the capture start ({capture_start:.6f} epoch). Rows that light up in the same "
+        f"columns degrade together.</p>"), width=1000)
+    return column(header, *[create_heatmap(grid) for grid in grids])
+
+# ------------------------------------------------------------------------
+# 2. Main Script
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python rtt_heatmap.py <pcapng_file> [bucket_seconds]")
+        sys.exit(1)
+
+    pcapng_file = sys.argv[1]
+    bucket_width = float(sys.argv[2]) if len(sys.argv) > 2 else BUCKET_WIDTH
+    print(f"Reading packets from {pcapng_file}...")
+    table = load_packets(pcapng_file)
+    print(f"Read {len(table['time'])} packets.")
+
+    with instrument.stage("rtt_grid", packets=len(table["time"])):
+        grids = [rtt_grid(table, bucket_width, by=by) for by in GROUPINGS]
+    capture_start = float(np.nanmin(table["time"])) if len(table["time"]) else 0.0
+    with instrument.stage("layout"):
+        final_layout = create_layout(grids, capture_start)
+
+    with instrument.stage("save") as stage:
+        output_file("plot12.html")
+        save(final_layout)
+        stage["outputs"] = "plot12.html"
+    print("RTT heatmap saved as 'plot12.html'.")
@@ -1,18 +1,24 @@
 import pyshark
 import pandas as pd
 import sys
-from bokeh.plotting import figure, show
+from bokeh.plotting import figure, save
 from bokeh.io import output_file
 from bokeh.layouts import column
 from bokeh.models import (
-    ColumnDataSource, DataTable, TableColumn, HoverTool
+    ColumnDataSource, TableColumn, HoverTool
 )
 from collections import defaultdict
+import os
 
 from bokeh.themes import built_in_themes
 from bokeh.io import curdoc
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.tables import write_table
+from netdelay.views import paged_table
+
 # Apply dark mode theme - add this before creating any figures
 curdoc().theme = built_in_themes["dark_minimal"]
 def analyze_pcapng(file_path):
@@ -155,8 +161,9 @@ def create_bokeh_visualization(ip_delays, all_ip_delays):
         }
         table_rows.append(row)
     
-    df = pd.DataFrame(table_rows)
-    table_source = ColumnDataSource(df)
+    # One row per IP can be a long table: it is paged by the analysis API
+    df = pd.DataFrame(table_rows, columns=["Source IP", "Spurious (s)", "Fast (s)", "Timeout (s)", "Total (s)"])
+    write_table("plot9-retransmission-delays", {c: df[c].to_numpy() for c in df.columns})
     columns = [
         TableColumn(field="Source IP", title="Source IP"),
         TableColumn(field="Spurious (s)", title="Spurious (s)"),
@@ -164,9 +171,9 @@ def create_bokeh_visualization(ip_delays, all_ip_delays):
         TableColumn(field="Timeout (s)", title="Timeout (s)"),
         TableColumn(field="Total (s)", title="Total (s)")
     ]
-    data_table = DataTable(source=table_source, columns=columns, width=800, height=280)
+    data_table, _, _ = paged_table(columns, table_id="plot9-retransmission-delays", width=800, height=280)
     
-    show(column(p, data_table))
+    save(column(p, data_table))
 
 if __name__ == "__main__":
     pcapng_file = sys.argv[1]  # Update this path
@@ -176,9 +183,13 @@ def main():
         sys.exit(1)
 
     pcapng_file = sys.argv[1]
-    all_ip_delays = analyze_pcapng(pcapng_file)
-    significant_delays = filter_significant_delays(all_ip_delays)
-    create_bokeh_visualization(significant_delays, all_ip_delays)
+    with instrument.stage("pyshark"):
+        all_ip_delays = analyze_pcapng(pcapng_file)
+    with instrument.stage("filter_significant_delays"):
+        significant_delays = filter_significant_delays(all_ip_delays)
+    with instrument.stage("render") as stage:
+        create_bokeh_visualization(significant_delays, all_ip_delays)
+        stage["outputs"] = "plot9.html"
 
 if __name__ == "__main__":
     main()
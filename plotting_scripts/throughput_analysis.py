@@ -0,0 +1,149 @@
+import os
+import sys
+
+import numpy as np
+from bokeh.plotting import figure, save
+from bokeh.io import output_file, curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, DataTable, TableColumn, HoverTool, Div, NumberFormatter
+from bokeh.palettes import Category10
+from bokeh.themes import built_in_themes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netdelay import instrument
+from netdelay.packets import load_packets
+from netdelay.throughput import SATURATION_THRESHOLD, rank_ip_pairs
+
+# Apply dark mode theme - add this before creating any figures
+curdoc().theme = built_in_themes["dark_minimal"]
+
+TOP_PAIRS = 10   # IP pairs shown in the charts
+
+# ------------------------------------------------------------------------
+# 1. Visualization
+# ------------------------------------------------------------------------
+
+def create_layout(result, capture_start):
+    """
+    Builds a Bokeh layout with:
+      - Row 1: Utilisation bar chart for the top IP pairs and the full ranking table.
+      - Row 2: Throughput over time for the top IP pairs.
+      - Row 3: Bytes in flight over time for the top IP pairs.
+    """
+    pairs = result["pairs"]
+    if len(pairs["src"]) == 0:
+        return column(Div(text="<h2>No IP traffic found in this capture.</h2>", width=800))
+
+    labels = [f"{s} → {d}" for s, d in zip(pairs["src"], pairs["dst"])]
+    top = min(TOP_PAIRS, len(labels))
+    palette = Category10[10]
+
+    # Row 1: Utilisation ranking
+    bar_source = ColumnDataSource(data={
+        "pair": labels[:top],
+        "utilisation": np.nan_to_num(pairs["utilisation"][:top] * 100, nan=0.0),
+        "p95_mbps": pairs["p95_bps"][:top] / 1e6,
+        "capacity_mbps": pairs["capacity_bps"][:top] / 1e6,
+    })
+    bar_fig = figure(
+        x_range=labels[:top],
+        title="Link Utilisation by IP Pair (p95 throughput / estimated capacity)",
+        x_axis_label="IP Pair",
+        y_axis_label="Utilisation (%)",
+        width=800,
+        height=400,
+        tools="pan,wheel_zoom,box_zoom,reset"
+    )
+    bar_fig.vbar(x="pair", top="utilisation", width=0.5, source=bar_source, color=palette[3])
+    bar_fig.add_tools(HoverTool(tooltips=[
+        ("Pair", "@pair"),
+        ("Utilisation", "@utilisation{0.0}%"),
+        ("p95 Throughput (Mbit/s)", "@p95_mbps{0.000}"),
+        ("Capacity (Mbit/s)", "@capacity_mbps{0.000}")
+    ]))
+    bar_fig.xaxis.major_label_orientation = 1.0
+    bar_fig.y_range.start = 0
+
+    table_source = ColumnDataSource(data={
+        "pair": labels,
+        "mean_mbps": pairs["mean_bps"] / 1e6,
+        "p95_mbps": pairs["p95_bps"] / 1e6,
+        "capacity_mbps": pairs["capacity_bps"] / 1e6,
+        "utilisation": pairs["utilisation"] * 100,
+        "max_in_flight": pairs["max_in_flight"],
+        "saturated": ["yes" if s else "" for s in pairs["saturated"]],
+    })
+    number = NumberFormatter(format="0.000")
+    columns = [
+        TableColumn(field="pair", title="Source → Destination"),
+        TableColumn(field="mean_mbps", title="Mean (Mbit/s)", formatter=number),
+        TableColumn(field="p95_mbps", title="p95 (Mbit/s)", formatter=number),
+        TableColumn(field="capacity_mbps", title="Capacity (Mbit/s)", formatter=number),
+        TableColumn(field="utilisation", title="Utilisation (%)", formatter=NumberFormatter(format="0.0")),
+        TableColumn(field="max_in_flight", title="Max In Flight (B)"),
+        TableColumn(field="saturated", title="Saturated"),
+    ]
+    data_table = DataTable(source=table_source, columns=columns, width=800, height=400)
+
+    # Rows 2 and 3: time series for the top pairs
+    series = result["series"]
+    flight = result["in_flight"]
+    pair_of_flow = result["flows"]["pair"]
+
+    tp_fig = figure(title="Throughput over Time (top IP pairs)", x_axis_label="Time (s since capture start)",
+                    y_axis_label="Throughput (Mbit/s)", width=800, height=400,
+                    tools="pan,wheel_zoom,box_zoom,reset")
+    fl_fig = figure(title="Bytes in Flight (top IP pairs)", x_axis_label="Time (s since capture start)",
+                    y_axis_label="Unacknowledged Bytes", width=800, height=400,
+                    x_range=tp_fig.x_range, tools="pan,wheel_zoom,box_zoom,reset")
+
+    series_pair = pair_of_flow[series["flow"]]
+    flight_pair = pair_of_flow[flight["flow"]] if len(flight["flow"]) else flight["flow"]
+    for idx in range(top):
+        color = palette[idx % len(palette)]
+        mine = series_pair == idx
+        if mine.any():
+            bins, inverse = np.unique(series["bin_start"][mine], return_inverse=True)
+            mbps = np.bincount(inverse.reshape(-1), weights=series["bps"][mine]) / 1e6
+            tp_fig.line(bins - capture_start, mbps, color=color, legend_label=labels[idx], line_width=2)
+        mine = flight_pair == idx
+        if mine.any():
+            fl_fig.step(flight["time"][mine] - capture_start, flight["in_flight"][mine],
+                        color=color, legend_label=labels[idx], mode="after")
+
+    for fig in (tp_fig, fl_fig):
+        if fig.legend:
+            fig.legend.location = "top_right"
+            fig.legend.click_policy = "hide"
+            fig.legend.label_text_font_size = "8pt"
+
+    saturated = int(np.sum(pairs["saturated"]))
+    summary = Div(text=f"<h3>{saturated} of {len(labels)} IP pairs at or above "
+                       f"{SATURATION_THRESHOLD * 100:.0f}% of their estimated capacity</h3>", width=800)
+    return column(row(bar_fig, data_table), summary, tp_fig, fl_fig)
+
+# ------------------------------------------------------------------------
+# 2. Main Script
+# ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python throughput_analysis.py <pcapng_file>")
+        sys.exit(1)
+
+    pcapng_file = sys.argv[1]
+    print(f"Reading packets from {pcapng_file}...")
+    table = load_packets(pcapng_file)
+    print(f"Read {len(table['time'])} packets.")
+
+    with instrument.stage("rank_ip_pairs", packets=len(table["time"])):
+        result = rank_ip_pairs(table)
+    capture_start = float(np.nanmin(table["time"])) if len(table["time"]) else 0.0
+    with instrument.stage("layout"):
+        final_layout = create_layout(result, capture_start)
+
+    with instrument.stage("save") as stage:
+        output_file("plot10.html")
+        save(final_layout)
+        stage["outputs"] = "plot10.html"
+    print("Throughput analysis saved as 'plot10.html'.")
@@ -4,6 +4,7 @@ import { fileURLToPath } from 'url';
 import mongoose from 'mongoose';
 import fs from 'fs';
 import { spawn } from 'child_process'; // Import child_process
+import net from 'net';
 
 import multer from 'multer';
 import dotenv from 'dotenv';
@@ -138,6 +139,87 @@ app.post('/upload-multiple', upload.array('files'), (req, res) => {
   res.json({ message: 'Files uploaded successfully', files: req.files });
 });
 
+// Analysis worker pool (python -m netdelay.worker): keeps the Python
+// imports warm so a plotting script costs a fork instead of a cold start.
+const ANALYSIS_WORKER_PORT = Number(process.env.ANALYSIS_WORKER_PORT || 8100);
+
+// Runs one plotting script in a fresh python process, writing into outputDir
+function spawnScript(script, scriptPath, filePath, outputDir) {
+  return new Promise((resolve, reject) => {
+    const proc = spawn('python', [scriptPath, filePath], { cwd: outputDir });
+    
+    let output = "";
+    let errorOutput = "";
+    
+    proc.stdout.on('data', (data) => {
+      output += data.toString();
+    });
+    
+    proc.stderr.on('data', (data) => {
+      errorOutput += data.toString();
+    });
+    
+    proc.on('close', (code) => {
+      if (code === 0) {
+        console.log(`${script} completed successfully.`);
+        resolve({ script, output });
+      } else {
+        console.error(`${script} exited with code ${code}. Error: ${errorOutput}`);
+        reject({ script, code, error: errorOutput });
+      }
+    });
+  });
+}
+
+// Runs one plotting script on the worker pool; spawns it if the pool is not running
+function runScript(script, scriptPath, filePath, outputDir) {
+  return new Promise((resolve, reject) => {
+    let connected = false;
+    let reply = "";
+    const socket = net.createConnection({ host: '127.0.0.1', port: ANALYSIS_WORKER_PORT }, () => {
+      connected = true;
+      socket.end(JSON.stringify({ script: scriptPath, args: [filePath], cwd: outputDir }) + "\n");
+    });
+    
+    socket.on('data', (data) => {
+      reply += data.toString();
+    });
+    
+    socket.on('error', (err) => {
+      if (!connected) {
+        spawnScript(script, scriptPath, filePath, outputDir).then(resolve, reject);
+      } else {
+        console.error(`${script} lost the analysis worker: ${err.message}`);
+        reject({ script, code: null, error: err.message });
+      }
+    });
+    
+    socket.on('end', () => {
+      let result;
+      try {
+        result = JSON.parse(reply);
+      } catch (err) {
+        console.error(`${script}: bad reply from the analysis worker.`);
+        return reject({ script, code: null, error: reply });
+      }
+      if (result.code === 0) {
+        console.log(`${script} completed successfully.`);
+        resolve({ script, output: result.output });
+      } else {
+        console.error(`${script} exited with code ${result.code}. Error: ${result.error}`);
+        reject({ script, code: result.code, error: result.error });
+      }
+    });
+  });
+}
+
+// The scripts writing the pages the dashboard stores and shows (plot1-9,
+// see updatePlot.js). The other analyses in plotting_scripts/ (plot10-12)
+// run as jobs of the analysis API (POST /jobs), whose pages are served from
+// analysis_jobs/<job_id>/.
+const DASHBOARD_SCRIPTS = ['rtt_ack_analysis.py', 'protocol_analysis.py', 'packet_loss.py',
+                           'source_retransmission_type.py'];
+
 // New: File Upload Endpoint for a single pcapng file
 app.post('/upload-file', upload.single('file'), (req, res) => {
   if (!req.file) {
@@ -152,7 +234,7 @@ app.post('/upload-file', upload.single('file'), (req, res) => {
   
   let scriptFiles;
   try {
-    scriptFiles = fs.readdirSync(scriptsDir).filter(file => file.endsWith('.py'));
+    scriptFiles = fs.readdirSync(scriptsDir).filter(file => DASHBOARD_SCRIPTS.includes(file));
   } catch (err) {
     console.error("Error reading plotting_scripts directory:", err);
     return res.status(500).json({ message: "Error reading plotting scripts directory." });
@@ -162,34 +244,20 @@ app.post('/upload-file', upload.single('file'), (req, res) => {
     return res.status(404).json({ message: "No plotting scripts found." });
   }
   
+  // Every upload gets its own output folder, plots/<user>/<upload>/, so
+  // concurrent uploads never overwrite each other's plots
+  let user = 'anonymous';
+  try {
+    user = fs.readFileSync(path.join(__dirname, 'currentUser.txt'), 'utf-8').trim() || user;
+  } catch (err) {
+    // No one logged in
+  }
+  const safeName = (name) => name.replace(/[^A-Za-z0-9_.@+-]/g, '_');
+  const outputDir = path.join(__dirname, 'plots', safeName(user), safeName(path.parse(req.file.filename).name));
+  fs.mkdirSync(outputDir, { recursive: true });
+  
   // Create a promise for each script execution
-  const scriptPromises = scriptFiles.map(script => {
-    return new Promise((resolve, reject) => {
-      const scriptPath = path.join(scriptsDir, script);
-      const proc = spawn('python', [scriptPath, filePath]);
-      
-      let output = "";
-      let errorOutput = "";
-      
-      proc.stdout.on('data', (data) => {
-        output += data.toString();
-      });
-      
-      proc.stderr.on('data', (data) => {
-        errorOutput += data.toString();
-      });
-      
-      proc.on('close', (code) => {
-        if (code === 0) {
-          console.log(`${script} completed successfully.`);
-          resolve({ script, output });
-        } else {
-          console.error(`${script} exited with code ${code}. Error: ${errorOutput}`);
-          reject({ script, code, error: errorOutput });
-        }
-      });
-    });
-  });
+  const scriptPromises = scriptFiles.map(script => runScript(script, path.join(scriptsDir, script), filePath, outputDir));
   
   // Wait for all scripts to settle
   Promise.allSettled(scriptPromises)
@@ -198,7 +266,8 @@ app.post('/upload-file', upload.single('file'), (req, res) => {
       const failures = results.filter(r => r.status === 'rejected').map(r => r.reason);
       
       console.log("Scripts execution results:", { successes, failures });
-      res.json({ message: "File uploaded and scripts executed.", successes, failures });
+      const output = path.relative(__dirname, outputDir).split(path.sep).join('/');
+      res.json({ message: "File uploaded and scripts executed.", output, successes, failures });
     })
     .catch(err => {
       console.error("Error running scripts:", err);
@@ -382,6 +451,23 @@ app.get('/userPlot9', async (req, res) => {
 });
 
 
+// Table pages for the plots are served by the analysis API (newapi.py)
+const ANALYSIS_API = process.env.ANALYSIS_API || 'http://127.0.0.1:8000';
+
+app.get('/api/tables/:tableId', async (req, res) => {
+  const query = new URLSearchParams(req.query).toString();
+  try {
+    const response = await fetch(`${ANALYSIS_API}/tables/${encodeURIComponent(req.params.tableId)}?${query}`);
+    res.status(response.status);
+    res.set('Content-Type', 'application/json');
+    return res.send(await response.text());
+  } catch (error) {
+    console.error("Error fetching table page:", error);
+    return res.status(502).send("Analysis API unavailable");
+  }
+});
+
+
 // Catch-all for SPA routes: serve index.html from the build folder
 app.get('*', (req, res) => {
   res.sendFile(path.join(__dirname, 'dist', 'index.html'));
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Import netdelay from the project directory, as the plotting scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netdelay import synth  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def capture(tmp_path_factory):
+    """
+    capture(packets, fmt="pcap", **params) writes a synthetic capture (see
+    netdelay.synth) once per session and returns (path, packets, expected):
+    the file, the generator's columns and its expected counts.
+    """
+    written = {}
+
+    def make(packets, fmt="pcap", **params):
+        key = (packets, fmt, repr(sorted(params.items())))
+        if key not in written:
+            path = str(tmp_path_factory.mktemp("captures") / f"synthetic.{fmt}")
+            expected = synth.write_capture(path, packets, fmt, **params)
+            table = synth.synthetic_packets(packets, **params)
+            table.pop("expected")
+            written[key] = path, table, expected
+        return written[key]
+    return make
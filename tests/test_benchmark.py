@@ -0,0 +1,23 @@
+import benchmark
+
+
+def test_run_scripts_records_the_script_report(tmp_path):
+    script = tmp_path / "analysis.py"
+    script.write_text("import sys\n"
+                      "from netdelay import instrument\n"
+                      "instrument.begin('count')\n"
+                      "open('plot1.html', 'w').write(open(sys.argv[1]).read())\n"
+                      "instrument.end(packets=7)\n")
+    broken = tmp_path / "broken.py"
+    broken.write_text("raise RuntimeError('no tshark')\n")
+    capture = tmp_path / "capture.pcap"
+    capture.write_text("x" * 10)
+    results = []
+    benchmark.run_scripts(str(capture), [str(script), str(broken)], str(tmp_path / "runs"), results, 100)
+
+    stages = [(r["analysis"], r["stage"], r["depth"]) for r in results]
+    assert stages == [("analysis.py", "total", 0), ("analysis.py", "count", 1),
+                      ("broken.py", "total", 0), ("broken.py", "failed", 0)]
+    assert results[1]["packets_per_second"] == 7 / results[1]["seconds"]
+    assert results[0]["packets_per_second"] == 100 / results[0]["seconds"]
+    assert results[-1]["error"] == "RuntimeError: no tshark"
@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+from urllib.parse import unquote, urljoin, urlparse
+
+import numpy as np
+from bokeh.embed import file_html
+from bokeh.models import ColumnDataSource, Div, Select
+from bokeh.plotting import figure
+from bokeh.resources import CDN
+
+from netdelay import cache, views
+from netdelay.cache import ResultCache, cache_key, code_version
+from netdelay.density import write_density
+
+
+def test_code_version_follows_netdelay_imports(tmp_path, monkeypatch):
+    package = tmp_path / "netdelay"
+    package.mkdir()
+    (package / "a.py").write_text("from netdelay.b import x\n")
+    (package / "b.py").write_text("x = 1\n")
+    (package / "c.py").write_text("y = 1\n")
+    script = tmp_path / "script.py"
+    script.write_text("import numpy\nfrom netdelay import a\n")
+    monkeypatch.setattr(cache, "PACKAGE_DIR", str(package))
+
+    version = code_version(script)
+    (package / "c.py").write_text("y = 2\n")
+    assert code_version(script) == version
+    (package / "b.py").write_text("x = 2\n")
+    assert code_version(script) != version
+
+
+def test_cache_key():
+    key, fields = cache_key("ab" * 32, "/x/rtt.py", "v1", [5, "a"])
+    assert fields == {"capture": "ab" * 32, "analysis": "rtt.py", "version": "v1", "params": ["5", "a"]}
+    assert key == cache_key("ab" * 32, "/y/rtt.py", "v1", ["5", "a"])[0]
+    assert key != cache_key("ab" * 32, "/x/rtt.py", "v2", [5, "a"])[0]
+
+
+def runner(calls):
+    def run(script, args, cwd):
+        calls.append(args)
+        os.makedirs(os.path.join(cwd, "data"), exist_ok=True)
+        with open(os.path.join(cwd, "data", "page.html"), "w") as f:
+            f.write("x" * 100)
+        return {"script": os.path.basename(script), "code": 0, "output": "ok", "error": "",
+                "files": ["data/page.html"]}
+    return run
+
+
+def test_run_through_the_cache(tmp_path):
+    (tmp_path / "script.py").write_text("print(1)\n")
+    (tmp_path / "capture.pcap").write_bytes(b"capture")
+    script, capture = str(tmp_path / "script.py"), str(tmp_path / "capture.pcap")
+    results = ResultCache(str(tmp_path / "cache"))
+    calls = []
+
+    first = results.run(runner(calls), script, [capture], str(tmp_path / "one"))
+    second = results.run(runner(calls), script, [capture], str(tmp_path / "two"))
+    assert not first["cached"] and second["cached"] and len(calls) == 1
+    assert second["files"] == ["data/page.html"] and second["output"] == "ok"
+    assert (tmp_path / "two" / "data" / "page.html").read_text() == "x" * 100
+
+    results.run(runner(calls), script, [capture, "--other"], str(tmp_path / "three"))
+    assert len(calls) == 2
+    reopened = ResultCache(str(tmp_path / "cache"))
+    assert reopened.run(runner(calls), script, [capture], str(tmp_path / "four"))["cached"]
+
+
+def test_least_recently_used_evicted(tmp_path):
+    (tmp_path / "script.py").write_text("print(1)\n")
+    script = str(tmp_path / "script.py")
+    results = ResultCache(str(tmp_path / "cache"), max_bytes=250)
+    calls = []
+    for name in ("a", "b", "c"):
+        (tmp_path / name).write_bytes(name.encode())
+        results.run(runner(calls), script, [str(tmp_path / name)], str(tmp_path / "out"))
+    assert len(os.listdir(tmp_path / "cache")) == 2
+    assert results.run(runner(calls), script, [str(tmp_path / "c")], str(tmp_path / "out"))["cached"]
+    assert not results.run(runner(calls), script, [str(tmp_path / "a")], str(tmp_path / "out"))["cached"]
+
+
+def page_runner(script, args, cwd):
+    """Writes a page with a lazily loaded view and a density view, as the RTT scripts do."""
+    here = os.getcwd()
+    os.makedirs(cwd, exist_ok=True)
+    os.chdir(cwd)
+    try:
+        x = np.arange(1000, dtype=np.float64)
+        part = views.series_payload({"time": x, "rtt": x / 10}, "time", "rtt", "plot1_data/conv0_rtt.bin", budget=50)
+        views.write_payload("plot1_data/conv1.json", {"rtt": part})
+        meta, image = write_density("plot3_data/density", x, x, url=views.served_url("plot3_data/density"))
+        source = ColumnDataSource(part["data"], tags=[part["meta"]])
+        p = figure()
+        p.scatter("time", "rtt", source=source)
+        views.reload_on_zoom(p, source)
+        select = Select(value="a", options=["a", "b"])
+        views.lazy_select(select, Div(), {"b": "plot1_data/conv1.json"}, {"rtt": {"source": source}})
+        density = figure()
+        views.density_plot(density, meta, image)
+        with open("plot1.html", "w") as f:
+            f.write(file_html([p, select, density], CDN, "test"))
+    finally:
+        os.chdir(here)
+    files = ["plot1.html", "plot1_data/conv0_rtt.bin", "plot1_data/conv1.json",
+             "plot3_data/density.levels.bin", "plot3_data/density.points.bin"]
+    return {"script": os.path.basename(script), "code": 0, "output": "", "error": "", "files": files}
+
+
+def test_restored_pages_load_their_own_data(tmp_path):
+    (tmp_path / "script.py").write_text("print(1)\n")
+    (tmp_path / "capture.pcap").write_bytes(b"capture")
+    script, capture = str(tmp_path / "script.py"), str(tmp_path / "capture.pcap")
+    results = ResultCache(str(tmp_path / "cache"))
+    results.run(page_runner, script, [capture], str(tmp_path / "plots" / "a" / "1-x"))
+    assert results.run(page_runner, script, [capture], str(tmp_path / "plots" / "a" / "2-x"))["cached"]
+    shutil.rmtree(tmp_path / "plots" / "a" / "1-x")
+
+    # the web app serves tmp_path; resolve every data URL against the page
+    page_url = "/plots/a/2-x/plot1.html"
+    html = (tmp_path / "plots" / "a" / "2-x" / "plot1.html").read_text()
+    urls = set(re.findall(r'"([^"]*plot\d_data/[^"]*)"', html))
+    assert len(urls) == 4
+    for url in urls:
+        assert (tmp_path / unquote(urlparse(urljoin(page_url, url)).path).lstrip("/")).is_file(), url
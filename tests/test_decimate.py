@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from netdelay.decimate import decimate, lttb_indices, minmax_indices, outlier_threshold
+
+
+def series(n=100000, seed=1):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, 600, n))
+    y = rng.gamma(4, 0.01, n)
+    y[rng.choice(n, 20, replace=False)] = 5.0                  # spikes
+    return x, y
+
+
+def test_small_series_untouched():
+    x, y = series(500)
+    assert decimate(x, y, budget=500).tolist() == list(range(500))
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_decimate_keeps_budget_and_outliers(method):
+    x, y = series()
+    keep = decimate(x, y, budget=2000, method=method)
+    assert (np.diff(keep) > 0).all()
+    outliers = np.flatnonzero(y > outlier_threshold(y))
+    assert np.isin(outliers, keep).all()
+    assert len(keep) <= 2000 + len(outliers)
+
+
+def test_unknown_method():
+    x, y = series(5000)
+    with pytest.raises(ValueError):
+        decimate(x, y, budget=100, method="random")
+
+
+def test_minmax_keeps_column_extremes():
+    x = np.arange(10, dtype=np.float64)
+    y = np.array([3, 1, 2, 9, 5, 0, 4, 8, 7, 6], dtype=np.float64)
+    # two columns: x 0-4 and x 5-9
+    assert minmax_indices(x, y, 2).tolist() == [1, 3, 5, 7]
+    assert minmax_indices(x[:0], y[:0], 2).tolist() == []
+
+
+def test_lttb_picks_the_peak():
+    x = np.arange(101, dtype=np.float64)
+    y = np.zeros(101)
+    y[37] = 10
+    keep = lttb_indices(x, y, 5)
+    assert len(keep) == 5 and keep[0] == 0 and keep[-1] == 100 and 37 in keep
+    assert lttb_indices(x, y, 200).tolist() == list(range(101))
+
+
+def test_outlier_threshold():
+    assert outlier_threshold([1, 1, 1, 1]) == 1
+    assert outlier_threshold([0, 2], stdevs=1) == 2
+    assert outlier_threshold([]) == np.inf
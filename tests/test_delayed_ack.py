@@ -0,0 +1,101 @@
+import numpy as np
+
+from netdelay.delayed_ack import (KIND_DELAYED, KIND_IMMEDIATE, KIND_OTHER, KIND_PIGGYBACK, classify_acks,
+                                  label_outliers)
+from netdelay.packets import TCP_ACK, TCP_FIN, TCP_PSH, TCP_SYN, load_packets
+
+A, B = 0, 1          # address codes: client, server
+DATA = TCP_ACK | TCP_PSH
+
+
+def tcp_table(rows):
+    """Packet table from (time, from_server, seq, ack, flags, payload) rows of one connection."""
+    time, back, seq, ack, flags, payload = (np.array(c) for c in zip(*rows))
+    return {"time": time.astype(np.float64), "src": np.where(back, B, A), "dst": np.where(back, A, B),
+            "sport": np.where(back, 443, 50000), "dport": np.where(back, 50000, 443), "proto": np.full(len(rows), 6),
+            "seq": seq.astype(np.uint32), "ack": ack.astype(np.uint32), "tcp_flags": flags.astype(np.uint16),
+            "payload_len": payload.astype(np.int64)}
+
+
+def test_single_segment_pure_ack_is_delayed():
+    acks = classify_acks(tcp_table([(0.0, True, 1000, 1, DATA, 100),
+                                    (0.04, False, 1, 1100, TCP_ACK, 0)]))
+    assert acks["kind"].tolist() == [KIND_OTHER, KIND_DELAYED]
+    assert acks["ack_delay"][1] == 0.04 and acks["data_row"][1] == 0 and acks["segments"][1] == 1
+
+
+def test_ack_covering_two_segments_is_immediate():
+    acks = classify_acks(tcp_table([(0.0, True, 1000, 1, DATA, 100),
+                                    (0.001, True, 1100, 1, DATA, 100),
+                                    (0.02, False, 1, 1200, TCP_ACK, 0)]))
+    assert acks["kind"][2] == KIND_IMMEDIATE
+    assert acks["data_row"][2] == 1 and acks["segments"][2] == 2
+
+
+def test_ack_on_data_is_piggybacked_and_fin_is_not_delayed():
+    acks = classify_acks(tcp_table([(0.0, True, 1000, 1, DATA, 100),
+                                    (0.03, False, 1, 1100, DATA, 20),
+                                    (0.05, True, 1100, 21, DATA, 100),
+                                    (0.06, False, 21, 1200, TCP_ACK | TCP_FIN, 0)]))
+    assert acks["kind"][1] == KIND_PIGGYBACK
+    assert acks["kind"][2] == KIND_PIGGYBACK        # the server's data acknowledges the client's
+    assert acks["kind"][3] == KIND_IMMEDIATE
+
+
+def test_retransmitted_segments_and_duplicate_acks_are_not_matched():
+    acks = classify_acks(tcp_table([(0.0, True, 1000, 1, DATA, 100),
+                                    (0.3, True, 1000, 1, DATA, 100),
+                                    (0.35, False, 1, 1100, TCP_ACK, 0),
+                                    (0.4, True, 1100, 1, DATA, 100),
+                                    (0.45, False, 1, 1200, TCP_ACK, 0),
+                                    (0.46, False, 1, 1200, TCP_ACK, 0)]))
+    assert acks["kind"][2] == KIND_OTHER             # Karn's rule
+    assert acks["kind"][4] == KIND_DELAYED
+    assert acks["kind"][5] == KIND_OTHER             # duplicate ACK
+    assert np.isnan(acks["ack_delay"][5])
+
+
+def test_sequence_numbers_wrap():
+    top = (1 << 32) - 50
+    acks = classify_acks(tcp_table([(0.0, True, top, 1, DATA, 100),
+                                    (0.01, False, 1, 50, TCP_ACK, 0)]))
+    assert acks["kind"][1] == KIND_DELAYED and acks["data_row"][1] == 0
+
+
+def test_streams_past_4_gib_keep_matching():
+    step = 1 << 29                                  # 512 MiB segments: 5 GiB in ten
+    rows = []
+    for i in range(10):
+        end = (1000 + (i + 1) * step) % (1 << 32)
+        rows += [(i, True, (1000 + i * step) % (1 << 32), 1, DATA, step), (i + 0.01, False, 1, end, TCP_ACK, 0)]
+    acks = classify_acks(tcp_table(rows))
+    assert acks["kind"][1::2].tolist() == [KIND_DELAYED] * 10
+    assert acks["data_row"][1::2].tolist() == list(range(0, 20, 2))
+
+
+def test_handshake_is_ignored():
+    acks = classify_acks(tcp_table([(0.0, False, 0, 0, TCP_SYN, 0),
+                                    (0.01, True, 99, 1, TCP_SYN | TCP_ACK, 0)]))
+    assert acks["kind"].tolist() == [KIND_OTHER, KIND_OTHER]
+
+
+def test_synthetic_acks_match_their_rtt(capture):
+    path, _, _ = capture(20000, conversations=20, rtt=("constant", 0.05), loss=0, retransmission=0,
+                         protocols={"TLS/SSL": 1})
+    acks = classify_acks(load_packets(path))
+    matched = acks["data_row"] >= 0
+    # every segment is acknowledged on its own, one RTT later
+    assert matched.sum() >= 9900
+    assert set(acks["kind"][matched]) == {KIND_DELAYED}
+    assert np.allclose(acks["ack_delay"][matched], 0.05, atol=2e-6)
+
+
+def test_label_outliers():
+    base = np.full(40, 0.05)
+    rtt = np.r_[base, 0.45, base, 0.9, 0.05, 5.0]
+    kind = np.r_[np.zeros(40), KIND_DELAYED, np.zeros(40), KIND_DELAYED, 0, 0]
+    groups = np.r_[np.zeros(41), np.ones(41), 2, 2]
+    outlier, artefact = label_outliers(rtt, kind, groups)
+    assert np.flatnonzero(outlier).tolist() == [40, 81]     # two values never exceed mean + 2 sigma
+    assert np.flatnonzero(artefact).tolist() == [40]        # 0.9 s is beyond the delayed-ACK timer
+    assert label_outliers([], [], [])[0].size == 0
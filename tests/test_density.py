@@ -0,0 +1,44 @@
+import numpy as np
+
+from netdelay.density import INDEX_SIZE, density_extent, density_levels, shade, write_density
+
+
+def test_density_levels_sum_up():
+    rng = np.random.default_rng(2)
+    x, y = rng.uniform(0, 10, 5000), rng.normal(0, 1, 5000)
+    grids = density_levels(x, y, density_extent(x), density_extent(y), width=4, height=3, levels=3)
+    assert [g.shape for g in grids] == [(3, 4), (3, 8), (3, 16)]
+    assert all(g.sum() == 5000 for g in grids)
+    assert (grids[0] == grids[1].reshape(3, 4, 2).sum(axis=2)).all()
+
+
+def test_density_extent():
+    assert density_extent([]) == [0.0, 1.0]
+    assert density_extent([np.nan, 1.0, 3.0]) == [0.96, 3.04]
+    low, high = density_extent([5.0])
+    assert low < 5.0 < high
+
+
+def test_shade():
+    image = shade([[0, 1], [10, 100]])
+    assert image.dtype == np.uint8
+    assert image[0, 0] == 0 and image[1, 1] == 255 and 0 < image[0, 1] < image[1, 0] < 255
+    assert not shade(np.zeros((2, 2))).any()
+
+
+def test_write_density(tmp_path):
+    x = np.array([3.0, 1.0, np.nan, 2.0] * 300)
+    y = np.array([0.3, 0.1, 0.5, np.nan] * 300)
+    path = str(tmp_path / "plot" / "rtt")
+    meta, image = write_density(path, x, y, url="/plots/u/1/rtt", width=8, height=4, levels=2)
+
+    assert meta["total"] == 600 and meta["levels_url"] == "/plots/u/1/rtt.levels.bin"
+    points = np.fromfile(path + ".points.bin", dtype="<f8").reshape(2, -1)
+    assert (np.diff(points[0]) >= 0).all()                              # sorted by x
+    assert sorted(zip(*points.tolist())) == sorted([(1.0, 0.1), (3.0, 0.3)] * 300)
+    assert meta["index"] == points[0][::meta["stride"]].tolist() and len(meta["index"]) <= INDEX_SIZE
+
+    counts = np.fromfile(path + ".levels.bin", dtype=f"<u{meta['count_bytes']}")
+    assert meta["count_bytes"] == 2 and len(counts) == 4 * 8 + 4 * 16
+    assert counts[:32].sum() == counts[32:].sum() == 600
+    assert image.shape == (4, 8) and image.max() == 255
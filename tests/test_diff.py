@@ -0,0 +1,64 @@
+import numpy as np
+
+from netdelay.diff import COUNT_COLUMNS, RATE_COLUMNS, capture_metrics, compare
+from netdelay.packets import load_packets
+from netdelay.protocols import PROTOCOLS, protocol_codes, protocol_shares
+
+
+def test_protocol_codes():
+    table = {"time": np.zeros(7), "ip_version": np.array([4, 4, 4, 6, 4, 4, 0]), "proto": np.array([6, 6, 17, 17, 1, 6, 0]),
+             "sport": np.array([443, 50000, 5353, 40000, 0, 1883, 0]),
+             "dport": np.array([50000, 8080, 5353, 53, 0, 443, 0]),
+             "wire_len": np.array([100, 100, 100, 100, 100, 100, 600])}
+    labels = np.array(PROTOCOLS)[protocol_codes(table)].tolist()
+    # 1883 is listed after 443, so TLS/SSL wins for the last TCP packet
+    assert labels == ["TLS/SSL", "HTTP", "mDNS", "DNS", "ICMP", "TLS/SSL", "Other"]
+
+    shares = protocol_shares(table)
+    assert shares["protocol"][0] == "TLS/SSL" and shares["packets"][0] == 2
+    assert np.isclose(shares["packet_share"].sum(), 100)
+    assert shares["byte_share"][shares["protocol"] == "Other"].tolist() == [50]
+
+
+def test_synthetic_protocol_mix(capture):
+    path, _, _ = capture(20000, protocols={"TLS/SSL": 0.5, "MQTT": 0.25, "DNS": 0.25})
+    shares = protocol_shares(load_packets(path))
+    assert sorted(shares["protocol"]) == ["DNS", "MQTT", "TLS/SSL"]
+
+
+def test_capture_against_itself(capture):
+    path, _, _ = capture(20000, loss=0.01, retransmission=0.01)
+    metrics = capture_metrics(load_packets(path), bucket_width=0.1)
+    cells = metrics["cells"]
+    whole = cells["bucket"] == -1
+    assert metrics["packets"] == 20000 and cells["packets"][whole].sum() == 20000
+    # every per-bucket count adds up to its conversation's whole-capture cell
+    for conversation in np.unique(cells["conversation"]):
+        mine = cells["conversation"] == conversation
+        assert cells["packets"][mine & ~whole].sum() == cells["packets"][mine & whole].sum()
+
+    diff = compare(metrics, metrics)["cells"]
+    assert (diff["present"] == "both").all()
+    for column in COUNT_COLUMNS:
+        assert (diff[f"{column}_delta"] == 0).all()
+    for column in RATE_COLUMNS:
+        delta = diff[f"{column}_delta"]
+        assert (delta[~np.isnan(delta)] == 0).all()
+
+
+def test_compare_with_the_first_half(capture):
+    table = load_packets(capture(20000, loss=0.01, retransmission=0.01)[0])
+    middle = (table["time"].min() + table["time"].max()) / 2
+    n = len(table["time"])
+    first = {k: v[table["time"] < middle] if len(v) == n else v for k, v in table.items()}
+    a, b = capture_metrics(table, bucket_width=0.1), capture_metrics(first, bucket_width=0.1)
+    diff = compare(a, b)
+    cells = diff["cells"]
+    only_a = cells["present"] == "A"
+    assert only_a.any() and not (cells["present"] == "B").any()
+    assert (cells["bucket"][only_a] > 0).all()
+    assert (cells["packets_b"][only_a] == 0).all() and np.isnan(cells["p50_b"][only_a]).all()
+    assert (cells["packets_delta"] == cells["packets_b"] - cells["packets_a"]).all()
+    whole = cells["bucket"] == -1
+    assert -cells["packets_delta"][whole].sum() == len(table["time"]) - len(first["time"])
+    assert np.allclose(diff["protocols"]["packet_share_a"].sum(), 100)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from netdelay.encoding import (capture_start, categorical, compact_data, integer_type, relative_times,
+                               typed_column)
+
+
+def test_integer_type():
+    assert integer_type(0, 255) is np.uint8
+    assert integer_type(0, 256) is np.uint16
+    assert integer_type(-1, 127) is np.int8
+    assert integer_type(0, 1 << 32) is np.float64
+
+
+def test_relative_times():
+    times = np.array([1700000003.25, 1700000000.0, 1700003600.0])
+    start = capture_start(times)
+    assert start == 1700000000.0 and capture_start([]) == 0.0
+    relative = relative_times(times, start)
+    assert relative.dtype == np.float32
+    assert relative.tolist() == [3.25, 0.0, 3600.0]
+    # resolution an hour in
+    assert np.spacing(relative[2]) == 2.0 ** -12
+
+
+def test_typed_columns():
+    data = compact_data({"len": [60, 1514], "code": np.array([0, 3]), "rtt": [0.5, None],
+                         "ip": ["10.0.0.1", "10.0.0.2"], "flag": np.array([True, False])})
+    assert data["len"].dtype == np.uint16 and data["len"].tolist() == [60, 1514]
+    assert data["code"].dtype == np.uint8
+    assert data["rtt"].dtype == np.float32 and np.isnan(data["rtt"][1])
+    assert data["ip"] == ["10.0.0.1", "10.0.0.2"]
+    assert data["flag"].dtype == np.uint8
+    assert typed_column([]).dtype == np.float32
+
+
+def test_categorical():
+    codes, categories = categorical(["b", "a", "b", "c"])
+    assert categories == ["a", "b", "c"]
+    assert codes.dtype == np.uint8 and codes.tolist() == [1, 0, 1, 2]
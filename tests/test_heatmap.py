@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from netdelay.delayed_ack import KIND_OTHER, classify_acks
+from netdelay.heatmap import rtt_grid
+from netdelay.packets import load_packets
+
+
+def test_constant_rtt_grid(capture):
+    path, _, _ = capture(20000, conversations=20, rtt=("constant", 0.05), loss=0, retransmission=0,
+                         protocols={"TLS/SSL": 1})
+    table = load_packets(path)
+    grid = rtt_grid(table, bucket_width=0.1)
+    matched = int((classify_acks(table)["kind"] != KIND_OTHER).sum())
+
+    assert len(grid["rows"]) == 20 and all(" → " in row for row in grid["rows"])
+    assert grid["samples"].shape == grid["percentile"].shape == (20, grid["samples"].shape[1])
+    assert matched > 0 and grid["samples"].sum() == grid["row_samples"].sum() == matched
+    assert (grid["samples"].sum(axis=1) == grid["row_samples"]).all()
+    filled = grid["samples"] > 0
+    assert np.allclose(grid["percentile"][filled], 0.05, atol=2e-6)
+    assert np.isnan(grid["percentile"][~filled]).all() and np.isnan(grid["outlier_rate"][~filled]).all()
+
+
+def test_rows_ordered_by_percentile(capture):
+    path, _, _ = capture(20000, conversations=20, rtt=("uniform", 0.01, 0.2), protocols={"HTTP": 1})
+    grid = rtt_grid(load_packets(path), bucket_width=0.1, q=50)
+    assert (np.diff(grid["row_percentile"]) >= 0).all()
+    assert grid["q"] == 50 and grid["by"] == "conversation"
+
+
+def test_by_source(capture):
+    path, _, _ = capture(20000, conversations=20, rtt=("constant", 0.05), protocols={"TLS/SSL": 1})
+    table = load_packets(path)
+    by_source = rtt_grid(table, by="source")
+    assert all(" → " not in row for row in by_source["rows"])
+    assert len(by_source["rows"]) <= len(rtt_grid(table)["rows"])
+    assert by_source["row_samples"].sum() == rtt_grid(table)["row_samples"].sum()
+    with pytest.raises(ValueError):
+        rtt_grid(table, by="port")
@@ -0,0 +1,63 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from netdelay import instrument
+
+
+def test_nested_stages():
+    instrument.start_report()
+    with instrument.stage("load") as record:
+        record["packets"] = 1000
+        with instrument.stage("parse"):
+            block = np.ones(1 << 22)
+        record["outputs"] = {"block": block, "name": "abc"}
+    instrument.begin("plot", packets=5)
+    stages = instrument.finish_report()          # closes "plot"
+
+    assert [(s["stage"], s["depth"]) for s in stages] == [("load", 0), ("parse", 1), ("plot", 0)]
+    load, parse, plot = stages
+    assert load["packets"] == 1000 and load["output_bytes"] == (1 << 25) + 3
+    assert load["wall_seconds"] >= parse["wall_seconds"] >= 0 and load["cpu_seconds"] >= 0
+    assert load["peak_rss"] >= parse["peak_rss"] >= 1 << 25
+    assert plot["packets"] == 5 and plot["wall_seconds"] is not None
+    assert not any(k.startswith("_") for s in stages for k in s)
+    assert instrument.finish_report() == []
+
+
+def test_measure():
+    instrument.start_report()
+    value, record = instrument.measure("sum", sum, [1, 2, 3], packets=3)
+    assert value == 6 and record["stage"] == "sum" and record["packets"] == 3
+    with pytest.raises(ZeroDivisionError):
+        instrument.measure("fail", lambda: 1 / 0)
+    assert [s["stage"] for s in instrument.finish_report()] == ["sum", "fail"]
+
+
+def test_reports_are_per_thread():
+    instrument.start_report()
+    other = []
+
+    def run():
+        instrument.start_report()
+        with instrument.stage("other"):
+            pass
+        other.extend(instrument.finish_report())
+
+    with instrument.stage("main"):
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    assert [s["stage"] for s in instrument.finish_report()] == ["main"]
+    assert [s["stage"] for s in other] == ["other"]
+
+
+def test_output_size_and_write_report(tmp_path):
+    (tmp_path / "page.html").write_bytes(b"x" * 10)
+    assert instrument.output_size(str(tmp_path / "page.html")) == 10
+    assert instrument.output_size([np.zeros(4, np.uint16), b"ab", (None, 1)]) == 10
+    path = str(tmp_path / "report.json")
+    instrument.write_report(path, {"stages": []})
+    assert json.loads((tmp_path / "report.json").read_text()) == {"stages": []}
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+import pytest
+
+from netdelay import jobs, worker
+from netdelay.cache import ResultCache
+
+PAGE = """
+import sys
+
+with open("page.html", "w") as f:
+    f.write(sys.argv[1])
+"""
+
+BROKEN = """
+import sys
+
+sys.exit("no luck")
+"""
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = worker.AnalysisPool(1, preload=[])
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def manager(tmp_path, pool):
+    return jobs.JobManager(pool=pool, directory=str(tmp_path / "jobs"), cache=ResultCache(str(tmp_path / "cache")),
+                           packet_tables=str(tmp_path / "packet_tables"))
+
+
+@pytest.fixture
+def scripts(tmp_path):
+    (tmp_path / "page.py").write_text(PAGE)
+    (tmp_path / "broken.py").write_text(BROKEN)
+    return [str(tmp_path / "page.py"), str(tmp_path / "broken.py")]
+
+
+def wait(manager, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status["status"] == "complete":
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_runs_every_script(capture, manager, scripts):
+    path, _, _ = capture(2000)
+    job = manager.submit(path, scripts)
+    assert job["summary"]["packets"] == 2000 and job["progress"]["scripts_total"] == 2
+
+    status = wait(manager, job["id"])
+    assert status["successes"] == ["page.py"] and status["failures"] == ["broken.py"]
+    assert status["results"]["page.py"] == [status["output"] + "/page.html"]
+    assert status["scripts"]["broken.py"]["code"] == 1 and "no luck" in status["scripts"]["broken.py"]["error"]
+    with open(os.path.join(status["output"], "page.html")) as f:
+        assert f.read() == os.path.abspath(path)
+    with open(os.path.join(status["output"], "job.json")) as f:
+        assert json.load(f)["finished"] == status["finished"]
+
+    report = manager.report(job["id"])
+    assert set(report["scripts"]) == {"page.py", "broken.py"} and report["elapsed_seconds"] >= 0
+
+
+def test_unchanged_scripts_come_from_the_cache(capture, manager, scripts):
+    path, _, _ = capture(2000)
+    first = wait(manager, manager.submit(path, scripts)["id"])
+    second = wait(manager, manager.submit(path, scripts)["id"])
+    assert not first["scripts"]["page.py"]["cached"] and second["scripts"]["page.py"]["cached"]
+    assert not second["scripts"]["broken.py"]["cached"]
+    with open(os.path.join(second["output"], "page.html")) as f:
+        assert f.read() == os.path.abspath(path)
+
+
+def test_early_results_run_on_the_pool(capture, manager, scripts, tmp_path):
+    path, table, _ = capture(2000)
+    job_id = wait(manager, manager.submit(path, scripts[:1])["id"])["id"]
+    deadline = time.time() + 60
+    while not (manager.partial(job_id) or {}).get("final") and time.time() < deadline:
+        time.sleep(0.05)
+    assert manager.partial(job_id)["packets"] == len(table["time"])
+    status = manager.status(job_id)
+    assert "early.py" not in status["scripts"] and status["preview"] is None
+    with open(os.path.join(status["output"], "preview.json")) as f:
+        assert json.load(f)["exact"]
+    table_dir = tmp_path / "packet_tables" / manager.cache.capture_hash(path)
+    while not (table_dir / "meta.json").exists() and time.time() < deadline:
+        time.sleep(0.05)
+    assert os.listdir(tmp_path / "packet_tables") == [table_dir.name]
+    while not manager.report(job_id)["early"] and time.time() < deadline:
+        time.sleep(0.05)
+    stages = [s["stage"] for s in manager.report(job_id)["early"] if s["depth"] < 2]
+    assert stages == ["early.py", "preview", "partial_results", "packet_table"]
+
+
+def test_unknown_jobs(manager):
+    with pytest.raises(FileNotFoundError):
+        manager.status("0" * 32)
+    with pytest.raises(ValueError):
+        jobs.job_path("../secrets")
+    with pytest.raises(FileNotFoundError):
+        manager.submit("/no/such/capture.pcap")
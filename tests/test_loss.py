@@ -0,0 +1,78 @@
+import numpy as np
+
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import TCP_ACK, TCP_PSH, TCP_SYN, load_packets
+from netdelay.tcp import sequence_state
+
+DATA = TCP_ACK | TCP_PSH
+
+
+def tcp_table(rows):
+    """Packet table from (time, from_server, seq, ack, flags, payload) rows of one connection."""
+    time, back, seq, ack, flags, payload = (np.array(c) for c in zip(*rows))
+    n = len(rows)
+    return {"time": time.astype(np.float64), "src": np.where(back, 1, 0), "dst": np.where(back, 0, 1),
+            "sport": np.where(back, 443, 50000), "dport": np.where(back, 50000, 443), "proto": np.full(n, 6),
+            "seq": seq.astype(np.uint32), "ack": ack.astype(np.uint32), "tcp_flags": flags.astype(np.uint16),
+            "payload_len": payload.astype(np.int64), "window": np.full(n, 65535, dtype=np.uint16)}
+
+
+def flagged(table):
+    loss = classify_loss(table)
+    return {lt: np.flatnonzero(loss[lt]).tolist() for lt in LOSS_TYPES}
+
+
+def test_loss_indicators():
+    table = tcp_table([
+        (0.00, True, 1000, 1, DATA, 100),       # 0
+        (0.01, True, 1200, 1, DATA, 100),       # 1: 1100-1200 never captured
+        (0.05, False, 1, 1100, TCP_ACK, 0),     # 2
+        (0.06, False, 1, 1100, TCP_ACK, 0),     # 3: duplicate ACK of the hole
+        (0.30, True, 1100, 1, DATA, 100),       # 4: retransmission filling the hole
+        (0.35, False, 1, 1300, TCP_ACK, 0),     # 5
+        (0.60, True, 1200, 1, DATA, 100),       # 6: resent although acknowledged
+    ])
+    assert flagged(table) == {"retransmissions": [4, 6], "lost_segments": [1],
+                              "spurious_retransmissions": [6], "duplicate_acks": [3]}
+
+
+def test_sequence_state():
+    table = tcp_table([(0.0, False, 0, 0, TCP_SYN, 0),
+                       (0.1, True, (1 << 32) - 10, 1, DATA, 100),
+                       (0.2, False, 1, 90, TCP_ACK, 0)])
+    state = sequence_state(table)
+    data, acks = state["data"], state["acks"]
+    assert data["row"].tolist() == [1] and data["first"].tolist() == [True]
+    assert data["rel_end"][0] - data["rel_seq"][0] == 100            # across the wrap
+    assert acks["rel_ack"][acks["row"] == 2].tolist() == [data["rel_end"][0]]
+
+
+def test_sequence_state_unwraps_long_streams():
+    step = 1 << 29
+    rows = []
+    for i in range(10):
+        rows += [(i, True, (1000 + i * step) % (1 << 32), 1, DATA, step),
+                 (i + 0.01, False, 1, (1000 + (i + 1) * step) % (1 << 32), TCP_ACK, 0)]
+    table = tcp_table(rows)
+    state = sequence_state(table)
+    assert state["data"]["rel_seq"].tolist() == [i * step for i in range(10)]
+    assert state["acks"]["rel_ack"].tolist() == [(i + 1) * step for i in range(10)]
+    assert not any(classify_loss(table)[lt].any() for lt in LOSS_TYPES)
+
+
+def test_no_tcp():
+    table = tcp_table([(0.0, True, 0, 0, 0, 10)])
+    table["proto"][:] = 17
+    assert not any(classify_loss(table)[lt].any() for lt in LOSS_TYPES)
+
+
+def test_synthetic_loss_counts(capture):
+    path, _, expected = capture(50000, conversations=50, rtt=("constant", 0.05), loss=0.02, retransmission=0.02,
+                                protocols={"HTTP": 1})
+    loss = classify_loss(load_packets(path))
+    counts = {lt: int(loss[lt].sum()) for lt in LOSS_TYPES}
+    # a few retransmissions fall after the packets the capture was cut to
+    assert 0.9 * expected["retransmitted"] <= counts["retransmissions"] <= expected["retransmitted"]
+    assert 0.9 * expected["lost"] <= counts["lost_segments"] <= expected["lost"]
+    assert counts["spurious_retransmissions"] == 0
+    assert counts["duplicate_acks"] > 0
@@ -0,0 +1,109 @@
+import struct
+
+import numpy as np
+
+from netdelay import mqtt
+from netdelay.packets import TCP_ACK, TCP_PSH, TCP_SYN, load_packets
+
+CLIENT, BROKER = bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])
+
+
+def _message(first, body):
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte, length = length & 0x7F, length >> 7
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes([first]) + bytes(encoded) + body
+
+
+def connect():
+    return _message(0x10, b"\x00\x04MQTT\x04\x02\x00\x3c\x00\x01c")
+
+
+def publish(packet_id, qos=1, payload=b"x"):
+    return _message(0x30 | qos << 1, b"\x00\x01t" + struct.pack(">H", packet_id) + payload)
+
+
+def ack(msg_type, packet_id=None):
+    return _message(msg_type << 4, b"" if packet_id is None else struct.pack(">H", packet_id))
+
+
+def write_pcap(path, segments):
+    """segments: (time, to_broker, seq, flags, payload) of one client port 50000 <-> broker 1883 connection."""
+    out = bytearray(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+    for time, to_broker, seq, flags, payload in segments:
+        src, dst = (CLIENT, BROKER) if to_broker else (BROKER, CLIENT)
+        sport, dport = (50000, 1883) if to_broker else (1883, 50000)
+        tcp = struct.pack(">HHIIHHHH", sport, dport, seq, 0, 5 << 12 | flags, 65535, 0, 0)
+        ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 40 + len(payload), 0, 0, 64, 6, 0, src, dst)
+        frame = b"\x02\0\0\0\0\x02\x02\0\0\0\0\x01\x08\x00" + ip + tcp + payload
+        micros = round(time * 1e6)
+        out += struct.pack("<IIII", micros // 10 ** 6, micros % 10 ** 6, len(frame), len(frame)) + frame
+    with open(path, "wb") as f:
+        f.write(out)
+    return str(path)
+
+
+def test_parse_messages():
+    big = publish(300, qos=2, payload=b"p" * 200)
+    buffer = bytearray(connect() + big + ack(mqtt.PINGREQ) + ack(mqtt.PUBACK, 5)[:3])
+    messages, ok = mqtt.parse_messages(buffer)
+    assert ok
+    assert messages == [(mqtt.CONNECT, 0, None), (mqtt.PUBLISH, 2, 300), (mqtt.PINGREQ, 0, None)]
+    assert big[1] & 0x80 and not big[2] & 0x80     # two-byte remaining length
+    assert bytes(buffer) == ack(mqtt.PUBACK, 5)[:3]  # incomplete message stays
+    buffer += ack(mqtt.PUBACK, 5)[3:]
+    assert mqtt.parse_messages(buffer) == ([(mqtt.PUBACK, 0, 5)], True)
+    assert not mqtt.parse_messages(bytearray(b"\x00\x00"))[1]
+    assert not mqtt.parse_messages(bytearray(b"\x30\xff\xff\xff\xff\x01"))[1]
+
+
+def test_match_latencies(tmp_path):
+    pub = publish(7)
+    c, b = 1000, 5000
+    segments = [
+        (0.000, True, c - 1, TCP_SYN, b""),
+        (0.010, False, b - 1, TCP_SYN | TCP_ACK, b""),
+        (0.020, True, c, TCP_ACK | TCP_PSH, connect()),
+        (0.045, False, b, TCP_ACK | TCP_PSH, ack(mqtt.CONNACK) + b"\x00\x00"),
+        # PUBLISH split over two segments, the first one retransmitted
+        (0.100, True, c + len(connect()), TCP_ACK | TCP_PSH, pub[:4]),
+        (0.101, True, c + len(connect()), TCP_ACK | TCP_PSH, pub[:4]),
+        (0.110, True, c + len(connect()) + 4, TCP_ACK | TCP_PSH, pub[4:]),
+        (0.140, False, b + 4, TCP_ACK | TCP_PSH, ack(mqtt.PUBACK, 7) + ack(mqtt.PUBACK, 9)),
+        (0.200, True, c + len(connect()) + len(pub), TCP_ACK | TCP_PSH, ack(mqtt.PINGREQ)),
+        (0.205, False, b + 12, TCP_ACK | TCP_PSH, ack(mqtt.PINGRESP)),
+    ]
+    path = write_pcap(tmp_path / "mqtt.pcap", segments)
+    table = load_packets(path)
+    result = mqtt.match_latencies(path, table)
+    samples, stats = result["samples"], result["stats"]
+    labels = [mqtt.EXCHANGE_LABELS[e] for e in samples["exchange"]]
+    assert labels == ["CONNECT → CONNACK", "PUBLISH QoS1 → PUBACK", "PINGREQ → PINGRESP"]
+    # a request counts from the segment that completes it
+    assert np.allclose(samples["latency"], [0.025, 0.03, 0.005])
+    assert samples["packet_id"].tolist() == [-1, 7, -1]
+    assert stats["matched"] == 3 and stats["unmatched_responses"] == 1 and stats["gaps"] == 0
+
+    summary = mqtt.latency_summary(samples, table["addresses"])
+    assert summary["client"].tolist() == ["10.0.0.1"] * 3
+    assert summary["p95"].tolist() == sorted(summary["p95"].tolist(), reverse=True)
+
+
+def test_pending_requests_are_bounded(tmp_path):
+    size = len(publish(0))
+    segments = [(i * 10.0, True, 1000 + size * i, TCP_ACK | TCP_PSH, publish(i)) for i in range(3)]
+    path = write_pcap(tmp_path / "publishes.pcap", segments)
+    table = load_packets(path)
+    stats = mqtt.match_latencies(path, table, pending_timeout=15)["stats"]
+    assert stats["expired"] == 1 and stats["pending_at_end"] == 2
+    stats = mqtt.match_latencies(path, table, max_pending=1)["stats"]
+    assert stats["evicted"] == 2 and stats["pending_at_end"] == 1
+
+
+def test_other_ports_are_ignored(tmp_path):
+    path = write_pcap(tmp_path / "one.pcap", [(0.0, True, 1, TCP_ACK | TCP_PSH, connect())])
+    result = mqtt.match_latencies(path, load_packets(path), ports=(8883,))
+    assert result["stats"]["messages"] == 0
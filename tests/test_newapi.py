@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+from netdelay.jobs import JobManager, job_path  # noqa: E402
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)         # newapi keeps its uploads under the working directory
+    sys.modules.pop("newapi", None)
+    import newapi
+    monkeypatch.setattr(newapi, "jobs", JobManager(pool=object(), directory=str(tmp_path / "jobs")))
+    monkeypatch.setattr(newapi, "EVENT_INTERVAL", 0.01)
+    yield newapi
+    sys.modules.pop("newapi", None)
+
+
+def events(client, url):
+    with client.stream("GET", url) as response:
+        assert response.status_code == 200
+        text = "".join(response.iter_text())
+    return [line.split(": ", 1)[1] for line in text.splitlines() if line.startswith("event: ")]
+
+
+def test_events_end_for_a_job_this_process_does_not_run(api):
+    # a job left behind by an earlier API process, its script still queued
+    job_id = "ab" * 16
+    path = job_path(job_id, api.jobs.directory)
+    os.makedirs(path)
+    with open(os.path.join(path, "job.json"), "w") as f:
+        json.dump({"id": job_id, "output": path, "total_bytes": 0, "finished": None,
+                   "scripts": {"a.py": {"status": "queued"}}}, f)
+    client = TestClient(api.app)
+    assert events(client, f"/jobs/{job_id}/events") == ["progress", "interrupted"]
+    assert client.get(f"/jobs/{'cd' * 16}/events").status_code == 404
+
+
+def test_events_end_when_idle(api, monkeypatch):
+    job_id = "ab" * 16
+    path = job_path(job_id, api.jobs.directory)
+    os.makedirs(path)
+    job = {"id": job_id, "output": path, "total_bytes": 0, "finished": None,
+           "scripts": {"a.py": {"status": "queued"}}}
+    with open(os.path.join(path, "job.json"), "w") as f:
+        json.dump(job, f)
+    api.jobs._jobs[job_id] = job            # submitted here, but it never progresses
+    monkeypatch.setattr(api, "EVENT_IDLE", 0.05)
+    assert events(TestClient(api.app), f"/jobs/{job_id}/events") == ["progress", "interrupted"]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from netdelay.loss import LOSS_TYPES
+from netdelay.packets import load_packets
+from netdelay.partial import partial_results, summarize
+
+
+def test_summarize(capture):
+    path, _, _ = capture(20000, loss=0.01, retransmission=0.01)
+    table = load_packets(path)
+    result = summarize(table, top=3)
+    assert result["packets"] == 20000 and result["bytes"] == int(table["wire_len"].sum())
+    assert set(result["loss"]) == {"percent", *LOSS_TYPES}
+    assert result["loss"]["percent"] == sum(result["loss"][lt] for lt in LOSS_TYPES) / 20000 * 100
+    assert sum(p["packets"] for p in result["protocols"]) == 20000
+
+    top = result["conversations"]
+    assert len(top) == 3 and top[0]["bytes"] >= top[1]["bytes"] >= top[2]["bytes"]
+
+
+def test_prefixes_grow_to_the_whole_capture(capture):
+    path, _, _ = capture(20000)
+    results = list(partial_results(path, first=100000, growth=4))
+    scanned = [r["bytes_scanned"] for r in results]
+    assert scanned == [100000, 400000, results[-1]["total_bytes"]]
+    assert [r["final"] for r in results] == [False] * (len(results) - 1) + [True]
+    assert (np.diff([r["packets"] for r in results]) > 0).all() and results[-1]["packets"] == 20000
+    assert results[-1]["loss"] == summarize(load_packets(path))["loss"]
@@ -0,0 +1,119 @@
+import ipaddress
+import struct
+
+import numpy as np
+import pytest
+
+from netdelay import pcapio
+from netdelay.packets import IPPROTO_TCP, load_packets
+
+
+def _addresses(table, column):
+    return np.array([table["addresses"][c] for c in table[column]])
+
+
+def _dotted(values):
+    return np.array([str(ipaddress.IPv4Address(int(v))) for v in values])
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_scan_records(capture, fmt):
+    path, packets, _ = capture(2000, fmt)
+    scan = pcapio.scan_records(path)
+    records = scan["records"]
+    assert scan["format"] == fmt == pcapio.detect_format(path)
+    assert scan["interfaces"][0]["linktype"] == 1
+    assert len(records["time"]) == 2000
+    assert np.allclose(records["time"], np.round(packets["time"] * 1e6) / 1e6, rtol=0, atol=1e-7)
+    wire = 34 + np.where(packets["proto"] == IPPROTO_TCP, 20, 8) + packets["payload_len"]
+    assert np.array_equal(records["wire_len"], wire)
+    assert np.array_equal(records["cap_len"], np.minimum(wire, 54))     # headers only
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_load_packets_decodes_headers(capture, fmt):
+    path, packets, _ = capture(2000, fmt)
+    table = load_packets(path)
+    assert np.array_equal(_addresses(table, "src"), _dotted(packets["src"]))
+    assert np.array_equal(_addresses(table, "dst"), _dotted(packets["dst"]))
+    for c in ("proto", "sport", "dport", "payload_len"):
+        assert np.array_equal(table[c], packets[c].astype(table[c].dtype)), c
+    tcp = packets["proto"] == IPPROTO_TCP
+    for c in ("seq", "ack", "tcp_flags"):
+        assert np.array_equal(table[c][tcp], packets[c][tcp].astype(table[c].dtype)), c
+    assert set(np.unique(table["ip_version"])) == {4}
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_limit_leaves_out_cut_record(capture, fmt):
+    path, _, _ = capture(2000, fmt)
+    full = pcapio.scan_records(path)["records"]
+    cut = int(full["offset"][100]) + 10          # inside the 101st record
+    part = pcapio.scan_records(path, limit=cut)["records"]
+    assert len(part["time"]) == 100
+    assert np.array_equal(part["offset"], full["offset"][:100])
+
+
+def test_progress_reports_the_end(capture):
+    path, _, _ = capture(2000)
+    calls = []
+    pcapio.scan_records(path, progress=lambda *args: calls.append(args))
+    size = calls[-1][2]
+    assert calls[-1] == (2000, size, size)
+
+
+def _block(block_type, body):
+    body += b"\0" * (-len(body) % 4)
+    return struct.pack("<II", block_type, 12 + len(body)) + body + struct.pack("<I", 12 + len(body))
+
+
+def _frame():
+    eth = b"\x02\0\0\0\0\x02" + b"\x02\0\0\0\0\x01" + b"\x08\x00"
+    ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 28, 0, 0, 64, 17, 0, bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+    return eth + ip + struct.pack(">HHHH", 1000, 53, 8, 0)
+
+
+def test_pcapng_blocks(tmp_path):
+    # Nanosecond interface, a name resolution block between packets, an
+    # enhanced, an obsolete and a simple packet block.
+    frame = _frame()
+    shb = _block(pcapio.PCAPNG_SHB, struct.pack("<IHHq", pcapio.PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1))
+    idb = _block(pcapio.PCAPNG_IDB, struct.pack("<HHI", 1, 0, 0) + struct.pack("<HHB3x", pcapio.IF_TSRESOL, 1, 9)
+                 + struct.pack("<HH", 0, 0))
+    ns = 1_700_000_000_123_456_789
+    epb = _block(pcapio.PCAPNG_EPB, struct.pack("<IIIII", 0, ns >> 32, ns & 0xFFFFFFFF, len(frame), len(frame)) + frame)
+    nrb = _block(0x00000004, struct.pack("<HH", 0, 0))
+    pb = _block(pcapio.PCAPNG_PB, struct.pack("<HHIIII", 0, 0, (ns + 10 ** 9) >> 32, (ns + 10 ** 9) & 0xFFFFFFFF,
+                                              len(frame), len(frame)) + frame)
+    spb = _block(pcapio.PCAPNG_SPB, struct.pack("<I", len(frame)) + frame)
+    path = tmp_path / "blocks.pcapng"
+    path.write_bytes(shb + idb + epb + nrb + pb + spb)
+
+    scan = pcapio.scan_records(str(path))
+    records = scan["records"]
+    assert scan["interfaces"][0]["units"] == 1e9
+    assert len(records["time"]) == 3
+    assert records["time"][0] == pytest.approx(1_700_000_000.123456789, abs=1e-6)
+    assert records["time"][1] == pytest.approx(1_700_000_001.123456789, abs=1e-6)
+    assert np.isnan(records["time"][2])
+    table = load_packets(str(path))
+    assert table["dport"].tolist() == [53, 53, 53]
+    assert [table["addresses"][c] for c in table["src"]] == ["10.0.0.1"] * 3
+
+
+def test_pcap_nanosecond_big_endian(tmp_path):
+    frame = _frame()
+    header = struct.pack(">IHHiIII", pcapio.PCAP_MAGIC_NS, 2, 4, 0, 0, 65535, 1)
+    record = struct.pack(">IIII", 1_700_000_000, 500_000_000, len(frame), len(frame)) + frame
+    path = tmp_path / "be.pcap"
+    path.write_bytes(header + record + record[:20])     # and a truncated record
+    records = pcapio.scan_records(str(path))["records"]
+    assert records["time"].tolist() == [1_700_000_000.5]
+    assert load_packets(str(path))["sport"].tolist() == [1000]
+
+
+def test_detect_format_rejects_other_files(tmp_path):
+    path = tmp_path / "x.txt"
+    path.write_bytes(b"not a capture at all")
+    with pytest.raises(ValueError):
+        pcapio.detect_format(str(path))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from netdelay.delayed_ack import KIND_OTHER, classify_acks
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import load_packets
+from netdelay.preview import preview
+from netdelay.protocols import protocol_shares
+
+
+def test_small_capture_is_exact(capture):
+    path, _, _ = capture(5000)
+    result = preview(path)
+    table = load_packets(path)
+    assert result["exact"] and result["estimated_packets"] == result["sampled_packets"] == 5000
+
+    shares = protocol_shares(table)
+    assert [p["protocol"] for p in result["protocols"]] == shares["protocol"].tolist()
+    assert all(p["low"] == p["value"] == p["high"] for p in result["protocols"])
+    loss = classify_loss(table)
+    assert result["loss"]["percent"]["value"] == pytest.approx(
+        sum(loss[lt].sum() for lt in LOSS_TYPES) / 5000 * 100)
+    acks = classify_acks(table)
+    rtt = acks["ack_delay"][acks["kind"] != KIND_OTHER]
+    assert result["rtt"]["samples"] == len(rtt)
+    assert result["rtt"]["p50"]["value"] == pytest.approx(np.percentile(rtt, 50))
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_block_sample_estimates(capture, fmt):
+    path, _, _ = capture(200000, fmt, rtt=("constant", 0.05))
+    result = preview(path, blocks=8, block_bytes=1 << 16)
+    assert not result["exact"] and result["blocks"] == 8
+    assert result["sampled_bytes"] < result["total_bytes"] / 10
+    assert result["estimated_packets"] == pytest.approx(200000, rel=0.05)
+
+    for estimate in result["protocols"] + list(result["loss"].values()):
+        assert estimate["low"] <= estimate["value"] <= estimate["high"]
+    tls = next(p for p in result["protocols"] if p["protocol"] == "TLS/SSL")
+    shares = protocol_shares(load_packets(path))
+    assert tls["low"] < shares["packet_share"][shares["protocol"] == "TLS/SSL"][0] < tls["high"]
+    assert result["rtt"]["p50"]["value"] == pytest.approx(0.05, abs=1e-5)
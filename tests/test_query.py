@@ -0,0 +1,88 @@
+import struct
+
+import numpy as np
+import pytest
+
+from netdelay.delayed_ack import KIND_OTHER, classify_acks
+from netdelay.loss import LOSS_TYPES, classify_loss
+from netdelay.packets import load_packets
+from netdelay.query import packet_table, query_packets
+
+
+@pytest.fixture
+def synthetic(capture, tmp_path):
+    path, _, _ = capture(20000, loss=0.01, retransmission=0.01)
+    return load_packets(path), packet_table(path, "a" * 64, str(tmp_path))
+
+
+def shuffled_pcap(source, target):
+    """Copy of a classic pcap with its records in reverse order."""
+    with open(source, "rb") as f:
+        data = f.read()
+    records, pos = [], 24
+    while pos < len(data):
+        cap_len = struct.unpack_from("<I", data, pos + 8)[0]
+        records.append(data[pos:pos + 16 + cap_len])
+        pos += 16 + cap_len
+    with open(target, "wb") as f:
+        f.write(data[:24] + b"".join(records[::-1]))
+
+
+def test_totals(synthetic):
+    table, packets = synthetic
+    result = query_packets(packets)
+    rows = result["rows"]
+    loss = classify_loss(table)
+    matched = classify_acks(table)["kind"] != KIND_OTHER
+    assert result["matched"] == 20000 and rows["group"] == ["all"]
+    assert rows["bytes"] == [int(table["wire_len"].sum())]
+    assert [rows[lt][0] for lt in LOSS_TYPES] == [int(loss[lt].sum()) for lt in LOSS_TYPES]
+    assert rows["rtt_samples"] == [int(matched.sum())]
+
+
+def test_filters_and_groups(synthetic):
+    table, packets = synthetic
+    by_src = query_packets(packets, group_by="src", limit=3)
+    assert by_src["groups"] > 3 and len(by_src["rows"]["group"]) == 3
+    assert by_src["rows"]["packets"] == sorted(by_src["rows"]["packets"], reverse=True)
+
+    address = by_src["rows"]["group"][0]
+    code = int(np.flatnonzero(table["addresses"] == address)[0])
+    assert query_packets(packets, src=address)["matched"] == int((table["src"] == code).sum())
+    both = query_packets(packets, ip=[address])["matched"]
+    assert both == int(((table["src"] == code) | (table["dst"] == code)).sum())
+
+    tcp = query_packets(packets, protocol="tcp")["matched"]
+    assert tcp == int((table["proto"] == 6).sum())
+    retransmitted = query_packets(packets, loss="retransmissions", group_by="loss")["rows"]
+    assert retransmitted["group"][0] == "retransmissions"
+
+    per_type = query_packets(packets, group_by="loss")["rows"]
+    loss = classify_loss(table)
+    assert dict(zip(per_type["group"], per_type["packets"])) == \
+        {lt: int(loss[lt].sum()) for lt in LOSS_TYPES if loss[lt].any()}
+
+
+def test_time_window(synthetic, capture, tmp_path):
+    table, packets = synthetic
+    start = table["time"].min()
+    window = query_packets(packets, start=0.1, end=0.2)["matched"]
+    relative = table["time"] - start
+    assert window == int(((relative >= 0.1) & (relative < 0.2)).sum())
+    buckets = query_packets(packets, group_by="time", bucket=0.1)["rows"]
+    assert buckets["group"][:2] == [0.0, 0.1] and sum(buckets["packets"]) == 20000
+
+    shuffled = str(tmp_path / "shuffled.pcap")
+    shuffled_pcap(capture(20000, loss=0.01, retransmission=0.01)[0], shuffled)
+    reversed_packets = packet_table(shuffled, "b" * 64, str(tmp_path))
+    assert not reversed_packets["meta"]["time_sorted"]
+    assert query_packets(reversed_packets, start=0.1, end=0.2)["matched"] == window
+
+
+def test_bad_queries(synthetic):
+    _, packets = synthetic
+    for kwargs in ({"group_by": "port"}, {"loss": "late"}, {"protocol": "gopher"},
+                   {"group_by": "time", "bucket": 0}):
+        with pytest.raises(ValueError):
+            query_packets(packets, **kwargs)
+    assert query_packets(packets, src="192.0.2.255")["matched"] == 0
@@ -0,0 +1,115 @@
+import pytest
+
+from netdelay import scheduler
+from netdelay.scheduler import BASE_MEMORY, Scheduler, estimate_cost, estimate_packets
+from netdelay.summary import capture_summary
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class Pool:
+    """Records the runs a scheduler starts; the test finishes them."""
+
+    def __init__(self):
+        self.started = []
+
+    def submit(self, script, args, cwd, progress=None, callback=None, error_callback=None):
+        self.started.append((script, args[0] if args else None, callback, error_callback))
+
+    def finish(self, script, capture=None):
+        run = next(r for r in self.started if r[0] == script and (capture is None or r[1] == capture))
+        run[2]({"script": script, "code": 0})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+
+def test_estimates(capture):
+    small, large = capture(200)[0], capture(30000)[0]
+    assert estimate_packets(small) == 200
+    # extrapolated from the first SAMPLE_BYTES until the header summary is taken
+    assert estimate_packets(large) == pytest.approx(30000, rel=0.01)
+    capture_summary(large)
+    assert estimate_packets(large) == 30000
+    cost = estimate_cost("/x/packet_loss.py", large)
+    assert cost["packets"] == 30000 and cost["seconds"] > estimate_cost("/x/mqtt_latency.py", large)["seconds"]
+    assert cost["memory"] > BASE_MEMORY
+
+
+def test_shortest_job_first(capture, clock):
+    small, large = capture(200)[0], capture(20000)[0]
+    pool = Pool()
+    jobs = Scheduler(pool, cpus=1, memory=None)
+    first = jobs.submit("a.py", [small])
+    jobs.submit("big.py", [large])
+    jobs.submit("small.py", [small])
+    assert [r[0] for r in pool.started] == ["a.py"]
+    assert [t["script"] for t in jobs.stats()["queued"]] == ["small.py", "big.py"]
+
+    pool.finish("a.py")
+    assert first.result() == {"script": "a.py", "code": 0}
+    assert [r[0] for r in pool.started] == ["a.py", "small.py"]
+
+
+def test_aging_lets_a_long_wait_win(capture, clock):
+    small, large = capture(200)[0], capture(20000)[0]
+    pool = Pool()
+    jobs = Scheduler(pool, cpus=1, memory=None)
+    jobs.submit("a.py", [small])
+    jobs.submit("big.py", [large])
+    clock.now += estimate_cost("big.py", large)["seconds"]
+    jobs.submit("small.py", [small])
+    pool.finish("a.py")
+    assert [r[0] for r in pool.started] == ["a.py", "big.py"]
+
+
+def test_memory_cap(capture, clock):
+    small = capture(200)[0]
+    pool = Pool()
+    jobs = Scheduler(pool, cpus=4, memory=int(BASE_MEMORY * 1.5))
+    for name in ("a.py", "b.py"):
+        jobs.submit(name, [small])
+    assert len(pool.started) == 1 and jobs.stats()["memory_reserved"] > BASE_MEMORY
+
+    huge = Scheduler(Pool(), cpus=4, memory=BASE_MEMORY // 2)
+    huge.submit("a.py", [small])
+    assert len(huge.pool.started) == 1
+
+
+def test_failed_run(capture, clock):
+    pool = Pool()
+    jobs = Scheduler(pool, cpus=1, memory=None)
+    future = jobs.submit("a.py", [capture(200)[0]])
+    jobs.submit("b.py", [capture(200)[0]])
+    pool.started[0][3](RuntimeError("worker died"))
+    with pytest.raises(RuntimeError):
+        future.result()
+    assert [r[0] for r in pool.started] == ["a.py", "b.py"]
+
+
+class BrokenPool:
+    """A pool whose worker fails before the script runs."""
+
+    def submit(self, script, args, cwd, progress=None, callback=None, error_callback=None):
+        error_callback(OSError("no such directory"))
+
+
+def test_failed_worker_still_reports_the_run(capture, clock):
+    results = []
+    jobs = Scheduler(BrokenPool(), cpus=1, memory=None)
+    future = jobs.submit("/x/a.py", [capture(200)[0]], "/tmp/out", callback=results.append)
+    with pytest.raises(OSError):
+        future.result()
+    assert results == [{"script": "a.py", "code": -1, "error": "no such directory", "files": [],
+                        "output": "/tmp/out"}]
+    assert jobs.stats()["running"] == []
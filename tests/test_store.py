@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+
+import pytest
+
+from netdelay import store as store_module
+from netdelay.store import INDEX_NAME, UploadSessions, UploadStore, file_hash
+
+
+class Upload:
+    """The part of fastapi's UploadFile the store reads."""
+
+    def __init__(self, data, filename):
+        self.file, self.filename = io.BytesIO(data), filename
+
+    async def read(self, size):
+        return self.file.read(size)
+
+
+def save(store, data, filename):
+    return asyncio.run(store.save(Upload(data, filename), chunk_size=7))
+
+
+def test_file_hash(tmp_path):
+    (tmp_path / "a").write_bytes(b"x" * 100)
+    assert file_hash(tmp_path / "a", chunk_size=7) == hashlib.sha256(b"x" * 100).hexdigest()
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    store = UploadStore(tmp_path)
+    entry, created = save(store, b"capture one", "trace.pcap")
+    assert created and entry["name"] == "trace.pcap" and entry["size"] == 11
+    assert entry["sha256"] == hashlib.sha256(b"capture one").hexdigest()
+
+    again, created = save(store, b"capture one", "copy.pcap")
+    assert not created and again["name"] == "trace.pcap" and again["names"] == ["trace.pcap", "copy.pcap"]
+    assert store.find_name("COPY.pcap")["sha256"] == entry["sha256"]
+    assert sorted(os.listdir(tmp_path)) == [INDEX_NAME, "trace.pcap"]
+
+    other, created = save(store, b"capture two", "trace.pcap")
+    assert created and other["name"] == f"trace-{other['sha256'][:12]}.pcap"
+    assert (tmp_path / other["name"]).read_bytes() == b"capture two"
+
+
+def test_index_survives_a_restart(tmp_path):
+    store = UploadStore(tmp_path)
+    entry, _ = save(store, b"capture one", "trace.pcap")
+    store.add_job(entry["sha256"], "job1")
+    store.add_job(entry["sha256"], "job1")
+
+    reopened = UploadStore(tmp_path)
+    assert reopened.find(entry["sha256"])["jobs"] == ["job1"]
+    assert reopened.find_name("trace.pcap")["sha256"] == entry["sha256"]
+
+    os.remove(tmp_path / "trace.pcap")
+    assert reopened.find(entry["sha256"]) is None
+    with open(tmp_path / INDEX_NAME) as f:
+        assert json.loads(f.readlines()[-1])["removed"]
+    assert UploadStore(tmp_path).find_name("trace.pcap") is None
+
+
+def test_existing_directory_is_indexed_in_the_background(tmp_path, monkeypatch):
+    (tmp_path / "old.pcap").write_bytes(b"old capture")
+    release = threading.Event()
+
+    def slow_hash(path):
+        release.wait()
+        return file_hash(path)
+
+    monkeypatch.setattr(store_module, "file_hash", slow_hash)
+    store = UploadStore(tmp_path)
+    assert store.find_name("old.pcap") is None and not store.indexed(timeout=0)
+    release.set()
+    assert store.indexed(timeout=10)
+    assert store.find(hashlib.sha256(b"old capture").hexdigest())["name"] == "old.pcap"
+    assert UploadStore(tmp_path).find_name("old.pcap")["size"] == 11
+
+
+async def chunks(data, size=3):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_chunks_in_any_order(tmp_path):
+    store = UploadStore(tmp_path)
+    sessions = UploadSessions(store)
+    data = bytes(range(256)) * 40
+    state = sessions.open("../big.pcap", len(data), chunk_size=4096)
+    assert state["filename"] == "big.pcap" and state["missing"] == [[0, len(data)]]
+
+    state = asyncio.run(sessions.write(state["id"], 4096, chunks(data[4096:8192])))
+    assert state["offset"] == 0 and state["missing"] == [[0, 4096], [8192, len(data)]]
+    state = asyncio.run(sessions.write(state["id"], 0, chunks(data[:4096]),
+                                       sha256=hashlib.sha256(data[:4096]).hexdigest()))
+    assert state["offset"] == 8192 and state["received"] == [[0, 8192]]
+    assert sessions.received_path(state["id"])[1] == 8192
+    with pytest.raises(ValueError):
+        sessions.complete(state["id"])
+
+    state = asyncio.run(sessions.write(state["id"], 8192, chunks(data[8192:])))
+    assert state["complete"]
+    entry, created = sessions.complete(state["id"])
+    assert created and entry["sha256"] == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "big.pcap").read_bytes() == data
+    with pytest.raises(FileNotFoundError):
+        sessions.state(state["id"])
+
+
+def test_rejected_chunks(tmp_path):
+    sessions = UploadSessions(UploadStore(tmp_path))
+    session_id = sessions.open("a.pcap", 10)["id"]
+    with pytest.raises(ValueError, match="Checksum"):
+        asyncio.run(sessions.write(session_id, 0, chunks(b"01234"), sha256="0" * 64))
+    assert sessions.state(session_id)["received"] == []
+
+    asyncio.run(sessions.write(session_id, 0, chunks(b"01234")))
+    for offset, data in ((2, b"x"), (10, b"x"), (5, b"0123456")):
+        with pytest.raises(ValueError):
+            asyncio.run(sessions.write(session_id, offset, chunks(data)))
+    with pytest.raises(ValueError):
+        sessions.state("../../etc")
+
+
+def test_one_chunk_per_offset_at_a_time(tmp_path):
+    sessions = UploadSessions(UploadStore(tmp_path))
+    session_id = sessions.open("a.pcap", 10)["id"]
+
+    async def both():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            yield b"01"
+            started.set()
+            await release.wait()
+            yield b"234"
+
+        first = asyncio.create_task(sessions.write(session_id, 0, slow()))
+        await started.wait()
+        with pytest.raises(ValueError, match="already being received"):
+            await sessions.write(session_id, 0, chunks(b"abcde"))
+        # a chunk at another offset of the gap may go ahead; the first one
+        # must then stop short of it
+        await sessions.write(session_id, 5, chunks(b"56789"))
+        release.set()
+        return await first
+
+    state = asyncio.run(both())
+    assert state["complete"]
+    assert sessions.complete(session_id)[0]["size"] == 10
+    assert (tmp_path / "a.pcap").read_bytes() == b"0123456789"
+
+
+def test_repeated_completion(tmp_path):
+    store = UploadStore(tmp_path)
+    sessions = UploadSessions(store)
+    session_id = sessions.open("a.pcap", 5)["id"]
+    asyncio.run(sessions.write(session_id, 0, chunks(b"01234")))
+    entry, created = sessions.complete(session_id)
+    again, created_again = sessions.complete(session_id)
+    assert created and not created_again and again == entry
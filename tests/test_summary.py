@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+from netdelay import pcapio, summary
+from netdelay.summary import cached_summary, capture_summary, summary_path
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_header_totals_match_a_full_scan(capture, fmt):
+    path, _, _ = capture(20000, fmt)
+    totals = pcapio.header_totals(path)
+    records = pcapio.scan_records(path)["records"]
+    assert totals["format"] == fmt and totals["packets"] == 20000
+    assert totals["wire_bytes"] == int(records["wire_len"].sum())
+    assert totals["captured_bytes"] == int(records["cap_len"].sum())
+    assert totals["first"] == records["time"].min() and totals["last"] == records["time"].max()
+    assert totals["interfaces"][0]["linktype"] == 1
+
+
+def test_summary_is_kept_next_to_the_capture(capture, tmp_path, monkeypatch):
+    path = str(tmp_path / "trace.pcap")
+    shutil.copyfile(capture(20000)[0], path)
+    assert cached_summary(path) is None
+
+    result = capture_summary(path)
+    assert result["packets"] == 20000 and result["link_type"] == "ETHERNET"
+    assert result["total_bytes"] == os.path.getsize(path)
+    assert result["average_pps"] == pytest.approx(20000 / result["duration"])
+    assert os.path.basename(summary_path(path)) == ".trace.pcap.summary.json"
+
+    monkeypatch.setattr(summary, "_summaries", {})     # a restart
+    monkeypatch.setattr(pcapio, "header_totals", None)
+    assert cached_summary(path) == result and capture_summary(path) == result
+
+
+def test_changed_capture_is_summarized_again(capture, tmp_path):
+    path = str(tmp_path / "trace.pcap")
+    shutil.copyfile(capture(2000)[0], path)
+    capture_summary(path)
+    shutil.copyfile(capture(3000)[0], path)
+    assert cached_summary(path) is None and capture_summary(path)["packets"] == 3000
+
+
+def test_not_a_capture(tmp_path):
+    (tmp_path / "notes.txt").write_bytes(b"not a capture at all, just text" * 4)
+    with pytest.raises(ValueError):
+        capture_summary(str(tmp_path / "notes.txt"))
+    assert not os.path.exists(summary_path(tmp_path / "notes.txt"))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from netdelay import synth
+from netdelay.packets import TCP_ACK
+
+
+def test_same_parameters_same_bytes(tmp_path):
+    paths = [tmp_path / name for name in ("a.pcap", "b.pcap", "c.pcap")]
+    synth.write_capture(str(paths[0]), 5000, seed=3)
+    synth.write_capture(str(paths[1]), 5000, seed=3)
+    synth.write_capture(str(paths[2]), 5000, seed=4)
+    data = [p.read_bytes() for p in paths]
+    assert data[0] == data[1] and data[0] != data[2]
+
+
+def test_columns_and_expected_counts():
+    table = synth.synthetic_packets(20000, conversations=20, loss=0.05, retransmission=0.05)
+    expected = table.pop("expected")
+    assert len(table["time"]) == 20000 and (np.diff(table["time"]) >= 0).all()
+    assert len({(s, d) for s, d in zip(table["src"], table["dst"])}) <= 40
+    assert 0 < expected["lost"] < expected["retransmitted"] < expected["segments"]
+    per = expected["segments"] + expected["exchanges"]
+    assert per % 20 == 0 and per * 2 >= 20000
+
+
+def test_constant_rtt_acks():
+    table = synth.synthetic_packets(2000, conversations=1, rtt=("constant", 0.05), loss=0, retransmission=0,
+                                    protocols={"HTTP": 1})
+    table.pop("expected")
+    data = table["payload_len"] > 0
+    acks = ~data & (table["tcp_flags"] == TCP_ACK)
+    assert (table["sport"][data] == 80).all() and (table["dport"][acks] == 80).all()
+    end = table["seq"][data].astype(np.int64) + table["payload_len"][data]
+    ack_time = dict(zip(table["ack"][acks].tolist(), table["time"][acks].tolist()))
+    delays = [ack_time[e % (1 << 32)] - t for e, t in zip(end.tolist(), table["time"][data].tolist())
+              if e % (1 << 32) in ack_time]
+    assert len(delays) > 0.9 * data.sum() and np.allclose(delays, 0.05)
+
+
+def test_bad_parameters(tmp_path):
+    with pytest.raises(ValueError):
+        synth.synthetic_packets(100, rtt=("pareto", 1.0))
+    with pytest.raises(ValueError):
+        synth.write_capture(str(tmp_path / "x"), 100, "erf")
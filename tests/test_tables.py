@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from netdelay.tables import PROJECT_DIR, output_table_dir, query_table, read_table, table_path, write_table
+
+
+@pytest.fixture
+def table(tmp_path):
+    directory = str(tmp_path)
+    write_table("t", {"ip": ["10.0.0.2", "10.0.0.1", None, "10.0.0.1", "192.168.1.9"],
+                      "rtt": [0.3, None, 0.1, 0.2, 0.5],
+                      "n": np.array([5, 4, 3, 2, 1])}, directory)
+    return directory
+
+
+@pytest.mark.parametrize("table_id", ["..", ".", "", "../t", "a/b", ".hidden", None])
+def test_table_path_rejects_ids_outside_the_directory(table_id):
+    with pytest.raises(ValueError):
+        table_path(table_id)
+
+
+def test_table_path_accepts_script_ids():
+    assert table_path("plot1-conv0.ack_2", "d") == "d/plot1-conv0.ack_2"
+
+
+def test_write_and_read(table):
+    meta, columns, categories = read_table("t", table)
+    assert meta == {"columns": ["ip", "rtt", "n"], "kinds": {"ip": "cat", "rtt": "num", "n": "num"}, "rows": 5}
+    assert categories["ip"].tolist() == ["", "10.0.0.1", "10.0.0.2", "192.168.1.9"]
+    assert np.isnan(columns["rtt"][1])
+    with pytest.raises(FileNotFoundError):
+        read_table("missing", table)
+
+
+def test_page_in_capture_order(table):
+    page = query_table("t", offset=1, limit=2, directory=table)
+    assert page["total"] == 5
+    assert page["rows"] == {"ip": ["10.0.0.1", ""], "rtt": [None, 0.1], "n": [4.0, 3.0]}
+
+
+def test_sort_keeps_missing_values_last(table):
+    assert query_table("t", sort="rtt", directory=table)["rows"]["rtt"] == [0.1, 0.2, 0.3, 0.5, None]
+    assert query_table("t", sort="rtt", desc=True, directory=table)["rows"]["rtt"] == [0.5, 0.3, 0.2, 0.1, None]
+    assert query_table("t", sort="ip", directory=table)["rows"]["n"] == [3.0, 4.0, 2.0, 5.0, 1.0]
+
+
+def test_search_and_filter(table):
+    page = query_table("t", q="10.0.0", sort="n", directory=table)
+    assert page["total"] == 3 and page["rows"]["n"] == [2.0, 4.0, 5.0]
+    page = query_table("t", filter_column="ip", filter_value="10.0.0.1", directory=table)
+    assert page["rows"]["n"] == [4.0, 2.0]
+    assert query_table("t", filter_column="ip", filter_value="10.9.9.9", directory=table)["total"] == 0
+    assert query_table("t", filter_column="n", filter_value="3", directory=table)["rows"]["ip"] == [""]
+    with pytest.raises(ValueError):
+        query_table("t", sort="nope", directory=table)
+
+
+def test_limit_is_clamped(table):
+    assert query_table("t", limit=0, directory=table)["limit"] == 1
+    assert query_table("t", offset=-4, limit=10 ** 6, directory=table)["offset"] == 0
+
+
+def test_output_table_dir():
+    assert output_table_dir("/plots/a%40b.c/17-x/", root="/srv") == \
+        os.path.join("/srv", "plots", "a@b.c", "17-x", "analysis_tables")
+    assert output_table_dir("/analysis_jobs/0123abcd/", root="/srv") == \
+        os.path.join("/srv", "analysis_jobs", "0123abcd", "analysis_tables")
+    assert output_table_dir("", root="/srv") == output_table_dir("/", root="/srv") == \
+        output_table_dir(None, root="/srv") == os.path.join("/srv", "analysis_tables")
+    assert output_table_dir("/") == os.path.join(PROJECT_DIR, "analysis_tables")
+
+
+@pytest.mark.parametrize("output", ["/plots/../..", "/plots/%2E%2E/x/", "/plots/./x/", "/etc\\passwd/", "/a b/"])
+def test_output_table_dir_stays_inside_the_project(output):
+    with pytest.raises(ValueError):
+        output_table_dir(output)
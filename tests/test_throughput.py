@@ -0,0 +1,88 @@
+import numpy as np
+
+from netdelay.packets import (
+    TCP_ACK, flow_index, group_percentile, load_packets, segmented_cummax, unwrap_sequence,
+)
+from netdelay.throughput import bytes_in_flight, flow_throughput, packet_pair_capacity, rank_ip_pairs
+
+
+def _flow_table(times, wire_len, payload_len):
+    n = len(times)
+    return {"time": np.asarray(times, dtype=np.float64), "wire_len": np.asarray(wire_len, dtype=np.uint32),
+            "payload_len": np.asarray(payload_len, dtype=np.int64),
+            "src": np.zeros(n, dtype=np.int32), "dst": np.ones(n, dtype=np.int32), "proto": np.full(n, 6),
+            "sport": np.full(n, 443), "dport": np.full(n, 50000)}
+
+
+def test_flow_index_directed_and_undirected():
+    table = {"src": np.array([0, 1, 0, -1]), "dst": np.array([1, 0, 2, -1]), "proto": np.array([6, 6, 17, 0]),
+             "sport": np.array([80, 5000, 53, 0]), "dport": np.array([5000, 80, 53, 0])}
+    ids, _, flows = flow_index(table, directed=True)
+    assert ids[3] == -1 and len(set(ids[:3])) == 3 and len(flows["src"]) == 3
+    ids, forward, flows = flow_index(table, directed=False)
+    assert ids[0] == ids[1] != ids[2]
+    assert forward[0] != forward[1]
+
+
+def test_group_helpers():
+    assert group_percentile(np.array([1.0, 2, 3, 4, 10]), np.array([0, 0, 0, 0, 2]), 3, 50).tolist()[::2] == [2, 10]
+    assert np.isnan(group_percentile(np.array([1.0]), np.array([0]), 2, 50)[1])
+    assert segmented_cummax(np.array([3, 1, 4, 1, 2]), np.array([0, 0, 0, 1, 1])).tolist() == [3, 3, 4, 1, 2]
+
+
+def test_unwrap_sequence():
+    relative = np.array([0, (1 << 31) - 1, 3 << 30, 10, (1 << 32) - 5, 7])
+    unwrapped = unwrap_sequence(relative, np.array([0, 0, 0, 0, 1, 1]))
+    assert unwrapped.tolist() == [0, (1 << 31) - 1, 3 << 30, (1 << 32) + 10, -5, 7]
+
+
+def test_flow_throughput_bins():
+    table = _flow_table([0.0, 0.5, 1.2, 3.9], [100, 200, 300, 400], [0, 0, 0, 0])
+    series = flow_throughput(table, np.array([0, 0, 0, -1]))
+    assert series["bin"].tolist() == [0, 1]
+    assert series["bytes"].tolist() == [300, 300]
+    assert series["bps"].tolist() == [2400, 2400]
+
+
+def test_packet_pair_capacity():
+    # back-to-back 1514-byte segments through a 10 Mbit/s bottleneck
+    gap = 1514 * 8 / 10e6
+    n = 20
+    table = _flow_table(np.arange(n) * gap, np.full(n, 1514), np.full(n, 1460))
+    ids, _, flows = flow_index(table)
+    flight = {"row": np.arange(n), "in_flight": np.full(n, 10 * 1460)}
+    capacity = packet_pair_capacity(table, ids, len(flows["src"]), flight)
+    assert capacity["pairs"].tolist() == [n - 1]
+    assert abs(capacity["capacity_bps"][0] - 10e6) < 1
+    # the same segments sent one at a time (nothing in flight) say nothing
+    flight["in_flight"][:] = 0
+    assert np.isnan(packet_pair_capacity(table, ids, 1, flight)["capacity_bps"][0])
+
+
+def test_bytes_in_flight_past_4_gib():
+    # 512 MiB segments, each acknowledged before the next: 5 GiB in ten,
+    # so sequence and acknowledgement numbers wrap twice
+    step, n = 1 << 29, 10
+    seq = (1000 + np.arange(n) * step) % (1 << 32)
+    back = np.tile([True, False], n)
+    table = {"time": np.repeat(np.arange(n, dtype=np.float64), 2) + np.tile([0, 0.01], n),
+             "src": np.where(back, 1, 0), "dst": np.where(back, 0, 1), "proto": np.full(2 * n, 6),
+             "sport": np.where(back, 443, 50000), "dport": np.where(back, 50000, 443),
+             "seq": np.where(back, np.repeat(seq, 2), 1).astype(np.uint32),
+             "ack": np.where(back, 1, np.repeat((seq + step) % (1 << 32), 2)).astype(np.uint32),
+             "tcp_flags": np.full(2 * n, TCP_ACK, dtype=np.uint16),
+             "payload_len": np.where(back, step, 0).astype(np.int64), "wire_len": np.full(2 * n, 54)}
+    flight = bytes_in_flight(table)
+    assert flight["row"].tolist() == list(range(0, 2 * n, 2))
+    assert flight["in_flight"].tolist() == [step] * n
+
+
+def test_rank_ip_pairs(capture):
+    path, packets, _ = capture(5000, conversations=10, rtt=("constant", 0.05))
+    table = load_packets(path)
+    ranked = rank_ip_pairs(table)
+    pairs = ranked["pairs"]
+    assert len(pairs["src"]) == len({(s, d) for s, d in zip(packets["src"], packets["dst"])})
+    assert pairs["bytes"].sum() == table["wire_len"].sum()
+    assert np.all(pairs["peak_bps"] >= pairs["mean_bps"] - 1e-6)
+    assert np.all(ranked["in_flight"]["in_flight"] >= 0)
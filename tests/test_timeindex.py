@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from netdelay import pcapio, timeindex
+from netdelay.timeindex import index_path, read_index, scan_window, window_range
+
+
+def copy_capture(capture, tmp_path, fmt):
+    path = str(tmp_path / f"trace.{fmt}")
+    shutil.copyfile(capture(20000, fmt)[0], path)
+    return path
+
+
+def in_window(path, start, end):
+    records = pcapio.scan_records(path)["records"]
+    keep = (records["time"] >= start) & (records["time"] < end)
+    return {k: v[keep] for k, v in records.items()}
+
+
+@pytest.mark.parametrize("fmt", ["pcap", "pcapng"])
+def test_windowed_scan_matches_a_full_scan(capture, tmp_path, monkeypatch, fmt):
+    path = copy_capture(capture, tmp_path, fmt)
+    times = pcapio.scan_records(path)["records"]["time"]
+    start, end = times[5000], times[9000]
+
+    first = scan_window(path, start, end)         # builds the index
+    assert read_index(path)["meta"]["packets"] == 20000
+
+    calls = []
+    scan_records = pcapio.scan_records
+    monkeypatch.setattr(pcapio, "scan_records", lambda *a, **k: calls.append(k) or scan_records(*a, **k))
+    second = scan_window(path, start, end)
+    expected = in_window(path, start, end)
+    for scan in (first, second):
+        for column, values in expected.items():
+            assert np.array_equal(scan["records"][column], values)
+    assert calls[0]["start"] is not None and calls[0]["limit"] < os.path.getsize(path)
+
+
+def test_stale_index_ignored(capture, tmp_path):
+    path = copy_capture(capture, tmp_path, "pcap")
+    scan_window(path)
+    assert os.path.basename(index_path(path)) == ".trace.pcap.tidx.npz"
+    assert read_index(path) is not None
+    with open(path, "ab") as f:
+        f.write(b"\0" * 16)
+    assert read_index(path) is None
+
+
+def test_out_of_order_times(capture, tmp_path):
+    path = copy_capture(capture, tmp_path, "pcap")
+    records = pcapio.scan_records(path)["records"]
+    with open(path, "rb") as f:
+        data = f.read()
+    # Move the last packet to the front
+    last = int(records["offset"][-1]) - 16
+    with open(path, "wb") as f:
+        f.write(data[:24] + data[last:] + data[24:last])
+
+    timeindex.build_index(path, pcapio.scan_records(path), every=100)
+    index = read_index(path)
+    late = records["time"][-1]
+    first, _ = window_range(index, late - 1e-6, None)
+    assert first == 24                            # the first record holds the latest packet
+    window = scan_window(path, late - 1e-6, None)
+    assert np.array_equal(window["records"]["time"], in_window(path, late - 1e-6, np.inf)["time"])
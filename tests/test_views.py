@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import threading
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import numpy as np
+import pytest
+from bokeh.embed import file_html
+from bokeh.models import CDSView, ColumnDataSource, Div, Select, TableColumn
+from bokeh.plotting import figure
+from bokeh.resources import CDN
+
+from netdelay import views
+from netdelay.density import write_density
+from netdelay.tables import output_table_dir, query_table, write_table
+
+
+@pytest.fixture
+def web_app(tmp_path):
+    """
+    A stand-in for server.js: the project directory tmp_path served as
+    static files, plus one page served from elsewhere at /userPlot1 (as the
+    web app serves pages stored in the database).
+    """
+    pages = {}
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if self.path in pages:
+                body = pages[self.path].encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", pages
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as r:
+        return r.read()
+
+
+def test_served_url():
+    assert views.served_url(os.path.join("plot1_data", "conv 0.json")) == "plot1_data/conv%200.json"
+
+
+def test_paged_table_reads_the_folder_it_was_served_from(tmp_path, monkeypatch):
+    out = tmp_path / "analysis_jobs" / "0123abcd"
+    out.mkdir(parents=True)
+    monkeypatch.chdir(out)
+    write_table("plot9-retransmission-delays", {"delay": [0.5, 0.25]})
+    columns = [TableColumn(field="delay", title="Delay")]
+    _, source, _ = views.paged_table(columns, table_id="plot9-retransmission-delays")
+    state = source.tags[0]
+    assert "output" not in state and state["total"] == 2
+    assert "document.baseURI" in views.TABLE_PAGE_JS
+    page = query_table(state["table"], directory=output_table_dir("/analysis_jobs/0123abcd/", root=tmp_path))
+    assert page["rows"] == {"delay": [0.5, 0.25]}
+
+
+def test_page_served_from_database_loads_its_data(tmp_path, monkeypatch, web_app):
+    base, pages = web_app
+    out = tmp_path / "plots" / "a@b.c" / "17-x"
+    out.mkdir(parents=True)
+    monkeypatch.chdir(out)
+
+    x = np.arange(5000, dtype=np.float64)
+    y = np.sin(x / 100)
+    part = views.series_payload({"time": x, "ack_rtt": y}, "time", "ack_rtt", "plot1_data/conv0_ack.bin", budget=200)
+    views.write_payload("plot1_data/conv0.json", {"ack": part})
+    views.write_payload("plot1_data/conv1.json", {"ack": part})
+    meta, image = write_density("plot3_data/density", x, y, url=views.served_url("plot3_data/density"))
+
+    source = ColumnDataSource(part["data"], tags=[part["meta"]])
+    p = figure()
+    p.scatter("time", "ack_rtt", source=source)
+    views.reload_on_zoom(p, source)
+    select = Select(value="a", options=["a", "b"])
+    views.lazy_select(select, Div(), {"a": "plot1_data/conv0.json", "b": "plot1_data/conv1.json"},
+                      {"ack": {"source": source}})
+    density = figure()
+    views.density_plot(density, meta, image)
+    html = file_html([p, select, density], CDN, "test")
+    # updatePlot.js stores the page with a <base href> naming its output folder
+    pages["/userPlot1"] = re.sub(r"<head[^>]*>", lambda m: m.group(0) + '\n<base href="/plots/a%40b.c/17-x/">', html,
+                                 count=1)
+
+    html = _get(base + "/userPlot1").decode()
+    page_base = urljoin(base, re.search(r'<base href="([^"]*)">', html).group(1))
+    urls = set(re.findall(r'"([^"]*plot\d_data/[^"]*)"', html))
+    assert urls >= {"plot1_data/conv0.json", "plot1_data/conv1.json", "plot1_data/conv0_ack.bin",
+                    "plot3_data/density.levels.bin", "plot3_data/density.points.bin"}
+    for url in urls:
+        assert len(_get(urljoin(page_base, url))) > 0
+
+    payload = json.loads(_get(urljoin(page_base, "plot1_data/conv1.json")))
+    assert payload["ack"]["total"] == 5000
+    full = np.frombuffer(_get(urljoin(page_base, part["meta"]["url"])), dtype="<f8").reshape(2, -1)
+    assert np.array_equal(full[0], x) and np.array_equal(full[1], y)
+
+
+def test_filter_lists_the_groups_of_each_view(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    x = np.arange(6, dtype=np.float64)
+    data = {"time": x, "ack_rtt": x / 10, "dst": ["10.0.0.2", "10.0.0.1"] * 3}
+    part = views.series_payload(data, "time", "ack_rtt", "plot2_data/src0_ack.bin", group="dst")
+    source = ColumnDataSource(part["data"])
+    select = Select(value="All", options=["All", "stale"])
+    select.value = "stale"
+    views.apply_part({"source": source, "filter": select}, part)
+    assert select.options == ["All", "10.0.0.1", "10.0.0.2"] and select.value == "All"
+    groups = part["meta"]["expand"]["dst"]
+    assert [groups[c] for c in np.asarray(source.data["code"]).tolist()] == data["dst"]
+
+
+def test_code_filters_share_one_source():
+    source = ColumnDataSource({"x": [1, 2, 3], "y": [4, 5, 6], "cause": np.array([0, 1, 0], dtype=np.uint8)})
+    p = figure()
+    for value in (0, 1):
+        p.scatter("x", "y", source=source, view=CDSView(filter=views.code_filter("cause", value)))
+    assert {id(r.data_source) for r in p.renderers} == {id(source)}
+    assert [r.view.filter.args["value"] for r in p.renderers] == [0, 1]
+    html = file_html(p, CDN)
+    assert html.count('"type":"object","name":"ColumnDataSource"') == 1
+
+
+def test_legend_data():
+    meta = {"group": "ip", "expand": {"ip": ["10.0.0.1", "10.0.0.2"], "color": ["#111111", "#222222"]}}
+    data = views.legend_data(meta)
+    assert np.isnan(data["x"]).all() and len(data["y"]) == 2
+    assert data["ip"] == ["10.0.0.1", "10.0.0.2"] and data["color"] == ["#111111", "#222222"]
@@ -0,0 +1,41 @@
+import pytest
+
+from netdelay import worker
+
+SCRIPT = """
+import sys
+
+with open("out.txt", "w") as f:
+    f.write(sys.argv[1])
+print("done")
+if sys.argv[1] == "fail":
+    sys.exit(3)
+"""
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = worker.AnalysisPool(1, preload=[])
+    yield pool
+    pool.close()
+
+
+def test_run_script_in_pool(tmp_path, pool):
+    script = tmp_path / "script.py"
+    script.write_text(SCRIPT)
+    out = tmp_path / "out"
+    out.mkdir()
+    result = pool.run(str(script), ["ok"], str(out))
+    assert result["code"] == 0 and result["output"] == "done\n"
+    assert result["files"] == ["out.txt", "script.py.report.json"]
+    assert (out / "out.txt").read_text() == "ok"
+
+    result = pool.run(str(script), ["fail"], str(out))
+    assert result["code"] == 3
+
+
+def test_importing_does_not_hook_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker, "_written", set())
+    with open(tmp_path / "x", "w"):
+        pass
+    assert worker._written == set()
@@ -10,6 +10,10 @@ dotenv.config();
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+// Folder holding the plots to store: an upload's output folder
+// (plots/<user>/<upload>/, as returned by /upload-file) or the project root
+const plotDir = process.argv[2] ? path.resolve(__dirname, process.argv[2]) : __dirname;
+
 // Read the current user's email from currentUser.txt
 const currentUserFile = path.join(__dirname, 'currentUser.txt');
 let currentUserEmail;
@@ -54,16 +58,53 @@ const userSchema = new mongoose.Schema({
 });
 const User = mongoose.model("User", userSchema);
 
+// URL path under which server.js serves a folder of the project
+function folderUrl(dir) {
+  const parts = path.relative(__dirname, dir).split(path.sep).filter(Boolean);
+  return '/' + parts.map(encodeURIComponent).map(part => part + '/').join('');
+}
+
+// The pages fetch their data (plot*_data/) and tables (analysis_tables/)
+// relative to themselves. A stored page is served from /userPlotN, so it
+// gets a <base href> naming the output folder it was written to.
+function withBase(content, dir) {
+  return content.replace(/<head[^>]*>/i, head => `${head}\n<base href="${folderUrl(dir)}">`);
+}
+
+// server.js serves an upload's output folder as /plots/<user>/<upload>/.
+// Deletes the user's older upload folders that none of their stored pages
+// refers to any more.
+async function removeUnusedOutputs(userDir, current) {
+  const user = await User.findOne({ email: currentUserEmail.toLowerCase().trim() }).lean();
+  if (!user) return;
+  const pages = [];
+  for (let i = 1; i <= 9; i++) {
+    if (user[`plotContent${i}`]) pages.push(user[`plotContent${i}`]);
+  }
+  // Upload folders are named <upload timestamp>-<file name>
+  const uploaded = (name) => parseInt(name, 10);
+  const userUrl = folderUrl(userDir);
+  for (const entry of fs.readdirSync(userDir, { withFileTypes: true })) {
+    // Newer folders may belong to uploads whose scripts are still running
+    if (!entry.isDirectory() || !(uploaded(entry.name) < uploaded(current))) continue;
+    const url = userUrl + encodeURIComponent(entry.name) + '/';
+    if (!pages.some(page => page.includes(url))) {
+      fs.rmSync(path.join(userDir, entry.name), { recursive: true, force: true });
+      console.log(`${url} is no longer used. Deleted.`);
+    }
+  }
+}
+
 async function updatePlots() {
   try {
     // Loop through plot files 1 through 9
     const updates = {};
     for (let i = 1; i <= 9; i++) {
       const fileName = `plot${i}.html`;
-      const filePath = path.join(__dirname, fileName);
+      const filePath = path.join(plotDir, fileName);
       if (fs.existsSync(filePath)) {
         const content = fs.readFileSync(filePath, 'utf-8');
-        updates[`plotContent${i}`] = content;
+        updates[`plotContent${i}`] = withBase(content, plotDir);
       } else {
         console.log(`${fileName} not found. Skipping update for this file.`);
       }
@@ -84,12 +125,17 @@ async function updatePlots() {
     // Delete each plot file after successful update
     for (let i = 1; i <= 9; i++) {
       const fileName = `plot${i}.html`;
-      const filePath = path.join(__dirname, fileName);
+      const filePath = path.join(plotDir, fileName);
       if (fs.existsSync(filePath)) {
         fs.unlinkSync(filePath);
         console.log(`${fileName} deleted successfully.`);
       }
     }
+    
+    // The new pages' data and tables stay in plotDir, served with them
+    if (path.dirname(path.dirname(plotDir)) === path.join(__dirname, 'plots')) {
+      await removeUnusedOutputs(path.dirname(plotDir), path.basename(plotDir));
+    }
   } catch (error) {
     console.error("Error updating plot content:", error);
   } finally {